@@ -0,0 +1,55 @@
+"""Benchmark: arkiv history round trip at growing sizes.
+
+Ingests ``--sizes`` synthetic visits (one long browsing session, the
+worst case for session regrouping), exports them to an arkiv bundle and
+imports the bundle into a fresh archive, which writes the visits one at
+a time. Import time per visit should stay flat as the size grows; a
+rising figure means some per-visit step rescans earlier visits.
+
+Usage::
+
+    python benchmarks/bench_arkiv_history.py [--sizes 2000 4000 8000]
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from bench_history_ingest import _entries
+
+from bookmark_memex.db import Database
+from bookmark_memex.exporters.arkiv import export_arkiv
+from bookmark_memex.importers.arkiv import import_arkiv
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 4000, 8000])
+    parser.add_argument("--urls", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'visits':>8}  {'ingest s':>9}  {'import s':>9}  {'import us/visit':>15}")
+    for size in args.sizes:
+        # 250ms apart: every visit lands in the same session.
+        entries = _entries(size, args.urls)
+        with tempfile.TemporaryDirectory() as tmp:
+            src = Database(Path(tmp) / "src.db")
+            start = time.perf_counter()
+            src.bulk_ingest_history(entries, source_type="chrome", source_name="bench")
+            ingest = time.perf_counter() - start
+
+            bundle = Path(tmp) / "bundle"
+            export_arkiv(src, bundle, include_history=True)
+            dst = Database(Path(tmp) / "dst.db")
+            start = time.perf_counter()
+            import_arkiv(dst, bundle)
+            imported = time.perf_counter() - start
+
+        print(f"{size:>8,}  {ingest:>9.2f}  {imported:>9.2f}"
+              f"  {imported / size * 1e6:>15,.0f}")
+
+
+if __name__ == "__main__":
+    main()
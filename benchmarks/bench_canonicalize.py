@@ -0,0 +1,101 @@
+"""Microbenchmark: per-URL cost of history URL canonicalization.
+
+Draws ``--lookups`` URLs from a Zipf-distributed pool of ``--urls``
+distinct ones (a few pages are revisited constantly, most are seen
+once or twice; roughly what a browser history looks like) and times:
+
+- ``two-pass``: strip trackers with one parse, re-parse in
+  :func:`normalize_url`, then do it all again for the unique id, as
+  ``bulk_ingest_history`` used to for every new URL.
+- ``single-pass``: :func:`canonicalize_history_url` with its cache
+  bypassed, i.e. the cost of a cold URL.
+- ``cached``: :func:`canonicalize_history_url` as the ingest path calls
+  it, from a cleared cache.
+
+Usage::
+
+    python benchmarks/bench_canonicalize.py [--lookups 500000] [--urls 50000]
+                                            [--zipf 1.1]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import random
+import time
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from bookmark_memex.db import (
+    _HISTORY_TRACKING_PARAMS,
+    canonicalize_history_url,
+    normalize_url,
+)
+
+
+def _two_pass_normalize(url: str) -> str:
+    p = urlparse(url)
+    params = [
+        (k, v) for k, v in parse_qsl(p.query, keep_blank_values=True)
+        if k.lower() not in _HISTORY_TRACKING_PARAMS
+    ]
+    return normalize_url(
+        urlunparse((p.scheme, p.netloc, p.path, p.params, urlencode(params), ""))
+    )
+
+
+def _two_pass(url: str) -> tuple[str, str]:
+    uid = hashlib.sha256(_two_pass_normalize(url).encode()).hexdigest()[:16]
+    return _two_pass_normalize(url), uid
+
+
+def _pool(urls: int, rng: random.Random) -> list[str]:
+    pool = []
+    for i in range(urls):
+        host = f"site{rng.randrange(500)}.example.com"
+        query = f"?id={i}&page={rng.randrange(10)}"
+        if rng.random() < 0.3:
+            query += "&utm_source=news&utm_medium=email&fbclid=abc"
+        pool.append(f"https://{host}/articles/{i}/{query}#section-{i % 4}")
+    return pool
+
+
+def _lookups(pool: list[str], n: int, s: float, rng: random.Random) -> list[str]:
+    weights = [1 / (rank + 1) ** s for rank in range(len(pool))]
+    return rng.choices(pool, weights=weights, k=n)
+
+
+def _time(fn, urls: list[str]) -> float:
+    start = time.perf_counter()
+    for url in urls:
+        fn(url)
+    return (time.perf_counter() - start) / len(urls)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lookups", type=int, default=500_000)
+    parser.add_argument("--urls", type=int, default=50_000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    urls = _lookups(_pool(args.urls, rng), args.lookups, args.zipf, rng)
+    print(f"{len(urls):,} lookups over {len(set(urls)):,} distinct URLs")
+
+    for u in set(urls):
+        assert canonicalize_history_url.__wrapped__(u) == _two_pass(u)
+
+    two = _time(_two_pass, urls)
+    one = _time(canonicalize_history_url.__wrapped__, urls)
+    canonicalize_history_url.cache_clear()
+    cached = _time(canonicalize_history_url, urls)
+    info = canonicalize_history_url.cache_info()
+
+    print(f"  two-pass     {two * 1e6:7.2f} us/url")
+    print(f"  single-pass  {one * 1e6:7.2f} us/url  ({two / one:.1f}x)")
+    print(f"  cached       {cached * 1e6:7.2f} us/url  ({two / cached:.1f}x, "
+          f"hit rate {info.hits / (info.hits + info.misses):.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Microbenchmark: cost of ``Database(path)`` on an existing archive.
+
+Compares the version-gated fast path (one ``schema_version`` read)
+against replaying the full idempotent migration chain, which is what
+every open used to do. ``mcp._create_tools`` constructs a Database per
+tool call, so this is a per-invocation cost.
+
+Usage::
+
+    python benchmarks/bench_open.py [--repeat 200]
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+
+from bookmark_memex.db import Database
+from bookmark_memex.migrations import run_migrations
+
+
+def _time(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        db = Database(path)
+        for i in range(100):
+            db.add(f"https://example.com/{i}", tags=["bench"])
+
+        def gated_open() -> None:
+            Database(path)
+
+        def full_chain_open() -> None:
+            engine = create_engine(f"sqlite:///{path}")
+            run_migrations(engine, 0)
+            engine.dispose()
+
+        gated = _time(gated_open, args.repeat)
+        full = _time(full_chain_open, args.repeat)
+
+    print(f"version-gated open : {gated * 1e3:8.3f} ms")
+    print(f"full migration run : {full * 1e3:8.3f} ms")
+    print(f"speed-up           : {full / gated:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
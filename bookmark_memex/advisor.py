@@ -0,0 +1,181 @@
+"""Index advisor: ``EXPLAIN QUERY PLAN`` over the known hot queries.
+
+Each entry in :data:`HOT_QUERIES` mirrors a read path that runs often
+enough to matter (``Database.list``/``iter_bookmarks``, the HTML app's
+list and tag views, MCP ``get_record``). :func:`advise` asks SQLite how
+it would run each one and flags full table scans, i.e. plan steps of
+the form ``SCAN <table>`` with no index. Index scans
+(``SCAN t USING INDEX ...``) are ordered walks that stop at ``LIMIT``
+and are not flagged.
+
+Positional parameters are bound to NULL; the plan does not depend on
+the values.
+"""
+from __future__ import annotations
+
+import re
+import sqlite3
+from typing import NamedTuple
+
+
+class HotQuery(NamedTuple):
+    name: str
+    source: str
+    sql: str
+    # Tables a whole-table aggregate legitimately scans.
+    expected_scans: tuple[str, ...] = ()
+
+
+class PlanReport(NamedTuple):
+    query: HotQuery
+    plan: list[str]
+    full_scans: list[str]
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.full_scans
+
+
+HOT_QUERIES: tuple[HotQuery, ...] = (
+    HotQuery(
+        "bookmarks.list",
+        "Database.list / html-app fetchRecent",
+        "SELECT id, unique_id, url, title, description, added FROM bookmarks "
+        "WHERE archived_at IS NULL ORDER BY added DESC LIMIT ?",
+    ),
+    HotQuery(
+        "bookmarks.iter_page",
+        "Database.iter_bookmarks",
+        "SELECT id FROM bookmarks "
+        "WHERE archived_at IS NULL AND (added, id) < (?, ?) "
+        "ORDER BY added DESC, id DESC LIMIT ?",
+    ),
+    HotQuery(
+        "bookmarks.by_domain",
+        "Database.list(domain=) / html-app fetchByDomain",
+        "SELECT id, unique_id, url, title, description, added FROM bookmarks "
+        "WHERE domain = ? AND archived_at IS NULL ORDER BY added DESC",
+    ),
+    HotQuery(
+        "history_urls.by_domain",
+        "MCP execute_sql per-site history",
+        "SELECT id, url, title, visit_count FROM history_urls "
+        "WHERE domain = ? AND archived_at IS NULL ORDER BY last_visited DESC",
+    ),
+    HotQuery(
+        "bookmarks.by_unique_id",
+        "Database.get_by_unique_id / html-app fetchBookmark",
+        "SELECT * FROM bookmarks WHERE unique_id = ? AND archived_at IS NULL LIMIT 1",
+    ),
+    HotQuery(
+        "bookmarks.by_tag",
+        "html-app fetchByTag",
+        "SELECT b.id, b.unique_id, b.url, b.title, b.description, b.added "
+        "FROM bookmarks b "
+        "JOIN bookmark_tags bt ON bt.bookmark_id = b.id "
+        "JOIN tags t ON t.id = bt.tag_id "
+        "WHERE b.archived_at IS NULL AND t.name = ? "
+        "ORDER BY b.added DESC",
+    ),
+    HotQuery(
+        "tags.for_bookmark",
+        "html-app fetchTagsFor",
+        "SELECT t.name FROM tags t "
+        "JOIN bookmark_tags bt ON bt.tag_id = t.id "
+        "WHERE bt.bookmark_id = ? ORDER BY t.name",
+    ),
+    HotQuery(
+        "tags.popular",
+        "html-app fetchPopularTags",
+        "SELECT t.name AS name, COUNT(*) AS cnt "
+        "FROM tags t JOIN bookmark_tags bt ON bt.tag_id = t.id "
+        "JOIN bookmarks b ON b.id = bt.bookmark_id "
+        "WHERE b.archived_at IS NULL "
+        "GROUP BY t.name ORDER BY cnt DESC, t.name ASC LIMIT ?",
+        expected_scans=("bookmark_tags", "bt"),
+    ),
+    HotQuery(
+        "marginalia.for_bookmark",
+        "html-app fetchMarginaliaFor / Database.list_marginalia",
+        "SELECT id, text, created_at, updated_at FROM marginalia "
+        "WHERE bookmark_id = ? AND archived_at IS NULL "
+        "ORDER BY created_at DESC",
+    ),
+    HotQuery(
+        "history_visits.for_url",
+        "mcp get_record (history-url)",
+        "SELECT unique_id, visited_at, transition, duration_ms, "
+        "       source_type, source_name "
+        "FROM history_visits "
+        "WHERE url_id = ? AND archived_at IS NULL "
+        "ORDER BY visited_at DESC LIMIT 20",
+    ),
+    HotQuery(
+        "history_visits.timeline",
+        "arkiv export",
+        "SELECT id FROM history_visits "
+        "WHERE archived_at IS NULL ORDER BY visited_at",
+    ),
+    HotQuery(
+        "history_visits.referred",
+        "Database.descendants / ON DELETE SET NULL on from_visit_id",
+        "SELECT id FROM history_visits WHERE from_visit_id = ?",
+    ),
+    HotQuery(
+        "history_visits.in_session",
+        "Database.session_visits",
+        "SELECT id, url_id, visited_at FROM history_visits "
+        "WHERE visited_at BETWEEN ? AND ? ORDER BY visited_at",
+    ),
+    HotQuery(
+        "browsing_sessions.for_visit",
+        "Database.session_for_visit",
+        "SELECT * FROM browsing_sessions WHERE started_at <= ? "
+        "ORDER BY started_at DESC LIMIT 1",
+    ),
+    HotQuery(
+        "history_daily.by_domain",
+        "Database.domain_activity",
+        "SELECT day, visits, total_duration_ms FROM history_daily "
+        "WHERE domain = ? AND day >= ? AND day <= ? ORDER BY day",
+    ),
+    HotQuery(
+        "history_url_daily.on_day",
+        "Database.history_on",
+        "SELECT u.unique_id, u.url, u.title, d.visits FROM history_url_daily d "
+        "JOIN history_urls u ON u.id = d.url_id "
+        "WHERE d.day = ? ORDER BY d.visits DESC",
+    ),
+)
+
+# "SCAN bookmarks" / "SCAN b" — but not "SCAN b USING [COVERING] INDEX ..."
+# or "SCAN ... VIRTUAL TABLE ...".
+_FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> list[str]:
+    """Return the ``EXPLAIN QUERY PLAN`` detail lines for *sql*."""
+    params = [None] * sql.count("?")
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def advise(
+    conn: sqlite3.Connection,
+    queries: tuple[HotQuery, ...] = HOT_QUERIES,
+) -> list[PlanReport]:
+    """Explain every query in *queries* and flag unexpected full scans."""
+    reports = []
+    for query in queries:
+        try:
+            plan = explain(conn, query.sql)
+        except sqlite3.Error as exc:
+            reports.append(PlanReport(query, [], [], error=str(exc)))
+            continue
+        scans = [
+            line
+            for line in plan
+            if (m := _FULL_SCAN.match(line)) and m.group(1) not in query.expected_scans
+        ]
+        reports.append(PlanReport(query, plan, scans))
+    return reports
@@ -1,8 +1,8 @@
 """Thin admin CLI for bookmark-memex.
 
 Interactive query goes through the MCP server or the web UI.
-This CLI handles imports, exports, database maintenance, raw SQL,
-and launching the MCP/web servers.
+This CLI handles imports, exports, database and history maintenance,
+raw SQL, and launching the MCP/web servers.
 
 Entry point: bookmark-memex (see pyproject.toml)
 """
@@ -14,9 +14,9 @@ import sqlite3
 import sys
 import argparse
 from argparse import ArgumentParser, Namespace
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 from bookmark_memex import __version__
 
@@ -113,9 +113,32 @@ def build_parser() -> ArgumentParser:
         help=(
             "Only import visits after this ISO-8601 datetime "
             "(e.g. 2026-04-01 or 2026-04-01T12:00:00). "
+            "Defaults to the last import's watermark. "
             "Optimisation only; re-imports are idempotent regardless."
         ),
     )
+    p_ih.add_argument(
+        "--full",
+        action="store_true",
+        default=False,
+        help="Ignore the last import's watermark and read the whole history",
+    )
+    p_ih.add_argument(
+        "--restart",
+        action="store_true",
+        default=False,
+        help="Ignore the checkpoint of an interrupted import and start over",
+    )
+    p_ih.add_argument(
+        "--all",
+        dest="all_profiles",
+        action="store_true",
+        default=False,
+        help=(
+            "Import every detected profile (of --browser, or of every "
+            "browser) concurrently; --profile narrows by profile name"
+        ),
+    )
     p_ih.add_argument(
         "--list",
         dest="list_profiles",
@@ -124,6 +147,35 @@ def build_parser() -> ArgumentParser:
         help="List detected browser profiles and exit",
     )
 
+    # ── history ──────────────────────────────────────────────────────────────
+    p_hist = sub.add_parser("history", help="Browser history maintenance")
+    hist_sub = p_hist.add_subparsers(dest="history_command")
+    p_prune = hist_sub.add_parser(
+        "prune",
+        help="Delete old visits, optionally keeping daily summaries",
+    )
+    p_prune.add_argument(
+        "--older-than",
+        dest="older_than",
+        metavar="AGE",
+        required=True,
+        help=(
+            "Delete visits before this age (e.g. 90d, 12w, 6m, 2y) or "
+            "ISO date (2024-01-01)"
+        ),
+    )
+    p_prune.add_argument(
+        "--summarise",
+        "--summarize",
+        dest="summarise",
+        action="store_true",
+        default=False,
+        help=(
+            "Keep the per-domain and per-URL daily rollups for the pruned "
+            "days; without it they are deleted too"
+        ),
+    )
+
     # ── export ───────────────────────────────────────────────────────────────
     p_export = sub.add_parser("export", help="Export bookmarks to a file")
     p_export.add_argument("path", metavar="PATH", help="Destination file path")
@@ -153,6 +205,15 @@ def build_parser() -> ArgumentParser:
         default=False,
         help=argparse.SUPPRESS,
     )
+    p_export.add_argument(
+        "--domain",
+        default=None,
+        metavar="DOMAIN",
+        help=(
+            "json/csv/markdown/text/m3u only: export just the bookmarks on "
+            "this site (www. and ports ignored)"
+        ),
+    )
     p_export.add_argument(
         "--include-history",
         dest="include_history",
@@ -189,9 +250,15 @@ def build_parser() -> ArgumentParser:
     p_db = sub.add_parser("db", help="Database maintenance commands")
     p_db.add_argument(
         "db_command",
-        choices=["info", "schema", "vacuum", "migrate"],
+        choices=[
+            "info", "schema", "vacuum", "migrate", "advise", "rebuild-rollups",
+            "compact-timestamps",
+        ],
         metavar="COMMAND",
-        help="One of: info, schema, vacuum, migrate",
+        help=(
+            "One of: info, schema, vacuum, migrate, advise, rebuild-rollups, "
+            "compact-timestamps"
+        ),
     )
 
     # ── serve ────────────────────────────────────────────────────────────────
@@ -209,8 +276,16 @@ def build_parser() -> ArgumentParser:
     )
 
     # ── sql ──────────────────────────────────────────────────────────────────
-    p_sql = sub.add_parser("sql", help="Execute a raw SQL query")
-    p_sql.add_argument("query", metavar="QUERY", help="SQL query string")
+    p_sql = sub.add_parser(
+        "sql",
+        help="Execute a raw SQL statement",
+        description=(
+            "Execute one SQL statement. Queries run on a shared read-only "
+            "connection; statements that write (INSERT, UPDATE, DELETE, DDL) "
+            "run on a read-write connection and are committed."
+        ),
+    )
+    p_sql.add_argument("query", metavar="QUERY", help="SQL statement")
     p_sql.add_argument(
         "-o",
         dest="output",
@@ -317,20 +392,37 @@ def cmd_import_browser(args: Namespace) -> None:
     )
 
 
+def _tty_progress(unit: str) -> Optional[Callable[[int], None]]:
+    """A progress callback that counts *unit* on stderr, if it is a terminal."""
+    if not sys.stderr.isatty():
+        return None
+
+    def progress(done: int) -> None:
+        print(f"\r  {done:,} {unit}", end="", file=sys.stderr, flush=True)
+
+    return progress
+
+
+def _print_history_profiles(browser: Optional[str]) -> None:
+    from bookmark_memex.importers.browser_history import list_history_profiles
+
+    profiles = list_history_profiles(browser)
+    if not profiles:
+        print("No browser profiles detected.")
+    for p in profiles:
+        default_marker = " (default)" if p.get("is_default") else ""
+        print(f"  {p['browser']} / {p['name']}{default_marker}: {p['path']}")
+
+
 def cmd_import_history(args: Namespace) -> None:
     """Import browser history (distinct from curated bookmarks)."""
     from bookmark_memex.importers.browser_history import (
         import_history,
-        list_history_profiles,
+        import_history_all,
     )
 
     if getattr(args, "list_profiles", False):
-        profiles = list_history_profiles(getattr(args, "browser", None))
-        if not profiles:
-            print("No browser profiles detected.")
-        for p in profiles:
-            default_marker = " (default)" if p.get("is_default") else ""
-            print(f"  {p['browser']} / {p['name']}{default_marker}: {p['path']}")
+        _print_history_profiles(getattr(args, "browser", None))
         return
 
     since: Optional[datetime] = None
@@ -347,13 +439,84 @@ def cmd_import_history(args: Namespace) -> None:
     db = Database(db_path)
     browser = getattr(args, "browser", None) or "chrome"
     profile = getattr(args, "profile", None)
-    result = import_history(db, browser=browser, profile=profile, since=since)
+    progress = _tty_progress("visits")
+
+    if getattr(args, "all_profiles", False):
+        requested = getattr(args, "browser", None)
+        results = import_history_all(
+            db,
+            browsers=[requested] if requested else ["chrome", "firefox"],
+            profiles=[profile] if profile else None,
+            since=since,
+            progress=progress,
+            resume=not getattr(args, "restart", False),
+            full=getattr(args, "full", False),
+        )
+    else:
+        results = {
+            browser: import_history(
+                db,
+                browser=browser,
+                profile=profile,
+                since=since,
+                progress=progress,
+                resume=not getattr(args, "restart", False),
+                full=getattr(args, "full", False),
+            )
+        }
+    if progress is not None:
+        print(file=sys.stderr)
+    for source, result in results.items():
+        print(
+            f"Imported history from {source}: "
+            f"urls seen {result.urls_seen}, added {result.urls_added}, "
+            f"updated {result.urls_updated}; "
+            f"visits seen {result.visits_seen}, added {result.visits_added}, "
+            f"skipped {result.visits_skipped}"
+        )
+
+
+# Days per unit accepted by ``history prune --older-than``.
+_AGE_UNITS = {"d": 1, "w": 7, "m": 30, "y": 365}
+
+
+def _parse_cutoff(raw: str) -> date:
+    """Turn ``--older-than`` (``2y``, ``90d``, or an ISO date) into a day."""
+    raw = raw.strip().lower()
+    if raw[:-1].isdigit() and raw[-1:] in _AGE_UNITS:
+        days = int(raw[:-1]) * _AGE_UNITS[raw[-1]]
+        return datetime.now(timezone.utc).date() - timedelta(days=days)
+    try:
+        return date.fromisoformat(raw)
+    except ValueError:
+        raise SystemExit(
+            f"invalid --older-than value {raw!r}: expected e.g. 90d, 6m, 2y "
+            "or an ISO date"
+        )
+
+
+def cmd_history(args: Namespace) -> None:
+    """Browser history maintenance: prune."""
+    if getattr(args, "history_command", None) != "prune":
+        print("usage: bookmark-memex history prune --older-than AGE [--summarise]")
+        sys.exit(1)
+
+    before = _parse_cutoff(args.older_than)
+    from bookmark_memex.db import Database
+
+    db = Database(_resolve_db(args))
+    progress = _tty_progress("visits deleted")
+
+    result = db.prune_history(
+        before, summarise=getattr(args, "summarise", False), progress=progress
+    )
+    if progress is not None:
+        print(file=sys.stderr)
+    kept = "kept" if result.summarised else "deleted"
     print(
-        f"Imported history from {browser}: "
-        f"urls seen {result.urls_seen}, added {result.urls_added}, "
-        f"updated {result.urls_updated}; "
-        f"visits seen {result.visits_seen}, added {result.visits_added}, "
-        f"skipped {result.visits_skipped}"
+        f"Pruned history before {before.isoformat()}: "
+        f"{result.visits_deleted} visit(s) across {result.urls_touched} URL(s); "
+        f"daily summaries {kept}; {result.pages_freed} page(s) freed"
     )
 
 
@@ -361,6 +524,7 @@ def cmd_export(args: Namespace) -> None:
     """Export bookmarks to a file."""
     from bookmark_memex.db import Database
     from bookmark_memex.exporters import export_file
+    from bookmark_memex.models import Bookmark, url_domain
 
     db_path = _resolve_db(args)
     db = Database(db_path)
@@ -386,23 +550,70 @@ def cmd_export(args: Namespace) -> None:
     if fmt == "arkiv":
         kwargs["include_history"] = bool(getattr(args, "include_history", False))
 
-    export_file(db, Path(args.path), format=fmt, **kwargs)
+    where = None
+    if getattr(args, "domain", None):
+        where = Bookmark.domain == url_domain(args.domain)
+
+    export_file(db, Path(args.path), format=fmt, where=where, **kwargs)
     print(f"Exported to {args.path} (format: {fmt})")
 
 
+def _db_info(conn: sqlite3.Connection) -> None:
+    """Print every table with its row count."""
+    tables = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"
+    ).fetchall()
+    for (name,) in tables:
+        count = conn.execute(f"SELECT COUNT(*) FROM [{name}]").fetchone()[0]
+        print(f"  {name}: {count} row(s)")
+
+
+def _db_advise(conn: sqlite3.Connection) -> None:
+    """Print the query advisor's reports; exit 1 if any query scans."""
+    from bookmark_memex.advisor import advise
+
+    reports = advise(conn)
+    for report in reports:
+        if report.error:
+            print(f"ERROR {report.query.name}: {report.error}")
+        elif report.full_scans:
+            print(f"SCAN  {report.query.name} ({report.query.source})")
+            for line in report.plan:
+                print(f"        {line}")
+        else:
+            print(f"ok    {report.query.name}")
+    if not all(r.ok for r in reports):
+        sys.exit(1)
+
+
+def _db_compact_timestamps(db_path: str) -> None:
+    from bookmark_memex.db import Database
+
+    result = Database(db_path).compact_history_timestamps()
+    if not result.converted:
+        print("History timestamps are already stored as integers.")
+        return
+    print(
+        "History timestamps now stored as epoch microseconds: "
+        f"{result.bytes_before / 1e6:.1f} MB -> "
+        f"{result.bytes_after / 1e6:.1f} MB."
+    )
+    if result.bytes_free:
+        print(
+            f"{result.bytes_free / 1e6:.1f} MB of freed pages remain "
+            "in the file; run `bookmark-memex db vacuum` to reclaim them."
+        )
+
+
 def cmd_db(args: Namespace) -> None:
-    """Database maintenance: info, schema, vacuum, migrate."""
+    """Database maintenance: info, schema, vacuum, migrate, advise, rollups,
+    compact-timestamps."""
     db_path = _resolve_db(args)
 
     conn = sqlite3.connect(db_path)
     try:
         if args.db_command == "info":
-            tables = conn.execute(
-                "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"
-            ).fetchall()
-            for (name,) in tables:
-                count = conn.execute(f"SELECT COUNT(*) FROM [{name}]").fetchone()[0]
-                print(f"  {name}: {count} row(s)")
+            _db_info(conn)
 
         elif args.db_command == "schema":
             rows = conn.execute(
@@ -413,6 +624,9 @@ def cmd_db(args: Namespace) -> None:
                 print()
 
         elif args.db_command == "vacuum":
+            # Also switches older files to incremental auto-vacuum, which
+            # `history prune` relies on to return freed pages.
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
             conn.execute("VACUUM")
             print("VACUUM complete.")
 
@@ -420,46 +634,80 @@ def cmd_db(args: Namespace) -> None:
             print("Command not yet implemented")
             sys.exit(1)
 
+        elif args.db_command == "advise":
+            _db_advise(conn)
+
+        elif args.db_command == "rebuild-rollups":
+            from bookmark_memex.db import Database
+
+            db = Database(db_path)
+            days = db.rebuild_history_rollups()
+            sessions = db.rebuild_browsing_sessions()
+            print(
+                f"Rebuilt history rollups: {days} domain-day row(s), "
+                f"{sessions} browsing session(s)."
+            )
+
+        elif args.db_command == "compact-timestamps":
+            _db_compact_timestamps(db_path)
+
     finally:
         conn.close()
 
 
-def cmd_sql(args: Namespace) -> None:
-    """Execute a raw SQL query and print results in the chosen format."""
-    db_path = _resolve_db(args)
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
+def _run_sql(db_path: str, query: str) -> list[sqlite3.Row]:
+    """Run *query* and return its rows.
+
+    Tried first on a pooled read-only connection. A statement SQLite
+    refuses there as a write is re-run on a read-write connection and
+    committed.
+    """
+    from bookmark_memex.pool import get_read_pool
 
     try:
-        cursor = conn.execute(args.query)
-        rows = cursor.fetchall()
+        with get_read_pool(db_path).connection() as conn:
+            conn.row_factory = sqlite3.Row
+            return conn.execute(query).fetchall()
+    except sqlite3.OperationalError as exc:
+        # A read-only connection rejects a write before changing anything.
+        if "readonly database" not in str(exc):
+            raise
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        with conn:
+            return conn.execute(query).fetchall()
+    finally:
+        conn.close()
 
-        if not rows:
-            print("(no rows)")
-            return
 
-        columns = list(rows[0].keys())
+def cmd_sql(args: Namespace) -> None:
+    """Execute a raw SQL statement and print results in the chosen format."""
+    rows = _run_sql(_resolve_db(args), args.query)
+    if not rows:
+        print("(no rows)")
+        return
 
-        if args.output == "json":
-            for row in rows:
-                print(json.dumps(dict(row)))
+    columns = list(rows[0].keys())
 
-        elif args.output == "csv":
-            writer = csv.writer(sys.stdout)
-            writer.writerow(columns)
-            for row in rows:
-                writer.writerow(list(row))
+    if args.output == "json":
+        for row in rows:
+            print(json.dumps(dict(row)))
 
-        else:  # table (tab-separated)
-            print("\t".join(columns))
-            for row in rows:
-                print("\t".join(str(v) if v is not None else "" for v in row))
+    elif args.output == "csv":
+        writer = csv.writer(sys.stdout)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(list(row))
 
-        if args.output == "table":
-            print(f"({len(rows)} row(s))")
+    else:  # table (tab-separated)
+        print("\t".join(columns))
+        for row in rows:
+            print("\t".join(str(v) if v is not None else "" for v in row))
 
-    finally:
-        conn.close()
+    if args.output == "table":
+        print(f"({len(rows)} row(s))")
 
 
 def cmd_mcp(args: Namespace) -> None:
@@ -487,6 +735,7 @@ def main() -> None:
         "import": cmd_import,
         "import-browser": cmd_import_browser,
         "import-history": cmd_import_history,
+        "history": cmd_history,
         "export": cmd_export,
         "db": cmd_db,
         "sql": cmd_sql,
@@ -10,195 +10,77 @@ that touches bookmark identity uses the same logic.
 from __future__ import annotations
 
 import hashlib
+import json
+import threading
 import uuid
 from contextlib import contextmanager
-from datetime import datetime, timezone
+from functools import lru_cache
+from datetime import date, datetime, time, timedelta, timezone
 from pathlib import Path
-from typing import Any, Generator, Optional
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Generator,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+)
 from urllib.parse import urlencode, parse_qsl, urlparse, urlunparse
 
-from sqlalchemy import create_engine, insert as sa_insert, select
-from sqlalchemy.orm import Session, sessionmaker
-
+from sqlalchemy import (
+    bindparam,
+    create_engine,
+    delete as sa_delete,
+    func,
+    insert as sa_insert,
+    literal,
+    select,
+    text,
+    true,
+    tuple_,
+    update as _sa_update,
+)
+from sqlalchemy.orm import Session, aliased, selectinload, sessionmaker, undefer
+
+from bookmark_memex.migrations import (
+    DEFER_VISIT_AGGREGATES,
+    SCHEMA_VERSION,
+    compact_history_timestamps,
+    extend_browsing_sessions,
+    recompute_browsing_sessions,
+    recompute_history_rollups,
+    run_migrations,
+    schema_state,
+    visit_day_sql,
+)
 from bookmark_memex.models import (
     Marginalia,
-    Base,
     Bookmark,
     BookmarkSource,
+    BrowsingSession,
+    ContentBlob,
+    ContentCache,
     Event,
+    HistoryDaily,
+    HistoryTimestamp,
     HistoryUrl,
+    HistoryUrlDaily,
     HistoryVisit,
+    ImportCheckpoint,
+    ImportWatermark,
+    StoreSetting,
     Tag,
     bookmark_tags,
+    generate_visit_key,
+    url_domain,
+    use_epoch_timestamps,
+    visit_key_from_unique_id,
 )
 from bookmark_memex.soft_delete import archive, hard_delete, restore, filter_active
 
 
-# ---------------------------------------------------------------------------
-# Pre-create migrations
-# ---------------------------------------------------------------------------
-
-
-def _apply_rename_annotations_to_marginalia(engine) -> None:
-    """Rename legacy ``annotations`` / ``annotations_fts`` tables in place.
-
-    Run once on first open of a pre-rename database. Idempotent: safe to
-    re-run, and a fresh database (no legacy tables) is a no-op.
-
-    Schema is otherwise identical — same columns, indexes, and FK targets —
-    so ``ALTER TABLE ... RENAME TO`` preserves data and indexes intact.
-    The FTS5 shadow table is dropped and will be recreated by the FTS
-    bootstrap on first use (it is a derived index, not a source of truth).
-    """
-    with engine.begin() as conn:
-        from sqlalchemy import text
-
-        names = {
-            r[0] for r in conn.execute(
-                text(
-                    "SELECT name FROM sqlite_master WHERE type='table' "
-                    "AND name IN ('annotations', 'marginalia', "
-                    "             'annotations_fts', 'marginalia_fts')"
-                )
-            )
-        }
-
-        if "annotations" in names and "marginalia" not in names:
-            conn.execute(text("ALTER TABLE annotations RENAME TO marginalia"))
-
-        # Legacy FTS5 shadow: drop if it exists; the FTS bootstrap will
-        # recreate a fresh one under the new name the next time it runs.
-        if "annotations_fts" in names:
-            conn.execute(text("DROP TABLE IF EXISTS annotations_fts"))
-
-
-def _apply_add_marginalia_history_cols(engine) -> None:
-    """Add history-record FK columns to an existing ``marginalia`` table.
-
-    Run once on first open of a database that predates history-capture.
-    Idempotent: inspects ``PRAGMA table_info`` and only adds columns that
-    are missing. A fresh database already has the columns via
-    ``Base.metadata.create_all``, so this is a no-op there.
-    """
-    with engine.begin() as conn:
-        from sqlalchemy import text
-
-        table_exists = conn.execute(
-            text(
-                "SELECT name FROM sqlite_master WHERE type='table' "
-                "AND name='marginalia'"
-            )
-        ).first()
-        if not table_exists:
-            return
-
-        cols = {
-            row[1]  # second column is the name
-            for row in conn.execute(text("PRAGMA table_info(marginalia)"))
-        }
-
-        if "history_url_id" not in cols:
-            conn.execute(
-                text(
-                    "ALTER TABLE marginalia ADD COLUMN history_url_id INTEGER "
-                    "REFERENCES history_urls(id) ON DELETE SET NULL"
-                )
-            )
-            conn.execute(
-                text(
-                    "CREATE INDEX IF NOT EXISTS "
-                    "ix_marginalia_history_url_id "
-                    "ON marginalia(history_url_id)"
-                )
-            )
-
-        if "history_visit_id" not in cols:
-            conn.execute(
-                text(
-                    "ALTER TABLE marginalia ADD COLUMN history_visit_id INTEGER "
-                    "REFERENCES history_visits(id) ON DELETE SET NULL"
-                )
-            )
-            conn.execute(
-                text(
-                    "CREATE INDEX IF NOT EXISTS "
-                    "ix_marginalia_history_visit_id "
-                    "ON marginalia(history_visit_id)"
-                )
-            )
-
-
-def _install_history_triggers(engine) -> None:
-    """Install SQL triggers that maintain ``history_urls`` aggregates.
-
-    ``visit_count``, ``first_visited`` and ``last_visited`` on history_urls
-    are derived from history_visits. Rather than recompute in Python for
-    every import, SQL triggers maintain the invariants on insert and
-    delete. Idempotent via ``CREATE TRIGGER IF NOT EXISTS``.
-
-    Notes:
-    - We use ``COALESCE(..., NEW.visited_at)`` for the first insert when
-      the aggregate columns are still NULL.
-    - The delete trigger is best-effort: for soft delete (``archived_at``)
-      we do NOT recompute, which is deliberate. ``visit_count`` is
-      "lifetime observed visits", not "active visits". Hard delete does
-      recompute via the delete trigger so hard-delete stays consistent.
-    """
-    with engine.begin() as conn:
-        from sqlalchemy import text
-
-        conn.execute(
-            text(
-                """
-                CREATE TRIGGER IF NOT EXISTS trg_history_visits_insert
-                AFTER INSERT ON history_visits
-                BEGIN
-                    UPDATE history_urls
-                    SET visit_count = visit_count + 1,
-                        first_visited = CASE
-                            WHEN first_visited IS NULL
-                                 OR NEW.visited_at < first_visited
-                            THEN NEW.visited_at
-                            ELSE first_visited
-                        END,
-                        last_visited = CASE
-                            WHEN last_visited IS NULL
-                                 OR NEW.visited_at > last_visited
-                            THEN NEW.visited_at
-                            ELSE last_visited
-                        END
-                    WHERE id = NEW.url_id;
-                END;
-                """
-            )
-        )
-
-        conn.execute(
-            text(
-                """
-                CREATE TRIGGER IF NOT EXISTS trg_history_visits_delete
-                AFTER DELETE ON history_visits
-                BEGIN
-                    UPDATE history_urls
-                    SET visit_count = (
-                            SELECT COUNT(*) FROM history_visits
-                            WHERE url_id = OLD.url_id
-                        ),
-                        first_visited = (
-                            SELECT MIN(visited_at) FROM history_visits
-                            WHERE url_id = OLD.url_id
-                        ),
-                        last_visited = (
-                            SELECT MAX(visited_at) FROM history_visits
-                            WHERE url_id = OLD.url_id
-                        )
-                    WHERE id = OLD.url_id;
-                END;
-                """
-            )
-        )
-
-
 # ---------------------------------------------------------------------------
 # URL utilities (public so tests can exercise them directly)
 # ---------------------------------------------------------------------------
@@ -256,6 +138,47 @@ _HISTORY_TRACKING_PARAMS: frozenset[str] = frozenset({
 })
 
 
+# Entries kept by canonicalize_history_url's LRU. History is dominated
+# by revisits, so a few tens of thousands of URLs cover almost every
+# lookup of an import while costing only a few MiB.
+_HISTORY_CANONICAL_CACHE = 32_768
+
+
+@lru_cache(maxsize=_HISTORY_CANONICAL_CACHE)
+def canonicalize_history_url(url: str) -> tuple[str, str]:
+    """Return ``(normalized_url, unique_id)`` for a history URL.
+
+    Equivalent to ``(normalize_url_for_history(url),
+    generate_history_unique_id(url))`` but parses *url* once: tracking
+    parameters are stripped and the survivors sorted in the same pass
+    that applies the :func:`normalize_url` rules. Blank-valued
+    parameters are dropped, as the former strip-then-normalize round
+    trip did.
+
+    Results are memoised in a bounded LRU; call
+    ``canonicalize_history_url.cache_clear()`` after changing
+    :data:`_HISTORY_TRACKING_PARAMS`.
+    """
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+
+    if scheme == "http" and netloc.endswith(":80"):
+        netloc = netloc[:-3]
+    elif scheme == "https" and netloc.endswith(":443"):
+        netloc = netloc[:-4]
+
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parsed.query)
+        if k.lower() not in _HISTORY_TRACKING_PARAMS
+    ))
+    path = parsed.path.rstrip("/") or "/"
+
+    # Fragment dropped: it is client-side anchor noise in history.
+    norm = urlunparse((scheme, netloc, path, parsed.params, query, ""))
+    return norm, hashlib.sha256(norm.encode("utf-8")).hexdigest()[:16]
+
+
 def normalize_url_for_history(url: str) -> str:
     """Return a history-grade canonical form of *url*.
 
@@ -268,28 +191,12 @@ def normalize_url_for_history(url: str) -> str:
     user chose to save stays faithful. History uses this. They are
     deliberately different.
     """
-    parsed = urlparse(url)
-
-    params = [
-        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
-        if k.lower() not in _HISTORY_TRACKING_PARAMS
-    ]
-    stripped = urlunparse((
-        parsed.scheme,
-        parsed.netloc,
-        parsed.path,
-        parsed.params,
-        urlencode(params),
-        "",  # drop fragment; it is client-side anchor noise in history
-    ))
-    return normalize_url(stripped)
+    return canonicalize_history_url(url)[0]
 
 
 def generate_history_unique_id(url: str) -> str:
     """Return the first 16 hex characters of sha256(normalize_for_history(url))."""
-    return hashlib.sha256(
-        normalize_url_for_history(url).encode("utf-8")
-    ).hexdigest()[:16]
+    return canonicalize_history_url(url)[1]
 
 
 # ---------------------------------------------------------------------------
@@ -301,12 +208,54 @@ def _utcnow() -> datetime:
     return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
+def _visit_by_unique_id(s: Session, unique_id: str) -> Optional[HistoryVisit]:
+    """The visit whose hex ``unique_id`` is *unique_id*, or None.
+
+    ``unique_id`` is a virtual column, so the lookup goes through
+    ``uq_history_visits_key`` instead.
+    """
+    key = visit_key_from_unique_id(unique_id)
+    if key is None:
+        return None
+    return s.execute(
+        select(HistoryVisit).where(HistoryVisit.visit_key == key)
+    ).scalar_one_or_none()
+
+
+# Opt-in loaders for Database.get(..., load=...). Each undefers the
+# heavy columns that are deferred on the models.
+_LOAD_OPTIONS = {
+    "content": lambda: (
+        selectinload(Bookmark.content_cache)
+        .undefer_group("content")
+        .selectinload(ContentCache.blob)
+        .undefer(ContentBlob.data)
+    ),
+    "favicon": lambda: undefer(Bookmark.favicon_data),
+    "sources": lambda: selectinload(Bookmark.sources).undefer(BookmarkSource.raw_data),
+}
+
+
+def _load_options(load: Iterable[str]) -> list[Any]:
+    """Translate ``load=("content", ...)`` names into loader options."""
+    options = []
+    for name in load:
+        if name not in _LOAD_OPTIONS:
+            raise ValueError(
+                f"Unknown load option {name!r}; expected one of "
+                f"{', '.join(sorted(_LOAD_OPTIONS))}"
+            )
+        options.append(_LOAD_OPTIONS[name]())
+    return options
+
+
 def _eager_load_bookmark(session: Session, bm: Bookmark) -> Bookmark:
     """Access all lazy relationships while *bm* is still bound to *session*.
 
     SQLAlchemy ``expire_on_commit=False`` keeps attribute values after commit,
     but lazy relationships that were never loaded still require a live session.
     Accessing them here forces the load before the session closes.
+    Deferred payload columns are not touched; see :data:`_LOAD_OPTIONS`.
     """
     _ = bm.tags
     _ = bm.sources
@@ -315,14 +264,690 @@ def _eager_load_bookmark(session: Session, bm: Bookmark) -> Bookmark:
     return bm
 
 
-def _get_or_create_tag(session: Session, name: str) -> Tag:
-    """Return the Tag with *name*, creating it if it does not yet exist."""
-    tag = session.execute(select(Tag).where(Tag.name == name)).scalar_one_or_none()
-    if tag is None:
-        tag = Tag(name=name)
-        session.add(tag)
-        session.flush()  # populate tag.id without committing
-    return tag
+# Chunk size for ``WHERE col IN (...)`` lookups. Comfortably below
+# SQLite's host-parameter limit on every build we care about.
+_IN_CHUNK = 500
+
+
+def _chunked(items: "list[Any]", size: int = _IN_CHUNK) -> Iterable["list[Any]"]:
+    """Yield successive *size*-length slices of *items*."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _chunked_iter(items: Iterable[Any], size: int) -> Iterator["list[Any]"]:
+    """Yield *size*-length lists from any iterable, without materialising it."""
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def _resolve_tag_ids(conn, names: Iterable[str]) -> dict[str, int]:
+    """Return ``{name: id}`` for *names*, creating any missing tags.
+
+    Uses chunked ``IN`` lookups and a single ``INSERT OR IGNORE``
+    executemany for the misses, so the cost is a handful of statements
+    regardless of how many names are requested.
+    """
+    wanted = list(dict.fromkeys(n for n in names if n))
+    ids: dict[str, int] = {}
+    for chunk in _chunked(wanted):
+        ids.update(
+            conn.execute(select(Tag.name, Tag.id).where(Tag.name.in_(chunk))).all()
+        )
+    missing = [n for n in wanted if n not in ids]
+    if missing:
+        conn.execute(
+            sa_insert(Tag).prefix_with("OR IGNORE"),
+            [{"name": n} for n in missing],
+        )
+        for chunk in _chunked(missing):
+            ids.update(
+                conn.execute(
+                    select(Tag.name, Tag.id).where(Tag.name.in_(chunk))
+                ).all()
+            )
+    return ids
+
+
+def _refresh_fts_tags(s: Session, bookmark_ids: "list[int]") -> None:
+    """Rewrite the ``tags`` column of ``bookmarks_fts`` for *bookmark_ids*.
+
+    A no-op when the FTS index has not been created or is empty. Runs
+    on the session's connection so it commits or rolls back with the
+    tag edit.
+
+    Rows are found by rowid, which :meth:`FTSIndex.rebuild_bookmarks_index
+    <bookmark_memex.fts.FTSIndex.rebuild_bookmarks_index>` sets to the
+    bookmark id. An index built before that (its newest rowid differs
+    from its bookmark id) is matched on the UNINDEXED ``bookmark_id``
+    instead, a full scan per chunk, until its next rebuild.
+    """
+    if not bookmark_ids:
+        return
+    has_fts = s.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type='table' AND name='bookmarks_fts'")
+    ).first()
+    if has_fts is None:
+        return
+    keyed = s.execute(
+        text("SELECT rowid = bookmark_id FROM bookmarks_fts ORDER BY rowid DESC LIMIT 1")
+    ).scalar()
+    if keyed is None:
+        return
+    key = "rowid" if keyed else "bookmark_id"
+    for chunk in _chunked(list(bookmark_ids)):
+        s.execute(
+            text(
+                "UPDATE bookmarks_fts SET tags = COALESCE(("
+                "  SELECT GROUP_CONCAT(t.name, ' ') FROM bookmark_tags bt"
+                "  JOIN tags t ON t.id = bt.tag_id"
+                f"  WHERE bt.bookmark_id = bookmarks_fts.{key}"
+                f"), '') WHERE {key} IN :ids"
+            ).bindparams(bindparam("ids", expanding=True)),
+            {"ids": chunk},
+        )
+
+
+def _plan_retag(
+    s: Session, mapping: dict[int, str]
+) -> "tuple[dict[str, int], list[dict[str, int]]]":
+    """Split a :meth:`Database._retag` *mapping* into renames and merges.
+
+    Returns ``{new name: tag id renamed into it}`` and the
+    ``{"src", "dst"}`` pairs whose links move to another tag.
+    """
+    held: dict[str, int] = {}
+    for chunk in _chunked(list(set(mapping.values()))):
+        held.update(
+            s.execute(select(Tag.name, Tag.id).where(Tag.name.in_(chunk))).all()
+        )
+    survivors: dict[str, int] = {}
+    merges: list[dict[str, int]] = []
+    for tag_id, name in mapping.items():
+        target = held.get(name)
+        if target is not None and target not in mapping:
+            merges.append({"src": tag_id, "dst": target})
+        elif name in survivors:
+            merges.append({"src": tag_id, "dst": survivors[name]})
+        else:
+            survivors[name] = tag_id
+    return survivors, merges
+
+
+def _tag_names_by_bookmark(s: Session, bookmark_ids: "list[int]") -> dict[int, list[str]]:
+    """``bookmark id -> sorted tag names`` for *bookmark_ids*, in one query."""
+    tags: dict[int, list[str]] = {}
+    if not bookmark_ids:
+        return tags
+    for bid, name in s.execute(
+        select(bookmark_tags.c.bookmark_id, Tag.name)
+        .join(Tag, Tag.id == bookmark_tags.c.tag_id)
+        .where(bookmark_tags.c.bookmark_id.in_(bookmark_ids))
+        .order_by(Tag.name)
+    ):
+        tags.setdefault(bid, []).append(name)
+    return tags
+
+
+def _bookmarks_by_uid(conn, uids: "list[str]") -> dict[str, list[Any]]:
+    """``unique_id -> [id, title]`` for the stored bookmarks among *uids*."""
+    found: dict[str, list[Any]] = {}
+    for chunk in _chunked(uids):
+        for bid, uid, title in conn.execute(
+            select(Bookmark.id, Bookmark.unique_id, Bookmark.title)
+            .where(Bookmark.unique_id.in_(chunk))
+        ):
+            found[uid] = [bid, title]
+    return found
+
+
+def _new_bookmark_rows(
+    prepared: "list[tuple[str, str, dict[str, Any]]]",
+    known: dict[str, Any],
+    now: datetime,
+) -> dict[str, dict[str, Any]]:
+    """Insert values for :meth:`Database.add_many`, keyed on unique_id.
+
+    The first occurrence of each URL not in *known* creates the row.
+    """
+    rows: dict[str, dict[str, Any]] = {}
+    for uid, norm, e in prepared:
+        if uid in known or uid in rows:
+            continue
+        rows[uid] = {
+            "unique_id": uid,
+            "url": norm,
+            "title": e.get("title") or "",
+            "description": e.get("description"),
+            "bookmark_type": e.get("bookmark_type") or "bookmark",
+            "starred": bool(e.get("starred", False)),
+            "pinned": bool(e.get("pinned", False)),
+            "added": now,
+            "visit_count": 0,
+            "media": e.get("media"),
+        }
+    return rows
+
+
+def _set_bookmark_column(conn, column: str, values: dict[int, Any]) -> None:
+    """Write ``bookmarks.<column>`` from a ``{bookmark id: value}`` map."""
+    if not values:
+        return
+    conn.execute(
+        _sa_update(Bookmark)
+        .where(Bookmark.id == bindparam("b_id"))
+        .values({column: bindparam("b_value")}),
+        [{"b_id": k, "b_value": v} for k, v in values.items()],
+    )
+
+
+def _expire_bookmark_tags(s: Session, bookmark_ids: Iterable[int]) -> None:
+    """Make identity-mapped bookmarks (batch mode) reload ``tags``."""
+    for bookmark_id in bookmark_ids:
+        cached = s.identity_map.get(s.identity_key(Bookmark, bookmark_id))
+        if cached is not None:
+            s.expire(cached, ["tags"])
+
+
+# Entries per bulk_ingest_history round; bounds the parameter lists
+# handed to executemany without affecting the single transaction.
+_HISTORY_CHUNK = 10_000
+
+
+def _history_urls_by_uid(
+    conn, uids: "list[str]"
+) -> dict[str, tuple[int, Optional[str], int]]:
+    """``unique_id -> (id, title, typed_count)`` for the stored URLs among *uids*."""
+    found: dict[str, tuple[int, Optional[str], int]] = {}
+    for part in _chunked(uids):
+        for row in conn.execute(
+            select(
+                HistoryUrl.unique_id, HistoryUrl.id,
+                HistoryUrl.title, HistoryUrl.typed_count,
+            ).where(HistoryUrl.unique_id.in_(part))
+        ):
+            found[row[0]] = (row[1], row[2], row[3] or 0)
+    return found
+
+
+def _ingest_history_urls(
+    conn,
+    chunk: "list[dict[str, Any]]",
+    uids: "list[tuple[str, str]]",
+    url_id_cache: dict[str, int],
+    counts: dict[str, int],
+) -> None:
+    """Resolve or create the history_urls rows referenced by *chunk*.
+
+    Only the first entry seen for a URL in the whole ingest decides its
+    title / typed_count, matching what the per-entry loop did.
+    """
+    first: dict[str, tuple[str, dict[str, Any]]] = {}
+    for entry, (norm, uid) in zip(chunk, uids):
+        if uid not in url_id_cache and uid not in first:
+            first[uid] = (norm, entry)
+    if not first:
+        return
+
+    existing = _history_urls_by_uid(conn, list(first))
+    backfill = []
+    for uid, (hu_id, title, typed) in existing.items():
+        entry = first[uid][1]
+        new_title = title or entry.get("title")
+        # typed_count is a source-side URL-level total; accept monotone
+        # increases across re-imports.
+        new_typed = max(typed, int(entry.get("typed_count") or 0))
+        if new_title != title or new_typed != typed:
+            backfill.append({"b_id": hu_id, "b_title": new_title, "b_typed": new_typed})
+        url_id_cache[uid] = hu_id
+    if backfill:
+        conn.execute(
+            _sa_update(HistoryUrl.__table__)
+            .where(HistoryUrl.id == bindparam("b_id"))
+            .values(title=bindparam("b_title"), typed_count=bindparam("b_typed")),
+            backfill,
+        )
+    counts["urls_updated"] += len(existing)
+
+    new_rows = [
+        {
+            "unique_id": uid,
+            "url": norm,
+            "title": entry.get("title"),
+            "typed_count": int(entry.get("typed_count") or 0),
+        }
+        for uid, (norm, entry) in first.items()
+        if uid not in existing
+    ]
+    if new_rows:
+        for hu_id, uid in conn.execute(
+            sa_insert(HistoryUrl.__table__).returning(
+                HistoryUrl.id, HistoryUrl.unique_id
+            ),
+            new_rows,
+        ):
+            url_id_cache[uid] = hu_id
+        counts["urls_added"] += len(new_rows)
+
+
+def _ingest_history_visits(
+    conn,
+    chunk: "list[dict[str, Any]]",
+    urls: "list[tuple[int, str]]",
+    source_type: str,
+    source_name: str,
+    pending_fv: "list[tuple[int, int]]",
+    counts: dict[str, int],
+) -> "list[int]":
+    """Insert *chunk*'s visits and queue their referrers for resolution.
+
+    *urls* holds each entry's ``(history_urls.id, unique_id)``. Visits
+    are keyed by :func:`generate_visit_key`, so whether a row was
+    written is read off ``RETURNING`` by that key alone. Each visit
+    keeps its browser-side id in ``source_visit_id``, which is what
+    :func:`_resolve_referrers` joins on. Returns the ids of the visits
+    actually inserted.
+    """
+    # OR IGNORE would also swallow the NOT NULL violation.
+    if any(entry["visited_at"] is None for entry in chunk):
+        raise ValueError("history entries need a visited_at")
+    now = _utcnow()
+    rows = [
+        {
+            "visit_key": generate_visit_key(
+                url_uid, entry["visited_at"], source_type, source_name
+            ),
+            "url_id": url_id,
+            "visited_at": entry["visited_at"],
+            "duration_ms": entry.get("duration_ms"),
+            "transition": entry.get("transition"),
+            "source_visit_id": int(entry.get("visit_id") or 0) or None,
+            "source_type": source_type,
+            "source_name": source_name,
+            "imported_at": now,
+        }
+        for entry, (url_id, url_uid) in zip(chunk, urls)
+    ]
+    # INSERT OR IGNORE skips rows that hit uq_history_visits_key, and
+    # RETURNING reports only the rows actually written.
+    inserted: dict[int, int] = {
+        key: visit_id
+        for visit_id, key in conn.execute(
+            sa_insert(HistoryVisit.__table__)
+            .prefix_with("OR IGNORE")
+            .returning(HistoryVisit.id, HistoryVisit.visit_key),
+            rows,
+        )
+    }
+    counts["visits_added"] += len(inserted)
+    counts["visits_skipped"] += len(rows) - len(inserted)
+
+    hits = [
+        (r["visit_key"], r["source_visit_id"])
+        for r in rows
+        if r["visit_key"] not in inserted and r["source_visit_id"] is not None
+    ]
+    if hits:
+        _backfill_source_visit_ids(conn, hits)
+
+    for entry, row in zip(chunk, rows):
+        our_id = inserted.get(row["visit_key"])
+        if our_id is not None and entry.get("from_visit"):
+            pending_fv.append((our_id, int(entry["from_visit"])))
+    return list(inserted.values())
+
+
+def _fill_temp_table(conn, name: str, columns: str, rows: "list[tuple]") -> None:
+    """(Re)load the connection-local scratch table *name* with *rows*.
+
+    Temp tables live outside the archive file, so loading them writes
+    no WAL and touches no index of the main database.
+    """
+    conn.exec_driver_sql(f"CREATE TEMP TABLE IF NOT EXISTS {name} ({columns})")
+    conn.exec_driver_sql(f"DELETE FROM {name}")
+    marks = ", ".join("?" * len(rows[0]))
+    conn.exec_driver_sql(f"INSERT INTO {name} VALUES ({marks})", rows)
+
+
+def _backfill_source_visit_ids(conn, hits: "list[tuple[int, int]]") -> None:
+    """Record browser-side ids on dedup hits that predate the column.
+
+    *hits* are ``(visit_key, source_visit_id)`` pairs. One ``UPDATE ...
+    FROM`` probes ``uq_history_visits_key`` for each; rows that already
+    carry an id are left alone, so a routine re-import writes nothing
+    here.
+    """
+    _fill_temp_table(
+        conn, "_visit_keys", "visit_key INTEGER, source_visit_id INTEGER", hits
+    )
+    conn.exec_driver_sql(
+        "UPDATE history_visits SET source_visit_id = k.source_visit_id "
+        "FROM _visit_keys AS k "
+        "WHERE history_visits.visit_key = k.visit_key "
+        "  AND history_visits.source_visit_id IS NULL"
+    )
+
+
+def _resolve_referrers(
+    conn,
+    pending: "list[tuple[int, int]]",
+    source_type: str,
+    source_name: str,
+) -> "list[tuple[int, int]]":
+    """Set ``from_visit_id`` for every pending visit whose referrer is known.
+
+    *pending* holds ``(visit id, browser-side from_visit)`` pairs. They
+    are loaded into a temp table and resolved with one ``UPDATE ...
+    FROM`` against ``ix_history_visits_source_visit``, so a referrer is
+    found whether it arrived in this chunk, an earlier one, or an
+    earlier import. The referrer lookup is materialized first with the
+    temp table driving: left to itself the planner walks every visit of
+    the source instead.
+
+    Returns the entries still unresolved, to be retried after later
+    chunks.
+    """
+    if not pending:
+        return []
+    _fill_temp_table(
+        conn, "_pending_referrers",
+        "visit_id INTEGER PRIMARY KEY, src_from INTEGER NOT NULL", pending,
+    )
+    resolved = {
+        row[0]
+        for row in conn.exec_driver_sql(
+            """
+            WITH r AS MATERIALIZED (
+                SELECT p.visit_id, ref.id AS ref_id
+                FROM _pending_referrers AS p
+                CROSS JOIN history_visits AS ref
+                WHERE ref.source_type = ? AND ref.source_name = ?
+                  AND ref.source_visit_id = p.src_from
+                  AND ref.id != p.visit_id
+            )
+            UPDATE history_visits SET from_visit_id = r.ref_id
+            FROM r WHERE history_visits.id = r.visit_id
+            RETURNING history_visits.id
+            """,
+            (source_type, source_name),
+        )
+    }
+    return [p for p in pending if p[0] not in resolved]
+
+
+def _add_visit_aggregates(conn, visit_ids: "list[int]") -> None:
+    """Fold *visit_ids* into their URLs' aggregates, as the trigger would.
+
+    One grouped ``UPDATE ... FROM`` applies each touched URL's count and
+    min/max visit time as a delta, with the same comparisons as
+    ``trg_history_visits_insert``, so the result is identical to having
+    inserted the visits with the trigger in place. The ids travel as a
+    single JSON array parameter.
+    """
+    if not visit_ids:
+        return
+    conn.execute(
+        text(
+            """
+            UPDATE history_urls
+            SET visit_count = visit_count + d.n,
+                first_visited = CASE
+                    WHEN first_visited IS NULL OR d.lo < first_visited
+                    THEN d.lo ELSE first_visited
+                END,
+                last_visited = CASE
+                    WHEN last_visited IS NULL OR d.hi > last_visited
+                    THEN d.hi ELSE last_visited
+                END
+            FROM (
+                SELECT url_id, COUNT(*) AS n,
+                       MIN(visited_at) AS lo, MAX(visited_at) AS hi
+                FROM history_visits
+                WHERE id IN (SELECT value FROM json_each(:ids))
+                GROUP BY url_id
+            ) AS d
+            WHERE history_urls.id = d.url_id
+            """
+        ),
+        {"ids": json.dumps(visit_ids)},
+    )
+
+
+def _add_daily_rollups(conn, visit_ids: "list[int]") -> None:
+    """Fold *visit_ids* into ``history_url_daily`` and ``history_daily``.
+
+    The new visits are grouped per (URL, day) into a temp table, noting
+    which pairs the URL rollup has not seen yet: those are the visits
+    that add a distinct URL to their domain's day. Two grouped upserts
+    then apply the deltas, domain rollup first so the "not seen yet"
+    test reads the state before this batch.
+    """
+    if not visit_ids:
+        return
+    conn.exec_driver_sql(
+        "CREATE TEMP TABLE IF NOT EXISTS _daily_delta (url_id INTEGER, day, "
+        "visits INTEGER, duration INTEGER, first_of_day INTEGER)"
+    )
+    conn.exec_driver_sql("DELETE FROM _daily_delta")
+    day = visit_day_sql("v.visited_at")
+    conn.execute(
+        text(
+            f"""
+            INSERT INTO _daily_delta
+            SELECT v.url_id, {day}, COUNT(*),
+                   COALESCE(SUM(v.duration_ms), 0),
+                   NOT EXISTS (
+                       SELECT 1 FROM history_url_daily AS d
+                       WHERE d.url_id = v.url_id AND d.day = {day}
+                   )
+            FROM history_visits AS v
+            WHERE v.id IN (SELECT value FROM json_each(:ids))
+            GROUP BY v.url_id, {day}
+            """
+        ),
+        {"ids": json.dumps(visit_ids)},
+    )
+    conn.exec_driver_sql(
+        """
+        INSERT INTO history_daily
+            (domain, day, visits, distinct_urls, total_duration_ms)
+        SELECT u.domain, d.day, SUM(d.visits),
+               SUM(d.first_of_day), SUM(d.duration)
+        FROM _daily_delta AS d
+        JOIN history_urls AS u ON u.id = d.url_id
+        WHERE true
+        GROUP BY u.domain, d.day
+        ON CONFLICT (domain, day) DO UPDATE SET
+            visits = visits + excluded.visits,
+            distinct_urls = distinct_urls + excluded.distinct_urls,
+            total_duration_ms = total_duration_ms + excluded.total_duration_ms
+        """
+    )
+    conn.exec_driver_sql(
+        """
+        INSERT INTO history_url_daily (url_id, day, visits, total_duration_ms)
+        SELECT url_id, day, visits, duration FROM _daily_delta WHERE true
+        ON CONFLICT (url_id, day) DO UPDATE SET
+            visits = visits + excluded.visits,
+            total_duration_ms = total_duration_ms + excluded.total_duration_ms
+        """
+    )
+
+
+# New visits further apart than this regroup their sessions separately,
+# so a chunk spanning years does not rescan every visit in between.
+_SESSION_REFRESH_SPLIT = timedelta(days=1)
+
+
+def _add_browsing_sessions(conn, visit_ids: "list[int]") -> None:
+    """Regroup ``browsing_sessions`` around newly inserted *visit_ids*.
+
+    Visits that all come after the last session, as an in-order import
+    delivers them, only extend the sessions forward
+    (:func:`~bookmark_memex.migrations.extend_browsing_sessions`).
+    Otherwise the visits' times are split into runs at least
+    :data:`_SESSION_REFRESH_SPLIT` apart, and each run is handed to
+    :func:`~bookmark_memex.migrations.recompute_browsing_sessions`, which
+    only reads the stored visits within a session gap of it.
+    """
+    if not visit_ids:
+        return
+    ids = {"ids": json.dumps(visit_ids)}
+    first, last = conn.execute(
+        text(
+            "SELECT MIN(visited_at) AS first, MAX(visited_at) AS last "
+            "FROM history_visits WHERE id IN (SELECT value FROM json_each(:ids))"
+        ).columns(first=HistoryTimestamp, last=HistoryTimestamp),
+        ids,
+    ).one()
+    if first is None:
+        return
+    last_end = conn.execute(select(func.max(BrowsingSession.ended_at))).scalar()
+    if last_end is None or first > last_end:
+        extend_browsing_sessions(conn, first, last)
+        return
+    times = conn.execute(
+        text(
+            "SELECT visited_at FROM history_visits "
+            "WHERE id IN (SELECT value FROM json_each(:ids)) ORDER BY visited_at"
+        ).columns(visited_at=HistoryTimestamp),
+        ids,
+    ).scalars().all()
+    start = prev = times[0]
+    for at in times[1:]:
+        if at - prev > _SESSION_REFRESH_SPLIT:
+            recompute_browsing_sessions(conn, start, prev)
+            start = at
+        prev = at
+    recompute_browsing_sessions(conn, start, prev)
+
+
+def _oldest_visit_day(conn) -> Optional[date]:
+    """Day of the oldest visit still stored, read off its index."""
+    oldest = conn.execute(select(func.min(HistoryVisit.visited_at))).scalar()
+    return oldest.date() if oldest is not None else None
+
+
+# Visits deleted per transaction by Database.prune_history.
+_PRUNE_CHUNK = 5_000
+
+
+def _prune_chunk_end(conn, cutoff: datetime) -> Optional[datetime]:
+    """Midnight up to which the next prune chunk deletes, or None if done.
+
+    Chunks hold whole days, so each commit leaves every day's rollups
+    and sessions matching its visits: as many days as fit within
+    :data:`_PRUNE_CHUNK` visits, or one larger day on its own.
+    """
+    old = select(HistoryVisit.visited_at).where(HistoryVisit.visited_at < cutoff)
+    first = conn.execute(
+        old.order_by(HistoryVisit.visited_at).limit(1)
+    ).scalar()
+    if first is None:
+        return None
+    beyond = conn.execute(
+        old.order_by(HistoryVisit.visited_at).limit(1).offset(_PRUNE_CHUNK)
+    ).scalar()
+    if beyond is None:
+        return cutoff
+    end = datetime.combine(beyond.date(), time.min)
+    if end <= first:
+        end = min(cutoff, end + timedelta(days=1))
+    return end
+
+
+def _prune_visit_chunk(conn, cutoff: datetime, summarise: bool) -> int:
+    """Delete the oldest whole days of visits before *cutoff*.
+
+    Runs inside the caller's transaction on a connection with foreign
+    keys off, so the ``ON DELETE SET NULL`` from marginalia and from
+    referring visits is applied here as indexed UPDATEs. The per-row
+    delete trigger stands aside while the ``defer_visit_aggregates``
+    row exists, and each touched URL's aggregates are recomputed once
+    afterwards, from ``ix_history_visits_url_visited``. The days' rollups
+    are recomputed first (*summarise*) or deleted, and the sessions
+    around them regrouped, in the same transaction. Returns the rows
+    deleted.
+    """
+    end = _prune_chunk_end(conn, cutoff)
+    if not summarise:
+        # Also drops rollups left by an earlier summarising prune.
+        until = (end or cutoff).date()
+        conn.execute(sa_delete(HistoryUrlDaily).where(HistoryUrlDaily.day < until))
+        conn.execute(sa_delete(HistoryDaily).where(HistoryDaily.day < until))
+    if end is None:
+        return 0
+    rows = conn.execute(
+        select(HistoryVisit.id, HistoryVisit.url_id, HistoryVisit.visited_at)
+        .where(HistoryVisit.visited_at < end)
+    ).all()
+    first_day = min(row.visited_at for row in rows).date()
+    if summarise:
+        recompute_history_rollups(conn, first_day, end.date())
+    _fill_temp_table(
+        conn, "_prune_ids", "id INTEGER, url_id INTEGER",
+        [(row.id, row.url_id) for row in rows],
+    )
+    conn.exec_driver_sql(
+        "UPDATE marginalia SET history_visit_id = NULL "
+        "WHERE history_visit_id IN (SELECT id FROM _prune_ids)"
+    )
+    conn.exec_driver_sql(
+        "UPDATE history_visits SET from_visit_id = NULL "
+        "WHERE from_visit_id IN (SELECT id FROM _prune_ids)"
+    )
+    conn.execute(
+        sa_insert(StoreSetting.__table__).prefix_with("OR REPLACE")
+        .values(key=DEFER_VISIT_AGGREGATES, value="1")
+    )
+    conn.exec_driver_sql(
+        "DELETE FROM history_visits WHERE id IN (SELECT id FROM _prune_ids)"
+    )
+    conn.execute(
+        sa_delete(StoreSetting.__table__)
+        .where(StoreSetting.key == DEFER_VISIT_AGGREGATES)
+    )
+    conn.exec_driver_sql(
+        """
+        UPDATE history_urls
+        SET visit_count = (
+                SELECT COUNT(*) FROM history_visits
+                WHERE url_id = history_urls.id
+            ),
+            first_visited = (
+                SELECT MIN(visited_at) FROM history_visits
+                WHERE url_id = history_urls.id
+            ),
+            last_visited = (
+                SELECT MAX(visited_at) FROM history_visits
+                WHERE url_id = history_urls.id
+            )
+        WHERE id IN (SELECT url_id FROM _prune_ids)
+        """
+    )
+    recompute_browsing_sessions(conn, datetime.combine(first_day, time.min), end)
+    return len(rows)
+
+
+def _no_media() -> Any:
+    """Match history_urls rows without media.
+
+    The JSON column holds SQL NULL for rows from the bulk insert, but
+    the JSON string ``null`` for ORM rows given ``media=None``.
+    """
+    return func.coalesce(func.json_type(HistoryUrl.media), "null") == "null"
+
+
+def _database_bytes(conn) -> int:
+    """Size of the database in pages, as bytes (WAL excluded)."""
+    pages = conn.exec_driver_sql("PRAGMA page_count").scalar_one()
+    return pages * conn.exec_driver_sql("PRAGMA page_size").scalar_one()
+
+
+def _naive(dt: datetime) -> datetime:
+    """Drop tzinfo the way SQLite's DateTime storage does."""
+    return dt.replace(tzinfo=None) if dt.tzinfo is not None else dt
 
 
 # ---------------------------------------------------------------------------
@@ -330,11 +955,195 @@ def _get_or_create_tag(session: Session, name: str) -> Tag:
 # ---------------------------------------------------------------------------
 
 
+# Columns returned by Database.iter_bookmarks() unless told otherwise:
+# everything a listing or export needs, without the favicon blob.
+BOOKMARK_ROW_COLUMNS: tuple[str, ...] = (
+    "id",
+    "unique_id",
+    "url",
+    "domain",
+    "title",
+    "description",
+    "bookmark_type",
+    "added",
+    "last_visited",
+    "visit_count",
+    "starred",
+    "pinned",
+    "media",
+    "archived_at",
+)
+
+
+class _BatchState:
+    """Session pinned by :meth:`Database.batch` for the current thread."""
+
+    __slots__ = ("session", "commit_every", "calls", "session_visits")
+
+    def __init__(self, session: Session, commit_every: Optional[int]) -> None:
+        self.session = session
+        self.commit_every = commit_every
+        self.calls = 0
+        # Visits added in the batch whose browsing sessions are regrouped
+        # once, just before each commit.
+        self.session_visits: list[int] = []
+
+    def commit(self) -> None:
+        if self.session_visits:
+            _add_browsing_sessions(self.session.connection(), self.session_visits)
+            self.session_visits = []
+        self.session.commit()
+
+
+class BulkAddResult(NamedTuple):
+    """Per-row outcome of :meth:`Database.add_many`."""
+
+    id: int
+    unique_id: str
+    added: bool  # False when the row merged into an existing bookmark
+
+
+class HistoryPruneResult(NamedTuple):
+    """Outcome of :meth:`Database.prune_history`."""
+
+    visits_deleted: int
+    urls_touched: int
+    summarised: bool  # rollups for the pruned days were kept
+    pages_freed: int  # returned to the filesystem by incremental vacuum
+
+
+class TimestampCompactionResult(NamedTuple):
+    """Outcome of :meth:`Database.compact_history_timestamps`."""
+
+    converted: bool  # False if the history tables were already compact
+    bytes_before: int  # page_count * page_size
+    bytes_after: int
+    bytes_free: int  # still on the freelist; needs a VACUUM to hand back
+
+
+class HistoryIngest:
+    """Per-source state of a streaming history ingest.
+
+    Obtained from :meth:`Database.history_ingest`. Each :meth:`feed`
+    commits one chunk of entries (see :meth:`Database.bulk_ingest_history`
+    for what a chunk costs); :meth:`finish` clears the checkpoint and
+    returns the counts. Chunks of different sources may be fed in any
+    order from one writer thread, as each ingest carries its own URL map
+    and pending referrers.
+    """
+
+    def __init__(
+        self,
+        db: "Database",
+        source_type: str,
+        source_name: str,
+        checkpoint: bool,
+        defer_aggregates: bool,
+    ) -> None:
+        self._db = db
+        self.source_type = source_type
+        self.source_name = source_name
+        self._checkpoint = checkpoint
+        self._defer_aggregates = defer_aggregates
+        self.counts = {"urls_added": 0, "urls_updated": 0, "visits_added": 0,
+                       "visits_skipped": 0}
+        self.done = 0
+        self._url_ids: dict[str, int] = {}               # unique_id -> history_urls.id
+        self._pending_fv: list[tuple[int, int]] = []     # (our id, source from_visit)
+
+    def chunks(
+        self, entries: "Iterable[dict[str, Any]]"
+    ) -> "Iterator[list[dict[str, Any]]]":
+        """Split *entries* into :meth:`feed`-sized lists, lazily."""
+        return _chunked_iter(entries, _HISTORY_CHUNK)
+
+    def canonicalize(self, chunk: "list[dict[str, Any]]") -> "list[tuple[str, str]]":
+        """Return ``(normalized_url, unique_id)`` for each entry of *chunk*.
+
+        Needs no database access, so a reader thread may run it ahead of
+        :meth:`feed`.
+        """
+        return [canonicalize_history_url(entry["url"]) for entry in chunk]
+
+    def feed(
+        self,
+        chunk: "list[dict[str, Any]]",
+        uids: "Optional[list[tuple[str, str]]]" = None,
+    ) -> None:
+        """Write *chunk* (http(s) entries only) in one transaction.
+
+        *uids* is :meth:`canonicalize`'s result for *chunk*, when the
+        caller has computed it already.
+        """
+        if uids is None:
+            uids = self.canonicalize(chunk)
+        with self._db._session() as s:
+            conn = s.connection()
+            _ingest_history_urls(conn, chunk, uids, self._url_ids, self.counts)
+            if self._defer_aggregates:
+                conn.execute(
+                    sa_insert(StoreSetting.__table__).prefix_with("OR REPLACE")
+                    .values(key=DEFER_VISIT_AGGREGATES, value="1")
+                )
+            inserted = _ingest_history_visits(
+                conn, chunk, [(self._url_ids[uid], uid) for _, uid in uids],
+                self.source_type, self.source_name,
+                self._pending_fv, self.counts,
+            )
+            if self._defer_aggregates:
+                conn.execute(
+                    sa_delete(StoreSetting.__table__)
+                    .where(StoreSetting.key == DEFER_VISIT_AGGREGATES)
+                )
+                _add_visit_aggregates(conn, inserted)
+            _add_daily_rollups(conn, inserted)
+            _add_browsing_sessions(conn, inserted)
+            self._pending_fv[:] = _resolve_referrers(
+                conn, self._pending_fv, self.source_type, self.source_name
+            )
+
+            self.done += len(chunk)
+            if self._checkpoint:
+                conn.execute(
+                    sa_insert(ImportCheckpoint.__table__)
+                    .prefix_with("OR REPLACE")
+                    .values(
+                        source_type=self.source_type,
+                        source_name=self.source_name,
+                        last_visited_at=max(e["visited_at"] for e in chunk),
+                        visits_done=self.done,
+                        updated_at=_utcnow(),
+                    )
+                )
+
+    def finish(self) -> "tuple[int, int, int, int, int]":
+        """Drop the source's checkpoint and return the ingest's counts.
+
+        Same tuple as :meth:`Database.bulk_ingest_history`.
+        """
+        if self._checkpoint:
+            with self._db._session() as s:
+                s.execute(
+                    sa_delete(ImportCheckpoint).where(
+                        ImportCheckpoint.source_type == self.source_type,
+                        ImportCheckpoint.source_name == self.source_name,
+                    )
+                )
+        return (
+            self.counts["urls_added"],
+            self.counts["urls_updated"],
+            self.counts["visits_added"],
+            self.counts["visits_skipped"],
+            len(self._url_ids),
+        )
+
+
 class Database:
     """Single-file SQLite bookmark store.
 
     All methods open and commit their own session.  No session is shared
-    across calls.
+    across calls, except inside :meth:`batch`, which pins one session for
+    the duration of the block.
     """
 
     def __init__(self, path: str | Path) -> None:
@@ -353,44 +1162,186 @@ class Database:
         #                       journalling is restored before HTML-SPA
         #                       export per the C6b durability rule.
         #   synchronous=NORMAL: safe under WAL; fsync only at checkpoints.
+        #   auto_vacuum=INCREMENTAL: lets prune_history hand freed pages
+        #                       back. Only applies to a new, empty file;
+        #                       older files switch on their next VACUUM.
         from sqlalchemy import event
 
         @event.listens_for(engine, "connect")
         def _pragmas(dbapi_conn, _):
             cur = dbapi_conn.cursor()
+            cur.execute("PRAGMA auto_vacuum=INCREMENTAL")
             cur.execute("PRAGMA foreign_keys=ON")
             cur.execute("PRAGMA journal_mode=WAL")
             cur.execute("PRAGMA synchronous=NORMAL")
+            # 64 MiB page cache (grown on demand): bulk ingest touches
+            # many index pages per row and spills to the WAL otherwise.
+            cur.execute("PRAGMA cache_size=-65536")
             cur.close()
-
-        # Run pre-create migrations before metadata.create_all so the
-        # ORM doesn't try to create a new marginalia table alongside the
-        # still-present legacy annotations table.
-        _apply_rename_annotations_to_marginalia(engine)
-        Base.metadata.create_all(engine)
-        # Post-create migrations (ALTERs and triggers that reference
-        # tables the metadata pass has just ensured exist).
-        _apply_add_marginalia_history_cols(engine)
-        _install_history_triggers(engine)
+            # Take transaction control away from pysqlite so SAVEPOINTs
+            # (used by batch() and the dedup paths) nest inside a real
+            # BEGIN. See the SQLAlchemy pysqlite "serializable isolation /
+            # savepoints" notes.
+            dbapi_conn.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def _begin(conn):
+            conn.exec_driver_sql("BEGIN")
+
+        # Version-gated bootstrap: an up-to-date file costs one read,
+        # which also says whether history timestamps are ISO text or
+        # converted by compact_history_timestamps(); the (idempotent)
+        # migration chain only runs when behind.
+        version, epoch = schema_state(engine)
+        use_epoch_timestamps(engine.dialect, epoch)
+        if version < SCHEMA_VERSION:
+            run_migrations(engine, version)
+        self._engine = engine
         self._Session = sessionmaker(bind=engine, expire_on_commit=False)
+        # Per-thread pinned session while a batch() block is active.
+        self._local = threading.local()
+        # Tag name -> id cache; see _tag_ids_for().
+        self._tag_cache: Optional[dict[str, int]] = None
+        self._tag_lock = threading.Lock()
 
     # ------------------------------------------------------------------
     # Session helper
     # ------------------------------------------------------------------
 
+    @contextmanager
+    def batch(
+        self, *, commit_every: Optional[int] = None
+    ) -> Generator["Database", None, None]:
+        """Pin one session and transaction for every call inside the block.
+
+        Normally each public method opens, commits and closes its own
+        session, which under WAL means one commit per call. Inside
+        ``with db.batch():`` every method on this instance (in the same
+        thread) reuses a single session instead, and the work is
+        committed once when the block exits cleanly, or rolled back if it
+        raises.
+
+        Each method call still runs in its own SAVEPOINT, so a call that
+        raises undoes only its own changes and the batch can carry on
+        (the MCP ``mutate`` tool relies on this).
+
+        *commit_every* commits the pinned transaction after every N
+        method calls, trading all-or-nothing for bounded work lost on a
+        crash. Nested ``batch()`` blocks join the outermost one.
+
+        Visits added one at a time inside the block have their browsing
+        sessions regrouped together before each commit rather than per
+        call, so a run of single-visit inserts reads each session once.
+        """
+        if getattr(self._local, "batch", None) is not None:
+            yield self
+            return
+
+        state = _BatchState(self._Session(), commit_every)
+        self._local.batch = state
+        try:
+            yield self
+            state.commit()
+        except BaseException:
+            state.session.rollback()
+            self._invalidate_tag_cache()
+            raise
+        finally:
+            self._local.batch = None
+            state.session.close()
+
     @contextmanager
     def _session(self) -> Generator[Session, None, None]:
-        """Yield a Session, committing on clean exit, rolling back on error."""
+        """Yield a Session, committing on clean exit, rolling back on error.
+
+        Inside :meth:`batch` the pinned session is yielded instead, wrapped
+        in a SAVEPOINT; the commit is left to the batch.
+        """
+        state: Optional[_BatchState] = getattr(self._local, "batch", None)
+        if state is not None:
+            try:
+                with state.session.begin_nested():
+                    yield state.session
+            except Exception:
+                self._invalidate_tag_cache()
+                raise
+            state.calls += 1
+            if state.commit_every and state.calls % state.commit_every == 0:
+                state.commit()
+            return
+
         s = self._Session()
         try:
             yield s
             s.commit()
         except Exception:
             s.rollback()
+            self._invalidate_tag_cache()
             raise
         finally:
             s.close()
 
+    def _group_into_sessions(self, s: Session, visit_id: int) -> None:
+        """Regroup browsing sessions for a just-added visit, or leave it
+        to the enclosing :meth:`batch`'s next commit."""
+        state: Optional[_BatchState] = getattr(self._local, "batch", None)
+        if state is not None:
+            state.session_visits.append(visit_id)
+        else:
+            _add_browsing_sessions(s.connection(), [visit_id])
+
+    # ------------------------------------------------------------------
+    # Tag resolution cache
+    # ------------------------------------------------------------------
+
+    def _invalidate_tag_cache(self) -> None:
+        """Drop the tag cache; the next lookup re-warms it."""
+        with self._tag_lock:
+            self._tag_cache = None
+
+    def _tag_ids_for(
+        self, s: Session, names: Iterable[str], *, create: bool = True
+    ) -> dict[str, int]:
+        """Return ``{name: id}`` for *names* via the per-Database tag cache.
+
+        The cache is warmed lazily with one full scan of ``tags`` and
+        extended in place as this instance creates tags, so repeated
+        lookups cost no round trips. Missing names are created with one
+        batched insert (unless *create* is false, in which case unknown
+        names are simply absent from the result).
+
+        ``PRAGMA data_version`` detects commits from other connections:
+        its value is remembered per pooled connection, and a change, or a
+        connection this cache has not seen before, drops the cache. Any
+        rollback also drops it, since ids created inside the rolled-back
+        transaction no longer exist.
+        """
+        wanted = list(dict.fromkeys(n for n in names if n))
+        conn = s.connection()
+        with self._tag_lock:
+            info = conn.connection.info
+            version = conn.exec_driver_sql("PRAGMA data_version").scalar()
+            if info.get("bm_tag_data_version") != version:
+                self._tag_cache = None
+                info["bm_tag_data_version"] = version
+            if self._tag_cache is None:
+                self._tag_cache = dict(conn.execute(select(Tag.name, Tag.id)).all())
+            cache = self._tag_cache
+
+            missing = [n for n in wanted if n not in cache]
+            if missing and create:
+                cache.update(_resolve_tag_ids(conn, missing))
+            return {n: cache[n] for n in wanted if n in cache}
+
+    def _link_tags(self, s: Session, bookmark_id: int, names: Iterable[str]) -> None:
+        """Attach tags *names* to *bookmark_id*, creating tags as needed."""
+        tag_ids = self._tag_ids_for(s, names)
+        if tag_ids:
+            s.execute(
+                sa_insert(bookmark_tags).prefix_with("OR IGNORE"),
+                [{"bookmark_id": bookmark_id, "tag_id": t} for t in tag_ids.values()],
+            )
+
     # ------------------------------------------------------------------
     # CRUD
     # ------------------------------------------------------------------
@@ -429,10 +1380,7 @@ class Database:
             if existing is not None:
                 # Merge tags.
                 if tags:
-                    existing_names = {t.name for t in existing.tags}
-                    for tag_name in tags:
-                        if tag_name not in existing_names:
-                            existing.tags.append(_get_or_create_tag(s, tag_name))
+                    self._link_tags(s, existing.id, tags)
 
                 # Fill in title if currently empty.
                 if title and not existing.title:
@@ -469,8 +1417,7 @@ class Database:
             s.flush()  # populate bm.id
 
             if tags:
-                for tag_name in tags:
-                    bm.tags.append(_get_or_create_tag(s, tag_name))
+                self._link_tags(s, bm.id, tags)
 
             if source_type:
                 src = BookmarkSource(
@@ -486,15 +1433,116 @@ class Database:
             s.refresh(bm)
             return _eager_load_bookmark(s, bm)
 
+    def add_many(self, entries: Iterable[dict[str, Any]]) -> list[BulkAddResult]:
+        """Bulk version of :meth:`add`, in a single transaction.
+
+        Each entry is a dict with a required ``url`` plus any of the
+        keyword arguments :meth:`add` accepts (``title``, ``description``,
+        ``tags``, ``starred``, ``pinned``, ``bookmark_type``,
+        ``source_type``, ``source_name``, ``folder_path``). An optional
+        ``media`` key is stored on the bookmark, overwriting any previous
+        value, which is what the importers' detector pass wants.
+
+        Merge semantics match calling :meth:`add` once per entry in
+        order, including duplicates within *entries*: the first
+        occurrence of a URL creates the row and later ones merge into
+        it. Existing rows and tags are resolved with chunked ``IN``
+        lookups and new rows are written with executemany, so the cost
+        is a handful of statements per few hundred rows rather than
+        several round-trips per row.
+
+        Returns one :class:`BulkAddResult` per entry, in input order.
+        """
+        prepared = [
+            (generate_unique_id(e["url"]), normalize_url(e["url"]), e)
+            for e in entries
+        ]
+        if not prepared:
+            return []
+
+        now = _utcnow()
+        with self._session() as s:
+            conn = s.connection()
+
+            # uid -> [id, title] for rows that already exist.
+            known = _bookmarks_by_uid(
+                conn, list(dict.fromkeys(uid for uid, _, _ in prepared))
+            )
+
+            new_rows = _new_bookmark_rows(prepared, known, now)
+            if new_rows:
+                conn.execute(sa_insert(Bookmark), list(new_rows.values()))
+                known.update(_bookmarks_by_uid(conn, list(new_rows)))
+
+            results: list[BulkAddResult] = []
+            created: set[str] = set()
+            titles: dict[int, str] = {}
+            media: dict[int, dict] = {}
+            tag_pairs: list[tuple[int, str]] = []
+            sources: list[dict[str, Any]] = []
+
+            for uid, _, e in prepared:
+                bid, current_title = known[uid]
+                added = uid in new_rows and uid not in created
+                created.add(uid)
+
+                if not added:
+                    title = e.get("title") or ""
+                    if title and not current_title:
+                        known[uid][1] = title
+                        titles[bid] = title
+                    if e.get("media") is not None:
+                        media[bid] = e["media"]
+
+                tag_pairs.extend((bid, name) for name in e.get("tags") or () if name)
+
+                if e.get("source_type"):
+                    sources.append({
+                        "bookmark_id": bid,
+                        "source_type": e["source_type"],
+                        "source_name": e.get("source_name"),
+                        "folder_path": e.get("folder_path"),
+                        "imported_at": now,
+                    })
+
+                results.append(BulkAddResult(bid, uid, added))
+
+            _set_bookmark_column(conn, "title", titles)
+            _set_bookmark_column(conn, "media", media)
+            if tag_pairs:
+                tag_ids = self._tag_ids_for(s, (n for _, n in tag_pairs))
+                conn.execute(
+                    sa_insert(bookmark_tags).prefix_with("OR IGNORE"),
+                    [
+                        {"bookmark_id": bid, "tag_id": tag_ids[name]}
+                        for bid, name in dict.fromkeys(tag_pairs)
+                    ],
+                )
+            if sources:
+                conn.execute(sa_insert(BookmarkSource), sources)
+
+        return results
+
     def get(
         self,
         bookmark_id: int,
         *,
         include_archived: bool = False,
+        load: Iterable[str] = (),
     ) -> Optional[Bookmark]:
-        """Return bookmark by primary-key id, or *None* if not found."""
+        """Return bookmark by primary-key id, or *None* if not found.
+
+        Heavy columns are deferred and not available on the returned
+        (detached) object unless requested via *load*: ``"content"``
+        (cached page HTML/markdown/text), ``"favicon"`` (favicon bytes),
+        ``"sources"`` (raw import data on each source row).
+        """
         with self._session() as s:
             q = select(Bookmark).where(Bookmark.id == bookmark_id)
+            if load:
+                q = q.options(*_load_options(load)).execution_options(
+                    populate_existing=True
+                )
             if not include_archived:
                 q = q.where(Bookmark.archived_at.is_(None))
             bm = s.execute(q).scalar_one_or_none()
@@ -505,10 +1553,18 @@ class Database:
         unique_id: str,
         *,
         include_archived: bool = False,
+        load: Iterable[str] = (),
     ) -> Optional[Bookmark]:
-        """Return bookmark by unique_id, or *None* if not found."""
+        """Return bookmark by unique_id, or *None* if not found.
+
+        *load* works as in :meth:`get`.
+        """
         with self._session() as s:
             q = select(Bookmark).where(Bookmark.unique_id == unique_id)
+            if load:
+                q = q.options(*_load_options(load)).execution_options(
+                    populate_existing=True
+                )
             if not include_archived:
                 q = q.where(Bookmark.archived_at.is_(None))
             bm = s.execute(q).scalar_one_or_none()
@@ -552,17 +1608,87 @@ class Database:
             if bm is not None:
                 restore(s, bm)
 
+    def store_content(self, bookmark_id: int, result: dict[str, Any]) -> bool:
+        """Cache a fetched page for *bookmark_id*.
+
+        *result* is the dict returned by ``ContentFetcher.fetch_and_process``.
+        The compressed page is stored once in ``content_blobs`` keyed by
+        ``content_hash`` and shared by every bookmark whose page hashes
+        the same; refcounts are kept by triggers.
+
+        Returns ``False`` when the cached page is unchanged (only
+        ``fetched_at`` is bumped), ``True`` when it was written. Either
+        way a soft-deleted cache row is restored by the fresh fetch.
+        Raises ``ValueError`` for an unsuccessful fetch or a missing
+        bookmark.
+        """
+        if not result.get("success"):
+            raise ValueError(f"Cannot store failed fetch: {result.get('error')}")
+        digest = result["content_hash"]
+        now = _utcnow()
+
+        with self._session() as s:
+            if s.get(Bookmark, bookmark_id) is None:
+                raise ValueError(f"No bookmark with id {bookmark_id}")
+            cache = s.execute(
+                select(ContentCache).where(ContentCache.bookmark_id == bookmark_id)
+            ).scalar_one_or_none()
+            if cache is not None and cache.blob_hash == digest:
+                cache.fetched_at = now
+                cache.archived_at = None
+                return False
+
+            s.execute(
+                sa_insert(ContentBlob)
+                .prefix_with("OR IGNORE")
+                .values(
+                    hash=digest,
+                    data=result["html_content"],
+                    size=result.get("content_length") or 0,
+                    compressed_size=result.get("compressed_size") or 0,
+                    refcount=0,
+                    created_at=now,
+                )
+            )
+            if cache is None:
+                cache = ContentCache(bookmark_id=bookmark_id)
+                s.add(cache)
+            cache.blob_hash = digest
+            cache.html_content = None
+            cache.markdown_content = result.get("markdown_content")
+            cache.extracted_text = result.get("extracted_text")
+            cache.content_hash = digest
+            cache.content_length = result.get("content_length") or 0
+            cache.compressed_size = result.get("compressed_size") or 0
+            cache.content_type = result.get("content_type") or None
+            cache.fetched_at = now
+            cache.archived_at = None
+            return True
+
     def list(
         self,
         *,
         include_archived: bool = False,
         limit: Optional[int] = None,
+        load: Iterable[str] = (),
+        domain: Optional[str] = None,
     ) -> list[Bookmark]:
-        """Return all bookmarks ordered by added DESC."""
+        """Return all bookmarks ordered by added DESC.
+
+        *load* works as in :meth:`get`. *domain* keeps only bookmarks on
+        that site (``www.`` and ports ignored, see
+        :func:`~bookmark_memex.models.url_domain`), read from
+        ``ix_bookmarks_domain``. For large archives prefer
+        :meth:`iter_bookmarks`.
+        """
         with self._session() as s:
             q = select(Bookmark).order_by(Bookmark.added.desc())
+            if load:
+                q = q.options(*_load_options(load))
             if not include_archived:
                 q = q.where(Bookmark.archived_at.is_(None))
+            if domain is not None:
+                q = q.where(Bookmark.domain == url_domain(domain))
             if limit is not None:
                 q = q.limit(limit)
             bms = list(s.execute(q).scalars().all())
@@ -570,6 +1696,69 @@ class Database:
                 _eager_load_bookmark(s, bm)
             return bms
 
+    def iter_bookmarks(
+        self,
+        *,
+        batch_size: int = 500,
+        columns: Optional[Iterable[str]] = None,
+        with_tags: bool = True,
+        where: Any = None,
+        include_archived: bool = False,
+        domain: Optional[str] = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Stream bookmarks as plain dicts, newest first, in constant memory.
+
+        Rows are fetched *batch_size* at a time with keyset pagination on
+        ``(added, id)``, each page in its own short session, so no ORM
+        objects are built and no read transaction is held between pages.
+
+        *columns* names the ``bookmarks`` columns to include (default:
+        :data:`BOOKMARK_ROW_COLUMNS`, which leaves out the favicon blob and
+        ``extra_data``). With *with_tags* each row also gets a ``tags``
+        list, loaded with one query per page. *where* is an optional
+        SQLAlchemy expression (or list of expressions) over
+        :class:`Bookmark` columns, e.g. ``Bookmark.id.in_(ids)``; *domain*
+        is shorthand for a filter on the indexed ``domain`` column.
+        """
+        table = Bookmark.__table__
+        names = list(columns or BOOKMARK_ROW_COLUMNS)
+        unknown = [n for n in names if n not in table.c]
+        if unknown:
+            raise ValueError(f"Unknown bookmark column(s): {', '.join(unknown)}")
+
+        selected = [table.c[n] for n in dict.fromkeys(["id", "added", *names])]
+        base = select(*selected).order_by(
+            Bookmark.added.desc(), Bookmark.id.desc()
+        ).limit(batch_size)
+        if not include_archived:
+            base = base.where(Bookmark.archived_at.is_(None))
+        if domain is not None:
+            base = base.where(Bookmark.domain == url_domain(domain))
+        if where is not None:
+            base = base.where(*where) if isinstance(where, (list, tuple)) else base.where(where)
+
+        after: Optional[tuple[datetime, int]] = None
+        while True:
+            q = base
+            if after is not None:
+                q = q.where(tuple_(Bookmark.added, Bookmark.id) < tuple_(*after))
+            with self._session() as s:
+                page = s.execute(q).mappings().all()
+                tags = (
+                    _tag_names_by_bookmark(s, [r["id"] for r in page])
+                    if with_tags else {}
+                )
+
+            for r in page:
+                row = {n: r[n] for n in names}
+                if with_tags:
+                    row["tags"] = tags.get(r["id"], [])
+                yield row
+
+            if len(page) < batch_size:
+                return
+            after = (page[-1]["added"], page[-1]["id"])
+
     # ------------------------------------------------------------------
     # Tags
     # ------------------------------------------------------------------
@@ -583,20 +1772,182 @@ class Database:
     ) -> None:
         """Add and/or remove tags on bookmark *bookmark_id*."""
         with self._session() as s:
-            bm = s.get(Bookmark, bookmark_id)
-            if bm is None:
+            exists = s.execute(
+                select(Bookmark.id).where(Bookmark.id == bookmark_id)
+            ).first()
+            if exists is None:
                 return
 
             if add:
-                existing_names = {t.name for t in bm.tags}
-                for name in add:
-                    if name not in existing_names:
-                        bm.tags.append(_get_or_create_tag(s, name))
+                self._link_tags(s, bookmark_id, add)
 
             if remove:
-                to_remove = {t for t in bm.tags if t.name in remove}
-                for t in to_remove:
-                    bm.tags.remove(t)
+                tag_ids = self._tag_ids_for(s, remove, create=False)
+                if tag_ids:
+                    s.execute(
+                        bookmark_tags.delete().where(
+                            bookmark_tags.c.bookmark_id == bookmark_id,
+                            bookmark_tags.c.tag_id.in_(list(tag_ids.values())),
+                        )
+                    )
+
+            # The junction was edited with Core; make sure a copy of the
+            # bookmark already in this session (batch mode) reloads tags.
+            cached = s.identity_map.get(s.identity_key(Bookmark, bookmark_id))
+            if cached is not None:
+                s.expire(cached, ["tags"])
+
+    def bulk_tag(
+        self,
+        ids: Iterable[int],
+        *,
+        add: Optional[list[str]] = None,
+        remove: Optional[list[str]] = None,
+    ) -> int:
+        """Add and/or remove tags on many bookmarks at once.
+
+        Runs as one ``INSERT OR IGNORE ... SELECT`` and one ``DELETE``
+        per chunk of ids instead of a session round trip per bookmark.
+        Unknown ids are ignored. Returns the number of existing
+        bookmarks that were considered.
+        """
+        wanted = list(dict.fromkeys(ids))
+        with self._session() as s:
+            s.flush()
+            existing: list[int] = []
+            for chunk in _chunked(wanted):
+                existing.extend(
+                    s.execute(select(Bookmark.id).where(Bookmark.id.in_(chunk))).scalars()
+                )
+            if not existing:
+                return 0
+
+            add_ids = list(self._tag_ids_for(s, add or ()).values())
+            remove_ids = list(self._tag_ids_for(s, remove or (), create=False).values())
+            for chunk in _chunked(existing):
+                if add_ids:
+                    s.execute(
+                        sa_insert(bookmark_tags)
+                        .prefix_with("OR IGNORE")
+                        .from_select(
+                            ["bookmark_id", "tag_id"],
+                            select(Bookmark.id, Tag.id)
+                            .join(Tag, true())  # deliberate cross join
+                            .where(Bookmark.id.in_(chunk), Tag.id.in_(add_ids)),
+                        )
+                    )
+                if remove_ids:
+                    s.execute(
+                        bookmark_tags.delete().where(
+                            bookmark_tags.c.bookmark_id.in_(chunk),
+                            bookmark_tags.c.tag_id.in_(remove_ids),
+                        )
+                    )
+
+            _refresh_fts_tags(s, existing)
+            _expire_bookmark_tags(s, existing)
+            return len(existing)
+
+    def rename_tag(self, old_prefix: str, new_prefix: str) -> int:
+        """Rename a tag and its subtree.
+
+        ``rename_tag("programming/python", "lang/python")`` renames
+        ``programming/python`` and every ``programming/python/...`` tag.
+        A trailing ``*`` switches to a plain string prefix, so
+        ``rename_tag("programming/py*", "lang/py")`` also catches
+        ``programming/pytest``. Where a new name already exists the two
+        tags are merged. Returns the number of tags renamed or merged.
+        """
+        if old_prefix.endswith("*"):
+            stem = old_prefix[:-1]
+            match = Tag.name.startswith(stem, autoescape=True)
+        else:
+            stem = old_prefix
+            match = (Tag.name == stem) | Tag.name.startswith(
+                stem + "/", autoescape=True
+            )
+        new_stem = new_prefix.rstrip("*")
+
+        with self._session() as s:
+            s.flush()
+            rows = s.execute(select(Tag.id, Tag.name).where(match)).all()
+            mapping = {
+                tag_id: new_stem + name[len(stem):]
+                for tag_id, name in rows
+                if new_stem + name[len(stem):] != name
+            }
+            return self._retag(s, mapping)
+
+    def merge_tags(self, src: Iterable[str], dst: str) -> int:
+        """Fold tags *src* into *dst*, creating *dst* if needed.
+
+        Every bookmark carrying one of *src* ends up tagged *dst*, and the
+        *src* tags are deleted. Names that do not exist are ignored.
+        Returns the number of tags merged away.
+        """
+        names = [n for n in dict.fromkeys(src) if n and n != dst]
+        with self._session() as s:
+            s.flush()
+            ids = self._tag_ids_for(s, names, create=False)
+            return self._retag(s, {tag_id: dst for tag_id in ids.values()})
+
+    def _retag(self, s: Session, mapping: dict[int, str]) -> int:
+        """Give each tag id in *mapping* its new name, merging on collision.
+
+        Tags keep their id where possible: the first source claiming a
+        free name is renamed in place, and any other source mapped to
+        the same name, or to a name held by a tag outside *mapping*, has
+        its links moved with ``INSERT ... SELECT`` and is deleted.
+        """
+        if not mapping:
+            return 0
+        sources = list(mapping)
+
+        affected: list[int] = []
+        for chunk in _chunked(sources):
+            affected.extend(
+                s.execute(
+                    select(bookmark_tags.c.bookmark_id)
+                    .where(bookmark_tags.c.tag_id.in_(chunk))
+                    .distinct()
+                ).scalars()
+            )
+
+        survivors, merges = _plan_retag(s, mapping)
+        if merges:
+            s.execute(
+                text(
+                    "INSERT OR IGNORE INTO bookmark_tags (bookmark_id, tag_id) "
+                    "SELECT bookmark_id, :dst FROM bookmark_tags WHERE tag_id = :src"
+                ),
+                merges,
+            )
+            merged = [m["src"] for m in merges]
+            for chunk in _chunked(merged):
+                s.execute(bookmark_tags.delete().where(bookmark_tags.c.tag_id.in_(chunk)))
+                s.execute(Tag.__table__.delete().where(Tag.id.in_(chunk)))
+        if survivors:
+            # Two passes so a rename never collides with a name another
+            # survivor is about to vacate.
+            rename = _sa_update(Tag.__table__).where(
+                Tag.id == bindparam("b_id")
+            ).values(name=bindparam("b_name"))
+            s.execute(
+                rename,
+                [{"b_id": i, "b_name": f"\x00retag:{i}"} for i in survivors.values()],
+            )
+            s.execute(
+                rename,
+                [{"b_id": i, "b_name": n} for n, i in survivors.items()],
+            )
+
+        self._invalidate_tag_cache()
+        _refresh_fts_tags(s, affected)
+        _expire_bookmark_tags(s, affected)
+        for obj in list(s.identity_map.values()):
+            if isinstance(obj, Tag):
+                s.expire(obj)
+        return len(mapping)
 
     def list_tags(self) -> list[Tag]:
         """Return all tags ordered by name."""
@@ -734,11 +2085,7 @@ class Database:
 
             history_visit_id: Optional[int] = None
             if history_visit_unique_id is not None:
-                hv = s.execute(
-                    select(HistoryVisit).where(
-                        HistoryVisit.unique_id == history_visit_unique_id
-                    )
-                ).scalar_one_or_none()
+                hv = _visit_by_unique_id(s, history_visit_unique_id)
                 if hv is not None:
                     history_visit_id = hv.id
 
@@ -803,136 +2150,92 @@ class Database:
 
     def bulk_ingest_history(
         self,
-        entries: "list[dict[str, Any]]",
+        entries: "Iterable[dict[str, Any]]",
         *,
         source_type: str,
         source_name: str,
+        progress: Optional[Callable[[int], None]] = None,
+        checkpoint: bool = False,
+        defer_aggregates: bool = False,
     ) -> "tuple[int, int, int, int, int]":
-        """Bulk-insert history URLs and visits in a single transaction.
+        """Stream history URLs and visits into the archive, chunk by chunk.
 
         Returns (urls_added, urls_updated, visits_added, visits_skipped,
         urls_seen) counts.
 
-        *entries* is a list of dicts (same shape ``browser_history``
-        readers produce). This path uses a single session for both the
-        URL upsert pass and the visit insert pass, avoiding the 30k+
-        fsyncs that a per-entry ``_session()`` would incur under
-        WAL+NORMAL.
-
-        Referrer chain (``from_visit_id``) is resolved at the end using
-        a source-id -> our-id map accumulated during the visit pass.
+        *entries* is any iterable of dicts (the shape ``browser_history``
+        readers yield); it is consumed ``_HISTORY_CHUNK`` entries at a
+        time and each chunk is committed on its own, so memory stays
+        bounded by the chunk size plus a few small id maps, and an
+        interruption loses at most one chunk. Within a chunk the work is
+        a handful of statements rather than several per entry:
+
+        1. URLs are resolved with chunked ``unique_id IN (...)`` lookups;
+           new ones go in with one ``executemany ... RETURNING id`` and
+           title / typed_count backfills with one executemany UPDATE.
+        2. Visits go in with ``INSERT OR IGNORE ... RETURNING``; SQLite
+           returns rows only for inserted visits. Each keeps its
+           browser-side id in ``source_visit_id``.
+        3. Referrers (``from_visit_id``) are resolved with one
+           ``UPDATE ... FROM`` joining the chunk's pending referrers
+           against ``source_visit_id`` (see :func:`_resolve_referrers`),
+           which also finds referrers imported by earlier runs.
+        4. The inserted visits are added into the ``history_daily`` /
+           ``history_url_daily`` rollups with two grouped upserts.
+
+        *progress* is called after every commit with the number of
+        entries processed so far. With *checkpoint* set, an
+        :class:`~bookmark_memex.models.ImportCheckpoint` row for the
+        source is written in each chunk's transaction and removed once
+        the stream is exhausted; see :meth:`get_import_checkpoint`.
+
+        *defer_aggregates* sets the ``defer_visit_aggregates`` row of
+        ``store_settings`` around each chunk's visit inserts, which makes
+        ``trg_history_visits_insert`` skip its ``UPDATE history_urls`` per
+        row. The touched URLs' aggregates are then brought up to date with
+        a single grouped UPDATE (see :func:`_add_visit_aggregates`). The
+        row is removed again before commit, and a failed chunk rolls it
+        back, so no other writer ever sees the trigger disabled; as the
+        schema is untouched, other connections keep their prepared
+        statements.
         """
-        from sqlalchemy import update as _update
-
-        urls_added = 0
-        urls_updated = 0
-        urls_seen = 0
-        visits_added = 0
-        visits_skipped = 0
-
-        url_id_cache: dict[str, int] = {}             # unique_id -> history_urls.id
-        src_to_ours: dict[int, Optional[int]] = {}    # source visit_id -> our id
-        pending_fv: list[tuple[int, int]] = []        # (our id, source from_visit)
-
-        # Dialect-native INSERT OR IGNORE keeps the dedup clean without
-        # raising IntegrityError: on conflict SQLite just skips the row
-        # and reports 0 rowcount. The session stays usable and we don't
-        # lose state from aborted flushes.
-        visit_insert = sa_insert(HistoryVisit).prefix_with("OR IGNORE")
+        ingest = self.history_ingest(
+            source_type=source_type,
+            source_name=source_name,
+            checkpoint=checkpoint,
+            defer_aggregates=defer_aggregates,
+        )
+        valid = (e for e in entries
+                 if (e.get("url") or "").startswith(("http://", "https://")))
+        for chunk in ingest.chunks(valid):
+            ingest.feed(chunk)
+            if progress is not None:
+                progress(ingest.done)
+        return ingest.finish()
+
+    def history_ingest(
+        self,
+        *,
+        source_type: str,
+        source_name: str,
+        checkpoint: bool = False,
+        defer_aggregates: bool = False,
+    ) -> "HistoryIngest":
+        """Return a :class:`HistoryIngest` writing one source into the archive.
+
+        :meth:`bulk_ingest_history` is the usual entry point; this is for
+        writers that interleave chunks from several sources, such as
+        :func:`~bookmark_memex.importers.browser_history.import_history_all`.
+        """
+        return HistoryIngest(self, source_type, source_name,
+                             checkpoint, defer_aggregates)
 
+    def get_import_checkpoint(
+        self, source_type: str, source_name: str
+    ) -> Optional[ImportCheckpoint]:
+        """Return the checkpoint left by an interrupted import, or None."""
         with self._session() as s:
-            for entry in entries:
-                url = entry.get("url") or ""
-                if not url.startswith(("http://", "https://")):
-                    continue
-
-                uid = generate_history_unique_id(url)
-                cached = url_id_cache.get(uid)
-                if cached is None:
-                    existing = s.execute(
-                        select(HistoryUrl).where(HistoryUrl.unique_id == uid)
-                    ).scalar_one_or_none()
-                    if existing is None:
-                        hu = HistoryUrl(
-                            unique_id=uid,
-                            url=normalize_url_for_history(url),
-                            title=entry.get("title"),
-                            typed_count=int(entry.get("typed_count") or 0),
-                        )
-                        s.add(hu)
-                        s.flush()
-                        urls_added += 1
-                    else:
-                        hu = existing
-                        if entry.get("title") and not hu.title:
-                            hu.title = entry.get("title")
-                        # typed_count is a source-side URL-level total;
-                        # accept monotone increases across re-imports.
-                        new_typed = int(entry.get("typed_count") or 0)
-                        if new_typed > (hu.typed_count or 0):
-                            hu.typed_count = new_typed
-                        urls_updated += 1
-                    url_id_cache[uid] = hu.id
-                    urls_seen += 1
-                    cached = hu.id
-
-                vuuid = uuid.uuid4().hex
-                res = s.connection().execute(
-                    visit_insert,
-                    [{
-                        "unique_id": vuuid,
-                        "url_id": cached,
-                        "visited_at": entry["visited_at"],
-                        "duration_ms": entry.get("duration_ms"),
-                        "transition": entry.get("transition"),
-                        "from_visit_id": None,
-                        "source_type": source_type,
-                        "source_name": source_name,
-                        "imported_at": _utcnow(),
-                    }],
-                )
-
-                inserted = res.rowcount == 1
-                if inserted:
-                    our_id = s.execute(
-                        select(HistoryVisit.id).where(
-                            HistoryVisit.unique_id == vuuid
-                        )
-                    ).scalar_one()
-                    visits_added += 1
-                else:
-                    # Dedup hit: re-query by the UNIQUE tuple so referrer
-                    # chains across re-imports still resolve.
-                    our_id = s.execute(
-                        select(HistoryVisit.id).where(
-                            HistoryVisit.url_id == cached,
-                            HistoryVisit.visited_at == entry["visited_at"],
-                            HistoryVisit.source_type == source_type,
-                            HistoryVisit.source_name == source_name,
-                        )
-                    ).scalar()
-                    visits_skipped += 1
-
-                if our_id is not None:
-                    src_vid = int(entry.get("visit_id") or 0)
-                    if src_vid:
-                        src_to_ours[src_vid] = our_id
-                    fv = int(entry.get("from_visit") or 0)
-                    if fv and inserted:
-                        pending_fv.append((our_id, fv))
-
-            # Pass 2: resolve referrer chain within the same transaction.
-            for our_id, src_from in pending_fv:
-                mapped = src_to_ours.get(src_from)
-                if mapped is None or mapped == our_id:
-                    continue
-                s.execute(
-                    _update(HistoryVisit)
-                    .where(HistoryVisit.id == our_id)
-                    .values(from_visit_id=mapped)
-                )
-
-        return urls_added, urls_updated, visits_added, visits_skipped, urls_seen
+            return s.get(ImportCheckpoint, (source_type, source_name))
 
     # ------------------------------------------------------------------
     # History: URLs
@@ -956,8 +2259,7 @@ class Database:
         here. They are maintained by the INSERT/DELETE triggers on
         ``history_visits``.
         """
-        unique_id = generate_history_unique_id(url)
-        norm = normalize_url_for_history(url)
+        norm, unique_id = canonicalize_history_url(url)
 
         with self._session() as s:
             row = s.execute(
@@ -1000,6 +2302,82 @@ class Database:
                 select(HistoryUrl).where(HistoryUrl.unique_id == unique_id)
             ).scalar_one_or_none()
 
+    def get_import_watermark(
+        self, source_type: str, source_name: str
+    ) -> Optional[ImportWatermark]:
+        """Return the watermark of the last completed import, or None."""
+        with self._session() as s:
+            return s.get(ImportWatermark, (source_type, source_name))
+
+    def advance_import_watermark(
+        self,
+        source_type: str,
+        source_name: str,
+        *,
+        last_visited_at: datetime,
+        last_visit_id: int,
+    ) -> ImportWatermark:
+        """Move the source's watermark forward; it never moves back.
+
+        Each field is kept at the maximum of its stored and given value,
+        so importing an older slice (``--since`` far in the past) cannot
+        rewind it.
+        """
+        with self._session() as s:
+            wm = s.get(ImportWatermark, (source_type, source_name))
+            if wm is None:
+                wm = ImportWatermark(
+                    source_type=source_type,
+                    source_name=source_name,
+                    last_visited_at=last_visited_at,
+                    last_visit_id=last_visit_id,
+                )
+                s.add(wm)
+            else:
+                wm.last_visited_at = max(wm.last_visited_at, last_visited_at)
+                wm.last_visit_id = max(wm.last_visit_id, last_visit_id)
+                wm.updated_at = _utcnow()
+            s.flush()
+            return wm
+
+    def max_history_url_id(self) -> int:
+        """Return the highest history_urls id, or 0 for an empty table."""
+        with self._session() as s:
+            return s.execute(select(func.max(HistoryUrl.id))).scalar() or 0
+
+    def history_urls_without_media(
+        self, first_id: int = 0
+    ) -> list[tuple[int, str]]:
+        """Return ``(id, url)`` for rows from *first_id* on that have no media."""
+        with self._session() as s:
+            return [
+                (row.id, row.url)
+                for row in s.execute(
+                    select(HistoryUrl.id, HistoryUrl.url)
+                    .where(HistoryUrl.id >= first_id, _no_media())
+                    .order_by(HistoryUrl.id)
+                )
+            ]
+
+    def set_history_url_media(self, media: Iterable[tuple[int, dict]]) -> int:
+        """Fill ``media`` on history_urls rows by id, in one executemany.
+
+        Rows that already carry media are left alone, as
+        :meth:`upsert_history_url` does. Returns the number of rows
+        written.
+        """
+        params = [{"b_id": hu_id, "b_media": m} for hu_id, m in media]
+        if not params:
+            return 0
+        with self._session() as s:
+            result = s.connection().execute(
+                _sa_update(HistoryUrl.__table__)
+                .where(HistoryUrl.id == bindparam("b_id"), _no_media())
+                .values(media=bindparam("b_media")),
+                params,
+            )
+            return result.rowcount
+
     def merge_history_url(
         self,
         *,
@@ -1063,21 +2441,27 @@ class Database:
         transition: Optional[str] = None,
         from_visit_id: Optional[int] = None,
     ) -> tuple[Optional[HistoryVisit], bool]:
-        """Insert a visit event with dedup on
-        ``UNIQUE(url_id, visited_at, source_type, source_name)``.
+        """Insert a visit event with dedup on its
+        :func:`~bookmark_memex.models.generate_visit_key`.
 
         Returns:
             ``(row, created)``. On a dedup hit ``created`` is False and
-            ``row`` is the existing row. The dedup path issues a SELECT
-            only when the INSERT conflicts, so clean inserts cost one
-            statement.
+            ``row`` is the existing row; ``(None, False)`` if *url_id*
+            names no history URL. The dedup path issues a SELECT only
+            when the INSERT conflicts, so clean inserts cost one
+            statement past the URL's.
         """
-        vuuid = uuid.uuid4().hex
         with self._session() as s:
             from sqlalchemy.exc import IntegrityError
 
+            url_uid = s.execute(
+                select(HistoryUrl.unique_id).where(HistoryUrl.id == url_id)
+            ).scalar_one_or_none()
+            if url_uid is None:
+                return None, False
+            key = generate_visit_key(url_uid, visited_at, source_type, source_name)
             row = HistoryVisit(
-                unique_id=vuuid,
+                visit_key=key,
                 url_id=url_id,
                 visited_at=visited_at,
                 duration_ms=duration_ms,
@@ -1087,24 +2471,22 @@ class Database:
                 source_name=source_name,
                 imported_at=_utcnow(),
             )
-            s.add(row)
             try:
-                s.flush()
+                # Savepoint so a dedup conflict only discards this row,
+                # not an enclosing batch() transaction.
+                with s.begin_nested():
+                    s.add(row)
             except IntegrityError:
-                s.rollback()
                 # Re-query the conflicting row so callers can map
                 # source-side IDs (e.g. Chrome's ``from_visit``) to our
                 # primary keys even on re-imports.
                 existing = s.execute(
-                    select(HistoryVisit).where(
-                        HistoryVisit.url_id == url_id,
-                        HistoryVisit.visited_at == visited_at,
-                        HistoryVisit.source_type == source_type,
-                        HistoryVisit.source_name == source_name,
-                    )
+                    select(HistoryVisit).where(HistoryVisit.visit_key == key)
                 ).scalar_one_or_none()
                 return existing, False
 
+            _add_daily_rollups(s.connection(), [row.id])
+            self._group_into_sessions(s, row.id)
             s.refresh(row)
             return row, True
 
@@ -1118,14 +2500,11 @@ class Database:
     ) -> Optional[HistoryVisit]:
         """Return a history_visits row by unique_id, or None."""
         with self._session() as s:
-            return s.execute(
-                select(HistoryVisit).where(HistoryVisit.unique_id == unique_id)
-            ).scalar_one_or_none()
+            return _visit_by_unique_id(s, unique_id)
 
     def merge_history_visit(
         self,
         *,
-        unique_id: str,
         url_unique_id: str,
         visited_at: datetime,
         source_type: str,
@@ -1134,19 +2513,17 @@ class Database:
         duration_ms: Optional[int] = None,
         from_visit_unique_id: Optional[str] = None,
     ) -> tuple[Optional[int], bool]:
-        """INSERT OR IGNORE a history_visit keyed by *unique_id*.
+        """INSERT OR IGNORE a history_visit identified by its content.
 
-        Used by the arkiv importer to round-trip visit events. Dedup
-        happens in two stages:
+        Used by the arkiv importer to round-trip visit events. The
+        visit's key, and so its ``unique_id``, is a hash of *url_unique_id*,
+        *visited_at* and the source, so the bundle's identifier is never
+        needed: if the key already exists (a re-imported bundle, or the
+        same visit captured from the browser directly) ``(id, False)``
+        is returned without modifying the row.
 
-        1. ``unique_id``: if this UUID already exists, return ``(id, False)``
-           without modifying the row. This makes re-importing the same
-           bundle idempotent.
-        2. ``UNIQUE(url_id, visited_at, source_type, source_name)``: if
-           a visit with the same semantic identity exists under a
-           different UUID, return ``(existing_id, False)``. This handles
-           re-importing a bundle after an intervening browser-direct
-           import.
+        *from_visit_unique_id* is resolved against stored visits; an
+        unknown referrer leaves ``from_visit_id`` NULL.
 
         Returns ``(None, False)`` when *url_unique_id* does not match any
         ``history_urls`` row; the visit is silently dropped. This protects
@@ -1156,31 +2533,24 @@ class Database:
         from sqlalchemy.exc import IntegrityError
 
         with self._session() as s:
-            url_row = s.execute(
-                select(HistoryUrl).where(HistoryUrl.unique_id == url_unique_id)
+            url_id = s.execute(
+                select(HistoryUrl.id).where(HistoryUrl.unique_id == url_unique_id)
             ).scalar_one_or_none()
-            if url_row is None:
+            if url_id is None:
                 return None, False
 
-            existing = s.execute(
-                select(HistoryVisit).where(HistoryVisit.unique_id == unique_id)
-            ).scalar_one_or_none()
-            if existing is not None:
-                return existing.id, False
-
+            key = generate_visit_key(
+                url_unique_id, visited_at, source_type, source_name
+            )
             from_visit_id: Optional[int] = None
             if from_visit_unique_id:
-                fv = s.execute(
-                    select(HistoryVisit).where(
-                        HistoryVisit.unique_id == from_visit_unique_id
-                    )
-                ).scalar_one_or_none()
+                fv = _visit_by_unique_id(s, from_visit_unique_id)
                 if fv is not None:
                     from_visit_id = fv.id
 
             row = HistoryVisit(
-                unique_id=unique_id,
-                url_id=url_row.id,
+                visit_key=key,
+                url_id=url_id,
                 visited_at=visited_at,
                 duration_ms=duration_ms,
                 transition=transition,
@@ -1189,24 +2559,365 @@ class Database:
                 source_name=source_name,
                 imported_at=_utcnow(),
             )
-            s.add(row)
             try:
-                s.flush()
+                with s.begin_nested():
+                    s.add(row)
             except IntegrityError:
-                s.rollback()
                 dup = s.execute(
-                    select(HistoryVisit).where(
-                        HistoryVisit.url_id == url_row.id,
-                        HistoryVisit.visited_at == visited_at,
-                        HistoryVisit.source_type == source_type,
-                        HistoryVisit.source_name == source_name,
-                    )
+                    select(HistoryVisit.id).where(HistoryVisit.visit_key == key)
                 ).scalar_one_or_none()
-                return (dup.id if dup is not None else None), False
+                return dup, False
 
-            s.refresh(row)
+            _add_daily_rollups(s.connection(), [row.id])
+            self._group_into_sessions(s, row.id)
             return row.id, True
 
+    # ------------------------------------------------------------------
+    # History: referrer chains and browsing sessions
+    # ------------------------------------------------------------------
+
+    def visit_chain(self, visit_id: int, depth: int = 50) -> list[HistoryVisit]:
+        """The referrer chain that led to *visit_id*: "how did I get here".
+
+        Follows ``from_visit_id`` up to *depth* hops with a recursive
+        CTE, one primary-key lookup per hop. Returned oldest first and
+        ending with the visit itself; empty if there is no such visit.
+        """
+        chain = (
+            select(HistoryVisit.id, HistoryVisit.from_visit_id,
+                   literal(0).label("hop"))
+            .where(HistoryVisit.id == visit_id)
+            .cte("chain", recursive=True)
+        )
+        referrer = aliased(HistoryVisit)
+        chain = chain.union_all(
+            select(referrer.id, referrer.from_visit_id, chain.c.hop + 1)
+            .join(chain, referrer.id == chain.c.from_visit_id)
+            .where(chain.c.hop < depth)
+        )
+        with self._session() as s:
+            return list(s.execute(
+                select(HistoryVisit)
+                .join(chain, HistoryVisit.id == chain.c.id)
+                .order_by(chain.c.hop.desc())
+            ).scalars())
+
+    def descendants(self, visit_id: int, depth: int = 10) -> list[HistoryVisit]:
+        """Visits reached from *visit_id* by following links, up to *depth* deep.
+
+        The inverse walk of :meth:`visit_chain`, over the
+        ``ix_history_visits_from_visit`` index. Each visit is returned
+        once, oldest first; ``from_visit_id`` gives the tree shape.
+        """
+        tree = (
+            select(HistoryVisit.id, literal(0).label("hop"))
+            .where(HistoryVisit.id == visit_id)
+            .cte("tree", recursive=True)
+        )
+        child = aliased(HistoryVisit)
+        tree = tree.union_all(
+            select(child.id, tree.c.hop + 1)
+            .join(tree, child.from_visit_id == tree.c.id)
+            .where(tree.c.hop < depth)
+        )
+        with self._session() as s:
+            return list(s.execute(
+                select(HistoryVisit)
+                .where(
+                    HistoryVisit.id.in_(select(tree.c.id)),
+                    HistoryVisit.id != visit_id,
+                )
+                .order_by(HistoryVisit.visited_at)
+            ).scalars())
+
+    def browsing_sessions(
+        self,
+        *,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        limit: Optional[int] = None,
+    ) -> list[BrowsingSession]:
+        """Browsing sessions that started on days in [*start*, *end*], newest first."""
+        stmt = select(BrowsingSession).order_by(BrowsingSession.started_at.desc())
+        if start is not None:
+            stmt = stmt.where(
+                BrowsingSession.started_at >= datetime.combine(start, time.min)
+            )
+        if end is not None:
+            stmt = stmt.where(
+                BrowsingSession.started_at
+                < datetime.combine(end + timedelta(days=1), time.min)
+            )
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        with self._session() as s:
+            return list(s.execute(stmt).scalars())
+
+    def session_for_visit(self, visit_id: int) -> Optional[BrowsingSession]:
+        """The browsing session *visit_id* belongs to, or None."""
+        with self._session() as s:
+            visit = s.get(HistoryVisit, visit_id)
+            if visit is None:
+                return None
+            return s.execute(
+                select(BrowsingSession)
+                .where(BrowsingSession.started_at <= visit.visited_at)
+                .order_by(BrowsingSession.started_at.desc())
+                .limit(1)
+            ).scalar_one_or_none()
+
+    def session_visits(self, session_id: int) -> list[HistoryVisit]:
+        """The visits of a browsing session, oldest first: "what did I do".
+
+        One range scan of the ``visited_at`` index between the session's
+        bounds. Empty for an unknown *session_id*.
+        """
+        with self._session() as s:
+            session = s.get(BrowsingSession, session_id)
+            if session is None:
+                return []
+            return list(s.execute(
+                select(HistoryVisit)
+                .where(HistoryVisit.visited_at.between(
+                    session.started_at, session.ended_at
+                ))
+                .order_by(HistoryVisit.visited_at)
+            ).scalars())
+
+    def rebuild_browsing_sessions(self) -> int:
+        """Regroup every stored visit into ``browsing_sessions``.
+
+        The ingest paths and :meth:`prune_history` keep the sessions
+        current; this is for repair after deleting or editing visits
+        by other means. Returns the number of sessions.
+        """
+        with self._session() as s:
+            recompute_browsing_sessions(s.connection())
+            return s.execute(
+                select(func.count()).select_from(BrowsingSession)
+            ).scalar_one()
+
+    # ------------------------------------------------------------------
+    # History: rollups
+    # ------------------------------------------------------------------
+
+    def rebuild_history_rollups(self, since: Optional[date] = None) -> int:
+        """Recompute ``history_daily`` / ``history_url_daily`` from visits.
+
+        The ingest paths keep the rollups current; this is for repair, or
+        after editing ``history_visits`` by hand. Only days from *since*
+        on are rebuilt; by default, from the oldest stored visit, so the
+        summaries :meth:`prune_history` leaves for pruned days survive.
+        Returns the number of ``history_daily`` rows written.
+        """
+        with self._session() as s:
+            conn = s.connection()
+            if since is None:
+                since = _oldest_visit_day(conn)
+                if since is None:
+                    return 0
+            recompute_history_rollups(conn, since)
+            return s.execute(
+                select(func.count()).select_from(HistoryDaily)
+                .where(HistoryDaily.day >= since)
+            ).scalar_one()
+
+    # ------------------------------------------------------------------
+    # History: retention
+    # ------------------------------------------------------------------
+
+    def prune_history(
+        self,
+        before: date,
+        *,
+        summarise: bool = False,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> HistoryPruneResult:
+        """Hard-delete every visit from before *before* (a UTC day).
+
+        With *summarise*, the ``history_daily`` / ``history_url_daily``
+        rows for the pruned days are first recomputed from the visits
+        and then kept, as the only record of that period; without it
+        they are deleted along with the visits. ``history_urls`` rows
+        stay (with aggregates over their remaining visits) so marginalia
+        and summaries keep their target.
+
+        Deleting row by row through ``trg_history_visits_delete`` runs
+        three aggregate subqueries per visit, and the foreign key check
+        on ``from_visit_id`` scans the table per visit. Instead visits go
+        in chunks of whole days, about :data:`_PRUNE_CHUNK` visits each,
+        with the trigger held off and foreign keys off (see
+        :func:`_prune_visit_chunk`). Each chunk is one transaction that
+        also clears referrers to its visits and adjusts the rollups and
+        browsing sessions, so an interrupted prune leaves a consistent
+        archive that a rerun finishes. *progress* is called after each
+        chunk with the visits deleted so far. Freed pages are then
+        returned to the filesystem with ``PRAGMA incremental_vacuum``
+        (databases created before incremental auto-vacuum need one ``db
+        vacuum`` to switch over).
+        """
+        cutoff = datetime.combine(before, time.min)
+        with self._session() as s:
+            urls_touched = s.execute(
+                select(func.count(func.distinct(HistoryVisit.url_id)))
+                .where(HistoryVisit.visited_at < cutoff)
+            ).scalar_one()
+
+        deleted = 0
+        with self._engine.connect() as conn:
+            raw = conn.connection.dbapi_connection
+            # Only takes effect outside a transaction, hence before begin().
+            raw.execute("PRAGMA foreign_keys=OFF")
+            try:
+                while True:
+                    with conn.begin():
+                        n = _prune_visit_chunk(conn, cutoff, summarise)
+                    if not n:
+                        break
+                    deleted += n
+                    if progress is not None:
+                        progress(deleted)
+            finally:
+                raw.execute("PRAGMA foreign_keys=ON")
+            free_before = raw.execute("PRAGMA freelist_count").fetchone()[0]
+            # executescript steps the pragma to completion; execute()
+            # would free a single page.
+            raw.executescript("PRAGMA incremental_vacuum")
+            free_after = raw.execute("PRAGMA freelist_count").fetchone()[0]
+
+        return HistoryPruneResult(
+            visits_deleted=deleted,
+            urls_touched=urls_touched,
+            summarised=summarise,
+            pages_freed=free_before - free_after,
+        )
+
+    def compact_history_timestamps(self) -> TimestampCompactionResult:
+        """Switch history timestamps to integer microseconds since the epoch.
+
+        Opt-in and one-way: see
+        :func:`~bookmark_memex.migrations.compact_history_timestamps`.
+        Afterwards this instance (and any later one on the same file)
+        binds and reads :class:`~bookmark_memex.models.HistoryTimestamp`
+        columns as integers; the ORM API still deals in datetimes. The
+        old tables' pages are handed back with ``PRAGMA
+        incremental_vacuum``. Databases created before incremental
+        auto-vacuum keep them on the freelist, reported as
+        ``bytes_free``, until a ``db vacuum``.
+        """
+        with self._engine.connect() as conn:
+            before = _database_bytes(conn)
+        converted = compact_history_timestamps(self._engine)
+        use_epoch_timestamps(self._engine.dialect, True)
+        with self._engine.connect() as conn:
+            conn.connection.dbapi_connection.executescript(
+                "PRAGMA incremental_vacuum"
+            )
+            after = _database_bytes(conn)
+            free = conn.exec_driver_sql("PRAGMA freelist_count").scalar_one()
+            free *= conn.exec_driver_sql("PRAGMA page_size").scalar_one()
+        return TimestampCompactionResult(converted, before, after, free)
+
+    def domain_activity(
+        self,
+        domain: str,
+        *,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        bucket: str = "day",
+    ) -> list[dict[str, Any]]:
+        """Visits to *domain* per day, week (from Monday) or month.
+
+        Read from ``history_daily``, so the cost is one index range scan
+        over at most a row per day. *domain* is matched as
+        :func:`~bookmark_memex.models.url_domain` stores it, so
+        ``www.example.com`` and ``example.com`` are the same. *start* and
+        *end* bound the days, inclusive. Each row has ``period`` (the
+        bucket's first day), ``visits``, ``active_days`` and
+        ``total_duration_ms``, oldest first.
+        """
+        periods = {
+            "day": HistoryDaily.day,
+            # On to the week's Sunday, then back to its Monday.
+            "week": func.date(HistoryDaily.day, "weekday 0", "-6 days"),
+            "month": func.strftime("%Y-%m-01", HistoryDaily.day),
+        }
+        if bucket not in periods:
+            raise ValueError(
+                f"Unknown bucket {bucket!r}; expected one of {', '.join(periods)}"
+            )
+        period = periods[bucket].label("period")
+        q = (
+            select(
+                period,
+                func.sum(HistoryDaily.visits).label("visits"),
+                func.count().label("active_days"),
+                func.sum(HistoryDaily.total_duration_ms).label("total_duration_ms"),
+            )
+            .where(HistoryDaily.domain == url_domain(domain))
+            .group_by(period)
+            .order_by(period)
+        )
+        if start is not None:
+            q = q.where(HistoryDaily.day >= start)
+        if end is not None:
+            q = q.where(HistoryDaily.day <= end)
+        with self._session() as s:
+            return [
+                {**row, "period": str(row["period"])}
+                for row in s.execute(q).mappings()
+            ]
+
+    def top_domains(
+        self,
+        *,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        limit: int = 20,
+    ) -> list[dict[str, Any]]:
+        """Most visited domains between *start* and *end* (inclusive)."""
+        q = (
+            select(
+                HistoryDaily.domain,
+                func.sum(HistoryDaily.visits).label("visits"),
+                func.count().label("active_days"),
+                func.sum(HistoryDaily.total_duration_ms).label("total_duration_ms"),
+            )
+            .group_by(HistoryDaily.domain)
+            .order_by(func.sum(HistoryDaily.visits).desc(), HistoryDaily.domain)
+            .limit(limit)
+        )
+        if start is not None:
+            q = q.where(HistoryDaily.day >= start)
+        if end is not None:
+            q = q.where(HistoryDaily.day <= end)
+        with self._session() as s:
+            return [dict(row) for row in s.execute(q).mappings()]
+
+    def history_on(
+        self, day: date, *, limit: Optional[int] = None
+    ) -> list[dict[str, Any]]:
+        """What was read on *day* (UTC): its URLs, most visited first.
+
+        Rows carry ``unique_id``, ``url``, ``title``, ``visits`` and
+        ``total_duration_ms`` for that day.
+        """
+        q = (
+            select(
+                HistoryUrl.unique_id,
+                HistoryUrl.url,
+                HistoryUrl.title,
+                HistoryUrlDaily.visits,
+                HistoryUrlDaily.total_duration_ms,
+            )
+            .join(HistoryUrl, HistoryUrl.id == HistoryUrlDaily.url_id)
+            .where(HistoryUrlDaily.day == day)
+            .order_by(HistoryUrlDaily.visits.desc(), HistoryUrl.url)
+            .limit(limit)
+        )
+        with self._session() as s:
+            return [dict(row) for row in s.execute(q).mappings()]
+
     # ------------------------------------------------------------------
     # Events
     # ------------------------------------------------------------------
@@ -2,14 +2,14 @@
 
 Public API
 ----------
-``export_file(db, path, format, bookmark_ids, **kwargs)``
+``export_file(db, path, format, bookmark_ids, where, **kwargs)``
     Dispatch to the format-specific exporter.  Supported formats:
     ``json``, ``csv``, ``text``, ``markdown``, ``m3u``, ``arkiv``.
 """
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
 from bookmark_memex.exporters.formats import (
     export_csv,
@@ -37,6 +37,7 @@ def export_file(
     path: Path,
     format: str = "json",
     bookmark_ids: Optional[list[int]] = None,
+    where: Any = None,
     **kwargs,
 ) -> None:
     """Export bookmarks to a file in the given format.
@@ -55,6 +56,10 @@ def export_file(
         Optional list of primary-key IDs to restrict the export.
         Not applicable to ``arkiv`` or ``html-app`` (which always
         include all active records).
+    where:
+        Optional SQLAlchemy filter over ``Bookmark`` columns, e.g.
+        ``Bookmark.domain == "example.com"``, applied in the query.
+        Same formats as *bookmark_ids*.
     **kwargs:
         Forwarded to the format-specific function.
 
@@ -86,4 +91,4 @@ def export_file(
     # Flat-file formats don't take format-specific options.
     kwargs.pop("single_file", None)
     kwargs.pop("include_history", None)
-    fn(db, path, bookmark_ids=bookmark_ids, **kwargs)
+    fn(db, path, bookmark_ids=bookmark_ids, where=where, **kwargs)
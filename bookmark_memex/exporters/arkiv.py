@@ -33,7 +33,7 @@ from typing import Any, Dict, List, Optional
 import yaml
 from sqlalchemy import select
 
-from bookmark_memex.models import Bookmark, HistoryUrl, HistoryVisit, Marginalia
+from bookmark_memex.models import HistoryUrl, HistoryVisit, Marginalia
 from bookmark_memex.uri import (
     build_bookmark_uri,
     build_history_url_uri,
@@ -123,11 +123,14 @@ SCHEMA: dict = {
                 "A single observed visit event. Emitted only when the "
                 "exporter runs with include_history=True."
             ),
-            "uri": "bookmark-memex://visit/<uuid>",
+            "uri": "bookmark-memex://visit/<unique_id>",
             "fields": {
                 "kind": "Always 'visit'.",
                 "uri": "Canonical URI for this visit.",
-                "uuid": "UUID hex string, stable across re-imports.",
+                "uuid": (
+                    "16-hex-character hash of the visit's history URL, "
+                    "time and source; stable across re-imports."
+                ),
                 "history_url_uri": "URI of the parent history-url.",
                 "visited_at": "ISO-8601 UTC datetime when the visit occurred.",
                 "transition": (
@@ -184,7 +187,7 @@ def _build_records(
 ) -> List[Dict[str, Any]]:
     """Collect arkiv records from the DB.
 
-    Order: bookmarks (by id) first, then history-urls (by id) if
+    Order: bookmarks (newest first) first, then history-urls (by id) if
     *include_history*, then visits (by visited_at) if *include_history*,
     then marginalia (by created_at) last so every note's parent URI has
     already appeared in the stream.
@@ -195,39 +198,31 @@ def _build_records(
     """
     records: List[Dict[str, Any]] = []
 
-    with db._session() as session:
-        bm_query = (
-            select(Bookmark)
-            .where(Bookmark.archived_at.is_(None))
-            .order_by(Bookmark.id)
+    # Bookmarks stream through iter_bookmarks(): plain rows, tags loaded
+    # per page, no blob columns.
+    bookmark_id_to_unique: Dict[int, str] = {}
+    for bm in db.iter_bookmarks():
+        # Kept so marginalia can reference parent URIs without
+        # per-note lookups.
+        bookmark_id_to_unique[bm["id"]] = bm["unique_id"]
+        records.append(
+            {
+                "kind": "bookmark",
+                "uri": build_bookmark_uri(bm["unique_id"]),
+                "unique_id": bm["unique_id"],
+                "url": bm["url"],
+                "title": bm["title"],
+                "description": bm["description"] or "",
+                "tags": bm["tags"],
+                "media": bm["media"],
+                "starred": bm["starred"],
+                "pinned": bm["pinned"],
+                "visit_count": bm["visit_count"] or 0,
+                "added": bm["added"].isoformat() if bm["added"] else None,
+            }
         )
-        bookmarks = list(session.execute(bm_query).scalars())
-
-        # Preload unique_ids so marginalia can reference parent URIs
-        # without per-note lookups.
-        bookmark_id_to_unique: Dict[int, str] = {
-            bm.id: bm.unique_id for bm in bookmarks
-        }
-
-        for bm in bookmarks:
-            tag_names = [t.name for t in bm.tags]
-            records.append(
-                {
-                    "kind": "bookmark",
-                    "uri": build_bookmark_uri(bm.unique_id),
-                    "unique_id": bm.unique_id,
-                    "url": bm.url,
-                    "title": bm.title,
-                    "description": bm.description or "",
-                    "tags": tag_names,
-                    "media": bm.media,
-                    "starred": bm.starred,
-                    "pinned": bm.pinned,
-                    "visit_count": bm.visit_count or 0,
-                    "added": bm.added.isoformat() if bm.added else None,
-                }
-            )
 
+    with db._session() as session:
         history_url_id_to_unique: Dict[int, str] = {}
         history_visit_id_to_unique: Dict[int, str] = {}
 
@@ -2,73 +2,120 @@
 
 Provides serializers for JSON, CSV, plain text, Markdown, and M3U playlist.
 All functions accept an optional ``bookmark_ids`` list: when given, only those
-bookmarks are exported; when omitted, all active bookmarks are exported.
+bookmarks are exported, in that order; when omitted, all active bookmarks are
+exported. An optional ``where`` filter (a SQLAlchemy expression, or list of
+them, over :class:`~bookmark_memex.models.Bookmark` columns) narrows either
+selection inside the query.
 """
 from __future__ import annotations
 
 import csv
 import json
+import textwrap
+from itertools import islice
 from pathlib import Path
-from typing import Optional
+from typing import Any, Iterable, Iterator, Optional
 
+from bookmark_memex.models import Bookmark
 
-def _bookmark_to_dict(b) -> dict:
+
+def _bookmark_to_dict(b: dict) -> dict:
     return {
-        "url": b.url,
-        "title": b.title,
-        "description": b.description or "",
-        "tags": b.tag_names,
-        "starred": b.starred,
-        "pinned": b.pinned,
-        "added": b.added.isoformat() if b.added else None,
-        "visit_count": b.visit_count,
-        "unique_id": b.unique_id,
+        "url": b["url"],
+        "title": b["title"],
+        "description": b["description"] or "",
+        "tags": b["tags"],
+        "starred": b["starred"],
+        "pinned": b["pinned"],
+        "added": b["added"].isoformat() if b["added"] else None,
+        "visit_count": b["visit_count"],
+        "unique_id": b["unique_id"],
     }
 
 
-def _get_bookmarks(db, bookmark_ids: Optional[list[int]]):
-    """Return the appropriate bookmark sequence based on whether IDs were given."""
-    if bookmark_ids is None:
-        return db.list()
-    bookmarks = []
-    for bid in bookmark_ids:
-        bm = db.get(bid)
-        if bm is not None:
-            bookmarks.append(bm)
-    return bookmarks
-
+# Ids bound per ``IN (...)`` lookup; well below SQLite's host-parameter
+# limit on every build.
+_ID_CHUNK = 500
 
-def export_json(db, path: Path, bookmark_ids: Optional[list[int]] = None) -> None:
-    """Write a JSON array of bookmark dicts to *path*."""
-    bookmarks = _get_bookmarks(db, bookmark_ids)
-    records = [_bookmark_to_dict(b) for b in bookmarks]
-    Path(path).write_text(json.dumps(records, indent=2, ensure_ascii=False), encoding="utf-8")
 
+def _get_bookmarks(
+    db, bookmark_ids: Optional[list[int]], where: Any = None
+) -> Iterator[dict]:
+    """Stream bookmark rows, restricted to *bookmark_ids* when given.
 
-def export_csv(db, path: Path, bookmark_ids: Optional[list[int]] = None) -> None:
+    Rows come from :meth:`Database.iter_bookmarks`, so exports run in
+    constant memory and never load favicon or page-content blobs.
+    Without *bookmark_ids* they come newest first; with it, in the
+    caller's order (repeated or unknown ids are skipped), looked up
+    :data:`_ID_CHUNK` ids at a time. *where* is passed through to
+    ``iter_bookmarks`` in both cases.
+    """
+    if bookmark_ids is None:
+        yield from db.iter_bookmarks(where=where)
+        return
+    if where is None:
+        where = []
+    elif not isinstance(where, (list, tuple)):
+        where = [where]
+    ids = iter(dict.fromkeys(bookmark_ids))
+    while chunk := list(islice(ids, _ID_CHUNK)):
+        rows = {
+            row["id"]: row
+            for row in db.iter_bookmarks(
+                batch_size=_ID_CHUNK, where=[Bookmark.id.in_(chunk), *where]
+            )
+        }
+        yield from (rows[i] for i in chunk if i in rows)
+
+
+def _write_lines(path: Path, lines: Iterable[str]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(line)
+            f.write("\n")
+
+
+def export_json(db, path: Path, bookmark_ids: Optional[list[int]] = None,
+                where: Any = None) -> None:
+    """Write a JSON array of bookmark dicts to *path*.
+
+    Streams one element at a time; the output is byte-identical to
+    ``json.dumps(records, indent=2)``.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        sep = "[\n"
+        for b in _get_bookmarks(db, bookmark_ids, where):
+            item = json.dumps(_bookmark_to_dict(b), indent=2, ensure_ascii=False)
+            f.write(sep)
+            f.write(textwrap.indent(item, "  "))
+            sep = ",\n"
+        f.write("[]" if sep == "[\n" else "\n]")
+
+
+def export_csv(db, path: Path, bookmark_ids: Optional[list[int]] = None,
+               where: Any = None) -> None:
     """Write bookmarks as CSV to *path* with header: url,title,tags,description,starred."""
-    bookmarks = _get_bookmarks(db, bookmark_ids)
     with open(path, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         writer.writerow(["url", "title", "tags", "description", "starred"])
-        for b in bookmarks:
+        for b in _get_bookmarks(db, bookmark_ids, where):
             writer.writerow([
-                b.url,
-                b.title,
-                ",".join(b.tag_names),
-                b.description or "",
-                str(b.starred).lower(),
+                b["url"],
+                b["title"],
+                ",".join(b["tags"]),
+                b["description"] or "",
+                str(b["starred"]).lower(),
             ])
 
 
-def export_text(db, path: Path, bookmark_ids: Optional[list[int]] = None) -> None:
+def export_text(db, path: Path, bookmark_ids: Optional[list[int]] = None,
+                where: Any = None) -> None:
     """Write one URL per line to *path*."""
-    bookmarks = _get_bookmarks(db, bookmark_ids)
-    lines = [b.url for b in bookmarks]
-    Path(path).write_text("\n".join(lines) + ("\n" if lines else ""), encoding="utf-8")
+    _write_lines(path, (b["url"] for b in _get_bookmarks(db, bookmark_ids, where)))
 
 
-def export_markdown(db, path: Path, bookmark_ids: Optional[list[int]] = None) -> None:
+def export_markdown(db, path: Path, bookmark_ids: Optional[list[int]] = None,
+                    where: Any = None) -> None:
     """Write bookmarks as a Markdown list to *path*.
 
     Format::
@@ -77,16 +124,19 @@ def export_markdown(db, path: Path, bookmark_ids: Optional[list[int]] = None) ->
 
         - [title](url) (tag1, tag2)
     """
-    bookmarks = _get_bookmarks(db, bookmark_ids)
-    lines = ["# Bookmarks", ""]
-    for b in bookmarks:
-        tag_str = ", ".join(b.tag_names)
-        tag_part = f" ({tag_str})" if tag_str else ""
-        lines.append(f"- [{b.title}]({b.url}){tag_part}")
-    Path(path).write_text("\n".join(lines) + "\n", encoding="utf-8")
+    def lines() -> Iterator[str]:
+        yield "# Bookmarks"
+        yield ""
+        for b in _get_bookmarks(db, bookmark_ids, where):
+            tag_str = ", ".join(b["tags"])
+            tag_part = f" ({tag_str})" if tag_str else ""
+            yield f"- [{b['title']}]({b['url']}){tag_part}"
 
+    _write_lines(path, lines())
 
-def export_m3u(db, path: Path, bookmark_ids: Optional[list[int]] = None) -> None:
+
+def export_m3u(db, path: Path, bookmark_ids: Optional[list[int]] = None,
+               where: Any = None) -> None:
     """Write bookmarks as an M3U playlist to *path*.
 
     Format::
@@ -95,9 +145,10 @@ def export_m3u(db, path: Path, bookmark_ids: Optional[list[int]] = None) -> None
         #EXTINF:-1,title
         url
     """
-    bookmarks = _get_bookmarks(db, bookmark_ids)
-    lines = ["#EXTM3U"]
-    for b in bookmarks:
-        lines.append(f"#EXTINF:-1,{b.title}")
-        lines.append(b.url)
-    Path(path).write_text("\n".join(lines) + "\n", encoding="utf-8")
+    def lines() -> Iterator[str]:
+        yield "#EXTM3U"
+        for b in _get_bookmarks(db, bookmark_ids, where):
+            yield f"#EXTINF:-1,{b['title']}"
+            yield b["url"]
+
+    _write_lines(path, lines())
@@ -90,6 +90,20 @@ def _read_vendor(name: str) -> bytes:
     return (_VENDORED_DIR / name).read_bytes()
 
 
+def _on_disk_size(db_path: Path) -> int:
+    """Bytes the source database occupies, including any pending WAL.
+
+    In WAL mode recent commits live in ``<db>-wal`` until a checkpoint,
+    so the main file alone under-reports what is being shipped (and can
+    be smaller than the stripped snapshot, which reads both).
+    """
+    total = 0
+    for p in (db_path, db_path.with_name(db_path.name + "-wal")):
+        if p.exists():
+            total += p.stat().st_size
+    return total
+
+
 def _snapshot_db(src_db_path: Path, dst_db_path: Path) -> None:
     """Snapshot the live DB to *dst_db_path* without mutating the source.
 
@@ -210,7 +224,7 @@ def _export_single_file(db, out_path) -> dict:
     out.parent.mkdir(parents=True, exist_ok=True)
 
     src_db_path = Path(db.path)
-    original_size = src_db_path.stat().st_size if src_db_path.exists() else 0
+    original_size = _on_disk_size(src_db_path)
 
     template = _read_template()
 
@@ -244,7 +258,7 @@ def _export_directory(db, out_path, *, compress_db: bool) -> dict:
     out_dir.mkdir(parents=True, exist_ok=True)
 
     src_db_path = Path(db.path)
-    original_size = src_db_path.stat().st_size if src_db_path.exists() else 0
+    original_size = _on_disk_size(src_db_path)
 
     # 1) index.html (template verbatim — the placeholder <script src=...>
     #    stays, and the base64 script elements are left empty so the
@@ -7,7 +7,9 @@ Manages three independent FTS5 virtual tables:
 
 All operations use raw sqlite3 connections (not SQLAlchemy) so that FTS5
 virtual-table DDL and the snippet()/bm25() auxiliary functions are accessible
-without ORM overhead.
+without ORM overhead. Rebuilds open their own read-write connection;
+``search`` and ``get_stats`` borrow warm read-only connections from
+:mod:`bookmark_memex.pool`.
 """
 
 from __future__ import annotations
@@ -16,6 +18,8 @@ import sqlite3
 from dataclasses import dataclass, field
 from typing import Callable, Dict, List, Optional
 
+from bookmark_memex.pool import get_read_pool
+
 
 # ---------------------------------------------------------------------------
 # SearchResult
@@ -109,7 +113,9 @@ class FTSIndex:
     ) -> int:
         """Repopulate bookmarks_fts from bookmarks + tags.
 
-        Only active (non-archived) bookmarks are indexed.
+        Only active (non-archived) bookmarks are indexed, each under its
+        bookmark id as rowid so single rows can be found without a scan
+        (``bookmark_id`` is UNINDEXED).
 
         Returns:
             Number of rows inserted.
@@ -135,9 +141,9 @@ class FTSIndex:
 
             for idx, (bid, url, title, desc, tags) in enumerate(rows, start=1):
                 cur.execute(
-                    "INSERT INTO bookmarks_fts(bookmark_id, url, title, description, tags)"
-                    " VALUES (?, ?, ?, ?, ?)",
-                    (bid, url or "", title or "", desc or "", tags or ""),
+                    "INSERT INTO bookmarks_fts(rowid, bookmark_id, url, title, description, tags)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (bid, bid, url or "", title or "", desc or "", tags or ""),
                 )
                 if progress_callback is not None:
                     progress_callback(idx, total)
@@ -250,7 +256,12 @@ class FTSIndex:
             return []
 
         prepared = self._prepare_query(query)
-        conn = self._connect()
+        with get_read_pool(self.db_path).connection() as conn:
+            return self._search(conn, query, prepared, limit)
+
+    def _search(
+        self, conn: sqlite3.Connection, query: str, prepared: str, limit: int
+    ) -> List[SearchResult]:
         try:
             cur = conn.cursor()
             cur.execute(
@@ -282,8 +293,6 @@ class FTSIndex:
             if "fts5" in err or "syntax" in err or "no such table" in err:
                 return self._fallback_search(query, limit, conn)
             raise
-        finally:
-            conn.close()
 
     def _prepare_query(self, query: str) -> str:
         """Normalise a user query for FTS5.
@@ -353,8 +362,7 @@ class FTSIndex:
                 "marginalia_fts": {"exists": True, "documents": 7},
             }
         """
-        conn = self._connect()
-        try:
+        with get_read_pool(self.db_path).connection() as conn:
             cur = conn.cursor()
             stats: Dict[str, Dict] = {}
             for table in _FTS_TABLES:
@@ -369,5 +377,3 @@ class FTSIndex:
                     count = cur.fetchone()[0]
                     stats[table] = {"exists": True, "documents": count}
             return stats
-        finally:
-            conn.close()
@@ -8,6 +8,7 @@ from bookmark_memex.importers.browser import (
 from bookmark_memex.importers.browser_history import (
     HistoryImportResult,
     import_history,
+    import_history_all,
     list_history_profiles,
 )
 
@@ -18,6 +19,7 @@ __all__ = [
     "list_browser_profiles",
     "ImportResult",
     "import_history",
+    "import_history_all",
     "list_history_profiles",
     "HistoryImportResult",
 ]
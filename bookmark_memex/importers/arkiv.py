@@ -29,8 +29,12 @@ Round-trip fidelity:
 
 - Bookmarks: identified by ``unique_id`` (16-char hash of normalised URL).
   Re-importing the same bundle is safe — duplicates are merged into the
-  existing row via :meth:`Database.add`, which preserves local tags,
+  existing row via :meth:`Database.add_many`, which preserves local tags,
   title, starred/pinned flags, and description.
+- Visits: identified by a hash of their URL, time and source, so the
+  ``unique_id`` a visit is exported under is the one it is re-imported
+  under. Bundles from before that carry random UUIDs; references to
+  those are translated while importing.
 - Marginalia: identified by UUID. Uses ``INSERT OR IGNORE`` semantics
   via :meth:`Database.merge_marginalia`, so re-importing the same
   bundle does not create duplicate notes.
@@ -53,6 +57,7 @@ from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional
 
 from bookmark_memex.db import Database
+from bookmark_memex.models import generate_visit_key, visit_key_to_unique_id
 
 
 # ---------------------------------------------------------------------------
@@ -76,6 +81,9 @@ def _jsonl_peek_first_record(reader) -> Optional[Dict[str, Any]]:
     return None
 
 
+# Per-record merge calls committed per this many records during import.
+_BATCH_COMMIT_EVERY = 5000
+
 _MARGINALIA_KINDS = ("marginalia", "annotation")  # annotation = legacy alias
 _KNOWN_KINDS = ("bookmark", "history-url", "visit") + _MARGINALIA_KINDS
 
@@ -274,110 +282,23 @@ def _parse_history_url_unique_id_from_uri(uri: Optional[str]) -> Optional[str]:
 
 
 def _parse_visit_uuid_from_uri(uri: Optional[str]) -> Optional[str]:
-    """Extract visit UUID from a ``bookmark-memex://visit/<uuid>`` URI."""
+    """Extract the visit id from a ``bookmark-memex://visit/<unique_id>`` URI."""
     return _parse_id_from_uri(uri, "visit")
 
 
 # ---------------------------------------------------------------------------
-# Public API
+# Import passes
 # ---------------------------------------------------------------------------
 
 
-def import_arkiv(
-    db: Database,
-    path: str | Path,
-    *,
-    merge: bool = False,
-    source_name: Optional[str] = None,
-) -> Dict[str, int]:
-    """Import an arkiv bundle into *db*.
-
-    Parameters
-    ----------
-    db:
-        Target :class:`Database`.
-    path:
-        Path to a directory, ``.zip``, ``.tar.gz``/``.tgz``, bare
-        ``.jsonl``, or ``.jsonl.gz`` bundle.
-    merge:
-        Reserved for CLI parity with the rest of the ``*-memex``
-        ecosystem. Currently a no-op because :meth:`Database.add` is
-        always merge-friendly.
-    source_name:
-        Optional identifier written to every imported bookmark's
-        source row. Defaults to the bundle path.
-
-    Returns
-    -------
-    dict
-        ``{"bookmarks_added": N, "bookmarks_seen": N,
-           "marginalia_added": N, "marginalia_seen": N,
-           "marginalia_skipped_existing": N,
-           "annotations_added": N, "annotations_seen": N,
-           "annotations_skipped_existing": N}``
-
-        The ``annotations_*`` keys are backwards-compat aliases of the
-        ``marginalia_*`` keys (same integer value). Existing callers do
-        not need to change.
-    """
-    stats_core = {
-        "bookmarks_added": 0,
-        "bookmarks_seen": 0,
-        "marginalia_added": 0,
-        "marginalia_seen": 0,
-        "marginalia_skipped_existing": 0,
-        "history_urls_added": 0,
-        "history_urls_seen": 0,
-        "history_urls_skipped_existing": 0,
-        "visits_added": 0,
-        "visits_seen": 0,
-        "visits_skipped_existing": 0,
-        "visits_dropped_unknown_parent": 0,
-    }
-    src_name = source_name or str(path)
-
-    # Multi-pass: bookmarks and history-urls first (so dependent visits
-    # and marginalia can find their parents), then visits (so visit
-    # marginalia can find their parents too), then marginalia.
-    records = list(_open_jsonl(path))
-
-    # Pass 1: bookmarks
-    for rec in records:
-        if not isinstance(rec, dict):
-            continue
-        if rec.get("kind") != "bookmark":
-            continue
-        stats_core["bookmarks_seen"] += 1
-
-        url = rec.get("url")
-        if not url:
-            continue
-
-        existing = (
-            db.get_by_unique_id(rec.get("unique_id") or "")
-            if rec.get("unique_id")
-            else None
-        )
-
-        db.add(
-            url,
-            title=rec.get("title") or "",
-            description=rec.get("description") or None,
-            tags=list(rec.get("tags") or []),
-            starred=bool(rec.get("starred", False)),
-            pinned=bool(rec.get("pinned", False)),
-            source_type="arkiv",
-            source_name=src_name,
-        )
-
-        if existing is None:
-            stats_core["bookmarks_added"] += 1
-
-    # Pass 2: history-urls
+def _import_history_urls(
+    db: Database, records: List[Any], stats: Dict[str, int]
+) -> None:
+    """Pass 2 of :func:`import_arkiv`: merge the ``history-url`` records."""
     for rec in records:
         if not isinstance(rec, dict) or rec.get("kind") != "history-url":
             continue
-        stats_core["history_urls_seen"] += 1
+        stats["history_urls_seen"] += 1
 
         uid = rec.get("unique_id")
         url = rec.get("url")
@@ -392,20 +313,29 @@ def import_arkiv(
             media=rec.get("media"),
         )
         if inserted:
-            stats_core["history_urls_added"] += 1
+            stats["history_urls_added"] += 1
         else:
-            stats_core["history_urls_skipped_existing"] += 1
+            stats["history_urls_skipped_existing"] += 1
+
 
-    # Pass 3: visits (in file order, which is visited_at ASC, so
-    # from_visit references are already-imported predecessors).
+def _import_visits(
+    db: Database, records: List[Any], stats: Dict[str, int]
+) -> Dict[str, str]:
+    """Pass 3 of :func:`import_arkiv`: merge the ``visit`` records.
+
+    Runs in file order, which is ``visited_at`` ascending, so
+    ``from_visit`` references are already-imported predecessors.
+    Returns the bundle's visit ids mapped to ours; they differ only in
+    older bundles.
+    """
+    visit_uids: Dict[str, str] = {}
     for rec in records:
         if not isinstance(rec, dict) or rec.get("kind") != "visit":
             continue
-        stats_core["visits_seen"] += 1
+        stats["visits_seen"] += 1
 
-        vuuid = rec.get("uuid")
         visited_at_raw = rec.get("visited_at")
-        if not vuuid or not visited_at_raw:
+        if not visited_at_raw:
             continue
 
         url_uid = _parse_history_url_unique_id_from_uri(rec.get("history_url_uri"))
@@ -418,33 +348,45 @@ def import_arkiv(
         source_name_rec = rec.get("source_name")
         if not source_type or not source_name_rec:
             continue
+        if rec.get("uuid"):
+            key = generate_visit_key(
+                url_uid, visited_at, str(source_type), str(source_name_rec)
+            )
+            visit_uids[rec["uuid"]] = visit_key_to_unique_id(key)
 
         visit_id, inserted = db.merge_history_visit(
-            unique_id=vuuid,
             url_unique_id=url_uid,
             visited_at=visited_at,
             transition=rec.get("transition"),
             duration_ms=rec.get("duration_ms"),
             source_type=str(source_type),
             source_name=str(source_name_rec),
-            from_visit_unique_id=from_uid,
+            from_visit_unique_id=visit_uids.get(from_uid, from_uid),
         )
         if visit_id is None and not inserted:
             # Parent history-url missing from the bundle (or a second
             # UNIQUE collision with non-resolvable data). Count it.
-            stats_core["visits_dropped_unknown_parent"] += 1
+            stats["visits_dropped_unknown_parent"] += 1
         elif inserted:
-            stats_core["visits_added"] += 1
+            stats["visits_added"] += 1
         else:
-            stats_core["visits_skipped_existing"] += 1
+            stats["visits_skipped_existing"] += 1
+    return visit_uids
 
-    # Pass 4: marginalia (every parent URI now resolvable).
+
+def _import_marginalia(
+    db: Database,
+    records: List[Any],
+    stats: Dict[str, int],
+    visit_uids: Dict[str, str],
+) -> None:
+    """Pass 4 of :func:`import_arkiv`: merge marginalia, every parent now known."""
     for rec in records:
         if not isinstance(rec, dict):
             continue
         if rec.get("kind") not in _MARGINALIA_KINDS:
             continue
-        stats_core["marginalia_seen"] += 1
+        stats["marginalia_seen"] += 1
 
         uuid = rec.get("uuid")
         text = rec.get("text") or ""
@@ -456,6 +398,8 @@ def import_arkiv(
             rec.get("history_url_uri")
         )
         parent_visit = _parse_visit_uuid_from_uri(rec.get("visit_uri"))
+        if parent_visit is not None:
+            parent_visit = visit_uids.get(parent_visit, parent_visit)
         created = _parse_timestamp(rec.get("created_at"))
         updated = _parse_timestamp(rec.get("updated_at"))
 
@@ -469,9 +413,110 @@ def import_arkiv(
             history_visit_unique_id=parent_visit,
         )
         if inserted:
-            stats_core["marginalia_added"] += 1
+            stats["marginalia_added"] += 1
         else:
-            stats_core["marginalia_skipped_existing"] += 1
+            stats["marginalia_skipped_existing"] += 1
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+
+def import_arkiv(
+    db: Database,
+    path: str | Path,
+    *,
+    merge: bool = False,
+    source_name: Optional[str] = None,
+) -> Dict[str, int]:
+    """Import an arkiv bundle into *db*.
+
+    Parameters
+    ----------
+    db:
+        Target :class:`Database`.
+    path:
+        Path to a directory, ``.zip``, ``.tar.gz``/``.tgz``, bare
+        ``.jsonl``, or ``.jsonl.gz`` bundle.
+    merge:
+        Reserved for CLI parity with the rest of the ``*-memex``
+        ecosystem. Currently a no-op because :meth:`Database.add` is
+        always merge-friendly.
+    source_name:
+        Optional identifier written to every imported bookmark's
+        source row. Defaults to the bundle path.
+
+    Returns
+    -------
+    dict
+        ``{"bookmarks_added": N, "bookmarks_seen": N,
+           "marginalia_added": N, "marginalia_seen": N,
+           "marginalia_skipped_existing": N,
+           "annotations_added": N, "annotations_seen": N,
+           "annotations_skipped_existing": N}``
+
+        The ``annotations_*`` keys are backwards-compat aliases of the
+        ``marginalia_*`` keys (same integer value). Existing callers do
+        not need to change.
+    """
+    stats_core = {
+        "bookmarks_added": 0,
+        "bookmarks_seen": 0,
+        "marginalia_added": 0,
+        "marginalia_seen": 0,
+        "marginalia_skipped_existing": 0,
+        "history_urls_added": 0,
+        "history_urls_seen": 0,
+        "history_urls_skipped_existing": 0,
+        "visits_added": 0,
+        "visits_seen": 0,
+        "visits_skipped_existing": 0,
+        "visits_dropped_unknown_parent": 0,
+    }
+    src_name = source_name or str(path)
+
+    # Multi-pass: bookmarks and history-urls first (so dependent visits
+    # and marginalia can find their parents), then visits (so visit
+    # marginalia can find their parents too), then marginalia.
+    records = list(_open_jsonl(path))
+
+    # Pass 1: bookmarks, written in one add_many() transaction.
+    bookmark_entries: List[Dict[str, Any]] = []
+    for rec in records:
+        if not isinstance(rec, dict):
+            continue
+        if rec.get("kind") != "bookmark":
+            continue
+        stats_core["bookmarks_seen"] += 1
+
+        url = rec.get("url")
+        if not url:
+            continue
+
+        bookmark_entries.append({
+            "url": url,
+            "title": rec.get("title") or "",
+            "description": rec.get("description") or None,
+            "tags": list(rec.get("tags") or []),
+            "starred": bool(rec.get("starred", False)),
+            "pinned": bool(rec.get("pinned", False)),
+            "source_type": "arkiv",
+            "source_name": src_name,
+        })
+
+    stats_core["bookmarks_added"] = sum(
+        1 for r in db.add_many(bookmark_entries) if r.added
+    )
+
+    # Passes 2-4 make one merge_* call per record; a pinned batch
+    # session turns that into a commit every few thousand records
+    # instead of one per record, and regroups the browsing sessions of
+    # the visits once per commit.
+    with db.batch(commit_every=_BATCH_COMMIT_EVERY):
+        _import_history_urls(db, records, stats_core)
+        visit_uids = _import_visits(db, records, stats_core)
+        _import_marginalia(db, records, stats_core, visit_uids)
 
     # Emit backwards-compat aliases so existing callers continue to work.
     return {
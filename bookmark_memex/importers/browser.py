@@ -18,12 +18,14 @@ import platform
 import shutil
 import sqlite3
 import tempfile
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, NamedTuple, Optional
+from typing import Any, Iterator, NamedTuple, Optional
 
-from bookmark_memex.db import Database, generate_unique_id
+from bookmark_memex.db import Database
 from bookmark_memex.detectors import run_detectors
 
 logger = logging.getLogger(__name__)
@@ -59,6 +61,92 @@ class ImportResult(NamedTuple):
     merged: int
 
 
+# ---------------------------------------------------------------------------
+# Source database access
+# ---------------------------------------------------------------------------
+
+
+def _sidecar(db_path: Path, suffix: str) -> Path:
+    return db_path.with_name(db_path.name + suffix)
+
+
+def _has_wal_content(db_path: Path) -> bool:
+    wal = _sidecar(db_path, "-wal")
+    try:
+        return wal.stat().st_size > 0
+    except FileNotFoundError:
+        return False
+
+
+def _open_in_place(db_path: Path) -> Optional[sqlite3.Connection]:
+    """Open *db_path* read-only where it lies, or return None if locked."""
+    uri = db_path.resolve().as_uri()
+    candidates = [f"{uri}?mode=ro"]
+    if not _has_wal_content(db_path):
+        candidates.append(f"{uri}?mode=ro&immutable=1")
+    for candidate in candidates:
+        # timeout=0: a browser holding the lock will keep holding it,
+        # so waiting for it only delays the copy fallback.
+        conn = sqlite3.connect(candidate, uri=True, timeout=0)
+        try:
+            conn.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        except sqlite3.OperationalError as exc:
+            conn.close()
+            if "locked" in str(exc):
+                return None
+            continue
+        return conn
+    return None
+
+
+# Copies of a live database taken before giving up on one that the
+# browser did not write to midway.
+_COPY_ATTEMPTS = 5
+
+
+def _file_state(path: Path) -> Optional[tuple[int, int]]:
+    """``(mtime_ns, size)`` of *path*, or None if it does not exist."""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _copy_with_wal(db_path: Path, dest_dir: Path) -> Path:
+    """Copy *db_path* and its ``-wal`` sidecar into *dest_dir*.
+
+    Used only while the browser holds an exclusive lock, which also
+    keeps SQLite's backup API and ``VACUUM INTO`` out, so the files are
+    copied as bytes. The WAL goes first: a checkpoint that lands
+    between the two copies writes pages into the main file that the
+    copied WAL holds as well. Should either file change while it is
+    being copied, the copy is taken again; SQLite replays the complete
+    transactions of the WAL when the copy is opened. Raises
+    :class:`OSError` if the browser never leaves the files alone long
+    enough.
+    """
+    dest = dest_dir / db_path.name
+    wal = _sidecar(db_path, "-wal")
+    for attempt in range(_COPY_ATTEMPTS):
+        if attempt:
+            time.sleep(0.05 * attempt)
+        before = _file_state(db_path), _file_state(wal)
+        _sidecar(dest, "-wal").unlink(missing_ok=True)
+        try:
+            if before[1] is not None:
+                shutil.copyfile(wal, _sidecar(dest, "-wal"))
+            shutil.copyfile(db_path, dest)
+        except FileNotFoundError:
+            continue  # the browser closed, removing its WAL
+        if (_file_state(db_path), _file_state(wal)) == before:
+            return dest
+    raise OSError(
+        f"{db_path} kept changing while it was copied; "
+        "try again when the browser is idle"
+    )
+
+
 # ---------------------------------------------------------------------------
 # Base class
 # ---------------------------------------------------------------------------
@@ -82,14 +170,44 @@ class BrowserImporter:
     # Shared helpers
     # ------------------------------------------------------------------
 
-    def _copy_database(self, db_path: Path) -> Path:
-        """Copy a (possibly locked) SQLite database to a temp file."""
+    @contextmanager
+    def _open_snapshot(self, db_path: Path) -> Iterator[sqlite3.Connection]:
+        """Open a browser database for reading without disturbing the browser.
+
+        In order of preference:
+
+        1. In place, ``mode=ro``. Works whenever the browser is closed or
+           keeps its database in shared-lock WAL mode (Firefox). No copy;
+           the WAL is honoured, and each query sees one consistent
+           snapshot.
+        2. In place, ``mode=ro&immutable=1``, when (1) fails for a reason
+           other than locking (read-only directory, no ``-shm``) and
+           there is no WAL content that immutable mode would skip.
+        3. A copy of the main file *and* its ``-wal`` sidecar into a
+           private directory, when the browser holds an exclusive lock
+           (Chrome while running). Opening the copy replays the WAL, so
+           recently committed visits are not lost.
+        """
         if not db_path.exists():
             raise FileNotFoundError(f"Database not found: {db_path}")
-        temp_fd, temp_path = tempfile.mkstemp(suffix=".db")
-        os.close(temp_fd)
-        shutil.copy2(db_path, temp_path)
-        return Path(temp_path)
+
+        conn = _open_in_place(db_path)
+        if conn is not None:
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
+
+        tmp_dir = Path(tempfile.mkdtemp(prefix="bookmark-memex-"))
+        try:
+            conn = sqlite3.connect(_copy_with_wal(db_path, tmp_dir))
+            try:
+                yield conn
+            finally:
+                conn.close()
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
 
     def _chrome_timestamp_to_datetime(self, chrome_timestamp: int) -> Optional[str]:
         """Convert Chrome microseconds-since-1601 to ISO 8601 UTC string."""
@@ -290,31 +408,26 @@ class FirefoxImporter(BrowserImporter):
             logger.warning("No places.sqlite at %s", places_db)
             return []
 
-        temp_db: Optional[Path] = None
         try:
-            temp_db = self._copy_database(places_db)
-            conn = sqlite3.connect(temp_db)
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT
-                    b.title,
-                    p.url,
-                    b.dateAdded,
-                    b.lastModified,
-                    GROUP_CONCAT(t.title, '/') AS folders
-                FROM moz_bookmarks b
-                JOIN moz_places p ON b.fk = p.id
-                LEFT JOIN moz_bookmarks t ON b.parent = t.id
-                WHERE b.type = 1
-                    AND p.url NOT LIKE 'place:%'
-                    AND p.url NOT LIKE 'about:%'
-                GROUP BY b.id
-                ORDER BY b.dateAdded DESC
-                """
-            )
-            rows = cursor.fetchall()
-            conn.close()
+            with self._open_snapshot(places_db) as conn:
+                rows = conn.execute(
+                    """
+                    SELECT
+                        b.title,
+                        p.url,
+                        b.dateAdded,
+                        b.lastModified,
+                        GROUP_CONCAT(t.title, '/') AS folders
+                    FROM moz_bookmarks b
+                    JOIN moz_places p ON b.fk = p.id
+                    LEFT JOIN moz_bookmarks t ON b.parent = t.id
+                    WHERE b.type = 1
+                        AND p.url NOT LIKE 'place:%'
+                        AND p.url NOT LIKE 'about:%'
+                    GROUP BY b.id
+                    ORDER BY b.dateAdded DESC
+                    """
+                ).fetchall()
 
             bookmarks: list[dict[str, Any]] = []
             _skip = {"bookmarks", "menu", "toolbar"}
@@ -345,9 +458,6 @@ class FirefoxImporter(BrowserImporter):
         except Exception as exc:
             logger.error("Failed to import Firefox bookmarks: %s", exc)
             return []
-        finally:
-            if temp_db and temp_db.exists():
-                temp_db.unlink()
 
 
 # ---------------------------------------------------------------------------
@@ -409,42 +519,32 @@ def import_browser_bookmarks(
     raw = importer.import_bookmarks(chosen.path)
     profile_name = f"{chosen.browser}/{chosen.name}"
 
-    processed = 0
-    added = 0
-    merged = 0
-    seen_ids: set[str] = set()
-
+    entries: list[dict[str, Any]] = []
     for entry in raw:
         url = entry.get("url", "")
         if not url or not _is_http(url):
             continue
 
-        processed += 1
-        uid = generate_unique_id(url)
-        is_new = uid not in seen_ids and db.get_by_unique_id(uid) is None
-        seen_ids.add(uid)
-
         tags = list(entry.get("tags") or [])
-        folder_path = entry.get("folder_path")
-
-        bm = db.add(
-            url,
-            title=entry.get("title") or "",
-            tags=tags or None,
-            source_type=source_type,
-            source_name=profile_name,
-            folder_path=folder_path,
-        )
-
-        if is_new:
-            added += 1
-        else:
-            merged += 1
+        row: dict[str, Any] = {
+            "url": url,
+            "title": entry.get("title") or "",
+            "tags": tags or None,
+            "source_type": source_type,
+            "source_name": profile_name,
+            "folder_path": entry.get("folder_path"),
+        }
 
         # Run detectors (YouTube, arXiv, GitHub, …) and store media metadata.
-        result = run_detectors(url)
-        if result is not None:
-            db.update(bm.id, media=result)
+        media = run_detectors(url)
+        if media is not None:
+            row["media"] = media
+        entries.append(row)
+
+    results = db.add_many(entries)
+    processed = len(results)
+    added = sum(1 for r in results if r.added)
+    merged = processed - added
 
     return ImportResult(processed=processed, added=added, merged=merged)
 
@@ -5,24 +5,37 @@ Supports Chrome/Chromium-family and Firefox browsers. Produces
 
 The importer is idempotent: re-running against the same profile only
 inserts visits we have not already captured, thanks to the
-``UNIQUE(url_id, visited_at, source_type, source_name)`` dedup contract
-on ``history_visits``.
+``UNIQUE(visit_key)`` dedup contract on ``history_visits`` (a hash of
+the visit's URL, time and source).
 
 Public API:
 
     import_history(db, browser="chrome", profile=None, since=None,
-                   strip_tracking=True) -> HistoryImportResult
+                   progress=None, resume=True, full=False) -> HistoryImportResult
+    import_history_all(db, browsers=("chrome", "firefox"), profiles=None,
+                       since=None, ..., workers=None)
+        -> dict[str, HistoryImportResult]
+
+Visits are streamed from the browser database and committed in chunks.
+Each chunk also records an ``import_checkpoints`` row, so an import
+that is interrupted resumes from the last committed visit on the next
+run. A completed import records a per-source watermark, and the next
+import reads only visits past it.
 """
 from __future__ import annotations
 
 import logging
-import sqlite3
-from datetime import datetime, timezone
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Iterable, NamedTuple, Optional
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional
 
-from bookmark_memex.db import Database, generate_history_unique_id
-from bookmark_memex.detectors import run_detectors
+from bookmark_memex.db import Database
+from bookmark_memex.detectors import discover, run_detectors
 from bookmark_memex.importers.browser import (
     BrowserImporter,
     BrowserProfile,
@@ -32,6 +45,11 @@ from bookmark_memex.importers.browser import (
 
 logger = logging.getLogger(__name__)
 
+# How far before the watermark an incremental import starts reading.
+# Covers visits whose timestamps landed slightly out of order (clock
+# adjustments, sync from another device); dedup absorbs the overlap.
+WATERMARK_OVERLAP = timedelta(hours=1)
+
 
 # ---------------------------------------------------------------------------
 # Result type
@@ -150,41 +168,38 @@ def _datetime_to_firefox_us(dt: datetime) -> int:
 def _read_chrome_history(
     profile_path: Path,
     since: Optional[datetime],
-) -> list[dict[str, Any]]:
-    """Read all (or post-*since*) rows from Chrome's History DB.
+    after_visit_id: Optional[int] = None,
+) -> Iterator[dict[str, Any]]:
+    """Yield all (or post-*since*) visits from Chrome's History DB.
 
-    Returns a list of dicts with keys:
+    With *after_visit_id*, visits whose Chrome-side id is greater are
+    yielded too, whatever their timestamp: a visit recorded while the
+    system clock was behind still gets picked up by the next
+    watermark-based import.
+
+    Yields dicts with keys:
         url, title, typed_count, visit_id (Chrome-side),
         visited_at (datetime), transition (str), duration_ms,
         from_visit (Chrome-side visit id or 0)
 
-    Visits arrive in ascending visited_at order so the referrer-chain
-    second pass can resolve from_visit IDs without a secondary lookup
-    structure.
+    Visits arrive in ascending visited_at order so referrers are
+    normally seen before the visits that point at them, and so an
+    import checkpoint is a single timestamp. Rows are stepped off the
+    cursor one at a time; the history is never held in memory.
     """
     history_db = profile_path / "History"
     if not history_db.exists():
         logger.warning("No Chrome History DB at %s", history_db)
-        return []
-
-    base = BrowserImporter()
-    temp_db: Optional[Path] = None
-    try:
-        temp_db = base._copy_database(history_db)
-        conn = sqlite3.connect(str(temp_db))
-        cur = conn.cursor()
-
-        since_us = (
-            _datetime_to_chrome_us(since) if since is not None else None
-        )
+        return
 
-        params: tuple[Any, ...] = ()
-        where = ""
-        if since_us is not None:
-            where = "WHERE v.visit_time > ?"
-            params = (since_us,)
+    where, params = _since_filter(
+        "v.visit_time", "v.id",
+        _datetime_to_chrome_us(since) if since is not None else None,
+        after_visit_id,
+    )
 
-        cur.execute(
+    with BrowserImporter()._open_snapshot(history_db) as conn:
+        cur = conn.execute(
             f"""
             SELECT v.id, v.visit_time, v.from_visit, v.transition,
                    v.visit_duration, u.url, u.title, u.typed_count
@@ -195,12 +210,11 @@ def _read_chrome_history(
             """,
             params,
         )
-        rows: list[dict[str, Any]] = []
-        for vid, vtime, fromv, trans, dur, url, title, typed in cur.fetchall():
+        for vid, vtime, fromv, trans, dur, url, title, typed in cur:
             dt = _chrome_us_to_datetime(vtime)
             if dt is None:
                 continue
-            rows.append({
+            yield {
                 "visit_id": int(vid),
                 "visited_at": dt,
                 "from_visit": int(fromv or 0),
@@ -209,45 +223,28 @@ def _read_chrome_history(
                 "url": url or "",
                 "title": title or None,
                 "typed_count": int(typed or 0),
-            })
-        conn.close()
-        return rows
-    finally:
-        if temp_db is not None and temp_db.exists():
-            try:
-                temp_db.unlink()
-            except OSError:
-                pass
+            }
 
 
 def _read_firefox_history(
     profile_path: Path,
     since: Optional[datetime],
-) -> list[dict[str, Any]]:
-    """Read all (or post-*since*) rows from Firefox's places.sqlite."""
+    after_visit_id: Optional[int] = None,
+) -> Iterator[dict[str, Any]]:
+    """Yield all (or post-*since*) visits from Firefox's places.sqlite."""
     places_db = profile_path / "places.sqlite"
     if not places_db.exists():
         logger.warning("No Firefox places.sqlite at %s", places_db)
-        return []
-
-    base = BrowserImporter()
-    temp_db: Optional[Path] = None
-    try:
-        temp_db = base._copy_database(places_db)
-        conn = sqlite3.connect(str(temp_db))
-        cur = conn.cursor()
-
-        since_us = (
-            _datetime_to_firefox_us(since) if since is not None else None
-        )
+        return
 
-        params: tuple[Any, ...] = ()
-        where = ""
-        if since_us is not None:
-            where = "WHERE h.visit_date > ?"
-            params = (since_us,)
+    where, params = _since_filter(
+        "h.visit_date", "h.id",
+        _datetime_to_firefox_us(since) if since is not None else None,
+        after_visit_id,
+    )
 
-        cur.execute(
+    with BrowserImporter()._open_snapshot(places_db) as conn:
+        cur = conn.execute(
             f"""
             SELECT h.id, h.visit_date, h.from_visit, h.visit_type,
                    p.url, p.title, p.typed
@@ -258,12 +255,11 @@ def _read_firefox_history(
             """,
             params,
         )
-        rows: list[dict[str, Any]] = []
-        for vid, vdate, fromv, vtype, url, title, typed in cur.fetchall():
+        for vid, vdate, fromv, vtype, url, title, typed in cur:
             dt = _firefox_us_to_datetime(vdate)
             if dt is None:
                 continue
-            rows.append({
+            yield {
                 "visit_id": int(vid),
                 "visited_at": dt,
                 "from_visit": int(fromv or 0),
@@ -272,15 +268,21 @@ def _read_firefox_history(
                 "url": url or "",
                 "title": title or None,
                 "typed_count": 1 if typed else 0,
-            })
-        conn.close()
-        return rows
-    finally:
-        if temp_db is not None and temp_db.exists():
-            try:
-                temp_db.unlink()
-            except OSError:
-                pass
+            }
+
+
+def _since_filter(
+    time_col: str,
+    id_col: str,
+    since_us: Optional[int],
+    after_visit_id: Optional[int],
+) -> tuple[str, tuple[Any, ...]]:
+    """Build the source-side WHERE clause for the *since* / id cut-off."""
+    if since_us is None:
+        return "", ()
+    if after_visit_id is None:
+        return f"WHERE {time_col} > ?", (since_us,)
+    return f"WHERE ({time_col} > ? OR {id_col} > ?)", (since_us, after_visit_id)
 
 
 # ---------------------------------------------------------------------------
@@ -297,11 +299,67 @@ def _is_http(url: str) -> bool:
 # ---------------------------------------------------------------------------
 
 
+def _resolve_browser(
+    browser: str,
+) -> tuple[BrowserImporter, Callable[..., Iterator[dict[str, Any]]], str]:
+    """Return ``(profile importer, reader, source_type)`` for *browser*."""
+    browser_lc = browser.lower()
+    if browser_lc in ("chrome", "chromium", "edge", "brave"):
+        return ChromeImporter(), _read_chrome_history, "chrome"
+    if browser_lc == "firefox":
+        return FirefoxImporter(), _read_firefox_history, "firefox"
+    raise ValueError(f"Unsupported browser: {browser!r}")
+
+
+def _start_point(
+    db: Database,
+    source_type: str,
+    profile_name: str,
+    since: Optional[datetime],
+    resume: bool,
+    full: bool,
+) -> tuple[Optional[datetime], Optional[int]]:
+    """Return the reader's ``(since, after_visit_id)`` for one source.
+
+    Applies the watermark and the resume checkpoint; see
+    :func:`import_history`.
+    """
+    after_visit_id: Optional[int] = None
+    if since is None and not full:
+        watermark = db.get_import_watermark(source_type, profile_name)
+        if watermark is not None:
+            since = watermark.last_visited_at - WATERMARK_OVERLAP
+            after_visit_id = watermark.last_visit_id
+
+    if resume:
+        checkpoint = db.get_import_checkpoint(source_type, profile_name)
+        if checkpoint is not None:
+            # Readers filter strictly after *since*; step back one
+            # microsecond (both browsers' resolution) so visits sharing
+            # the checkpoint timestamp are re-read and dedup-skipped
+            # rather than lost.
+            resume_from = checkpoint.last_visited_at - timedelta(microseconds=1)
+            logger.info(
+                "Resuming %s import from checkpoint at %s",
+                profile_name, checkpoint.last_visited_at,
+            )
+            if since is None or resume_from > since:
+                since = resume_from
+                # Visits with ids past the watermark but before the
+                # checkpoint were committed by the interrupted run.
+                after_visit_id = None
+    return since, after_visit_id
+
+
 def import_history(
     db: Database,
     browser: str = "chrome",
     profile: Optional[str] = None,
     since: Optional[datetime] = None,
+    *,
+    progress: Optional[Callable[[int], None]] = None,
+    resume: bool = True,
+    full: bool = False,
 ) -> HistoryImportResult:
     """Import visits from *browser* into *db*.
 
@@ -313,27 +371,33 @@ def import_history(
         since:     If given, only visits strictly after this datetime are
                    considered. The filter runs source-side against the
                    browser's own timestamp column, so it is cheap even on
-                   very large history databases.
+                   very large history databases. Defaults to the source's
+                   watermark (see below).
+        progress:  Called after each committed chunk with the number of
+                   visits processed so far in this run.
+        resume:    If the previous import of this profile was interrupted,
+                   continue from its checkpoint instead of re-reading
+                   everything before it. ``False`` starts over (dedup
+                   still makes that safe, just slower).
+        full:      Ignore the watermark and read every visit the browser
+                   still holds.
+
+    Each completed import advances the source's
+    :class:`~bookmark_memex.models.ImportWatermark` to the newest visit
+    it read. Without *since* or *full*, the next import reads only visits
+    after the watermark minus :data:`WATERMARK_OVERLAP`, or with a
+    browser-side id past the watermark's, so a routine re-import touches
+    new rows only.
 
     Returns:
-        :class:`HistoryImportResult` with the six counts.
+        :class:`HistoryImportResult` with the six counts. After a resume
+        they cover only the visits read by this call.
 
     Raises:
         ValueError: when *browser* is unsupported, no profiles exist, or
         *profile* does not match a known profile.
     """
-    browser_lc = browser.lower()
-
-    if browser_lc in ("chrome", "chromium", "edge", "brave"):
-        profile_importer: BrowserImporter = ChromeImporter()
-        reader = _read_chrome_history
-        source_type = "chrome"
-    elif browser_lc == "firefox":
-        profile_importer = FirefoxImporter()
-        reader = _read_firefox_history
-        source_type = "firefox"
-    else:
-        raise ValueError(f"Unsupported browser: {browser!r}")
+    profile_importer, reader, source_type = _resolve_browser(browser)
 
     profiles = profile_importer.find_profiles()
     if not profiles:
@@ -352,16 +416,50 @@ def import_history(
                 f"Profile {profile!r} not found for {browser}. Available: {avail}"
             )
 
-    raw = reader(chosen.path, since)
     profile_name = f"{chosen.browser}/{chosen.name}"
-
-    return _ingest_visits(
-        db=db,
-        rows=raw,
-        source_type=source_type,
-        source_name=profile_name,
+    start, after_visit_id = _start_point(
+        db, source_type, profile_name, since, resume, full
     )
 
+    with closing(reader(chosen.path, start, after_visit_id)) as rows:
+        return _ingest_visits(
+            db=db,
+            rows=rows,
+            source_type=source_type,
+            source_name=profile_name,
+            progress=progress,
+        )
+
+
+class _VisitTally:
+    """Visits seen, and the newest one, in one source's stream."""
+
+    __slots__ = ("seen", "newest", "newest_id")
+
+    def __init__(self) -> None:
+        self.seen = 0
+        self.newest: Optional[datetime] = None
+        self.newest_id = 0
+
+    def track(self, rows: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+        """Yield the http(s) entries of *rows*, counting them as they pass."""
+        for entry in rows:
+            if _is_http(entry.get("url") or ""):
+                self.seen += 1
+                if self.newest is None or entry["visited_at"] > self.newest:
+                    self.newest = entry["visited_at"]
+                self.newest_id = max(self.newest_id, int(entry.get("visit_id") or 0))
+                yield entry
+
+    def advance_watermark(
+        self, db: Database, source_type: str, source_name: str
+    ) -> None:
+        if self.newest is not None:
+            db.advance_import_watermark(
+                source_type, source_name,
+                last_visited_at=self.newest, last_visit_id=self.newest_id,
+            )
+
 
 def _ingest_visits(
     *,
@@ -369,65 +467,306 @@ def _ingest_visits(
     rows: Iterable[dict[str, Any]],
     source_type: str,
     source_name: str,
+    progress: Optional[Callable[[int], None]] = None,
 ) -> HistoryImportResult:
     """Shared ingestion loop for both browsers.
 
     Two passes:
-    1. :meth:`Database.bulk_ingest_history` writes all URLs and visits in
-       a single transaction. WAL + synchronous=NORMAL make this O(1)
-       fsyncs for the whole batch rather than O(N).
+    1. :meth:`Database.bulk_ingest_history` streams *rows* in chunks,
+       committing (and checkpointing) each one. WAL + synchronous=NORMAL
+       keep that to one cheap commit per chunk rather than per visit, and
+       ``defer_aggregates`` replaces the per-visit aggregate trigger with
+       one grouped UPDATE per chunk.
+       The source's watermark advances once the stream is exhausted.
     2. Media detectors run afterwards on newly-added URLs only. Kept
        out of the bulk transaction so a flaky detector cannot abort the
        import; each detector touch is a tiny UPDATE.
     """
-    # Materialise so we can count visits_seen without consuming the iterator.
-    entries = [e for e in rows if _is_http(e.get("url") or "")]
-    visits_seen = len(entries)
-
-    urls_added, urls_updated, visits_added, visits_skipped, urls_seen = (
-        db.bulk_ingest_history(
-            entries,
-            source_type=source_type,
-            source_name=source_name,
-        )
+    tally = _VisitTally()
+    first_new_id = db.max_history_url_id() + 1
+    counts = db.bulk_ingest_history(
+        tally.track(rows),
+        source_type=source_type,
+        source_name=source_name,
+        progress=progress,
+        checkpoint=True,
+        defer_aggregates=True,
     )
+    tally.advance_watermark(db, source_type, source_name)
 
     # Best-effort media detection on freshly-added URLs. Done as a
     # separate pass so detector failures cannot roll back the bulk
     # import. Only runs when something new was added.
-    if urls_added:
-        _attach_media_to_new_urls(db, entries)
+    if counts[0]:
+        _attach_media_to_new_urls(db, first_new_id)
+
+    return _result(counts, tally)
 
+
+def _result(
+    counts: "tuple[int, int, int, int, int]", tally: _VisitTally
+) -> HistoryImportResult:
+    urls_added, urls_updated, visits_added, visits_skipped, urls_seen = counts
     return HistoryImportResult(
         urls_seen=urls_seen,
         urls_added=urls_added,
         urls_updated=urls_updated,
-        visits_seen=visits_seen,
+        visits_seen=tally.seen,
         visits_added=visits_added,
         visits_skipped=visits_skipped,
     )
 
 
-def _attach_media_to_new_urls(
+# ---------------------------------------------------------------------------
+# Multi-profile import
+# ---------------------------------------------------------------------------
+
+# Display names ChromeImporter gives each Chromium-family browser.
+# "chrome" is absent on purpose: it selects the whole family, as it
+# does for import_history().
+_CHROMIUM_NAMES: dict[str, str] = {
+    "chromium": "Chromium",
+    "edge": "Microsoft Edge",
+    "brave": "Brave",
+}
+
+# Chunks a reader may run ahead of the writer, per reader thread.
+_QUEUE_CHUNKS_PER_READER = 2
+
+
+class _Source(NamedTuple):
+    """One profile scheduled by :func:`import_history_all`."""
+
+    name: str                 # "<browser>/<profile>", the source_name
+    source_type: str
+    reader: Callable[..., Iterator[dict[str, Any]]]
+    path: Path
+    since: Optional[datetime]
+    after_visit_id: Optional[int]
+
+
+def _find_sources(
+    browsers: Iterable[str], profiles: Optional[Iterable[str]]
+) -> list[tuple[BrowserProfile, Callable[..., Iterator[dict[str, Any]]], str]]:
+    """Return ``(profile, reader, source_type)`` for every selected profile."""
+    wanted = None if profiles is None else {p.lower() for p in profiles}
+    found: dict[str, tuple[BrowserProfile, Any, str]] = {}
+    for browser in browsers:
+        importer, reader, source_type = _resolve_browser(browser)
+        family = _CHROMIUM_NAMES.get(browser.lower())
+        for p in importer.find_profiles():
+            if family is not None and p.browser != family:
+                continue
+            key = f"{p.browser}/{p.name}"
+            if wanted is not None and not (
+                p.name.lower() in wanted or key.lower() in wanted
+            ):
+                continue
+            found.setdefault(key, (p, reader, source_type))
+    return list(found.values())
+
+
+def _schedule_sources(
     db: Database,
-    entries: list[dict[str, Any]],
+    browsers: Iterable[str],
+    profiles: Optional[Iterable[str]],
+    since: Optional[datetime],
+    resume: bool,
+    full: bool,
+) -> list[_Source]:
+    """Find the selected profiles and where each one's read starts."""
+    found = _find_sources(browsers, profiles)
+    if not found:
+        raise ValueError("No matching browser profiles found on this system")
+
+    sources = []
+    for p, reader, source_type in found:
+        name = f"{p.browser}/{p.name}"
+        start, after_visit_id = _start_point(
+            db, source_type, name, since, resume, full
+        )
+        sources.append(
+            _Source(name, source_type, reader, p.path, start, after_visit_id)
+        )
+    return sources
+
+
+class _ChunkQueue:
+    """Bounded hand-off of chunks from reader threads to the writer.
+
+    Items are ``(source name, chunk, uids)``; a chunk of ``None`` marks
+    the end of a source and an exception stands for a failed read. Once
+    :meth:`stop` is called, blocked and later :meth:`put` calls give up.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self._queue: "queue.Queue[tuple[str, Any, Any]]" = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+
+    def put(self, item: tuple[str, Any, Any]) -> bool:
+        """Enqueue *item*; False if the writer stopped first."""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self) -> tuple[str, Any, Any]:
+        return self._queue.get()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def _read_source(
+    src: _Source, ingest: Any, tally: _VisitTally, out: _ChunkQueue
 ) -> None:
-    """Run detectors on each distinct URL whose history_url.media is NULL."""
-    seen: set[str] = set()
-    for entry in entries:
-        url = entry.get("url") or ""
-        if not url or url in seen:
-            continue
-        seen.add(url)
-        row = db.get_history_url_by_unique_id(generate_history_unique_id(url))
-        if row is None or row.media is not None:
-            continue
+    """Reader thread body: queue *src*'s chunks, canonicalized, then its end."""
+    try:
+        with closing(src.reader(src.path, src.since, src.after_visit_id)) as rows:
+            for chunk in ingest.chunks(tally.track(rows)):
+                if not out.put((src.name, chunk, ingest.canonicalize(chunk))):
+                    return
+    except BaseException as exc:
+        out.put((src.name, exc, None))
+        return
+    out.put((src.name, None, None))
+
+
+def import_history_all(
+    db: Database,
+    browsers: Iterable[str] = ("chrome", "firefox"),
+    profiles: Optional[Iterable[str]] = None,
+    since: Optional[datetime] = None,
+    *,
+    progress: Optional[Callable[[int], None]] = None,
+    resume: bool = True,
+    full: bool = False,
+    workers: Optional[int] = None,
+) -> dict[str, HistoryImportResult]:
+    """Import every selected profile of every browser in *browsers*.
+
+    Each profile's history database is read and its URLs canonicalized
+    in a worker thread; the calling thread is the single writer, and
+    commits the chunks in whatever order they arrive through a bounded
+    queue. SQLite reads and page I/O release the GIL, so the readers
+    overlap with each other and with the writes, and a full sync takes
+    roughly as long as the largest profile rather than the sum of all.
+    Memory stays bounded by the queue: each reader runs at most a couple
+    of chunks ahead.
+
+    Args:
+        db:        Open :class:`Database` instance.
+        browsers:  Browser names as for :func:`import_history`.
+                   ``"chrome"`` means every Chromium-family profile;
+                   ``"brave"``, ``"edge"`` and ``"chromium"`` narrow to
+                   that browser.
+        profiles:  Profile names to keep, case-insensitive, either bare
+                   (``"Default"``) or qualified (``"Brave/Default"``).
+                   ``None`` keeps every profile found.
+        since, resume, full:
+                   As for :func:`import_history`, applied per profile.
+        progress:  Called after each committed chunk with the number of
+                   visits processed so far across all profiles.
+        workers:   Reader threads; defaults to one per profile, capped at
+                   the CPU count.
+
+    Returns:
+        ``{"<browser>/<profile>": HistoryImportResult}`` for each profile,
+        in discovery order.
+
+    Raises:
+        ValueError: when a browser is unsupported or no profile matches.
+        Any exception raised while reading a profile stops the remaining
+        readers and propagates; chunks already committed stay committed
+        and their checkpoints let the next run resume.
+    """
+    sources = _schedule_sources(db, browsers, profiles, since, resume, full)
+    if workers is None:
+        workers = min(len(sources), os.cpu_count() or 1)
+    workers = max(1, workers)
+
+    ingests = {
+        src.name: db.history_ingest(
+            source_type=src.source_type,
+            source_name=src.name,
+            checkpoint=True,
+            defer_aggregates=True,
+        )
+        for src in sources
+    }
+    tallies = {src.name: _VisitTally() for src in sources}
+    chunks = _ChunkQueue(workers * _QUEUE_CHUNKS_PER_READER)
+
+    first_new_id = db.max_history_url_id() + 1
+    results: dict[str, HistoryImportResult] = {}
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers,
+                            thread_name_prefix="history-reader") as pool:
         try:
-            media = run_detectors(url)
-        except Exception:
-            media = None
-        if media:
-            db.upsert_history_url(url, media=media)
+            for src in sources:
+                pool.submit(
+                    _read_source, src, ingests[src.name], tallies[src.name], chunks
+                )
+            remaining = len(sources)
+            while remaining:
+                name, chunk, uids = chunks.get()
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                ingest = ingests[name]
+                if chunk is None:
+                    counts = ingest.finish()
+                    tallies[name].advance_watermark(db, ingest.source_type, name)
+                    results[name] = _result(counts, tallies[name])
+                    remaining -= 1
+                    continue
+                ingest.feed(chunk, uids)
+                done += len(chunk)
+                if progress is not None:
+                    progress(done)
+        finally:
+            chunks.stop()
+
+    if any(r.urls_added for r in results.values()):
+        _attach_media_to_new_urls(db, first_new_id)
+
+    return {src.name: results[src.name] for src in sources}
+
+
+# Threads running media detectors after an import. Built-in detectors
+# are cheap regex work; the pool is for user detectors that block.
+_DETECTOR_WORKERS = 8
+
+
+def _detect_media(url: str) -> Optional[dict]:
+    try:
+        return run_detectors(url)
+    except Exception:
+        return None
+
+
+def _attach_media_to_new_urls(db: Database, first_new_id: int) -> None:
+    """Run detectors on history_urls added since *first_new_id*.
+
+    Reads the new rows back from the archive rather than from the import
+    stream, which has been consumed by now: one SELECT for the ids and
+    URLs still without media, detectors over them in a thread pool, and
+    one executemany UPDATE for the matches.
+    """
+    rows = db.history_urls_without_media(first_new_id)
+    if not rows:
+        return
+    discover()  # import detector modules once, not from every thread
+    with ThreadPoolExecutor(
+        max_workers=min(_DETECTOR_WORKERS, len(rows)),
+        thread_name_prefix="history-detect",
+    ) as pool:
+        found = pool.map(_detect_media, [url for _, url in rows])
+        db.set_history_url_media(
+            (hu_id, media) for (hu_id, _), media in zip(rows, found) if media
+        )
 
 
 def list_history_profiles(
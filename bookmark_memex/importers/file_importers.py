@@ -105,11 +105,17 @@ def import_file(
 # ---------------------------------------------------------------------------
 
 
-def _apply_detectors(db: Database, bm_id: int, url: str) -> None:
-    """Run detectors for *url* and store any result in bm.media."""
-    result = run_detectors(url)
+def _with_media(entry: dict[str, Any]) -> dict[str, Any]:
+    """Run detectors for ``entry["url"]`` and attach any result as ``media``."""
+    result = run_detectors(entry["url"])
     if result is not None:
-        db.update(bm_id, media=result)
+        entry["media"] = result
+    return entry
+
+
+def _add_all(db: Database, entries: list[dict[str, Any]]) -> int:
+    """Write *entries* through :meth:`Database.add_many`; return the count."""
+    return len(db.add_many([_with_media(e) for e in entries]))
 
 
 def _is_http(url: str) -> bool:
@@ -203,7 +209,7 @@ def import_html(db: Database, path: Path) -> int:
     parser = _NetscapeParser()
     parser.feed(content)
 
-    count = 0
+    entries: list[dict[str, Any]] = []
     for entry in parser.bookmarks:
         url = entry["url"]
         if not _is_http(url):
@@ -218,18 +224,16 @@ def import_html(db: Database, path: Path) -> int:
             if folder_tag not in tags:
                 tags.append(folder_tag)
 
-        bm = db.add(
-            url,
-            title=entry["title"] or "",
-            tags=tags or None,
-            source_type="html_file",
-            source_name=path.name,
-            folder_path=folder_path,
-        )
-        _apply_detectors(db, bm.id, url)
-        count += 1
+        entries.append({
+            "url": url,
+            "title": entry["title"] or "",
+            "tags": tags or None,
+            "source_type": "html_file",
+            "source_name": path.name,
+            "folder_path": folder_path,
+        })
 
-    return count
+    return _add_all(db, entries)
 
 
 # ---------------------------------------------------------------------------
@@ -249,7 +253,7 @@ def import_json(db: Database, path: Path) -> int:
     path = Path(path)
     raw = json.loads(path.read_text(encoding="utf-8"))
 
-    count = 0
+    entries: list[dict[str, Any]] = []
     for item in raw:
         if not isinstance(item, dict):
             continue
@@ -264,19 +268,17 @@ def import_json(db: Database, path: Path) -> int:
         else:
             tags = [str(t).strip() for t in raw_tags if t]
 
-        bm = db.add(
-            url,
-            title=item.get("title") or "",
-            description=item.get("description") or None,
-            tags=tags or None,
-            starred=bool(item.get("starred", False)),
-            source_type="json_file",
-            source_name=Path(path).name,
-        )
-        _apply_detectors(db, bm.id, url)
-        count += 1
+        entries.append({
+            "url": url,
+            "title": item.get("title") or "",
+            "description": item.get("description") or None,
+            "tags": tags or None,
+            "starred": bool(item.get("starred", False)),
+            "source_type": "json_file",
+            "source_name": Path(path).name,
+        })
 
-    return count
+    return _add_all(db, entries)
 
 
 # ---------------------------------------------------------------------------
@@ -292,7 +294,7 @@ def import_csv(db: Database, path: Path) -> int:
     Returns the count of bookmarks imported.
     """
     path = Path(path)
-    count = 0
+    entries: list[dict[str, Any]] = []
 
     with path.open(newline="", encoding="utf-8") as fh:
         reader = csv.DictReader(fh)
@@ -307,18 +309,16 @@ def import_csv(db: Database, path: Path) -> int:
             raw_tags = row_lower.get("tags", "")
             tags = [t.strip() for t in raw_tags.split(",") if t.strip()]
 
-            bm = db.add(
-                url,
-                title=row_lower.get("title", "").strip() or "",
-                description=row_lower.get("description", "").strip() or None,
-                tags=tags or None,
-                source_type="csv_file",
-                source_name=path.name,
-            )
-            _apply_detectors(db, bm.id, url)
-            count += 1
+            entries.append({
+                "url": url,
+                "title": row_lower.get("title", "").strip() or "",
+                "description": row_lower.get("description", "").strip() or None,
+                "tags": tags or None,
+                "source_type": "csv_file",
+                "source_name": path.name,
+            })
 
-    return count
+    return _add_all(db, entries)
 
 
 # ---------------------------------------------------------------------------
@@ -339,7 +339,7 @@ def import_markdown(db: Database, path: Path) -> int:
     content = path.read_text(encoding="utf-8", errors="replace")
 
     seen: set[str] = set()
-    count = 0
+    entries: list[dict[str, Any]] = []
 
     for match in _MD_LINK_RE.finditer(content):
         title = match.group(1).strip()
@@ -349,16 +349,14 @@ def import_markdown(db: Database, path: Path) -> int:
             continue
         seen.add(url)
 
-        bm = db.add(
-            url,
-            title=title or "",
-            source_type="markdown_file",
-            source_name=path.name,
-        )
-        _apply_detectors(db, bm.id, url)
-        count += 1
+        entries.append({
+            "url": url,
+            "title": title or "",
+            "source_type": "markdown_file",
+            "source_name": path.name,
+        })
 
-    return count
+    return _add_all(db, entries)
 
 
 # ---------------------------------------------------------------------------
@@ -373,7 +371,7 @@ def import_text(db: Database, path: Path) -> int:
     Only HTTP(S) URLs are imported.  Returns the count of bookmarks imported.
     """
     path = Path(path)
-    count = 0
+    entries: list[dict[str, Any]] = []
 
     for raw_line in path.read_text(encoding="utf-8", errors="replace").splitlines():
         line = raw_line.strip()
@@ -382,13 +380,11 @@ def import_text(db: Database, path: Path) -> int:
         if not _is_http(line):
             continue
 
-        bm = db.add(
-            line,
-            title=line,
-            source_type="text_file",
-            source_name=path.name,
-        )
-        _apply_detectors(db, bm.id, line)
-        count += 1
+        entries.append({
+            "url": line,
+            "title": line,
+            "source_type": "text_file",
+            "source_name": path.name,
+        })
 
-    return count
+    return _add_all(db, entries)
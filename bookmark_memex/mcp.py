@@ -20,11 +20,14 @@ from __future__ import annotations
 
 import json
 import sqlite3
+import threading
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 from bookmark_memex.config import get_config
 from bookmark_memex.db import Database
+from bookmark_memex.models import from_epoch_us
+from bookmark_memex.pool import get_read_pool
 
 # ---------------------------------------------------------------------------
 # Constants
@@ -32,6 +35,77 @@ from bookmark_memex.db import Database
 
 _ALLOWED_KEYWORDS: frozenset[str] = frozenset({"SELECT", "WITH", "EXPLAIN"})
 
+# Shown above a table's DDL in get_schema: steer agents to the indexed
+# domain column and to the rollups, which answer most per-domain /
+# per-day history questions without touching visits.
+_TABLE_NOTES: dict[str, str] = {
+    "bookmarks": (
+        "Filter by site with the indexed domain column (lowercase host, "
+        "no port or leading www.), not url LIKE."
+    ),
+    "history_urls": (
+        "Filter by site with the indexed domain column (lowercase host, "
+        "no port or leading www.), not url LIKE."
+    ),
+    "history_visits": (
+        "Times are naive UTC: ISO text, or integer microseconds since 1970 "
+        "where declared INTEGER (datetime(visited_at / 1000000, "
+        "'unixepoch')). Bind range bounds in the same form so the "
+        "visited_at indexes apply. from_visit_id is the referrer visit "
+        "(indexed): walk chains with WITH RECURSIVE. unique_id is computed "
+        "(printf('%016x', visit_key)) and not indexed: match on visit_key."
+    ),
+    "browsing_sessions": (
+        "Runs of visits (all browsers) with no idle gap over 30 minutes. "
+        "A session's visits are history_visits WHERE visited_at BETWEEN "
+        "started_at AND ended_at."
+    ),
+    "history_daily": (
+        "Visits per domain per UTC day (domain = history_urls.domain). "
+        "Prefer over scanning history_visits for per-domain or per-period "
+        "counts."
+    ),
+    "history_url_daily": (
+        "Visits per history URL per UTC day. Join history_urls on url_id "
+        "for 'what was I reading on day X'."
+    ),
+}
+
+
+def _schema_header(name: str, count: Any) -> str:
+    """Comment lines above a table's DDL in get_schema."""
+    header = f"-- {name} ({count} rows)"
+    note = _TABLE_NOTES.get(name)
+    if note:
+        header += f"\n-- {note}"
+    return header
+
+
+def _visit_time_text(value: Any) -> Any:
+    """Raw ``history_visits`` time as the ISO text a non-compact DB holds."""
+    if isinstance(value, int):
+        return from_epoch_us(value).isoformat(" ", "microseconds")
+    return value
+
+
+class _LazyDatabase:
+    """The :class:`Database` for *db_path*, opened on the first call.
+
+    Tools run on executor threads, so the first calls may race; the
+    lock makes them share one engine and pool.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self._db_path = db_path
+        self._db: Optional[Database] = None
+        self._lock = threading.Lock()
+
+    def __call__(self) -> Database:
+        with self._lock:
+            if self._db is None:
+                self._db = Database(self._db_path)
+            return self._db
+
 
 # ---------------------------------------------------------------------------
 # Pure-Python tool implementations (sync, testable without MCP)
@@ -45,7 +119,12 @@ def _create_tools(db_path: str) -> dict[str, Any]:
         get_schema, execute_sql, get_record, mutate
     (import_bookmarks and export_bookmarks are registered separately in
     create_server because they are heavier and always use the executor.)
+
+    Read tools borrow connections from the shared read-only pool for
+    *db_path*; ORM lookups and ``mutate`` share one lazily-opened
+    :class:`Database`.
     """
+    db_handle = _LazyDatabase(db_path)
 
     # ------------------------------------------------------------------
     # get_schema
@@ -53,7 +132,7 @@ def _create_tools(db_path: str) -> dict[str, Any]:
 
     def get_schema() -> str:
         """Return DDL + row counts for every table in the database."""
-        with sqlite3.connect(db_path) as conn:
+        with get_read_pool(db_path).connection() as conn:
             conn.row_factory = sqlite3.Row
             tables = conn.execute(
                 "SELECT name, sql FROM sqlite_master "
@@ -69,7 +148,7 @@ def _create_tools(db_path: str) -> dict[str, Any]:
                     ).fetchone()[0]
                 except Exception:
                     count = "?"
-                parts.append(f"-- {name} ({count} rows)\n{ddl};")
+                parts.append(f"{_schema_header(name, count)}\n{ddl};")
             return "\n\n".join(parts)
 
     # ------------------------------------------------------------------
@@ -94,9 +173,8 @@ def _create_tools(db_path: str) -> dict[str, Any]:
                 )
             })
 
-        uri = f"file:{db_path}?mode=ro"
         try:
-            with sqlite3.connect(uri, uri=True) as conn:
+            with get_read_pool(db_path).connection() as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(sql, params or [])
                 return [dict(row) for row in cursor.fetchall()]
@@ -121,7 +199,7 @@ def _create_tools(db_path: str) -> dict[str, Any]:
 
         Raises ValueError if the record is not found or kind is unknown.
         """
-        db = Database(db_path)
+        db = db_handle()
 
         if kind == "bookmark":
             bm = db.get_by_unique_id(id)
@@ -157,7 +235,7 @@ def _create_tools(db_path: str) -> dict[str, Any]:
 
         if kind in ("marginalia", "annotation"):
             # Fetch via raw SQL to avoid needing a separate lookup method.
-            with sqlite3.connect(db_path) as conn:
+            with get_read_pool(db_path).connection() as conn:
                 conn.row_factory = sqlite3.Row
                 row = conn.execute(
                     "SELECT m.id, m.text, m.created_at, m.updated_at, "
@@ -197,13 +275,13 @@ def _create_tools(db_path: str) -> dict[str, Any]:
                     f"history-url with unique_id={id!r} not found"
                 )
             # Pull the 20 most recent visits inline for convenience.
-            with sqlite3.connect(db_path) as conn:
+            with get_read_pool(db_path).connection() as conn:
                 conn.row_factory = sqlite3.Row
                 visits = [
                     {
                         "unique_id": r["unique_id"],
                         "uri": f"bookmark-memex://visit/{r['unique_id']}",
-                        "visited_at": r["visited_at"],
+                        "visited_at": _visit_time_text(r["visited_at"]),
                         "transition": r["transition"],
                         "duration_ms": r["duration_ms"],
                         "source_type": r["source_type"],
@@ -277,6 +355,9 @@ def _create_tools(db_path: str) -> dict[str, Any]:
 
           Bookmark lifecycle:
             add, update, delete, restore, tag
+          Tag maintenance:
+            rename_tag {"old", "new"} — renames a tag subtree
+            merge_tags {"src": [...], "dst"} — folds tags into one
           Marginalia (notes) lifecycle:
             add_marginalia, update_marginalia,
             delete_marginalia, restore_marginalia
@@ -287,18 +368,23 @@ def _create_tools(db_path: str) -> dict[str, Any]:
         Returns {"total": N, "succeeded": N, "results": [...]}.
         Individual failures do not abort the remaining batch.
         """
-        db = Database(db_path)
+        db = db_handle()
         results: list[dict] = []
         succeeded = 0
 
-        for op in operations:
-            op_type = op.get("op", "")
-            try:
-                result = _dispatch_op(db, op_type, op)
-                results.append({"status": "ok", **result})
-                succeeded += 1
-            except Exception as exc:
-                results.append({"status": "error", "op": op_type, "error": str(exc)})
+        # One transaction for the whole list; each op runs in its own
+        # savepoint, so a failing op does not undo the others.
+        with db.batch():
+            for op in operations:
+                op_type = op.get("op", "")
+                try:
+                    result = _dispatch_op(db, op_type, op)
+                    results.append({"status": "ok", **result})
+                    succeeded += 1
+                except Exception as exc:
+                    results.append(
+                        {"status": "error", "op": op_type, "error": str(exc)}
+                    )
 
         return {
             "total": len(operations),
@@ -319,11 +405,32 @@ def _create_tools(db_path: str) -> dict[str, Any]:
 # ---------------------------------------------------------------------------
 
 
+def _op_rename_tag(db: Database, op: dict) -> dict:
+    count = db.rename_tag(op["old"], op["new"])
+    return {"old": op["old"], "new": op["new"], "tags": count}
+
+
+def _op_merge_tags(db: Database, op: dict) -> dict:
+    count = db.merge_tags(op["src"], op["dst"])
+    return {"dst": op["dst"], "tags": count}
+
+
+# Ops handled by a function of (db, op) rather than inline in _dispatch_op.
+_OP_HANDLERS: dict[str, Callable[[Database, dict], dict]] = {
+    "rename_tag": _op_rename_tag,
+    "merge_tags": _op_merge_tags,
+}
+
+
 def _dispatch_op(db: Database, op_type: str, op: dict) -> dict:
     """Execute a single mutation operation; return a result dict.
 
     Raises on failure so the caller can record it without stopping the batch.
     """
+    handler = _OP_HANDLERS.get(op_type)
+    if handler is not None:
+        return handler(db, op)
+
     if op_type == "add":
         bm = db.add(
             op["url"],
@@ -351,12 +458,7 @@ def _dispatch_op(db: Database, op_type: str, op: dict) -> dict:
         return {"id": op["id"]}
 
     if op_type == "tag":
-        for bm_id in op.get("ids", []):
-            db.tag(
-                bm_id,
-                add=op.get("add"),
-                remove=op.get("remove"),
-            )
+        db.bulk_tag(op.get("ids", []), add=op.get("add"), remove=op.get("remove"))
         return {"ids": op.get("ids", [])}
 
     if op_type in ("add_marginalia", "annotate"):
@@ -464,7 +566,7 @@ def create_server(db_path: Optional[str] = None):
         """Execute a batch of write operations.
 
         Each item in *operations* must have an "op" key.  Supported ops:
-        add, update, delete, tag, annotate, restore.
+        add, update, delete, tag, annotate, restore, rename_tag, merge_tags.
 
         Returns a JSON summary: {"total": N, "succeeded": N, "results": [...]}.
         """
@@ -0,0 +1,1044 @@
+"""Schema migrations for bookmark-memex.
+
+Migrations are an ordered registry of idempotent steps. The highest
+applied step is recorded in ``schema_version``, so opening an
+up-to-date database costs a single read (:func:`schema_state`, which
+also returns the history timestamp storage); the chain in
+:func:`run_migrations` only runs when that read reports a version
+behind :data:`SCHEMA_VERSION`.
+
+Each step must stay idempotent: databases created before versioning was
+introduced report version 0 and replay the whole chain, whatever state
+their tables are actually in.
+
+To change the schema, append a :class:`Migration` with the next version
+number. Never renumber or remove an existing step.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import bindparam, delete, func, insert, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+from bookmark_memex.models import (
+    Base,
+    BrowsingSession,
+    ContentBlob,
+    HistoryDaily,
+    HistoryTimestamp,
+    HistoryUrlDaily,
+    ImportCheckpoint,
+    ImportWatermark,
+    SESSION_IDLE_GAP,
+    SchemaVersion,
+    StoreSetting,
+    _utcnow,
+    from_epoch_us,
+    generate_visit_key,
+    url_domain,
+)
+
+
+# ---------------------------------------------------------------------------
+# Steps
+# ---------------------------------------------------------------------------
+
+
+def _apply_rename_annotations_to_marginalia(engine) -> None:
+    """Rename legacy ``annotations`` / ``annotations_fts`` tables in place.
+
+    Run once on first open of a pre-rename database. Idempotent: safe to
+    re-run, and a fresh database (no legacy tables) is a no-op.
+
+    Schema is otherwise identical — same columns, indexes, and FK targets —
+    so ``ALTER TABLE ... RENAME TO`` preserves data and indexes intact.
+    The FTS5 shadow table is dropped and will be recreated by the FTS
+    bootstrap on first use (it is a derived index, not a source of truth).
+    """
+    with engine.begin() as conn:
+        names = {
+            r[0] for r in conn.execute(
+                text(
+                    "SELECT name FROM sqlite_master WHERE type='table' "
+                    "AND name IN ('annotations', 'marginalia', "
+                    "             'annotations_fts', 'marginalia_fts')"
+                )
+            )
+        }
+
+        if "annotations" in names and "marginalia" not in names:
+            conn.execute(text("ALTER TABLE annotations RENAME TO marginalia"))
+
+        # Legacy FTS5 shadow: drop if it exists; the FTS bootstrap will
+        # recreate a fresh one under the new name the next time it runs.
+        if "annotations_fts" in names:
+            conn.execute(text("DROP TABLE IF EXISTS annotations_fts"))
+
+
+def _create_tables(engine: Engine) -> None:
+    """Create any table or index declared on the ORM metadata but missing.
+
+    Only creates; never alters. Column additions to existing tables need
+    their own step (see :func:`_apply_add_marginalia_history_cols`).
+    """
+    Base.metadata.create_all(engine)
+
+
+def _apply_add_marginalia_history_cols(engine) -> None:
+    """Add history-record FK columns to an existing ``marginalia`` table.
+
+    Run once on first open of a database that predates history-capture.
+    Idempotent: inspects ``PRAGMA table_info`` and only adds columns that
+    are missing. A fresh database already has the columns via
+    ``Base.metadata.create_all``, so this is a no-op there.
+    """
+    with engine.begin() as conn:
+        table_exists = conn.execute(
+            text(
+                "SELECT name FROM sqlite_master WHERE type='table' "
+                "AND name='marginalia'"
+            )
+        ).first()
+        if not table_exists:
+            return
+
+        cols = {
+            row[1]  # second column is the name
+            for row in conn.execute(text("PRAGMA table_info(marginalia)"))
+        }
+
+        if "history_url_id" not in cols:
+            conn.execute(
+                text(
+                    "ALTER TABLE marginalia ADD COLUMN history_url_id INTEGER "
+                    "REFERENCES history_urls(id) ON DELETE SET NULL"
+                )
+            )
+            conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS "
+                    "ix_marginalia_history_url_id "
+                    "ON marginalia(history_url_id)"
+                )
+            )
+
+        if "history_visit_id" not in cols:
+            conn.execute(
+                text(
+                    "ALTER TABLE marginalia ADD COLUMN history_visit_id INTEGER "
+                    "REFERENCES history_visits(id) ON DELETE SET NULL"
+                )
+            )
+            conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS "
+                    "ix_marginalia_history_visit_id "
+                    "ON marginalia(history_visit_id)"
+                )
+            )
+
+
+# Database.bulk_ingest_history(defer_aggregates=True) and
+# Database.prune_history hold the store_settings row below for the
+# duration of a chunk's transaction and bring the aggregates up to date
+# themselves; the insert and delete triggers stand aside.
+DEFER_VISIT_AGGREGATES = "defer_visit_aggregates"
+
+HISTORY_VISITS_INSERT_TRIGGER = f"""
+CREATE TRIGGER IF NOT EXISTS trg_history_visits_insert
+AFTER INSERT ON history_visits
+WHEN NOT EXISTS (
+    SELECT 1 FROM store_settings WHERE key = '{DEFER_VISIT_AGGREGATES}'
+)
+BEGIN
+    UPDATE history_urls
+    SET visit_count = visit_count + 1,
+        first_visited = CASE
+            WHEN first_visited IS NULL
+                 OR NEW.visited_at < first_visited
+            THEN NEW.visited_at
+            ELSE first_visited
+        END,
+        last_visited = CASE
+            WHEN last_visited IS NULL
+                 OR NEW.visited_at > last_visited
+            THEN NEW.visited_at
+            ELSE last_visited
+        END
+    WHERE id = NEW.url_id;
+END;
+"""
+
+
+# Prune recomputes the aggregates once per touched URL instead of once
+# per deleted visit.
+HISTORY_VISITS_DELETE_TRIGGER = f"""
+CREATE TRIGGER IF NOT EXISTS trg_history_visits_delete
+AFTER DELETE ON history_visits
+WHEN NOT EXISTS (
+    SELECT 1 FROM store_settings WHERE key = '{DEFER_VISIT_AGGREGATES}'
+)
+BEGIN
+    UPDATE history_urls
+    SET visit_count = (
+            SELECT COUNT(*) FROM history_visits
+            WHERE url_id = OLD.url_id
+        ),
+        first_visited = (
+            SELECT MIN(visited_at) FROM history_visits
+            WHERE url_id = OLD.url_id
+        ),
+        last_visited = (
+            SELECT MAX(visited_at) FROM history_visits
+            WHERE url_id = OLD.url_id
+        )
+    WHERE id = OLD.url_id;
+END;
+"""
+
+
+def _install_history_triggers(engine) -> None:
+    """Install SQL triggers that maintain ``history_urls`` aggregates.
+
+    ``visit_count``, ``first_visited`` and ``last_visited`` on history_urls
+    are derived from history_visits. Rather than recompute in Python for
+    every import, SQL triggers maintain the invariants on insert and
+    delete. Idempotent via ``CREATE TRIGGER IF NOT EXISTS``.
+
+    Notes:
+    - We use ``COALESCE(..., NEW.visited_at)`` for the first insert when
+      the aggregate columns are still NULL.
+    - The delete trigger is best-effort: for soft delete (``archived_at``)
+      we do NOT recompute, which is deliberate. ``visit_count`` is
+      "lifetime observed visits", not "active visits". Hard delete does
+      recompute via the delete trigger so hard-delete stays consistent.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(HISTORY_VISITS_INSERT_TRIGGER))
+
+        conn.execute(text(HISTORY_VISITS_DELETE_TRIGGER))
+
+
+def _apply_content_blobs(engine: Engine) -> None:
+    """Move cached page bodies into the content-addressed ``content_blobs``.
+
+    Creates the table, adds ``content_cache.blob_hash`` when missing,
+    installs the refcount triggers, then backfills: every legacy row
+    with an inline ``html_content`` and a known ``content_hash`` gets
+    its payload copied into a blob (once per distinct hash) and the
+    inline copy cleared. Rows without a hash keep their inline payload.
+
+    Refcounts are trigger-maintained on ``content_cache`` insert, update
+    of ``blob_hash`` and delete; a blob whose count reaches zero is
+    deleted in the same statement, which is what garbage-collects pages
+    when bookmarks are hard-deleted.
+    """
+    ContentBlob.__table__.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        cols = {row[1] for row in conn.execute(text("PRAGMA table_info(content_cache)"))}
+        if "blob_hash" not in cols:
+            conn.execute(
+                text(
+                    "ALTER TABLE content_cache ADD COLUMN blob_hash VARCHAR(64) "
+                    "REFERENCES content_blobs(hash)"
+                )
+            )
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_content_cache_blob_hash "
+                "ON content_cache(blob_hash)"
+            )
+        )
+
+        conn.execute(
+            text(
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_content_cache_blob_insert
+                AFTER INSERT ON content_cache
+                WHEN NEW.blob_hash IS NOT NULL
+                BEGIN
+                    UPDATE content_blobs SET refcount = refcount + 1
+                    WHERE hash = NEW.blob_hash;
+                END;
+                """
+            )
+        )
+        conn.execute(
+            text(
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_content_cache_blob_update
+                AFTER UPDATE OF blob_hash ON content_cache
+                WHEN OLD.blob_hash IS NOT NEW.blob_hash
+                BEGIN
+                    UPDATE content_blobs SET refcount = refcount + 1
+                    WHERE hash = NEW.blob_hash;
+                    UPDATE content_blobs SET refcount = refcount - 1
+                    WHERE hash = OLD.blob_hash;
+                    DELETE FROM content_blobs
+                    WHERE hash = OLD.blob_hash AND refcount <= 0;
+                END;
+                """
+            )
+        )
+        conn.execute(
+            text(
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_content_cache_blob_delete
+                AFTER DELETE ON content_cache
+                WHEN OLD.blob_hash IS NOT NULL
+                BEGIN
+                    UPDATE content_blobs SET refcount = refcount - 1
+                    WHERE hash = OLD.blob_hash;
+                    DELETE FROM content_blobs
+                    WHERE hash = OLD.blob_hash AND refcount <= 0;
+                END;
+                """
+            )
+        )
+
+        # Backfill. Blobs start at refcount 0; the update trigger counts
+        # each content_cache row as it is repointed.
+        conn.execute(
+            text(
+                """
+                INSERT OR IGNORE INTO content_blobs
+                    (hash, data, size, compressed_size, refcount, created_at)
+                SELECT content_hash, html_content, content_length,
+                       compressed_size, 0, fetched_at
+                FROM content_cache
+                WHERE html_content IS NOT NULL
+                  AND content_hash IS NOT NULL
+                  AND blob_hash IS NULL
+                """
+            )
+        )
+        conn.execute(
+            text(
+                """
+                UPDATE content_cache
+                SET blob_hash = content_hash, html_content = NULL
+                WHERE html_content IS NOT NULL
+                  AND content_hash IS NOT NULL
+                  AND blob_hash IS NULL
+                """
+            )
+        )
+
+
+# Partial / covering indexes added after the tables they live on, so
+# existing databases need them created explicitly. Fresh databases get
+# them from create_all in step 2 and this step is a no-op.
+_ACTIVE_INDEXES = (
+    ("bookmarks", "ix_bookmarks_active_added"),
+    ("bookmark_tags", "ix_bookmark_tags_tag_bookmark"),
+    ("marginalia", "ix_marginalia_active_bookmark_created"),
+    ("history_visits", "ix_history_visits_active_url_visited"),
+    ("history_visits", "ix_history_visits_active_visited"),
+)
+
+
+def _apply_active_indexes(engine: Engine) -> None:
+    """Create the ``archived_at IS NULL`` partial and covering indexes.
+
+    The indexes they supersede are dropped: ``ix_bookmark_tags_tag_id``
+    is a prefix of the covering ``(tag_id, bookmark_id)`` index, and
+    the plain ``archived_at`` indexes on bookmarks and history_visits
+    would otherwise win the planner's equality heuristic and force a
+    sort on every ``ORDER BY added`` / ``visited_at`` read.
+    """
+    for table_name, index_name in _ACTIVE_INDEXES:
+        table = Base.metadata.tables[table_name]
+        index = next(ix for ix in table.indexes if ix.name == index_name)
+        index.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        for name in (
+            "ix_bookmark_tags_tag_id",
+            "ix_bookmarks_archived_at",
+            "ix_history_visits_archived_at",
+        ):
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def _drop_shadowed_visit_indexes(engine: Engine) -> None:
+    """Drop history_visits indexes that are prefixes of the dedup key.
+
+    ``uq_history_visits_dedup`` leads with ``(url_id, visited_at)``, so
+    ``ix_history_visits_url_id`` and ``ix_history_visits_url_id_visited_at``
+    answered nothing it could not, while costing two extra b-tree
+    writes per ingested visit.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_history_visits_url_id"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_history_visits_url_id_visited_at"))
+
+
+def _create_import_checkpoints(engine: Engine) -> None:
+    """Create ``import_checkpoints`` for resumable history imports."""
+    ImportCheckpoint.__table__.create(engine, checkfirst=True)
+
+
+def _create_import_watermarks(engine: Engine) -> None:
+    """Create ``import_watermarks`` for incremental history imports."""
+    ImportWatermark.__table__.create(engine, checkfirst=True)
+
+
+def _apply_source_visit_ids(engine: Engine) -> None:
+    """Add ``history_visits.source_visit_id`` and index it per source.
+
+    Existing visits keep a NULL id until a re-import of their source
+    dedup-hits them and records it. ``ix_history_visits_source`` is a
+    prefix of the new index and is dropped.
+    """
+    with engine.begin() as conn:
+        cols = {row[1] for row in conn.execute(text("PRAGMA table_info(history_visits)"))}
+        if "source_visit_id" not in cols:
+            conn.execute(
+                text("ALTER TABLE history_visits ADD COLUMN source_visit_id INTEGER")
+            )
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_history_visits_source_visit "
+                "ON history_visits(source_type, source_name, source_visit_id)"
+            )
+        )
+        conn.execute(text("DROP INDEX IF EXISTS ix_history_visits_source"))
+
+
+def visit_day_sql(column: str) -> str:
+    """SQL for the UTC day (``YYYY-MM-DD``) of a history timestamp *column*.
+
+    Works on either storage of :class:`~bookmark_memex.models.HistoryTimestamp`:
+    ISO text, or integer microseconds after :func:`compact_history_timestamps`.
+    """
+    return (
+        f"CASE WHEN typeof({column}) = 'integer' "
+        f"THEN date({column} / 1000000, 'unixepoch') ELSE date({column}) END"
+    )
+
+
+def epoch_us_sql(column: str) -> str:
+    """SQL for a history timestamp *column* as epoch microseconds.
+
+    Integers (compact storage) pass through. ISO text is converted:
+    ``strftime('%s')`` gives whole seconds, and the fraction is read off
+    the text, padded so that 0 to 6 digits (or none) all parse.
+    """
+    return (
+        f"CASE WHEN typeof({column}) = 'text' "
+        f"THEN CAST(strftime('%s', {column}) AS INTEGER) * 1000000 "
+        f"+ CAST(substr({column} || '000000', 21, 6) AS INTEGER) "
+        f"ELSE {column} END"
+    )
+
+
+# Recompute the history rollups for days in [:since, :until) (ISO dates)
+# from history_visits; see recompute_history_rollups().
+_HISTORY_ROLLUP_REBUILD = (
+    text("DELETE FROM history_url_daily WHERE day >= :since AND day < :until"),
+    text("DELETE FROM history_daily WHERE day >= :since AND day < :until"),
+    text(
+        f"""
+        INSERT INTO history_url_daily (url_id, day, visits, total_duration_ms)
+        SELECT url_id, {visit_day_sql("visited_at")}, COUNT(*),
+               COALESCE(SUM(duration_ms), 0)
+        FROM history_visits
+        WHERE visited_at >= :since_at AND visited_at < :until_at
+        GROUP BY url_id, {visit_day_sql("visited_at")}
+        """
+    ).bindparams(
+        bindparam("since_at", type_=HistoryTimestamp),
+        bindparam("until_at", type_=HistoryTimestamp),
+    ),
+    text(
+        """
+        INSERT INTO history_daily
+            (domain, day, visits, distinct_urls, total_duration_ms)
+        SELECT u.domain, d.day, SUM(d.visits), COUNT(*), SUM(d.total_duration_ms)
+        FROM history_url_daily AS d
+        JOIN history_urls AS u ON u.id = d.url_id
+        WHERE d.day >= :since AND d.day < :until
+        GROUP BY u.domain, d.day
+        """
+    ),
+)
+
+
+def recompute_history_rollups(
+    conn, since: Optional[date] = None, until: Optional[date] = None
+) -> None:
+    """Rebuild ``history_url_daily`` / ``history_daily`` for [*since*, *until*).
+
+    Open bounds cover every day. Shared by the domain backfill step,
+    :meth:`~bookmark_memex.db.Database.rebuild_history_rollups` and
+    :meth:`~bookmark_memex.db.Database.prune_history`; the visit range
+    is bound through :class:`~bookmark_memex.models.HistoryTimestamp`
+    so it matches whichever storage the database uses.
+    """
+    since = since or date.min
+    until = until or date.max
+    bounds = {
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "since_at": datetime.combine(since, time.min),
+        "until_at": datetime.combine(until, time.min),
+    }
+    for statement in _HISTORY_ROLLUP_REBUILD:
+        conn.execute(statement, bounds)
+
+
+# Regroup the visits in [:since_at, :until_at] into browsing sessions:
+# a visit more than :gap_us after the previous one starts a new session
+# (gaps and islands over the visited_at index).
+_SESSIONS_REBUILD = text(
+    f"""
+    INSERT INTO browsing_sessions
+        (started_at, ended_at, visit_count, url_count, total_duration_ms)
+    SELECT MIN(visited_at), MAX(visited_at), COUNT(*), COUNT(DISTINCT url_id),
+           COALESCE(SUM(duration_ms), 0)
+    FROM (
+        SELECT visited_at, url_id, duration_ms,
+               SUM(is_start) OVER (
+                   ORDER BY visited_at ROWS UNBOUNDED PRECEDING
+               ) AS session
+        FROM (
+            SELECT visited_at, url_id, duration_ms,
+                   COALESCE(
+                       {epoch_us_sql("visited_at")}
+                       - LAG({epoch_us_sql("visited_at")})
+                             OVER (ORDER BY visited_at) > :gap_us,
+                       1
+                   ) AS is_start
+            FROM history_visits
+            WHERE visited_at >= :since_at AND visited_at <= :until_at
+        )
+    )
+    GROUP BY session
+    """
+).bindparams(
+    bindparam("since_at", type_=HistoryTimestamp),
+    bindparam("until_at", type_=HistoryTimestamp),
+)
+
+
+# URLs visited in [:since_at, :until_at] but not in [:tail_start, :tail_end].
+_SESSION_NEW_URLS = text(
+    """
+    SELECT COUNT(DISTINCT v.url_id) FROM history_visits AS v
+    WHERE v.visited_at >= :since_at AND v.visited_at <= :until_at
+      AND NOT EXISTS (
+          SELECT 1 FROM history_visits AS o
+          WHERE o.url_id = v.url_id
+            AND o.visited_at >= :tail_start AND o.visited_at <= :tail_end
+      )
+    """
+).bindparams(
+    *(bindparam(name, type_=HistoryTimestamp)
+      for name in ("since_at", "until_at", "tail_start", "tail_end"))
+)
+
+
+def recompute_browsing_sessions(
+    conn, since: Optional[datetime] = None, until: Optional[datetime] = None
+) -> None:
+    """Regroup ``browsing_sessions`` around the visits in [*since*, *until*].
+
+    Any session within :data:`~bookmark_memex.models.SESSION_IDLE_GAP`
+    of the range may merge with (or split around) its visits, so those
+    are deleted and the range widened to cover them before regrouping.
+    Sessions outside it are untouched: each starts and ends more than a
+    gap away from its neighbours. Open bounds regroup everything.
+    """
+    gap = SESSION_IDLE_GAP
+    since = since or datetime.min + gap
+    until = until or datetime.max - gap
+    # Sessions are disjoint, so only the last one starting before the
+    # range can reach into it: bound the started_at range scan there
+    # rather than filtering on ended_at across every later session.
+    floor = conn.execute(
+        select(func.max(BrowsingSession.started_at))
+        .where(BrowsingSession.started_at <= since - gap)
+    ).scalar()
+    near = (
+        BrowsingSession.started_at.between(floor or since - gap, until + gap)
+        & (BrowsingSession.ended_at >= since - gap)
+    )
+    first, last = conn.execute(
+        select(func.min(BrowsingSession.started_at),
+               func.max(BrowsingSession.ended_at)).where(near)
+    ).one()
+    conn.execute(delete(BrowsingSession).where(near))
+    conn.execute(
+        _SESSIONS_REBUILD,
+        {
+            "since_at": min(since, first) if first else since,
+            "until_at": max(until, last) if last else until,
+            "gap_us": gap // timedelta(microseconds=1),
+        },
+    )
+
+
+def extend_browsing_sessions(conn, since: datetime, until: datetime) -> None:
+    """Group visits in [*since*, *until*] that all follow the last session.
+
+    The append-only case of :func:`recompute_browsing_sessions`, which
+    is what ingesting in time order hits for every chunk (or, from the
+    arkiv importer, every visit): only the new visits are read. The
+    first new session is folded into the previous tail session if it
+    starts within a gap of it, with the tail's existing visits only
+    probed per new URL on ``ix_history_visits_url_visited`` to keep
+    ``url_count`` distinct. The caller guarantees *since* is after the
+    last session's ``ended_at``.
+    """
+    gap = SESSION_IDLE_GAP
+    tail = conn.execute(
+        select(BrowsingSession.id, BrowsingSession.started_at,
+               BrowsingSession.ended_at)
+        .order_by(BrowsingSession.started_at.desc())
+        .limit(1)
+    ).first()
+    conn.execute(
+        _SESSIONS_REBUILD,
+        {"since_at": since, "until_at": until,
+         "gap_us": gap // timedelta(microseconds=1)},
+    )
+    if tail is None or since - tail.ended_at > gap:
+        return
+    head = conn.execute(
+        select(BrowsingSession).where(BrowsingSession.started_at == since)
+    ).one()
+    new_urls = conn.execute(
+        _SESSION_NEW_URLS,
+        {"since_at": since, "until_at": head.ended_at,
+         "tail_start": tail.started_at, "tail_end": tail.ended_at},
+    ).scalar()
+    conn.execute(delete(BrowsingSession).where(BrowsingSession.id == head.id))
+    conn.execute(
+        BrowsingSession.__table__.update()
+        .where(BrowsingSession.id == tail.id)
+        .values(
+            ended_at=head.ended_at,
+            visit_count=BrowsingSession.visit_count + head.visit_count,
+            url_count=BrowsingSession.url_count + new_urls,
+            total_duration_ms=(
+                BrowsingSession.total_duration_ms + head.total_duration_ms
+            ),
+        )
+    )
+
+
+def _apply_visit_graph(engine: Engine) -> None:
+    """Index ``history_visits.from_visit_id`` and add ``browsing_sessions``.
+
+    The index serves referrer-tree walks and the ``ON DELETE SET NULL``
+    lookup, which otherwise scans every visit per deleted row. The
+    sessions are then grouped from the stored visits in one pass.
+    """
+    table = Base.metadata.tables["history_visits"]
+    index = next(
+        ix for ix in table.indexes if ix.name == "ix_history_visits_from_visit"
+    )
+    index.create(engine, checkfirst=True)
+    BrowsingSession.__table__.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        recompute_browsing_sessions(conn)
+
+
+def _create_history_rollups(engine: Engine) -> None:
+    """Create the domain x day history rollups.
+
+    They are keyed on ``history_urls.domain``, so the backfill waits for
+    :func:`_apply_domain_columns`, which rebuilds them once that column
+    is filled.
+    """
+    HistoryUrlDaily.__table__.create(engine, checkfirst=True)
+    HistoryDaily.__table__.create(engine, checkfirst=True)
+
+
+# Rows per UPDATE batch when backfilling a derived column in Python.
+_BACKFILL_BATCH = 5_000
+
+
+def _backfill_batches(conn, query: str, key: str = "id") -> Iterator[list]:
+    """Rows of *query* in pages of :data:`_BACKFILL_BATCH`, by rowid *key*.
+
+    *query* selects *key* first and filters on ``key > :last``; each
+    page is a fresh keyset query on the rowid, so only one page is held
+    in memory however large the table.
+    """
+    page = text(f"{query} ORDER BY {key} LIMIT :limit")
+    last = -(2 ** 63)
+    while True:
+        rows = conn.execute(
+            page, {"last": last, "limit": _BACKFILL_BATCH}
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+
+
+def _apply_domain_columns(engine: Engine) -> None:
+    """Add and fill the indexed ``domain`` column on bookmarks and history URLs.
+
+    The value comes from :func:`~bookmark_memex.models.url_domain`, so
+    the backfill pages through ``(id, url)`` pairs and writes them back
+    a page at a time. The history rollups are then rebuilt, as their
+    keys are these domains.
+    """
+    with engine.begin() as conn:
+        for table in ("bookmarks", "history_urls"):
+            cols = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+            if "domain" not in cols:
+                conn.execute(text(
+                    f"ALTER TABLE {table} "
+                    "ADD COLUMN domain VARCHAR(255) NOT NULL DEFAULT ''"
+                ))
+            update = text(f"UPDATE {table} SET domain = :domain WHERE id = :id")
+            for rows in _backfill_batches(
+                conn,
+                f"SELECT id, url FROM {table} WHERE domain = '' AND id > :last",
+            ):
+                conn.execute(update, [
+                    {"id": row_id, "domain": url_domain(url)}
+                    for row_id, url in rows
+                ])
+        recompute_history_rollups(conn)
+    for table, index_name in (
+        ("bookmarks", "ix_bookmarks_domain"),
+        ("history_urls", "ix_history_urls_domain"),
+    ):
+        table_obj = Base.metadata.tables[table]
+        index = next(ix for ix in table_obj.indexes if ix.name == index_name)
+        index.create(engine, checkfirst=True)
+
+
+def _apply_visit_keys(engine: Engine) -> None:
+    """Key history visits on a 64-bit hash of their dedup tuple.
+
+    ``visit_key`` (see :func:`~bookmark_memex.models.generate_visit_key`)
+    is filled from each visit's URL, time and source and takes over
+    from both the random 32-character ``unique_id`` and the four-column
+    ``uq_history_visits_dedup``; ``unique_id`` comes back as a virtual
+    column, the key in hex. Existing visits therefore change ``unique_id``
+    once. A plain ``(url_id, visited_at)`` index keeps per-URL lookups
+    and the ``ON DELETE CASCADE`` probe indexed.
+    """
+    with engine.begin() as conn:
+        cols = {
+            row[1]
+            for row in conn.exec_driver_sql("PRAGMA table_info(history_visits)")
+        }
+        if "visit_key" not in cols:
+            conn.exec_driver_sql("DROP INDEX IF EXISTS ix_history_visits_unique_id")
+            conn.exec_driver_sql("ALTER TABLE history_visits DROP COLUMN unique_id")
+            conn.exec_driver_sql(
+                "ALTER TABLE history_visits "
+                "ADD COLUMN visit_key INTEGER NOT NULL DEFAULT 0"
+            )
+            update = text("UPDATE history_visits SET visit_key = :key WHERE id = :id")
+            for rows in _backfill_batches(
+                conn,
+                f"SELECT v.id, u.unique_id, {epoch_us_sql('v.visited_at')}, "
+                "v.source_type, v.source_name "
+                "FROM history_visits AS v JOIN history_urls AS u ON u.id = v.url_id "
+                "WHERE v.id > :last",
+                key="v.id",
+            ):
+                conn.execute(update, [
+                    {"id": row_id, "key": generate_visit_key(
+                        url_uid, from_epoch_us(at_us), source_type, source_name
+                    )}
+                    for row_id, url_uid, at_us, source_type, source_name in rows
+                ])
+            conn.exec_driver_sql(
+                "ALTER TABLE history_visits ADD COLUMN unique_id TEXT "
+                "GENERATED ALWAYS AS (printf('%016x', visit_key)) VIRTUAL"
+            )
+        conn.exec_driver_sql("DROP INDEX IF EXISTS uq_history_visits_dedup")
+    table = Base.metadata.tables["history_visits"]
+    for index in table.indexes:
+        if index.name in ("uq_history_visits_key", "ix_history_visits_url_visited"):
+            index.create(engine, checkfirst=True)
+
+
+def _record_timestamp_storage(engine: Engine) -> None:
+    """Record in ``store_settings`` how history timestamps are stored.
+
+    Read from the declared type of ``history_visits.visited_at``, as
+    files converted by :func:`compact_history_timestamps` before the
+    setting existed have no row. Kept if already present.
+    """
+    storage = "epoch" if history_timestamps_are_epoch(engine) else "iso"
+    with engine.begin() as conn:
+        conn.execute(
+            insert(StoreSetting).prefix_with("OR IGNORE"),
+            {"key": HISTORY_TIMESTAMPS, "value": storage},
+        )
+
+
+def _gate_visit_insert_trigger(engine: Engine) -> None:
+    """Create ``store_settings`` and re-create the visit insert trigger.
+
+    The trigger now stands aside while the ``defer_visit_aggregates``
+    row exists, so bulk ingest no longer drops and re-creates it per
+    chunk; each of those schema changes invalidated every other
+    connection's prepared statements.
+    """
+    StoreSetting.__table__.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TRIGGER IF EXISTS trg_history_visits_insert")
+        conn.exec_driver_sql(HISTORY_VISITS_INSERT_TRIGGER)
+
+
+def _gate_visit_delete_trigger(engine: Engine) -> None:
+    """Re-create the visit delete trigger behind the same gate.
+
+    History prune held it off by dropping and re-creating it in every
+    chunk, with the same cost to other connections as the insert
+    trigger had.
+    """
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TRIGGER IF EXISTS trg_history_visits_delete")
+        conn.exec_driver_sql(HISTORY_VISITS_DELETE_TRIGGER)
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Migration:
+    """One step in the schema history."""
+
+    version: int
+    description: str
+    apply: Callable[[Engine], None]
+
+
+MIGRATIONS: tuple[Migration, ...] = (
+    # Runs before create_all so the ORM doesn't try to create a new
+    # marginalia table alongside the still-present legacy annotations.
+    Migration(1, "rename annotations to marginalia",
+              _apply_rename_annotations_to_marginalia),
+    Migration(2, "create tables from ORM metadata", _create_tables),
+    Migration(3, "add history FK columns to marginalia",
+              _apply_add_marginalia_history_cols),
+    Migration(4, "install history_urls aggregate triggers",
+              _install_history_triggers),
+    Migration(5, "content-addressed content_blobs", _apply_content_blobs),
+    Migration(6, "partial indexes for active rows", _apply_active_indexes),
+    Migration(7, "drop history_visits indexes shadowed by the dedup key",
+              _drop_shadowed_visit_indexes),
+    Migration(8, "import_checkpoints for resumable history imports",
+              _create_import_checkpoints),
+    Migration(9, "import_watermarks for incremental history imports",
+              _create_import_watermarks),
+    Migration(10, "history_visits.source_visit_id for referrer resolution",
+              _apply_source_visit_ids),
+    Migration(11, "history_daily / history_url_daily rollups",
+              _create_history_rollups),
+    Migration(12, "stored domain column on bookmarks and history_urls",
+              _apply_domain_columns),
+    Migration(13, "from_visit_id index and browsing_sessions",
+              _apply_visit_graph),
+    Migration(14, "history_visits.visit_key replaces the random unique_id",
+              _apply_visit_keys),
+    Migration(15, "store_settings and a gated visit insert trigger",
+              _gate_visit_insert_trigger),
+    Migration(16, "record history timestamp storage in store_settings",
+              _record_timestamp_storage),
+    Migration(17, "gate the visit delete trigger on store_settings",
+              _gate_visit_delete_trigger),
+)
+
+SCHEMA_VERSION: int = MIGRATIONS[-1].version
+
+
+def current_version(engine: Engine) -> int:
+    """Return the highest applied migration, or 0 if none is recorded.
+
+    ``MAX`` over the integer primary key is answered from the b-tree in
+    a single seek. A missing ``schema_version`` table (fresh file, or a
+    database older than the table) reads as 0.
+    """
+    try:
+        with engine.connect() as conn:
+            version = conn.execute(
+                text("SELECT MAX(version) FROM schema_version")
+            ).scalar()
+    except OperationalError:
+        return 0
+    return int(version or 0)
+
+
+def schema_state(engine: Engine) -> tuple[int, bool]:
+    """Return the schema version and whether history timestamps are epoch.
+
+    Both come from one statement: ``MAX(version)`` from ``schema_version``
+    and the ``history_timestamps`` row of ``store_settings``. Files that
+    predate either (and so are about to be migrated) fall back to
+    :func:`current_version` and :func:`history_timestamps_are_epoch`.
+    """
+    try:
+        with engine.connect() as conn:
+            version, storage = conn.execute(
+                text(
+                    "SELECT (SELECT MAX(version) FROM schema_version), "
+                    "(SELECT value FROM store_settings WHERE key = :key)"
+                ),
+                {"key": HISTORY_TIMESTAMPS},
+            ).one()
+    except OperationalError:
+        return current_version(engine), history_timestamps_are_epoch(engine)
+    if storage is None:
+        return int(version or 0), history_timestamps_are_epoch(engine)
+    return int(version or 0), storage == "epoch"
+
+
+def run_migrations(engine: Engine, from_version: int = 0) -> int:
+    """Apply every step newer than *from_version* and record it.
+
+    Versions are recorded once all steps have run: the early steps
+    predate ``schema_version`` itself on a fresh file. Returns the
+    resulting schema version.
+    """
+    pending = [m for m in MIGRATIONS if m.version > from_version]
+    for migration in pending:
+        migration.apply(engine)
+    if pending:
+        now = _utcnow()
+        with engine.begin() as conn:
+            conn.execute(
+                insert(SchemaVersion).prefix_with("OR IGNORE"),
+                [
+                    {
+                        "version": m.version,
+                        "applied_at": now,
+                        "description": m.description,
+                    }
+                    for m in pending
+                ],
+            )
+    return max(from_version, SCHEMA_VERSION)
+
+
+# ---------------------------------------------------------------------------
+# Opt-in conversions
+# ---------------------------------------------------------------------------
+
+# store_settings key holding the history timestamp storage, "iso" or
+# "epoch"; written by compact_history_timestamps().
+HISTORY_TIMESTAMPS = "history_timestamps"
+
+# Columns compact_history_timestamps() turns into integer microseconds.
+# history_urls' first/last_visited are copied from visited_at by the
+# aggregate triggers, and session bounds from visits, so they have to
+# share its storage.
+_HISTORY_TIMESTAMP_COLUMNS: dict[str, tuple[str, ...]] = {
+    "history_urls": ("first_visited", "last_visited"),
+    "history_visits": ("visited_at", "imported_at", "archived_at"),
+    "browsing_sessions": ("started_at", "ended_at"),
+}
+
+
+def history_timestamps_are_epoch(engine: Engine) -> bool:
+    """True when ``history_visits.visited_at`` is declared ``INTEGER``.
+
+    That declaration is what :func:`compact_history_timestamps` leaves
+    behind, and it is visible to anyone reading the schema. A missing
+    table (fresh file) reads as False.
+    """
+    with engine.connect() as conn:
+        for row in conn.exec_driver_sql("PRAGMA table_info(history_visits)"):
+            if row[1] == "visited_at":
+                return row[2].upper() == "INTEGER"
+    return False
+
+
+def compact_history_timestamps(engine: Engine) -> bool:
+    """Store history timestamps as integer microseconds since the epoch.
+
+    An opt-in conversion, not a numbered step: ISO text costs ~26 bytes
+    per timestamp, repeated in every index that holds ``visited_at``,
+    where an integer takes at most 8 and compares without collation.
+    ``history_visits`` and ``history_urls`` are rebuilt the usual SQLite
+    way (copy into a new table with the columns redeclared ``INTEGER``,
+    drop, rename) with their indexes and triggers recreated from
+    ``sqlite_master``, all in one transaction with foreign keys off,
+    which also records the new storage in ``store_settings``. The
+    freed pages go to the freelist.
+
+    The caller must flag the engine with
+    :func:`~bookmark_memex.models.use_epoch_timestamps` afterwards.
+    Returns False if the tables were already converted.
+    """
+    if history_timestamps_are_epoch(engine):
+        return False
+    tables = tuple(_HISTORY_TIMESTAMP_COLUMNS)
+    marks = ", ".join("?" * len(tables))
+    with engine.connect() as conn:
+        raw = conn.connection.dbapi_connection
+        # Dropping a table with foreign keys on deletes its rows first,
+        # cascading into every table that references it.
+        raw.execute("PRAGMA foreign_keys=OFF")
+        try:
+            with conn.begin():
+                dependents = conn.exec_driver_sql(
+                    "SELECT type, name, sql FROM sqlite_master "
+                    f"WHERE tbl_name IN ({marks}) "
+                    "AND type IN ('index', 'trigger') AND sql IS NOT NULL "
+                    "ORDER BY type",
+                    tables,
+                ).all()
+                for kind, name, _ in dependents:
+                    if kind == "trigger":
+                        conn.exec_driver_sql(f"DROP TRIGGER {name}")
+                for table, columns in _HISTORY_TIMESTAMP_COLUMNS.items():
+                    _rebuild_with_epoch_columns(conn, table, columns)
+                for _, _, sql in dependents:
+                    conn.exec_driver_sql(sql)
+                conn.execute(
+                    insert(StoreSetting).prefix_with("OR REPLACE"),
+                    {"key": HISTORY_TIMESTAMPS, "value": "epoch"},
+                )
+                problems = conn.exec_driver_sql("PRAGMA foreign_key_check").all()
+                if problems:
+                    raise RuntimeError(
+                        f"foreign key check failed after rebuild: {problems[:5]}"
+                    )
+        finally:
+            raw.execute("PRAGMA foreign_keys=ON")
+    return True
+
+
+def _rebuild_with_epoch_columns(conn, table: str, columns: tuple[str, ...]) -> None:
+    """Recreate *table* with *columns* declared ``INTEGER`` and converted."""
+    ddl = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (table,),
+    ).scalar_one()
+    scratch = f"{table}__compact"
+    ddl = re.sub(
+        rf"^CREATE TABLE \"?{table}\"?", f"CREATE TABLE {scratch}", ddl.strip()
+    )
+    for column in columns:
+        ddl = re.sub(
+            rf"(\b{column}\s+)DATETIME\b", r"\1INTEGER", ddl, flags=re.IGNORECASE
+        )
+    conn.exec_driver_sql(ddl)
+    names = [row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")]
+    select_list = ", ".join(
+        epoch_us_sql(name) if name in columns else name for name in names
+    )
+    conn.exec_driver_sql(
+        f"INSERT INTO {scratch} ({', '.join(names)}) "
+        f"SELECT {select_list} FROM {table}"
+    )
+    conn.exec_driver_sql(f"DROP TABLE {table}")
+    conn.exec_driver_sql(f"ALTER TABLE {scratch} RENAME TO {table}")
@@ -4,19 +4,38 @@ Uses SQLAlchemy 2.0 declarative style (Mapped / mapped_column).
 
 Key design decisions:
 - Soft delete on Bookmark, ContentCache, and Marginalia via ``archived_at``.
+- Cached page bodies are content-addressed in ``content_blobs`` and
+  shared between ContentCache rows with trigger-maintained refcounts.
 - Marginalia.bookmark_id uses ON DELETE SET NULL so marginalia survive
   bookmark deletion (orphan survival).
 - bookmark_tags junction cascades DELETE on both FK sides.
 - Bookmark.tags loaded with ``lazy="selectin"`` for efficient retrieval.
+- Hot read paths filter ``archived_at IS NULL``; they are backed by
+  partial indexes (``ix_*_active_*``) that only hold live rows.
+- ``domain`` on Bookmark and HistoryUrl is stored (see :func:`url_domain`)
+  and indexed with ``archived_at``, so per-site filters are index lookups.
+- A visit's identity is a 64-bit hash of its dedup tuple
+  (:func:`generate_visit_key`); its public ``unique_id`` is that key in
+  hex, computed by SQLite rather than stored.
+- History timestamps (:class:`HistoryTimestamp`) are ISO text by default,
+  or integer microseconds in a database converted with
+  ``db compact-timestamps``; either way the ORM sees naive UTC datetimes.
+- Heavy payload columns (favicon bytes, cached page content, raw import
+  data) are deferred: loading a row does not read them. Opt in with
+  :meth:`bookmark_memex.db.Database.get` ``load=`` or the usual
+  ``undefer`` loader options.
 """
 from __future__ import annotations
 
-from datetime import datetime, timezone
+import hashlib
+import re
+from datetime import date, datetime, timedelta, timezone
 from typing import List, Optional
-from urllib.parse import urlparse
+from urllib.parse import urlsplit
 
 from sqlalchemy import (
     Boolean,
+    Date,
     DateTime,
     ForeignKey,
     Index,
@@ -27,7 +46,11 @@ from sqlalchemy import (
     Table,
     Text,
     Column,
+    Computed,
+    TypeDecorator,
+    event,
 )
+from sqlalchemy import text as sql_text
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import (
     DeclarativeBase,
@@ -35,6 +58,7 @@ from sqlalchemy.orm import (
     mapped_column,
     relationship,
 )
+from sqlalchemy.types import UserDefinedType
 
 from bookmark_memex.uri import (
     build_bookmark_uri,
@@ -49,6 +73,134 @@ def _utcnow() -> datetime:
     return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
+def url_domain(url: str) -> str:
+    """Return the ``domain`` key stored for *url*.
+
+    The lowercase host with any port, credentials and a leading ``www.``
+    dropped, so ``https://WWW.Example.com:8443/x`` and
+    ``http://example.com/`` share ``example.com``. A bare host
+    (``www.example.com``) is accepted too, which lets callers normalise
+    user input the same way.
+    """
+    if "://" not in url:
+        url = "//" + url
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def _domain_default(context) -> str:
+    """Column default: derive ``domain`` from the row's ``url``."""
+    return url_domain(context.get_current_parameters()["url"])
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Set on an engine's dialect when its history tables store integer
+# microseconds (see use_epoch_timestamps()).
+_EPOCH_FLAG = "bm_epoch_history_timestamps"
+
+
+def to_epoch_us(value: datetime) -> int:
+    """Microseconds since 1970-01-01 for a naive UTC datetime.
+
+    Any tzinfo is dropped unconverted, as SQLite's text storage does.
+    """
+    value = value.replace(tzinfo=None)
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def from_epoch_us(value: int) -> datetime:
+    """Inverse of :func:`to_epoch_us`, as a naive UTC datetime."""
+    return _EPOCH + timedelta(microseconds=value)
+
+
+_U64 = (1 << 64) - 1
+_VISIT_UNIQUE_ID = re.compile(r"[0-9a-f]{16}")
+
+
+def generate_visit_key(
+    url_unique_id: str,
+    visited_at: datetime,
+    source_type: str,
+    source_name: str,
+) -> int:
+    """Return the dedup key of a visit: a signed 64-bit integer.
+
+    The first 8 bytes of sha256 over the visit's identity, with the
+    time as epoch microseconds so text and integer storage agree. The
+    same visit gets the same key in every database, which is what lets
+    imports dedup on it and arkiv bundles keep their identifiers.
+    """
+    ident = "\x1f".join(
+        (url_unique_id, str(to_epoch_us(visited_at)), source_type, source_name)
+    )
+    digest = hashlib.sha256(ident.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+def visit_key_to_unique_id(key: int) -> str:
+    """The 16-hex-character ``unique_id`` of visit *key*."""
+    return f"{key & _U64:016x}"
+
+
+def visit_key_from_unique_id(unique_id: str) -> Optional[int]:
+    """Inverse of :func:`visit_key_to_unique_id`; None if *unique_id* is
+    not one (e.g. a UUID from an older bundle)."""
+    if not _VISIT_UNIQUE_ID.fullmatch(unique_id):
+        return None
+    return int.from_bytes(bytes.fromhex(unique_id), "big", signed=True)
+
+
+def use_epoch_timestamps(dialect, enabled: bool) -> None:
+    """Switch :class:`HistoryTimestamp` columns on *dialect*'s engine to
+    integer-microsecond storage (or back to ISO text)."""
+    setattr(dialect, _EPOCH_FLAG, enabled)
+
+
+class _TimestampStorage(UserDefinedType):
+    """Untranslated ``DATETIME`` column; :class:`HistoryTimestamp` does the
+    conversion in both directions."""
+
+    cache_ok = True
+
+    def get_col_spec(self, **kw) -> str:
+        return "DATETIME"
+
+
+class HistoryTimestamp(TypeDecorator):
+    """Naive UTC datetime stored as ISO text or as integer microseconds.
+
+    Text is what :class:`~sqlalchemy.types.DateTime` writes on SQLite
+    (``2026-04-20 09:00:00.000000``) and remains the default. A database
+    whose history tables were converted by
+    :func:`bookmark_memex.migrations.compact_history_timestamps` stores
+    8-byte integers instead, which every index on ``visited_at`` repeats;
+    :class:`bookmark_memex.db.Database` detects that and flags its
+    engine with :func:`use_epoch_timestamps`. Reads accept either form.
+    """
+
+    impl = _TimestampStorage
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if getattr(dialect, _EPOCH_FLAG, False):
+            return to_epoch_us(value)
+        return value.replace(tzinfo=None).isoformat(" ", "microseconds")
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, datetime):
+            return value
+        if isinstance(value, int):
+            return from_epoch_us(value)
+        return datetime.fromisoformat(value)
+
+    @property
+    def python_type(self) -> type:
+        return datetime
+
+
 # ---------------------------------------------------------------------------
 # Declarative base
 # ---------------------------------------------------------------------------
@@ -77,7 +229,8 @@ bookmark_tags = Table(
         ForeignKey("tags.id", ondelete="CASCADE"),
         primary_key=True,
     ),
-    Index("ix_bookmark_tags_tag_id", "tag_id"),
+    # Covers tag -> bookmarks lookups without touching the base table.
+    Index("ix_bookmark_tags_tag_bookmark", "tag_id", "bookmark_id"),
 )
 
 
@@ -98,6 +251,9 @@ class Bookmark(Base):
     url: Mapped[str] = mapped_column(
         String(2048), unique=True, nullable=False, index=True
     )
+    domain: Mapped[str] = mapped_column(
+        String(255), nullable=False, default=_domain_default
+    )
     title: Mapped[str] = mapped_column(String(512), nullable=False)
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     bookmark_type: Mapped[str] = mapped_column(
@@ -116,15 +272,15 @@ class Bookmark(Base):
     last_checked: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     status_code: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
-    favicon_data: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    favicon_data: Mapped[Optional[bytes]] = mapped_column(
+        LargeBinary, nullable=True, deferred=True
+    )
     favicon_mime_type: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
 
     media: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
     extra_data: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
 
-    archived_at: Mapped[Optional[datetime]] = mapped_column(
-        DateTime, nullable=True, index=True
-    )
+    archived_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
     # Relationships
     tags: Mapped[List["Tag"]] = relationship(
@@ -154,6 +310,13 @@ class Bookmark(Base):
 
     __table_args__ = (
         Index("ix_bookmarks_added_desc", "added"),
+        Index(
+            "ix_bookmarks_active_added",
+            "added",
+            "id",
+            sqlite_where=sql_text("archived_at IS NULL"),
+        ),
+        Index("ix_bookmarks_domain", "domain", "archived_at", "added"),
     )
 
     # ------------------------------------------------------------------
@@ -164,10 +327,6 @@ class Bookmark(Base):
     def uri(self) -> str:
         return build_bookmark_uri(self.unique_id)
 
-    @hybrid_property
-    def domain(self) -> str:
-        return urlparse(self.url).netloc
-
     @hybrid_property
     def tag_names(self) -> List[str]:
         return [t.name for t in self.tags]
@@ -241,7 +400,9 @@ class BookmarkSource(Base):
     imported_at: Mapped[datetime] = mapped_column(
         DateTime, nullable=False, default=_utcnow
     )
-    raw_data: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    raw_data: Mapped[Optional[dict]] = mapped_column(
+        JSON, nullable=True, deferred=True
+    )
 
     bookmark: Mapped["Bookmark"] = relationship("Bookmark", back_populates="sources")
 
@@ -274,9 +435,20 @@ class ContentCache(Base):
         unique=True,
         nullable=False,
     )
-    html_content: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
-    markdown_content: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
-    extracted_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # Legacy inline payload. New fetches store the zlib'd page in
+    # content_blobs and leave this NULL; see ``compressed_html``.
+    html_content: Mapped[Optional[bytes]] = mapped_column(
+        LargeBinary, nullable=True, deferred=True, deferred_group="content"
+    )
+    blob_hash: Mapped[Optional[str]] = mapped_column(
+        String(64), ForeignKey("content_blobs.hash"), nullable=True, index=True
+    )
+    markdown_content: Mapped[Optional[str]] = mapped_column(
+        Text, nullable=True, deferred=True, deferred_group="content"
+    )
+    extracted_text: Mapped[Optional[str]] = mapped_column(
+        Text, nullable=True, deferred=True, deferred_group="content"
+    )
     content_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
     content_length: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     compressed_size: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -289,6 +461,14 @@ class ContentCache(Base):
     bookmark: Mapped["Bookmark"] = relationship(
         "Bookmark", back_populates="content_cache"
     )
+    blob: Mapped[Optional["ContentBlob"]] = relationship("ContentBlob")
+
+    @property
+    def compressed_html(self) -> Optional[bytes]:
+        """The zlib'd page, from the shared blob or the legacy inline column."""
+        if self.blob_hash is not None:
+            return self.blob.data if self.blob is not None else None
+        return self.html_content
 
     def __repr__(self) -> str:
         return (
@@ -297,6 +477,31 @@ class ContentCache(Base):
         )
 
 
+class ContentBlob(Base):
+    """A cached page payload, stored once per distinct content.
+
+    Keyed by the SHA-256 of the uncompressed page (the same digest as
+    ``ContentCache.content_hash``), so mirrors, tracking-parameter
+    variants and unchanged re-fetches share one row. ``refcount`` counts
+    the ``content_cache`` rows pointing here; it is maintained by SQL
+    triggers, which also delete the blob when the count drops to zero.
+    """
+
+    __tablename__ = "content_blobs"
+
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False, deferred=True)
+    size: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    compressed_size: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    refcount: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=_utcnow
+    )
+
+    def __repr__(self) -> str:
+        return f"<ContentBlob hash={self.hash!r} refcount={self.refcount!r}>"
+
+
 # ---------------------------------------------------------------------------
 # Marginalia
 # ---------------------------------------------------------------------------
@@ -366,6 +571,15 @@ class Marginalia(Base):
         foreign_keys=[history_visit_id],
     )
 
+    __table_args__ = (
+        Index(
+            "ix_marginalia_active_bookmark_created",
+            "bookmark_id",
+            "created_at",
+            sqlite_where=sql_text("archived_at IS NULL"),
+        ),
+    )
+
     @hybrid_property
     def uri(self) -> str:
         return build_marginalia_uri(self.id)
@@ -404,13 +618,16 @@ class HistoryUrl(Base):
     url: Mapped[str] = mapped_column(
         String(2048), unique=True, nullable=False, index=True
     )
+    domain: Mapped[str] = mapped_column(
+        String(255), nullable=False, default=_domain_default
+    )
     title: Mapped[Optional[str]] = mapped_column(String(512), nullable=True)
 
     first_visited: Mapped[Optional[datetime]] = mapped_column(
-        DateTime, nullable=True, index=True
+        HistoryTimestamp, nullable=True, index=True
     )
     last_visited: Mapped[Optional[datetime]] = mapped_column(
-        DateTime, nullable=True, index=True
+        HistoryTimestamp, nullable=True, index=True
     )
     visit_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     typed_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -436,16 +653,13 @@ class HistoryUrl(Base):
 
     __table_args__ = (
         Index("ix_history_urls_visit_count_desc", "visit_count"),
+        Index("ix_history_urls_domain", "domain", "archived_at", "last_visited"),
     )
 
     @hybrid_property
     def uri(self) -> str:
         return build_history_url_uri(self.unique_id)
 
-    @hybrid_property
-    def domain(self) -> str:
-        return urlparse(self.url).netloc
-
     def __repr__(self) -> str:
         return (
             f"<HistoryUrl id={self.id!r} visit_count={self.visit_count!r}"
@@ -456,30 +670,40 @@ class HistoryUrl(Base):
 class HistoryVisit(Base):
     """A single visit event in browser history.
 
-    Dedup contract: ``UNIQUE(url_id, visited_at, source_type, source_name)``.
-    Re-importing the same browser profile is idempotent via
-    ``INSERT OR IGNORE`` on this tuple.
+    Dedup contract: one row per ``(url, visited_at, source_type,
+    source_name)``, enforced by ``UNIQUE(visit_key)``, the tuple's
+    :func:`generate_visit_key` hash. Re-importing the same browser
+    profile is idempotent via ``INSERT OR IGNORE`` on that one integer.
+    ``unique_id`` is the key in hex, a virtual column: look visits up by
+    key (:func:`visit_key_from_unique_id`), not by it.
 
     ``from_visit_id`` preserves the referrer chain. It stays NULL when the
     referrer visit has been pruned from the browser's own DB before the
-    memex capture.
+    memex capture. ``source_visit_id`` is the browser's own id for the
+    visit, which is what its ``from_visit`` references name; it is NULL
+    for visits that did not come from a browser database.
     """
 
     __tablename__ = "history_visits"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    visit_key: Mapped[int] = mapped_column(Integer, nullable=False)
     unique_id: Mapped[str] = mapped_column(
-        Text, unique=True, nullable=False, index=True
+        Text, Computed("printf('%016x', visit_key)", persisted=False)
     )
+    # Lookups by url_id use the leading column of ix_history_visits_url_visited.
     url_id: Mapped[int] = mapped_column(
         Integer,
         ForeignKey("history_urls.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
-    visited_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    visited_at: Mapped[datetime] = mapped_column(
+        HistoryTimestamp, nullable=False, index=True
+    )
     duration_ms: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     transition: Mapped[Optional[str]] = mapped_column(String(16), nullable=True)
+    # Referrer edge. Indexed (non-NULL rows only) for walking a visit's
+    # descendants and for the ON DELETE SET NULL lookup.
     from_visit_id: Mapped[Optional[int]] = mapped_column(
         Integer,
         ForeignKey("history_visits.id", ondelete="SET NULL"),
@@ -487,11 +711,12 @@ class HistoryVisit(Base):
     )
     source_type: Mapped[str] = mapped_column(String(32), nullable=False)
     source_name: Mapped[str] = mapped_column(String(256), nullable=False)
+    source_visit_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     imported_at: Mapped[datetime] = mapped_column(
-        DateTime, nullable=False, default=_utcnow
+        HistoryTimestamp, nullable=False, default=_utcnow
     )
     archived_at: Mapped[Optional[datetime]] = mapped_column(
-        DateTime, nullable=True, index=True
+        HistoryTimestamp, nullable=True
     )
 
     history_url: Mapped["HistoryUrl"] = relationship(
@@ -506,16 +731,31 @@ class HistoryVisit(Base):
     )
 
     __table_args__ = (
+        Index("uq_history_visits_key", "visit_key", unique=True),
+        Index("ix_history_visits_url_visited", "url_id", "visited_at"),
+        # Also serves plain per-source filters, as its prefix.
         Index(
-            "uq_history_visits_dedup",
-            "url_id",
-            "visited_at",
+            "ix_history_visits_source_visit",
             "source_type",
             "source_name",
-            unique=True,
+            "source_visit_id",
+        ),
+        Index(
+            "ix_history_visits_active_url_visited",
+            "url_id",
+            "visited_at",
+            sqlite_where=sql_text("archived_at IS NULL"),
+        ),
+        Index(
+            "ix_history_visits_active_visited",
+            "visited_at",
+            sqlite_where=sql_text("archived_at IS NULL"),
+        ),
+        Index(
+            "ix_history_visits_from_visit",
+            "from_visit_id",
+            sqlite_where=sql_text("from_visit_id IS NOT NULL"),
         ),
-        Index("ix_history_visits_url_id_visited_at", "url_id", "visited_at"),
-        Index("ix_history_visits_source", "source_type", "source_name"),
     )
 
     @hybrid_property
@@ -529,6 +769,163 @@ class HistoryVisit(Base):
         )
 
 
+class HistoryDaily(Base):
+    """Visits per domain per UTC day, for queries that need no visit rows.
+
+    ``domain`` is ``history_urls.domain``. ``distinct_urls`` counts the
+    domain's URLs visited that day, and ``total_duration_ms`` sums the
+    visits' recorded durations. Kept up
+    to date by the ingest paths in :mod:`bookmark_memex.db` as visits
+    arrive and rebuilt by
+    :meth:`~bookmark_memex.db.Database.rebuild_history_rollups`.
+    Deleting visits does not decrement it: like
+    ``history_urls.visit_count`` it records what was observed.
+    """
+
+    __tablename__ = "history_daily"
+
+    domain: Mapped[str] = mapped_column(String(255), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    visits: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    distinct_urls: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total_duration_ms: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0
+    )
+
+    __table_args__ = (
+        Index("ix_history_daily_day", "day"),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<HistoryDaily {self.domain} {self.day} visits={self.visits!r}>"
+        )
+
+
+class HistoryUrlDaily(Base):
+    """Visits per history URL per UTC day; the detail under HistoryDaily.
+
+    Answers "what was I reading on day X" from an index, and tells the
+    ingest path whether a visit is a URL's first of the day (and so adds
+    to ``history_daily.distinct_urls``).
+    """
+
+    __tablename__ = "history_url_daily"
+
+    url_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("history_urls.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    visits: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total_duration_ms: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0
+    )
+
+    __table_args__ = (
+        Index("ix_history_url_daily_day", "day"),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<HistoryUrlDaily url_id={self.url_id!r} {self.day}"
+            f" visits={self.visits!r}>"
+        )
+
+
+# Idle time that ends a browsing session.
+SESSION_IDLE_GAP = timedelta(minutes=30)
+
+
+class BrowsingSession(Base):
+    """A run of visits with no gap longer than :data:`SESSION_IDLE_GAP`.
+
+    Sessions span every browser source, as one person's activity, and
+    count archived visits too. A session's visits are those with
+    ``visited_at`` in [``started_at``, ``ended_at``], an index range on
+    ``history_visits``. The ingest paths in :mod:`bookmark_memex.db`
+    regroup the sessions around newly arrived visits, so merged
+    sessions get new ids. Hard-deleting visits other than through
+    :meth:`~bookmark_memex.db.Database.prune_history` needs
+    :meth:`~bookmark_memex.db.Database.rebuild_browsing_sessions`.
+    """
+
+    __tablename__ = "browsing_sessions"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    started_at: Mapped[datetime] = mapped_column(
+        HistoryTimestamp, nullable=False, unique=True, index=True
+    )
+    ended_at: Mapped[datetime] = mapped_column(
+        HistoryTimestamp, nullable=False, index=True
+    )
+    visit_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    url_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    total_duration_ms: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<BrowsingSession id={self.id!r} started_at={self.started_at!r}"
+            f" visit_count={self.visit_count!r}>"
+        )
+
+
+class ImportCheckpoint(Base):
+    """Resume point of a streaming history import, one row per source.
+
+    Written in the same transaction as each committed chunk, so
+    ``last_visited_at`` is always the newest visit durably ingested.
+    Deleted when the import finishes; a row that survives means the
+    last import for that source was interrupted.
+    """
+
+    __tablename__ = "import_checkpoints"
+
+    source_type: Mapped[str] = mapped_column(String(32), primary_key=True)
+    source_name: Mapped[str] = mapped_column(String(256), primary_key=True)
+    last_visited_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    visits_done: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=_utcnow
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<ImportCheckpoint {self.source_type}:{self.source_name}"
+            f" last_visited_at={self.last_visited_at!r}>"
+        )
+
+
+class ImportWatermark(Base):
+    """Newest source-side visit captured from each history source.
+
+    Advanced when an import completes; the next import of the same
+    source reads only visits past it (see
+    :func:`bookmark_memex.importers.browser_history.import_history`).
+    ``last_visit_id`` is the browser's own visit id, not ours.
+    """
+
+    __tablename__ = "import_watermarks"
+
+    source_type: Mapped[str] = mapped_column(String(32), primary_key=True)
+    source_name: Mapped[str] = mapped_column(String(256), primary_key=True)
+    last_visited_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    last_visit_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=_utcnow
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<ImportWatermark {self.source_type}:{self.source_name}"
+            f" last_visited_at={self.last_visited_at!r}"
+            f" last_visit_id={self.last_visit_id!r}>"
+        )
+
+
 # Backwards-compat alias for callers that still import ``Annotation``.
 # Deprecated; will be removed once the ecosystem has fully migrated.
 Annotation = Marginalia
@@ -565,6 +962,14 @@ class Event(Base):
         )
 
 
+@event.listens_for(Bookmark.url, "set")
+@event.listens_for(HistoryUrl.url, "set")
+def _sync_domain(target, value, oldvalue, initiator) -> None:
+    """Keep ``domain`` in step with ``url`` on ORM objects."""
+    if value is not None:
+        target.domain = url_domain(value)
+
+
 # ---------------------------------------------------------------------------
 # SchemaVersion
 # ---------------------------------------------------------------------------
@@ -583,3 +988,25 @@ class SchemaVersion(Base):
 
     def __repr__(self) -> str:
         return f"<SchemaVersion version={self.version!r}>"
+
+
+# ---------------------------------------------------------------------------
+# StoreSetting
+# ---------------------------------------------------------------------------
+
+
+class StoreSetting(Base):
+    """Key/value flags kept in the database file itself.
+
+    ``defer_visit_aggregates`` is only ever present inside a bulk-ingest
+    transaction: while it exists, ``trg_history_visits_insert`` skips its
+    per-row UPDATE of ``history_urls``.
+    """
+
+    __tablename__ = "store_settings"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    value: Mapped[str] = mapped_column(Text, nullable=False, default="")
+
+    def __repr__(self) -> str:
+        return f"<StoreSetting {self.key}={self.value!r}>"
@@ -0,0 +1,158 @@
+"""Pooled read-only sqlite3 connections.
+
+Search, MCP read tools and ``bookmark-memex sql`` used to open a fresh
+``sqlite3`` connection per call, paying connection setup, schema
+parsing and a cold page cache every time. :func:`get_read_pool` hands
+out a process-wide :class:`ReadPool` per database file whose
+connections are opened ``mode=ro`` with a larger page cache, a memory
+map and a statement cache, and are kept warm between calls.
+
+Writers (the ORM engine, FTS rebuilds) keep their own connections; a
+read-only connection in WAL mode sees every commit made before its
+read transaction starts, so pooled readers never observe stale data.
+"""
+from __future__ import annotations
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+
+_DEFAULT_SIZE = 4
+# Negative cache_size is in KiB: 16 MiB of page cache per connection.
+_CACHE_SIZE_KIB = 16 * 1024
+_MMAP_SIZE = 256 * 1024 * 1024
+_CACHED_STATEMENTS = 256
+
+
+class ReadPool:
+    """A bounded, thread-safe pool of read-only connections to one file.
+
+    Connections are opened lazily up to *size*; once that many are
+    checked out, :meth:`connection` blocks until one is returned.
+    """
+
+    def __init__(self, db_path: str | Path, *, size: int = _DEFAULT_SIZE) -> None:
+        self.db_path = str(db_path)
+        self.size = size
+        self._uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self._uri,
+            uri=True,
+            check_same_thread=False,
+            cached_statements=_CACHED_STATEMENTS,
+        )
+        conn.execute(f"PRAGMA cache_size = -{_CACHE_SIZE_KIB}")
+        conn.execute(f"PRAGMA mmap_size = {_MMAP_SIZE}")
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return self._open()
+                except BaseException:
+                    self._opened -= 1
+                    raise
+        return self._idle.get()
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        conn.close()
+        with self._lock:
+            self._opened -= 1
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        conn.row_factory = None
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        if self._closed:
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Check out a warm connection for the duration of the block."""
+        if self._closed:
+            raise RuntimeError(f"ReadPool for {self.db_path} is closed")
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def close(self) -> None:
+        """Close idle connections; checked-out ones close on return."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+# ---------------------------------------------------------------------------
+# Process-wide registry
+# ---------------------------------------------------------------------------
+
+# Keyed by resolved path; the stored (st_dev, st_ino) detects a database
+# file that was replaced (restore from backup, test fixtures re-using a
+# path) so we don't keep reading the old inode.
+_POOLS: dict[str, tuple[tuple[int, int], ReadPool]] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _identity(path: str) -> tuple[int, int]:
+    st = os.stat(path)
+    return st.st_dev, st.st_ino
+
+
+def get_read_pool(db_path: str | Path, *, size: Optional[int] = None) -> ReadPool:
+    """Return the shared :class:`ReadPool` for *db_path*.
+
+    Raises ``sqlite3.OperationalError`` if the file does not exist, the
+    same error a ``mode=ro`` connect would raise.
+    """
+    key = str(Path(db_path).resolve())
+    try:
+        ident = _identity(key)
+    except FileNotFoundError:
+        raise sqlite3.OperationalError(f"unable to open database file: {db_path}")
+    with _POOLS_LOCK:
+        entry = _POOLS.get(key)
+        if entry is not None and entry[0] == ident:
+            return entry[1]
+        if entry is not None:
+            entry[1].close()
+        pool = ReadPool(key, size=size or _DEFAULT_SIZE)
+        _POOLS[key] = (ident, pool)
+        return pool
+
+
+def close_read_pools() -> None:
+    """Close every shared pool (tests, shutdown)."""
+    with _POOLS_LOCK:
+        for _, pool in _POOLS.values():
+            pool.close()
+        _POOLS.clear()
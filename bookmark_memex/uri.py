@@ -4,7 +4,7 @@ Public URI kinds:
     bookmark-memex://bookmark/<unique_id>
     bookmark-memex://marginalia/<uuid>
     bookmark-memex://history-url/<unique_id>
-    bookmark-memex://visit/<uuid>
+    bookmark-memex://visit/<unique_id>
 
 Fragment support (positions inside a record):
     bookmark-memex://bookmark/<unique_id>#paragraph=5
@@ -64,9 +64,9 @@ def build_history_url_uri(unique_id: str) -> str:
     return _build("history-url", unique_id)
 
 
-def build_visit_uri(uuid: str) -> str:
-    """Return ``bookmark-memex://visit/<uuid>``."""
-    return _build("visit", uuid)
+def build_visit_uri(unique_id: str) -> str:
+    """Return ``bookmark-memex://visit/<unique_id>``."""
+    return _build("visit", unique_id)
 
 
 # Backwards-compat alias. New code should use build_marginalia_uri().
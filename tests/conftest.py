@@ -433,6 +433,9 @@ def tmp_db_path():
     tmp_dir = tempfile.mkdtemp(prefix="bm_test_")
     db_path = os.path.join(tmp_dir, "test.db")
     yield db_path
+    from bookmark_memex.pool import close_read_pools
+
+    close_read_pools()
     shutil.rmtree(tmp_dir)
 
 
@@ -0,0 +1,54 @@
+"""Tests for bookmark_memex.advisor."""
+
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from bookmark_memex.advisor import HOT_QUERIES, HotQuery, advise
+from bookmark_memex.db import Database
+
+
+@pytest.fixture
+def conn(tmp_db_path):
+    Database(tmp_db_path)
+    conn = sqlite3.connect(tmp_db_path)
+    yield conn
+    conn.close()
+
+
+def test_hot_queries_use_indexes_on_migrated_schema(conn):
+    reports = advise(conn)
+    assert len(reports) == len(HOT_QUERIES)
+    assert [r.query.name for r in reports if not r.ok] == []
+
+
+def test_active_reads_use_partial_indexes(conn):
+    plans = {r.query.name: " ".join(r.plan) for r in advise(conn)}
+    assert "ix_bookmarks_active_added" in plans["bookmarks.list"]
+    assert "ix_bookmarks_active_added" in plans["bookmarks.iter_page"]
+    assert "ix_history_visits_active_url_visited" in plans["history_visits.for_url"]
+
+
+def test_full_table_scan_is_flagged(conn):
+    conn.execute("CREATE TABLE scratch (a INTEGER, b TEXT)")
+    query = HotQuery("scratch.by_a", "test", "SELECT b FROM scratch WHERE a = ?")
+    (report,) = advise(conn, (query,))
+    assert not report.ok
+    assert report.full_scans == ["SCAN scratch"]
+
+    conn.execute("CREATE INDEX ix_scratch_a ON scratch (a)")
+    (report,) = advise(conn, (query,))
+    assert report.ok
+
+
+def test_expected_scans_and_errors(conn):
+    aggregate = HotQuery(
+        "tags.count", "test", "SELECT COUNT(*) FROM bookmark_tags bt GROUP BY bt.tag_id",
+        expected_scans=("bt",),
+    )
+    missing = HotQuery("missing", "test", "SELECT * FROM no_such_table")
+    ok, broken = advise(conn, (aggregate, missing))
+    assert ok.ok
+    assert not broken.ok and "no_such_table" in broken.error
@@ -21,13 +21,20 @@ from pathlib import Path
 from unittest.mock import patch
 
 import pytest
+from sqlalchemy import select
 
 from bookmark_memex.db import Database
 from bookmark_memex.exporters.arkiv import export_arkiv
 from bookmark_memex.importers.arkiv import import_arkiv
 from bookmark_memex.importers.browser import BrowserProfile, ChromeImporter
 from bookmark_memex.importers.browser_history import import_history
-from bookmark_memex.models import HistoryUrl, HistoryVisit, Marginalia
+from bookmark_memex.models import (
+    HistoryUrl,
+    HistoryVisit,
+    Marginalia,
+    generate_visit_key,
+    visit_key_to_unique_id,
+)
 
 
 # ---------------------------------------------------------------------------
@@ -191,14 +198,13 @@ class TestMergeHistoryVisit:
         url_uid = "0000000000000100"
         self._url(db, url_uid)
 
-        v_uuid = uuid.uuid4().hex
         t = datetime(2026, 4, 20, 9, 0, 0)
         id1, ins1 = db.merge_history_visit(
-            unique_id=v_uuid, url_unique_id=url_uid, visited_at=t,
+            url_unique_id=url_uid, visited_at=t,
             source_type="chrome", source_name="Chrome/Default",
         )
         id2, ins2 = db.merge_history_visit(
-            unique_id=v_uuid, url_unique_id=url_uid, visited_at=t,
+            url_unique_id=url_uid, visited_at=t,
             source_type="chrome", source_name="Chrome/Default",
         )
         assert ins1 is True
@@ -208,7 +214,6 @@ class TestMergeHistoryVisit:
     def test_unknown_url_drops(self, tmp_db_path: str) -> None:
         db = Database(tmp_db_path)
         vid, ins = db.merge_history_visit(
-            unique_id=uuid.uuid4().hex,
             url_unique_id="nonexistent00000",
             visited_at=datetime(2026, 4, 20, 9, 0, 0),
             source_type="chrome",
@@ -217,46 +222,41 @@ class TestMergeHistoryVisit:
         assert vid is None
         assert ins is False
 
-    def test_tuple_dedup_across_uuids(self, tmp_db_path: str) -> None:
-        """Two different UUIDs, same (url, time, source) tuple.
-
-        The second insert should resolve to the first row via the
-        secondary UNIQUE constraint and return (existing_id, False).
-        """
-        db = Database(tmp_db_path)
+    def test_unique_id_is_derived_from_content(
+        self, tmp_db_path: str, tmp_path: Path
+    ) -> None:
+        """The same visit gets the same unique_id in separate databases."""
         url_uid = "0000000000000101"
-        self._url(db, url_uid)
-
         t = datetime(2026, 4, 20, 9, 0, 0)
-        id1, _ = db.merge_history_visit(
-            unique_id="aaa1", url_unique_id=url_uid, visited_at=t,
-            source_type="chrome", source_name="Chrome/Default",
-        )
-        id2, ins2 = db.merge_history_visit(
-            unique_id="bbb2", url_unique_id=url_uid, visited_at=t,
-            source_type="chrome", source_name="Chrome/Default",
+        uids = []
+        for db in (Database(tmp_db_path), Database(str(tmp_path / "other.db"))):
+            self._url(db, url_uid)
+            vid, _ = db.merge_history_visit(
+                url_unique_id=url_uid, visited_at=t,
+                source_type="chrome", source_name="Chrome/Default",
+            )
+            uids.append(db.get_history_visit(vid).unique_id)
+        assert uids[0] == uids[1]
+        assert uids[0] == visit_key_to_unique_id(
+            generate_visit_key(url_uid, t, "chrome", "Chrome/Default")
         )
-        assert id2 == id1
-        assert ins2 is False
 
     def test_resolves_from_visit(self, tmp_db_path: str) -> None:
         db = Database(tmp_db_path)
         url_uid = "0000000000000102"
         self._url(db, url_uid)
 
-        first_uuid = uuid.uuid4().hex
         first_id, _ = db.merge_history_visit(
-            unique_id=first_uuid, url_unique_id=url_uid,
+            url_unique_id=url_uid,
             visited_at=datetime(2026, 4, 20, 9, 0, 0),
             source_type="chrome", source_name="Chrome/Default",
         )
 
-        second_uuid = uuid.uuid4().hex
         second_id, _ = db.merge_history_visit(
-            unique_id=second_uuid, url_unique_id=url_uid,
+            url_unique_id=url_uid,
             visited_at=datetime(2026, 4, 20, 9, 0, 5),
             source_type="chrome", source_name="Chrome/Default",
-            from_visit_unique_id=first_uuid,
+            from_visit_unique_id=db.get_history_visit(first_id).unique_id,
         )
 
         row = db.get_history_visit(second_id)
@@ -365,6 +365,31 @@ class TestRoundTrip:
         assert rows[1][1] is not None                 # link resolves to prior
         assert rows[2][1] is None                     # reload has no from_visit
 
+    def test_history_passes_commit_every_batch(
+        self, tmp_db_path: str, tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        from sqlalchemy import event
+
+        src = Database(tmp_db_path)
+        _populate_history(src, tmp_path)
+        bundle = tmp_path / "bundle"
+        export_arkiv(src, bundle, include_history=True)
+
+        def commits(every: int) -> int:
+            monkeypatch.setattr(
+                "bookmark_memex.importers.arkiv._BATCH_COMMIT_EVERY", every
+            )
+            dst = Database(str(tmp_path / f"dst-{every}.db"))
+            seen: list[int] = []
+            event.listen(dst._engine, "commit", lambda conn: seen.append(1))
+            import_arkiv(dst, bundle)
+            return len(seen)
+
+        # Two history-urls then three visits: commits after the 2nd and
+        # 4th record, one at the end, and no separate visit batch.
+        assert commits(2) == commits(1000) + 2
+
     def test_idempotent_reimport(
         self, tmp_db_path: str, tmp_path: Path
     ) -> None:
@@ -457,6 +482,50 @@ class TestRoundTrip:
             assert m.bookmark_id is None
             assert m.history_url_id is None
 
+    def test_legacy_uuid_visit_ids_are_translated(
+        self, tmp_db_path: str, tmp_path: Path
+    ) -> None:
+        """Bundles from before content-derived visit ids carry UUIDs.
+
+        Referrers and visit notes naming them still resolve, and the
+        visits come back under the ids the source database now uses.
+        """
+        src = Database(tmp_db_path)
+        _populate_history(src, tmp_path)
+        with src._session() as s:
+            v_id = s.execute(
+                select(HistoryVisit.id).where(
+                    HistoryVisit.from_visit_id.is_not(None)
+                )
+            ).scalar_one()
+            src_uids = set(s.execute(select(HistoryVisit.unique_id)).scalars())
+            s.add(Marginalia(
+                id=uuid.uuid4().hex, history_visit_id=v_id, text="legacy note"
+            ))
+
+        bundle = tmp_path / "bundle"
+        export_arkiv(src, bundle, include_history=True)
+
+        jsonl = bundle / "records.jsonl"
+        legacy = {uid: uuid.uuid4().hex for uid in src_uids}
+        text = jsonl.read_text()
+        for uid, old in legacy.items():
+            text = text.replace(uid, old)
+        jsonl.write_text(text)
+        assert not any(uid in text for uid in src_uids)
+
+        dst_path = str(tmp_path / "dst.db")
+        dst = Database(dst_path)
+        stats = import_arkiv(dst, bundle)
+        assert stats["visits_added"] == 3
+
+        with dst._session() as s:
+            visits = list(s.execute(select(HistoryVisit)).scalars())
+            note = s.execute(select(Marginalia)).scalar_one()
+            assert {v.unique_id for v in visits} == src_uids
+            assert sum(v.from_visit_id is not None for v in visits) == 1
+            assert note.history_visit_id is not None
+
     def test_bookmarks_only_bundle_drops_history(
         self, tmp_db_path: str, tmp_path: Path
     ) -> None:
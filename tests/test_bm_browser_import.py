@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import json
+import shutil
 import sqlite3
 from pathlib import Path
 from unittest.mock import MagicMock, patch
@@ -9,7 +10,9 @@ from unittest.mock import MagicMock, patch
 import pytest
 
 from bookmark_memex.db import Database
+from bookmark_memex.importers import browser as browser_mod
 from bookmark_memex.importers.browser import (
+    BrowserImporter,
     BrowserProfile,
     ChromeImporter,
     FirefoxImporter,
@@ -359,6 +362,100 @@ class TestFirefoxImporterBookmarks:
         assert importer._firefox_timestamp_to_datetime(0) is None
 
 
+# ---------------------------------------------------------------------------
+# Source snapshots
+# ---------------------------------------------------------------------------
+
+
+def _make_visits_db(path: Path, *, journal_mode: str = "wal") -> sqlite3.Connection:
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+    conn.execute("PRAGMA wal_autocheckpoint = 0")
+    conn.execute("CREATE TABLE visits (id INTEGER PRIMARY KEY)")
+    conn.executemany("INSERT INTO visits VALUES (?)", [(1,), (2,)])
+    return conn
+
+
+class TestOpenSnapshot:
+    def test_reads_in_place_including_wal(self, tmp_path: Path) -> None:
+        db_path = tmp_path / "History"
+        writer = _make_visits_db(db_path)
+        assert (tmp_path / "History-wal").stat().st_size > 0
+
+        with patch.object(browser_mod, "_copy_with_wal", side_effect=AssertionError):
+            with BrowserImporter()._open_snapshot(db_path) as conn:
+                assert conn.execute("SELECT COUNT(*) FROM visits").fetchone() == (2,)
+        writer.close()
+
+    def test_copies_with_wal_when_exclusively_locked(self, tmp_path: Path) -> None:
+        db_path = tmp_path / "History"
+        writer = _make_visits_db(db_path, journal_mode="delete")
+        writer.execute("PRAGMA locking_mode = EXCLUSIVE")
+        writer.execute("INSERT INTO visits VALUES (3)")
+
+        copies: list[Path] = []
+        real_copy = browser_mod._copy_with_wal
+
+        def spy(src: Path, dest_dir: Path) -> Path:
+            copies.append(real_copy(src, dest_dir))
+            return copies[-1]
+
+        with patch.object(browser_mod, "_copy_with_wal", spy):
+            with BrowserImporter()._open_snapshot(db_path) as conn:
+                assert conn.execute("SELECT COUNT(*) FROM visits").fetchone() == (3,)
+        writer.close()
+        assert len(copies) == 1
+        assert not copies[0].parent.exists()
+
+    def test_copy_replays_wal(self, tmp_path: Path) -> None:
+        db_path = tmp_path / "places.sqlite"
+        writer = _make_visits_db(db_path)
+        (tmp_path / "copy").mkdir()
+        dest = browser_mod._copy_with_wal(db_path, tmp_path / "copy")
+        writer.close()
+        with sqlite3.connect(dest) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM visits").fetchone() == (2,)
+
+    def test_copy_retries_when_checkpointed_midway(self, tmp_path: Path) -> None:
+        db_path = tmp_path / "History"
+        writer = _make_visits_db(db_path)
+        (tmp_path / "copy").mkdir()
+        calls: list[Path] = []
+        real_copyfile = shutil.copyfile
+
+        def copyfile(src: Path, dst: Path) -> None:
+            calls.append(Path(src))
+            real_copyfile(src, dst)
+            if len(calls) == 1:
+                # The browser checkpoints between the WAL and main copies.
+                writer.execute("INSERT INTO visits VALUES (3)")
+                writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        with patch.object(browser_mod.shutil, "copyfile", copyfile):
+            dest = browser_mod._copy_with_wal(db_path, tmp_path / "copy")
+        writer.close()
+        assert [p.name for p in calls] == ["History-wal", "History"] * 2
+        with sqlite3.connect(dest) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM visits").fetchone() == (3,)
+
+    def test_copy_gives_up_on_a_busy_database(self, tmp_path: Path) -> None:
+        db_path = tmp_path / "History"
+        writer = _make_visits_db(db_path)
+        (tmp_path / "copy").mkdir()
+        states = iter(range(1000))
+
+        with patch.object(browser_mod, "_file_state", lambda path: next(states)), \
+                patch.object(browser_mod.time, "sleep"):
+            with pytest.raises(OSError, match="kept changing"):
+                browser_mod._copy_with_wal(db_path, tmp_path / "copy")
+        writer.close()
+
+    def test_missing_file_raises(self, tmp_path: Path) -> None:
+        with pytest.raises(FileNotFoundError):
+            with BrowserImporter()._open_snapshot(tmp_path / "nope"):
+                pass
+
+
 # ---------------------------------------------------------------------------
 # list_browser_profiles
 # ---------------------------------------------------------------------------
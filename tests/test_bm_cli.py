@@ -6,6 +6,7 @@ Command tests verify cmd_import and cmd_sql against a real (temp) database.
 from __future__ import annotations
 
 import json
+import sqlite3
 import sys
 from io import StringIO
 from pathlib import Path
@@ -67,6 +68,27 @@ class TestParser:
         args = build_parser().parse_args(["db", "vacuum"])
         assert args.db_command == "vacuum"
 
+    def test_db_advise(self):
+        args = build_parser().parse_args(["db", "advise"])
+        assert args.db_command == "advise"
+
+    def test_history_prune(self):
+        args = build_parser().parse_args(
+            ["history", "prune", "--older-than", "2y", "--summarise"]
+        )
+        assert args.command == "history"
+        assert args.history_command == "prune"
+        assert args.older_than == "2y"
+        assert args.summarise is True
+
+    def test_db_rebuild_rollups(self):
+        args = build_parser().parse_args(["db", "rebuild-rollups"])
+        assert args.db_command == "rebuild-rollups"
+
+    def test_db_compact_timestamps(self):
+        args = build_parser().parse_args(["db", "compact-timestamps"])
+        assert args.db_command == "compact-timestamps"
+
     def test_sql(self):
         args = build_parser().parse_args(["sql", "SELECT 1"])
         assert args.command == "sql"
@@ -235,6 +257,34 @@ def test_cmd_sql_select(db_with_data):
     assert "2" in output
 
 
+def test_cmd_sql_write_is_committed(db_with_data):
+    """A write falls back from the read-only pool and is committed."""
+    from bookmark_memex.cli import cmd_sql
+
+    update = SimpleNamespace(
+        db=db_with_data,
+        query="UPDATE bookmarks SET title = 'Renamed' WHERE url LIKE '%python%' "
+              "RETURNING title",
+        output="table",
+    )
+    buf = StringIO()
+    with patch("sys.stdout", buf):
+        cmd_sql(update)
+    assert "Renamed" in buf.getvalue()
+
+    with sqlite3.connect(db_with_data) as conn:
+        titles = {r[0] for r in conn.execute("SELECT title FROM bookmarks")}
+    assert titles == {"Example", "Renamed"}
+
+
+def test_cmd_sql_errors_are_not_retried_as_writes(db_with_data):
+    from bookmark_memex.cli import cmd_sql
+
+    args = SimpleNamespace(db=db_with_data, query="SELECT nope FROM bookmarks", output="table")
+    with pytest.raises(sqlite3.OperationalError, match="no such column"):
+        cmd_sql(args)
+
+
 def test_cmd_sql_json_output(db_with_data):
     """cmd_sql with -o json emits valid JSON rows."""
     from bookmark_memex.cli import cmd_sql
@@ -268,6 +318,25 @@ def test_cmd_sql_csv_output(db_with_data):
     assert len(rows) == 3  # header + 2 data rows
 
 
+def test_cmd_export_domain_filter(db_with_data, tmp_path):
+    """cmd_export --domain exports only that site's bookmarks."""
+    from bookmark_memex import exporters
+    from bookmark_memex.cli import cmd_export
+
+    out = tmp_path / "site.txt"
+    args = SimpleNamespace(
+        db=db_with_data, path=str(out), format="text", domain="www.python.org"
+    )
+    with patch.object(
+        exporters, "export_file", wraps=exporters.export_file
+    ) as export_file:
+        cmd_export(args)
+    assert out.read_text().splitlines() == ["https://python.org/"]
+    # The filter runs in the export query rather than as a list of ids.
+    assert export_file.call_args.kwargs.get("bookmark_ids") is None
+    assert export_file.call_args.kwargs["where"] is not None
+
+
 def test_cmd_db_info(db_with_data, capsys):
     """cmd_db info prints table names and row counts."""
     from bookmark_memex.cli import cmd_db
@@ -296,6 +365,105 @@ def test_cmd_db_vacuum(db_with_data):
     cmd_db(args)  # should not raise
 
 
+def test_cmd_db_vacuum_switches_to_incremental(tmp_path):
+    """cmd_db vacuum moves older files onto incremental auto-vacuum."""
+    from bookmark_memex.cli import cmd_db
+
+    path = tmp_path / "legacy.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE t (x)")
+    cmd_db(SimpleNamespace(db=str(path), db_command="vacuum"))
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone() == (2,)
+
+
+def test_cmd_db_advise_reports_no_full_scans(db_with_data, capsys):
+    """cmd_db advise passes on a freshly migrated database."""
+    from bookmark_memex.cli import cmd_db
+
+    args = SimpleNamespace(db=db_with_data, db_command="advise")
+    cmd_db(args)
+    out = capsys.readouterr().out
+    assert "ok    bookmarks.list" in out
+    assert "SCAN " not in out
+
+
+def test_cmd_db_rebuild_rollups(db_with_data, capsys):
+    """cmd_db rebuild-rollups reports the rebuilt domain-day rows and sessions."""
+    from bookmark_memex.cli import cmd_db
+
+    args = SimpleNamespace(db=db_with_data, db_command="rebuild-rollups")
+    cmd_db(args)
+    out = capsys.readouterr().out
+    assert "Rebuilt history rollups: 0" in out
+    assert "0 browsing session(s)" in out
+
+
+def test_cmd_db_compact_timestamps(db_with_data, capsys):
+    """cmd_db compact-timestamps converts once, then reports nothing to do."""
+    from bookmark_memex.cli import cmd_db
+
+    args = SimpleNamespace(db=db_with_data, db_command="compact-timestamps")
+    cmd_db(args)
+    assert "now stored as epoch microseconds" in capsys.readouterr().out
+    with sqlite3.connect(db_with_data) as conn:
+        declared = {
+            row[1]: row[2]
+            for row in conn.execute("PRAGMA table_info(history_visits)")
+        }
+    assert declared["visited_at"] == "INTEGER"
+    cmd_db(args)
+    assert "already stored as integers" in capsys.readouterr().out
+
+
+def test_cmd_db_compact_timestamps_suggests_vacuum(db_with_data, capsys):
+    """Files without incremental auto-vacuum are told to run db vacuum."""
+    from bookmark_memex.cli import cmd_db
+
+    conn = sqlite3.connect(db_with_data)
+    conn.execute("PRAGMA auto_vacuum=NONE")
+    conn.execute("VACUUM")
+    conn.close()
+    cmd_db(SimpleNamespace(db=db_with_data, db_command="compact-timestamps"))
+    assert "run `bookmark-memex db vacuum`" in capsys.readouterr().out
+
+
+def test_parse_cutoff_ages_and_dates():
+    from datetime import date, datetime, timedelta, timezone
+
+    from bookmark_memex.cli import _parse_cutoff
+
+    today = datetime.now(timezone.utc).date()
+    assert _parse_cutoff("2y") == today - timedelta(days=730)
+    assert _parse_cutoff("90D") == today - timedelta(days=90)
+    assert _parse_cutoff("2024-01-01") == date(2024, 1, 1)
+    with pytest.raises(SystemExit):
+        _parse_cutoff("soon")
+
+
+def test_cmd_history_prune(db_with_data, capsys):
+    """cmd_history prune reports what it deleted."""
+    from datetime import datetime
+
+    from bookmark_memex.cli import cmd_history
+    from bookmark_memex.db import Database
+
+    db = Database(db_with_data)
+    row, _ = db.upsert_history_url("https://old.example.com/")
+    db.add_history_visit(
+        url_id=row.id, visited_at=datetime(2020, 1, 1),
+        source_type="chrome", source_name="Chrome/Default",
+    )
+    args = SimpleNamespace(
+        db=db_with_data, history_command="prune",
+        older_than="2021-01-01", summarise=True,
+    )
+    cmd_history(args)
+    out = capsys.readouterr().out
+    assert "Pruned history before 2021-01-01: 1 visit(s) across 1 URL(s)" in out
+    assert "daily summaries kept" in out
+
+
 def test_main_no_command_exits_zero(monkeypatch):
     """main() with no args prints help and exits 0."""
     from bookmark_memex import cli as cli_mod
@@ -2,7 +2,10 @@
 
 from __future__ import annotations
 
+from datetime import datetime
+
 import pytest
+from sqlalchemy.exc import IntegrityError
 
 from bookmark_memex.db import Database, normalize_url, generate_unique_id
 
@@ -143,6 +146,102 @@ def test_add_title_empty_updated_on_duplicate(db):
     assert bm2.title == "Now Has Title"
 
 
+# ---------------------------------------------------------------------------
+# add_many
+# ---------------------------------------------------------------------------
+
+
+def test_add_many_reports_added_and_merged(db):
+    existing = db.add("https://a.example.com", title="A")
+    results = db.add_many([
+        {"url": "https://a.example.com/", "title": "ignored"},
+        {"url": "https://b.example.com", "title": "B"},
+        {"url": "https://b.example.com/", "title": "B again"},
+    ])
+    assert [r.added for r in results] == [False, True, False]
+    assert results[0].id == existing.id
+    assert results[1].id == results[2].id
+    assert db.get(results[1].id).title == "B"
+
+
+def test_add_many_empty_is_noop(db):
+    assert db.add_many([]) == []
+
+
+def test_add_many_merges_tags_and_backfills_title(db):
+    bm = db.add("https://example.com", tags=["old"])
+    db.add_many([
+        {"url": "https://example.com", "title": "Filled", "tags": ["old", "new"]},
+        {"url": "https://other.example.com", "tags": ["new"]},
+    ])
+    fetched = db.get(bm.id)
+    assert fetched.title == "Filled"
+    assert set(fetched.tag_names) == {"old", "new"}
+    assert sorted(t.name for t in db.list_tags()) == ["new", "old"]
+
+
+def test_add_many_records_sources_and_media(db):
+    results = db.add_many([
+        {
+            "url": "https://example.com",
+            "source_type": "html_file",
+            "source_name": "bookmarks.html",
+            "folder_path": "Dev",
+            "media": {"type": "video"},
+        },
+    ])
+    bm = db.get(results[0].id)
+    assert bm.media == {"type": "video"}
+    assert [(s.source_type, s.folder_path) for s in bm.sources] == [
+        ("html_file", "Dev")
+    ]
+
+
+# ---------------------------------------------------------------------------
+# batch
+# ---------------------------------------------------------------------------
+
+
+def test_batch_commits_on_clean_exit(db, tmp_db_path):
+    with db.batch():
+        bm = db.add("https://example.com", title="Example")
+        db.tag(bm.id, add=["python"])
+        db.update(bm.id, starred=True)
+    fresh = Database(tmp_db_path).get(bm.id)
+    assert fresh.starred is True
+    assert fresh.tag_names == ["python"]
+
+
+def test_batch_rolls_back_on_error(db):
+    with pytest.raises(RuntimeError):
+        with db.batch():
+            db.add("https://example.com")
+            raise RuntimeError("boom")
+    assert db.list() == []
+
+
+def test_batch_failed_call_only_undoes_itself(db):
+    with db.batch():
+        db.add("https://a.example.com")
+        with pytest.raises(IntegrityError):
+            db.update(db.list()[0].id, title=None)  # NOT NULL violation
+        db.add("https://b.example.com")
+    assert len(db.list()) == 2
+
+
+def test_batch_commit_every_persists_completed_chunks(db):
+    with pytest.raises(RuntimeError):
+        with db.batch(commit_every=2):
+            db.add("https://a.example.com")
+            db.add("https://b.example.com")
+            db.add("https://c.example.com")
+            raise RuntimeError("boom")
+    assert sorted(b.url for b in db.list()) == [
+        "https://a.example.com/",
+        "https://b.example.com/",
+    ]
+
+
 # ---------------------------------------------------------------------------
 # get / get_by_unique_id
 # ---------------------------------------------------------------------------
@@ -172,6 +271,137 @@ def test_get_by_unique_id_nonexistent_returns_none(db):
     assert result is None
 
 
+def test_get_defers_heavy_columns_by_default(db):
+    from bookmark_memex.models import ContentCache
+
+    bm = db.add("https://example.com", source_type="html_file")
+    db.update(bm.id, favicon_data=b"\x89PNG")
+    with db._session() as s:
+        s.add(ContentCache(bookmark_id=bm.id, html_content=b"x" * 1000,
+                           markdown_content="# x", content_length=1000))
+
+    plain = db.get(bm.id)
+    assert plain.content_cache.content_length == 1000
+    assert "html_content" not in plain.content_cache.__dict__
+    assert "favicon_data" not in plain.__dict__
+    assert "raw_data" not in plain.sources[0].__dict__
+
+
+def test_get_load_opts_in_to_heavy_columns(db):
+    from bookmark_memex.models import ContentCache
+
+    bm = db.add("https://example.com", source_type="html_file")
+    db.update(bm.id, favicon_data=b"\x89PNG")
+    with db._session() as s:
+        s.add(ContentCache(bookmark_id=bm.id, html_content=b"<html/>",
+                           markdown_content="# x"))
+
+    full = db.get(bm.id, load=("content", "favicon", "sources"))
+    assert full.content_cache.html_content == b"<html/>"
+    assert full.content_cache.markdown_content == "# x"
+    assert full.favicon_data == b"\x89PNG"
+    assert full.sources[0].raw_data is None
+    with pytest.raises(ValueError):
+        db.get(bm.id, load=("everything",))
+
+
+# ---------------------------------------------------------------------------
+# store_content
+# ---------------------------------------------------------------------------
+
+
+def _fetched(body: bytes) -> dict:
+    import hashlib
+    import zlib
+
+    return {
+        "success": True,
+        "html_content": zlib.compress(body),
+        "markdown_content": body.decode(),
+        "extracted_text": body.decode(),
+        "content_hash": hashlib.sha256(body).hexdigest(),
+        "content_length": len(body),
+        "compressed_size": len(zlib.compress(body)),
+        "content_type": "text/html",
+    }
+
+
+def _blobs(db) -> list[tuple[str, int]]:
+    from sqlalchemy import text
+
+    with db._engine.connect() as conn:
+        return [tuple(r) for r in conn.execute(
+            text("SELECT hash, refcount FROM content_blobs ORDER BY hash")
+        )]
+
+
+def test_store_content_shares_blob_between_bookmarks(db):
+    import zlib
+
+    a = db.add("https://example.com/a")
+    b = db.add("https://mirror.example.org/a")
+    page = _fetched(b"<html>same</html>")
+    assert db.store_content(a.id, page) is True
+    assert db.store_content(b.id, page) is True
+
+    assert _blobs(db) == [(page["content_hash"], 2)]
+    loaded = db.get(b.id, load=("content",))
+    assert loaded.content_cache.html_content is None
+    assert zlib.decompress(loaded.content_cache.compressed_html) == b"<html>same</html>"
+
+
+def test_store_content_unchanged_page_is_a_noop(db):
+    bm = db.add("https://example.com")
+    page = _fetched(b"<html>v1</html>")
+    db.store_content(bm.id, page)
+    first = db.get(bm.id).content_cache.fetched_at
+
+    assert db.store_content(bm.id, page) is False
+    assert db.get(bm.id).content_cache.fetched_at >= first
+    assert _blobs(db) == [(page["content_hash"], 1)]
+
+
+def test_store_content_refetch_restores_archived_cache(db):
+    import sqlite3
+
+    def archive_cache() -> None:
+        with sqlite3.connect(db.path) as conn:
+            conn.execute("UPDATE content_cache SET archived_at = CURRENT_TIMESTAMP")
+
+    bm = db.add("https://example.com")
+    v1, v2 = _fetched(b"<html>v1</html>"), _fetched(b"<html>v2</html>")
+    db.store_content(bm.id, v1)
+
+    archive_cache()
+    assert db.store_content(bm.id, v1) is False
+    assert db.get(bm.id).content_cache.archived_at is None
+
+    archive_cache()
+    assert db.store_content(bm.id, v2) is True
+    assert db.get(bm.id).content_cache.archived_at is None
+
+
+def test_store_content_replacement_and_hard_delete_collect_blobs(db):
+    bm = db.add("https://example.com")
+    other = db.add("https://example.org")
+    v1, v2 = _fetched(b"<html>v1</html>"), _fetched(b"<html>v2</html>")
+    db.store_content(bm.id, v1)
+    db.store_content(other.id, v2)
+
+    db.store_content(bm.id, v2)
+    assert _blobs(db) == [(v2["content_hash"], 2)]
+
+    db.delete(bm.id, hard=True)
+    db.delete(other.id, hard=True)
+    assert _blobs(db) == []
+
+
+def test_store_content_rejects_failed_fetch(db):
+    bm = db.add("https://example.com")
+    with pytest.raises(ValueError):
+        db.store_content(bm.id, {"success": False, "error": "timeout"})
+
+
 # ---------------------------------------------------------------------------
 # update
 # ---------------------------------------------------------------------------
@@ -295,6 +525,71 @@ def test_list_limit(db):
     assert len(bms) == 3
 
 
+def test_list_filters_by_domain(db):
+    db.add("https://www.Example.com/a", title="A")
+    db.add("http://example.com:8080/b", title="B")
+    db.add("https://sub.example.com/c", title="C")
+    db.add("https://other.com/", title="D")
+    assert {b.title for b in db.list(domain="example.com")} == {"A", "B"}
+    assert {b.title for b in db.list(domain="WWW.example.com")} == {"A", "B"}
+    assert [b.title for b in db.list(domain="sub.example.com")] == ["C"]
+
+
+def test_bulk_add_and_update_keep_domain_in_step(db):
+    db.add_many([{"url": "https://www.bulk.example.com/x"}])
+    bm = db.list()[0]
+    assert bm.domain == "bulk.example.com"
+    updated = db.update(bm.id, url="https://moved.example.org/x")
+    assert updated.domain == "moved.example.org"
+    assert [r["id"] for r in db.iter_bookmarks(domain="moved.example.org")] == [bm.id]
+
+
+# ---------------------------------------------------------------------------
+# iter_bookmarks
+# ---------------------------------------------------------------------------
+
+
+def test_iter_bookmarks_pages_through_everything_newest_first(db):
+    for i in range(7):
+        db.add(f"https://example.com/{i}", tags=["b", "a"])
+    rows = list(db.iter_bookmarks(batch_size=3))
+    assert [r["url"] for r in rows] == [
+        f"https://example.com/{i}" for i in reversed(range(7))
+    ]
+    assert all(r["tags"] == ["a", "b"] for r in rows)
+
+
+def test_iter_bookmarks_keyset_handles_equal_added(db):
+    from bookmark_memex.models import Bookmark
+
+    ids = [db.add(f"https://example.com/{i}").id for i in range(5)]
+    with db._session() as s:
+        s.execute(Bookmark.__table__.update().values(added=datetime(2026, 1, 1)))
+    rows = list(db.iter_bookmarks(batch_size=2, with_tags=False))
+    assert sorted(r["id"] for r in rows) == ids
+    assert "tags" not in rows[0]
+
+
+def test_iter_bookmarks_column_projection_and_where(db):
+    from bookmark_memex.models import Bookmark
+
+    a = db.add("https://a.example.com", title="A")
+    db.add("https://b.example.com", title="B")
+    rows = list(db.iter_bookmarks(
+        columns=["url"], with_tags=False, where=Bookmark.id == a.id
+    ))
+    assert rows == [{"url": "https://a.example.com/"}]
+
+
+def test_iter_bookmarks_skips_archived_and_rejects_unknown_columns(db):
+    bm = db.add("https://a.example.com")
+    db.delete(bm.id)
+    assert list(db.iter_bookmarks()) == []
+    assert len(list(db.iter_bookmarks(include_archived=True))) == 1
+    with pytest.raises(ValueError):
+        list(db.iter_bookmarks(columns=["nope"]))
+
+
 # ---------------------------------------------------------------------------
 # tag / list_tags
 # ---------------------------------------------------------------------------
@@ -326,6 +621,125 @@ def test_tag_reuse(db):
     assert len(python_tags) == 1
 
 
+def _tag_names(db, bookmark_id):
+    return sorted(t.name for t in db.get(bookmark_id).tags)
+
+
+def test_bulk_tag_adds_and_removes_across_bookmarks(db):
+    a = db.add("https://a.example", tags=["old", "keep"])
+    b = db.add("https://b.example", tags=["old"])
+    c = db.add("https://c.example")
+
+    touched = db.bulk_tag([a.id, b.id, 9999], add=["new"], remove=["old", "absent"])
+    assert touched == 2
+    assert _tag_names(db, a.id) == ["keep", "new"]
+    assert _tag_names(db, b.id) == ["new"]
+    assert _tag_names(db, c.id) == []
+
+
+def test_rename_tag_moves_subtree_and_merges_collisions(db):
+    a = db.add("https://a.example", tags=["programming/python", "programming/python/web"])
+    b = db.add("https://b.example", tags=["lang/python", "programming/pythonic"])
+    keep_id = next(t.id for t in db.list_tags() if t.name == "programming/python")
+
+    assert db.rename_tag("programming/python", "lang/python") == 2
+    names = [t.name for t in db.list_tags()]
+    assert "programming/python" not in names
+    assert "programming/pythonic" in names  # not in the subtree
+    assert _tag_names(db, a.id) == ["lang/python", "lang/python/web"]
+    assert _tag_names(db, b.id) == ["lang/python", "programming/pythonic"]
+    # "lang/python" already existed, so the old tag was merged into it.
+    assert keep_id not in {t.id for t in db.list_tags()}
+
+
+def test_rename_tag_string_prefix_and_swap(db):
+    a = db.add("https://a.example", tags=["programming/py", "programming/pytest"])
+    assert db.rename_tag("programming/py*", "lang/py") == 2
+    assert _tag_names(db, a.id) == ["lang/py", "lang/pytest"]
+
+    # Renaming onto a name the subtree itself vacates must not collide.
+    b = db.add("https://b.example", tags=["x", "x/x"])
+    db.rename_tag("x", "x/x")
+    assert _tag_names(db, b.id) == ["x/x", "x/x/x"]
+
+
+def test_merge_tags_folds_sources_into_destination(db):
+    a = db.add("https://a.example", tags=["py", "python3"])
+    b = db.add("https://b.example", tags=["python3"])
+    assert db.merge_tags(["py", "python3", "missing"], "python") == 2
+    assert [t.name for t in db.list_tags()] == ["python"]
+    assert _tag_names(db, a.id) == ["python"]
+    assert _tag_names(db, b.id) == ["python"]
+    # The tag cache must not hand out the deleted ids.
+    db.tag(a.id, add=["py"])
+    assert _tag_names(db, a.id) == ["py", "python"]
+
+
+def test_tag_edits_refresh_fts_tags(db):
+    from bookmark_memex.fts import FTSIndex
+
+    bm = db.add("https://a.example", title="Alpha", tags=["zebra"])
+    idx = FTSIndex(db.path)
+    idx.create_indexes()
+    idx.rebuild_bookmarks_index()
+
+    db.rename_tag("zebra", "okapi")
+    assert [r.bookmark_id for r in idx.search("okapi")] == [bm.id]
+    db.bulk_tag([bm.id], add=["giraffe"])
+    assert [r.bookmark_id for r in idx.search("giraffe")] == [bm.id]
+    assert idx.search("zebra") == []
+
+
+def test_fts_tag_refresh_is_keyed_on_rowid(db):
+    import sqlite3
+
+    from sqlalchemy import event
+
+    from bookmark_memex.fts import FTSIndex
+
+    for i in range(3):
+        db.add(f"https://a.example/{i}", tags=["zebra"])
+    bm = db.add("https://b.example", tags=["zebra"])
+    idx = FTSIndex(db.path)
+    idx.create_indexes()
+    idx.rebuild_bookmarks_index()
+    with sqlite3.connect(db.path) as conn:
+        rows = conn.execute("SELECT rowid, bookmark_id FROM bookmarks_fts").fetchall()
+    assert all(rowid == bookmark_id for rowid, bookmark_id in rows)
+
+    statements: list[str] = []
+    event.listen(
+        db._engine, "before_cursor_execute",
+        lambda conn, cur, stmt, *a: statements.append(stmt),
+    )
+    db.bulk_tag([bm.id], add=["giraffe"])
+    assert [s for s in statements if "UPDATE bookmarks_fts" in s and "WHERE rowid IN" in s]
+    assert [r.bookmark_id for r in idx.search("giraffe")] == [bm.id]
+
+
+def test_fts_tag_refresh_on_index_without_rowid_keys(db):
+    """An index built before rowids followed bookmark ids still refreshes."""
+    import sqlite3
+
+    from bookmark_memex.fts import FTSIndex
+
+    a = db.add("https://a.example", tags=["zebra"])
+    b = db.add("https://b.example", tags=["zebra"])
+    idx = FTSIndex(db.path)
+    idx.create_indexes()
+    with sqlite3.connect(db.path) as conn:
+        for rowid, bm in ((100, a), (101, b)):
+            conn.execute(
+                "INSERT INTO bookmarks_fts(rowid, bookmark_id, url, title, description, tags)"
+                " VALUES (?, ?, ?, '', '', 'zebra')",
+                (rowid, bm.id, bm.url),
+            )
+
+    db.bulk_tag([b.id], add=["giraffe"])
+    assert [r.bookmark_id for r in idx.search("giraffe")] == [b.id]
+    assert {r.bookmark_id for r in idx.search("zebra")} == {a.id, b.id}
+
+
 def test_list_tags_returns_tags(db):
     db.add("https://a.com", title="A", tags=["python", "web"])
     tags = db.list_tags()
@@ -334,6 +748,42 @@ def test_list_tags_returns_tags(db):
     assert "web" in names
 
 
+def test_tag_lookups_are_cached_across_calls(db):
+    from sqlalchemy import event
+
+    db.add("https://warm.example.com", tags=["python", "web"])
+    statements: list[str] = []
+    event.listen(
+        db._engine, "before_cursor_execute",
+        lambda conn, cur, stmt, *a: statements.append(stmt),
+    )
+    for i in range(20):
+        db.add(f"https://example.com/{i}", tags=["python", "web"])
+    # Only the returned rows' tag collections are loaded; no name lookups.
+    assert not [s for s in statements if "tags.name IN" in s or "INTO tags" in s]
+
+
+def test_tag_cache_sees_writes_from_other_connections(db, tmp_db_path):
+    import sqlite3
+
+    db.add("https://a.example.com", tags=["python"])
+    with sqlite3.connect(tmp_db_path) as conn:
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("DELETE FROM tags WHERE name = 'python'")
+        conn.execute("INSERT INTO tags (id, name) VALUES (999, 'python')")
+    bm = db.add("https://b.example.com", tags=["python"])
+    assert [t.id for t in bm.tags] == [999]
+
+
+def test_tag_cache_dropped_on_rollback(db):
+    with pytest.raises(RuntimeError):
+        with db.batch():
+            db.add("https://a.example.com", tags=["ephemeral"])
+            raise RuntimeError("boom")
+    bm = db.add("https://b.example.com", tags=["ephemeral"])
+    assert bm.tag_names == ["ephemeral"]
+
+
 # ---------------------------------------------------------------------------
 # annotate / get_annotations
 # ---------------------------------------------------------------------------
@@ -74,6 +74,53 @@ def test_json_with_bookmark_ids(db, tmp_path):
     assert data[0]["url"] == bms[0].url
 
 
+def test_json_bookmark_ids_keep_caller_order(db, tmp_path, monkeypatch):
+    from bookmark_memex.exporters import formats
+
+    monkeypatch.setattr(formats, "_ID_CHUNK", 2)
+    ids = [db.add(f"https://order.example/{i}").id for i in range(5)]
+    wanted = [ids[3], ids[0], ids[4], ids[1], ids[3]]
+    out = tmp_path / "bm.json"
+    export_json(db, out, bookmark_ids=wanted + [10**6])
+    data = json.loads(out.read_text())
+    assert [d["url"] for d in data] == [
+        f"https://order.example/{i}" for i in (3, 0, 4, 1)
+    ]
+
+
+def test_json_bookmark_ids_are_bound_in_chunks(db, tmp_path):
+    from sqlalchemy import event
+
+    from bookmark_memex.exporters.formats import _ID_CHUNK
+
+    bound: list[int] = []
+    event.listen(
+        db._engine, "before_cursor_execute",
+        lambda conn, cur, stmt, params, *a: bound.append(len(params)),
+    )
+    out = tmp_path / "bm.json"
+    bms = db.list()
+    export_json(db, out, bookmark_ids=list(range(10**6, 10**6 + 5_000)) + [bms[0].id])
+    data = json.loads(out.read_text())
+    assert [d["url"] for d in data] == [bms[0].url]
+    # Each lookup binds one chunk of ids plus LIMIT / OFFSET.
+    assert max(bound) <= _ID_CHUNK + 2
+
+
+def test_text_where_narrows_bookmark_ids(db, tmp_path):
+    from bookmark_memex.models import Bookmark
+
+    a = db.add("https://keep.example/a")
+    b = db.add("https://drop.example/b")
+    c = db.add("https://keep.example/c")
+    out = tmp_path / "bm.txt"
+    export_text(
+        db, out, bookmark_ids=[c.id, b.id, a.id],
+        where=Bookmark.domain == "keep.example",
+    )
+    assert out.read_text().splitlines() == [c.url, a.url]
+
+
 def test_json_dict_keys(db, tmp_path):
     out = tmp_path / "bm.json"
     export_json(db, out)
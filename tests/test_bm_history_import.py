@@ -17,27 +17,37 @@ from __future__ import annotations
 
 import sqlite3
 from argparse import Namespace
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from unittest.mock import patch
 
 import pytest
+from sqlalchemy import event, select
 
+from bookmark_memex import db as db_module
 from bookmark_memex.db import (
     Database,
+    canonicalize_history_url,
     generate_history_unique_id,
     normalize_url,
     normalize_url_for_history,
 )
-from bookmark_memex.importers.browser import BrowserProfile, ChromeImporter, FirefoxImporter
+from bookmark_memex.importers.browser import (
+    BrowserProfile,
+    ChromeImporter,
+    FirefoxImporter,
+)
 from bookmark_memex.importers.browser_history import (
     HistoryImportResult,
     _datetime_to_chrome_us,
     _datetime_to_firefox_us,
     _decode_chrome_transition,
     _decode_firefox_visit_type,
+    _read_chrome_history,
     import_history,
+    import_history_all,
 )
+from bookmark_memex.models import ImportCheckpoint
 
 
 # ---------------------------------------------------------------------------
@@ -90,6 +100,52 @@ class TestNormalizeUrlForHistory:
         assert bm_uid != hist_uid
 
 
+class TestCanonicalizeHistoryUrl:
+    @staticmethod
+    def _two_pass(url: str) -> str:
+        """The strip-then-normalize composition the single pass replaced."""
+        from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+        from bookmark_memex.db import _HISTORY_TRACKING_PARAMS
+
+        p = urlparse(url)
+        params = [
+            (k, v) for k, v in parse_qsl(p.query, keep_blank_values=True)
+            if k.lower() not in _HISTORY_TRACKING_PARAMS
+        ]
+        return normalize_url(
+            urlunparse((p.scheme, p.netloc, p.path, p.params, urlencode(params), ""))
+        )
+
+    @pytest.mark.parametrize("url", [
+        "https://Example.COM:443/a/b/?utm_source=x&b=2&a=1#frag",
+        "http://x.com:80",
+        "http://x.com:8080/",
+        "https://x.com/?a=&b=1&c",
+        "https://x.com/p;params?x=1",
+        "https://x.com//double//",
+        "https://x.com/?q=a+b&r=%20c&s=%2B",
+        "https://x.com/?a=1&a=0&A=2&Ref=3",
+        "https://user:pw@X.com:443/",
+        "https://x.com/?next=https://y.com/?a=1%26b=2",
+        "https://x.com/path?#",
+    ])
+    def test_matches_two_pass_normalisation(self, url: str) -> None:
+        import hashlib
+
+        norm, uid = canonicalize_history_url(url)
+        assert norm == self._two_pass(url)
+        assert uid == hashlib.sha256(norm.encode()).hexdigest()[:16]
+
+    def test_repeat_lookups_hit_cache(self) -> None:
+        url = "https://cache.example.com/page?utm_source=x"
+        canonicalize_history_url(url)
+        hits = canonicalize_history_url.cache_info().hits
+        assert normalize_url_for_history(url) == "https://cache.example.com/page"
+        assert generate_history_unique_id(url) == canonicalize_history_url(url)[1]
+        assert canonicalize_history_url.cache_info().hits == hits + 3
+
+
 # ---------------------------------------------------------------------------
 # Timestamp helpers
 # ---------------------------------------------------------------------------
@@ -196,6 +252,22 @@ class TestDatabaseHistoryMethods:
         b, _ = db.upsert_history_url("https://example.com/dedup?utm_source=y")
         assert a.id == b.id
 
+    def test_set_history_url_media_fills_only_empty_rows(
+        self, tmp_db_path: str
+    ) -> None:
+        db = Database(tmp_db_path)
+        a, _ = db.upsert_history_url("https://example.com/a")
+        b, _ = db.upsert_history_url("https://example.com/b", media={"type": "old"})
+        assert db.history_urls_without_media() == [(a.id, a.url)]
+
+        written = db.set_history_url_media(
+            [(a.id, {"type": "new"}), (b.id, {"type": "new"})]
+        )
+        assert written == 1
+        assert db.get_history_url(a.id).media == {"type": "new"}
+        assert db.get_history_url(b.id).media == {"type": "old"}
+        assert db.history_urls_without_media() == []
+
     def test_visit_insert_updates_aggregates(self, tmp_db_path: str) -> None:
         db = Database(tmp_db_path)
         url_row, _ = db.upsert_history_url("https://example.com/v")
@@ -283,6 +355,779 @@ class TestDatabaseHistoryMethods:
         assert refreshed.first_visited == t1
         assert refreshed.last_visited == t1
 
+    def test_bulk_ingest_across_chunks(
+        self, tmp_db_path: str, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Referrers resolve across chunk boundaries; re-ingest is a no-op."""
+        monkeypatch.setattr("bookmark_memex.db._HISTORY_CHUNK", 2)
+        db = Database(tmp_db_path)
+        t0 = datetime(2026, 4, 20, 9, 0, 0)
+        entries = [
+            {
+                "visit_id": i,
+                "visited_at": t0 + timedelta(minutes=i),
+                "from_visit": i - 1 if i > 1 else 0,
+                "transition": "link",
+                "url": f"https://example.com/{i % 3}",
+                "title": f"Page {i % 3}",
+                "typed_count": 0,
+            }
+            for i in range(1, 8)
+        ]
+        first = db.bulk_ingest_history(
+            entries, source_type="chrome", source_name="Chrome/Default"
+        )
+        assert first == (3, 0, 7, 0, 3)
+        again = db.bulk_ingest_history(
+            entries, source_type="chrome", source_name="Chrome/Default"
+        )
+        assert again[2:4] == (0, 7)
+
+        with sqlite3.connect(tmp_db_path) as conn:
+            rows = conn.execute(
+                "SELECT v.id, v.from_visit_id, p.visited_at < v.visited_at "
+                "FROM history_visits v LEFT JOIN history_visits p "
+                "ON p.id = v.from_visit_id ORDER BY v.visited_at"
+            ).fetchall()
+        assert rows[0][1] is None
+        assert all(fv is not None and earlier for _, fv, earlier in rows[1:])
+
+    def test_deferred_aggregates_match_trigger_path(self, tmp_path: Path) -> None:
+        """defer_aggregates must leave history_urls exactly as the trigger does."""
+        import random
+
+        rng = random.Random(7)
+        t0 = datetime(2026, 4, 1, 0, 0, 0)
+
+        def batch(start: int, n: int) -> list[dict]:
+            return [
+                {
+                    "visit_id": i,
+                    "visited_at": t0 + timedelta(seconds=rng.randrange(10**6)),
+                    "from_visit": 0,
+                    "transition": "link",
+                    "url": f"https://agg.example.com/{rng.randrange(40)}",
+                    "title": None,
+                    "typed_count": 0,
+                }
+                for i in range(start, start + n)
+            ]
+
+        first, second = batch(1, 300), batch(301, 300)
+        # Re-ingested visits (dedup hits) must not be counted twice.
+        second += first[:50]
+
+        snapshots = []
+        for defer in (False, True):
+            db = Database(str(tmp_path / f"defer-{defer}.db"))
+            # A pre-existing URL with aggregates from an earlier capture.
+            url_row, _ = db.upsert_history_url("https://agg.example.com/0")
+            db.add_history_visit(
+                url_id=url_row.id, visited_at=t0 + timedelta(days=30),
+                source_type="firefox", source_name="Firefox/default",
+            )
+            with sqlite3.connect(str(tmp_path / f"defer-{defer}.db")) as conn:
+                cookie = conn.execute("PRAGMA schema_version").fetchone()
+            for entries in (first, second):
+                db.bulk_ingest_history(
+                    entries, source_type="chrome", source_name="Chrome/Default",
+                    defer_aggregates=defer,
+                )
+            with sqlite3.connect(str(tmp_path / f"defer-{defer}.db")) as conn:
+                snapshots.append(conn.execute(
+                    "SELECT unique_id, visit_count, first_visited, last_visited "
+                    "FROM history_urls ORDER BY unique_id"
+                ).fetchall())
+                # No DDL: other connections keep their prepared statements.
+                assert conn.execute("PRAGMA schema_version").fetchone() == cookie
+                assert conn.execute(
+                    "SELECT 1 FROM store_settings WHERE key = 'defer_visit_aggregates'"
+                ).fetchall() == []
+
+        assert len(snapshots[0]) == 40
+        assert snapshots[0] == snapshots[1]
+
+    def test_deferred_aggregates_failure_leaves_trigger_enabled(
+        self, tmp_db_path: str
+    ) -> None:
+        db = Database(tmp_db_path)
+        bad = [{"url": "https://x.example.com/", "visited_at": None}]
+        with pytest.raises(Exception):
+            db.bulk_ingest_history(
+                bad, source_type="chrome", source_name="Chrome/Default",
+                defer_aggregates=True,
+            )
+        with sqlite3.connect(tmp_db_path) as conn:
+            assert conn.execute(
+                "SELECT 1 FROM store_settings WHERE key = 'defer_visit_aggregates'"
+            ).fetchall() == []
+        url_row, _ = db.upsert_history_url("https://x.example.com/")
+        db.add_history_visit(
+            url_id=url_row.id, visited_at=datetime(2026, 4, 1),
+            source_type="chrome", source_name="Chrome/Default",
+        )
+        assert db.get_history_url(url_row.id).visit_count == 1
+
+
+class TestHistoryRollups:
+    @staticmethod
+    def _entries() -> list[dict]:
+        # Mon 2026-04-20 .. Thu 2026-04-30; two sites, one also seen
+        # under www., the other on a non-default port.
+        t0 = datetime(2026, 4, 20, 9, 0, 0)
+        hosts = ["a.example.com", "B.example.com:8080", "www.a.example.com"]
+        return [
+            {
+                "visit_id": i,
+                "visited_at": t0 + timedelta(hours=12 * i),
+                "from_visit": 0,
+                "transition": "link",
+                "url": f"https://{hosts[i % 3]}/p{i % 4}",
+                "title": f"Page {i % 4}",
+                "typed_count": 0,
+                "duration_ms": 1000 * i,
+            }
+            for i in range(20)
+        ]
+
+    @staticmethod
+    def _rollups(db_path: str) -> tuple[list, list]:
+        with sqlite3.connect(db_path) as conn:
+            return (
+                conn.execute(
+                    "SELECT * FROM history_daily ORDER BY domain, day"
+                ).fetchall(),
+                conn.execute(
+                    "SELECT * FROM history_url_daily ORDER BY url_id, day"
+                ).fetchall(),
+            )
+
+    def test_bulk_ingest_maintains_rollups(
+        self, tmp_db_path: str, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr("bookmark_memex.db._HISTORY_CHUNK", 3)
+        db = Database(tmp_db_path)
+        entries = self._entries()
+        db.bulk_ingest_history(
+            entries, source_type="chrome", source_name="Chrome/Default"
+        )
+        # Dedup hits on re-ingest must not be counted again.
+        db.bulk_ingest_history(
+            entries, source_type="chrome", source_name="Chrome/Default"
+        )
+
+        with sqlite3.connect(tmp_db_path) as conn:
+            expected = conn.execute(
+                "SELECT date(v.visited_at), count(*), "
+                "count(DISTINCT v.url_id), coalesce(sum(v.duration_ms), 0) "
+                "FROM history_visits v JOIN history_urls u ON u.id = v.url_id "
+                "WHERE u.domain = 'a.example.com' "
+                "GROUP BY 1 ORDER BY 1"
+            ).fetchall()
+            domains = {r[0] for r in conn.execute(
+                "SELECT domain FROM history_daily"
+            )}
+        assert domains == {"a.example.com", "b.example.com"}
+
+        days = db.domain_activity("a.example.com")
+        assert [
+            (d["period"], d["visits"], d["total_duration_ms"]) for d in days
+        ] == [(day, n, ms) for day, n, _, ms in expected]
+        with sqlite3.connect(tmp_db_path) as conn:
+            distinct = conn.execute(
+                "SELECT day, distinct_urls FROM history_daily "
+                "WHERE domain = 'a.example.com' ORDER BY day"
+            ).fetchall()
+        assert distinct == [(day, urls) for day, _, urls, _ in expected]
+
+        weeks = db.domain_activity("A.example.com", bucket="week")
+        assert [w["period"] for w in weeks] == ["2026-04-20", "2026-04-27"]
+        assert sum(w["visits"] for w in weeks) == sum(r[1] for r in expected)
+        months = db.domain_activity("a.example.com", bucket="month")
+        assert [m["period"] for m in months] == ["2026-04-01"]
+
+        windowed = db.domain_activity(
+            "a.example.com", start=date(2026, 4, 22), end=date(2026, 4, 23)
+        )
+        assert [d["period"] for d in windowed] == ["2026-04-22", "2026-04-23"]
+
+        top = db.top_domains()
+        assert [t["domain"] for t in top] == ["a.example.com", "b.example.com"]
+        assert sum(t["visits"] for t in top) == 20
+
+        on_day = db.history_on(date(2026, 4, 20))
+        assert sum(r["visits"] for r in on_day) == 2
+        assert {r["url"] for r in on_day} == {
+            "https://a.example.com/p0",
+            "https://b.example.com:8080/p1",
+        }
+
+    def test_unknown_bucket_raises(self, tmp_db_path: str) -> None:
+        with pytest.raises(ValueError, match="bucket"):
+            Database(tmp_db_path).domain_activity("a.example.com", bucket="year")
+
+    def test_incremental_rollups_match_rebuild(self, tmp_db_path: str) -> None:
+        db = Database(tmp_db_path)
+        db.bulk_ingest_history(
+            self._entries(), source_type="chrome", source_name="Chrome/Default"
+        )
+        url_row, _ = db.upsert_history_url("https://a.example.com/single")
+        db.add_history_visit(
+            url_id=url_row.id, visited_at=datetime(2026, 4, 21, 8, 0, 0),
+            source_type="firefox", source_name="Firefox/default",
+            duration_ms=500,
+        )
+        incremental = self._rollups(tmp_db_path)
+
+        assert db.rebuild_history_rollups() == len(incremental[0])
+        assert self._rollups(tmp_db_path) == incremental
+        assert db.rebuild_history_rollups(since=date(2026, 4, 25)) < len(
+            incremental[0]
+        )
+        assert self._rollups(tmp_db_path) == incremental
+
+    def test_add_history_visit_updates_rollups(self, tmp_db_path: str) -> None:
+        db = Database(tmp_db_path)
+        url_row, _ = db.upsert_history_url("https://solo.example.com/x")
+        t = datetime(2026, 4, 20, 9, 0, 0)
+        for _ in range(2):
+            db.add_history_visit(
+                url_id=url_row.id, visited_at=t,
+                source_type="chrome", source_name="Chrome/Default",
+                duration_ms=250,
+            )
+        assert db.domain_activity("solo.example.com") == [{
+            "period": "2026-04-20",
+            "visits": 1,
+            "active_days": 1,
+            "total_duration_ms": 250,
+        }]
+
+
+class TestPruneHistory:
+    @staticmethod
+    def _seed(db: Database) -> None:
+        # Two visits a day, 2026-04-01 .. 2026-04-10, each referring to
+        # the previous one; three URLs.
+        t0 = datetime(2026, 4, 1, 9, 0, 0)
+        db.bulk_ingest_history(
+            [
+                {
+                    "visit_id": i,
+                    "visited_at": t0 + timedelta(hours=12 * i),
+                    "from_visit": i - 1,
+                    "transition": "link",
+                    "url": f"https://prune.example.com/{i % 3}",
+                    "title": None,
+                    "typed_count": 0,
+                    "duration_ms": 100,
+                }
+                for i in range(20)
+            ],
+            source_type="chrome",
+            source_name="Chrome/Default",
+        )
+
+    def test_prune_deletes_visits_and_recomputes_aggregates(
+        self, tmp_db_path: str, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        from bookmark_memex.models import HistoryVisit, Marginalia
+
+        monkeypatch.setattr("bookmark_memex.db._PRUNE_CHUNK", 3)
+        db = Database(tmp_db_path)
+        self._seed(db)
+        with db._session() as s:
+            old_visit = s.execute(
+                select(HistoryVisit).order_by(HistoryVisit.visited_at)
+            ).scalars().first()
+            s.add(Marginalia(
+                id="prune-note", history_visit_id=old_visit.id, text="kept"
+            ))
+
+        seen: list[int] = []
+        result = db.prune_history(
+            date(2026, 4, 6), progress=seen.append
+        )
+        assert result.visits_deleted == 10
+        assert result.urls_touched == 3
+        assert result.summarised is False
+        # Whole days per chunk: two visits a day fit a chunk of three.
+        assert seen == [2, 4, 6, 8, 10]
+
+        with sqlite3.connect(tmp_db_path) as conn:
+            aggregates = conn.execute(
+                "SELECT u.visit_count, u.first_visited, u.last_visited, "
+                "(SELECT COUNT(*) FROM history_visits v WHERE v.url_id = u.id), "
+                "(SELECT MIN(visited_at) FROM history_visits v WHERE v.url_id = u.id), "
+                "(SELECT MAX(visited_at) FROM history_visits v WHERE v.url_id = u.id) "
+                "FROM history_urls u"
+            ).fetchall()
+            oldest = conn.execute(
+                "SELECT MIN(visited_at) FROM history_visits"
+            ).fetchone()[0]
+            first_survivor = conn.execute(
+                "SELECT from_visit_id FROM history_visits ORDER BY visited_at LIMIT 1"
+            ).fetchone()[0]
+            rollup_days = conn.execute(
+                "SELECT MIN(day), SUM(visits) FROM history_daily"
+            ).fetchone()
+            triggers = {r[0] for r in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+            )}
+            note = conn.execute(
+                "SELECT history_visit_id FROM marginalia WHERE id = 'prune-note'"
+            ).fetchone()
+        assert len(aggregates) == 3
+        assert all(row[:3] == row[3:] for row in aggregates)
+        assert oldest.startswith("2026-04-06")
+        assert first_survivor is None  # its referrer was pruned
+        assert rollup_days == ("2026-04-06", 10)
+        assert "trg_history_visits_delete" in triggers
+        assert note == (None,)
+
+        # The pooled connection went back with foreign keys on.
+        with db._session() as s:
+            assert s.connection().exec_driver_sql(
+                "PRAGMA foreign_keys"
+            ).scalar() == 1
+
+    def test_summarise_keeps_rollups_for_pruned_days(
+        self, tmp_db_path: str
+    ) -> None:
+        db = Database(tmp_db_path)
+        self._seed(db)
+        before = db.domain_activity("prune.example.com")
+
+        result = db.prune_history(date(2026, 4, 6), summarise=True)
+        assert result.summarised is True
+        assert db.domain_activity("prune.example.com") == before
+        assert db.history_on(date(2026, 4, 2))
+
+        # A later rebuild only covers days that still have visits.
+        db.rebuild_history_rollups()
+        assert db.domain_activity("prune.example.com") == before
+
+    def test_prune_makes_no_schema_changes(self, tmp_db_path: str) -> None:
+        db = Database(tmp_db_path)
+        self._seed(db)
+        with sqlite3.connect(tmp_db_path) as conn:
+            cookie = conn.execute("PRAGMA schema_version").fetchone()
+        db.prune_history(date(2026, 4, 6))
+
+        with sqlite3.connect(tmp_db_path) as conn:
+            # No DDL: other connections keep their prepared statements.
+            assert conn.execute("PRAGMA schema_version").fetchone() == cookie
+            assert conn.execute("SELECT COUNT(*) FROM store_settings "
+                                "WHERE key = 'defer_visit_aggregates'"
+                                ).fetchone() == (0,)
+            # The delete trigger still maintains aggregates outside prune.
+            url_id, = conn.execute(
+                "SELECT url_id FROM history_visits ORDER BY visited_at LIMIT 1"
+            ).fetchone()
+            conn.execute("PRAGMA foreign_keys=OFF")
+            conn.execute("DELETE FROM history_visits WHERE url_id = ?", (url_id,))
+            assert conn.execute(
+                "SELECT visit_count, last_visited FROM history_urls WHERE id = ?",
+                (url_id,),
+            ).fetchone() == (0, None)
+
+    @pytest.mark.parametrize("summarise", [False, True])
+    def test_interrupted_prune_leaves_consistent_state(
+        self, tmp_db_path: str, monkeypatch: pytest.MonkeyPatch,
+        summarise: bool,
+    ) -> None:
+        monkeypatch.setattr("bookmark_memex.db._PRUNE_CHUNK", 3)
+        db = Database(tmp_db_path)
+        self._seed(db)
+        before = db.domain_activity("prune.example.com")
+
+        def stop(deleted: int) -> None:
+            if deleted == 4:
+                raise KeyboardInterrupt
+
+        with pytest.raises(KeyboardInterrupt):
+            db.prune_history(date(2026, 4, 6), summarise=summarise, progress=stop)
+
+        def snapshot() -> tuple:
+            with sqlite3.connect(tmp_db_path) as conn:
+                return tuple(conn.execute(sql).fetchall() for sql in (
+                    "SELECT * FROM history_daily ORDER BY day",
+                    "SELECT * FROM history_url_daily ORDER BY day, url_id",
+                    "SELECT started_at, ended_at, visit_count, url_count "
+                    "FROM browsing_sessions ORDER BY started_at",
+                    "SELECT COUNT(*) FROM history_visits WHERE from_visit_id "
+                    "NOT IN (SELECT id FROM history_visits)",
+                ))
+
+        interrupted = snapshot()
+        assert interrupted[3] == [(0,)]  # no dangling referrers
+        db.rebuild_history_rollups()
+        db.rebuild_browsing_sessions()
+        assert snapshot() == interrupted
+        if summarise:
+            assert db.domain_activity("prune.example.com") == before
+        else:
+            with sqlite3.connect(tmp_db_path) as conn:
+                assert conn.execute(
+                    "SELECT MIN(day) FROM history_daily"
+                ).fetchone() == ("2026-04-03",)
+
+        # A rerun finishes the job.
+        assert db.prune_history(
+            date(2026, 4, 6), summarise=summarise
+        ).visits_deleted == 6
+        if summarise:
+            assert db.domain_activity("prune.example.com") == before
+
+    def test_prune_with_nothing_old_is_a_noop(self, tmp_db_path: str) -> None:
+        db = Database(tmp_db_path)
+        self._seed(db)
+        result = db.prune_history(date(2026, 1, 1))
+        assert result.visits_deleted == 0
+        assert result.urls_touched == 0
+        assert len(db.domain_activity("prune.example.com")) == 10
+
+
+class TestCompactTimestamps:
+    @staticmethod
+    def _snapshot(db: Database) -> tuple:
+        from bookmark_memex.models import HistoryUrl, HistoryVisit
+
+        with db._session() as s:
+            visits = s.execute(
+                select(HistoryVisit.id, HistoryVisit.visited_at,
+                       HistoryVisit.imported_at, HistoryVisit.from_visit_id)
+                .order_by(HistoryVisit.id)
+            ).all()
+            urls = s.execute(
+                select(HistoryUrl.id, HistoryUrl.visit_count,
+                       HistoryUrl.first_visited, HistoryUrl.last_visited)
+                .order_by(HistoryUrl.id)
+            ).all()
+        return visits, urls, db.domain_activity("prune.example.com")
+
+    def test_compaction_keeps_data_and_shrinks_storage(
+        self, tmp_db_path: str
+    ) -> None:
+        db = Database(tmp_db_path)
+        TestPruneHistory._seed(db)
+        before = self._snapshot(db)
+
+        result = db.compact_history_timestamps()
+        assert result.converted is True
+        # New files use incremental auto-vacuum: nothing left to VACUUM.
+        assert result.bytes_free == 0
+        assert self._snapshot(db) == before
+        # A fresh instance reads the format from store_settings.
+        with patch(
+            "bookmark_memex.migrations.history_timestamps_are_epoch"
+        ) as probe:
+            assert self._snapshot(Database(tmp_db_path)) == before
+        probe.assert_not_called()
+
+        with sqlite3.connect(tmp_db_path) as conn:
+            types = conn.execute(
+                "SELECT DISTINCT typeof(v.visited_at), typeof(v.imported_at), "
+                "typeof(u.last_visited) "
+                "FROM history_visits v JOIN history_urls u ON u.id = v.url_id"
+            ).fetchall()
+            declared = {
+                row[1]: row[2]
+                for row in conn.execute("PRAGMA table_info(history_visits)")
+            }
+            objects = {row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master "
+                "WHERE tbl_name IN ('history_visits', 'history_urls')"
+            )}
+        assert types == [("integer", "integer", "integer")]
+        assert declared["visited_at"] == "INTEGER"
+        assert {
+            "uq_history_visits_key",
+            "ix_history_visits_active_visited",
+            "ix_history_urls_domain",
+            "trg_history_visits_insert",
+            "trg_history_visits_delete",
+        } <= objects
+
+        assert db.compact_history_timestamps().converted is False
+
+    def test_ingest_rollups_and_prune_after_compaction(
+        self, tmp_db_path: str
+    ) -> None:
+        db = Database(tmp_db_path)
+        TestPruneHistory._seed(db)
+        db.compact_history_timestamps()
+
+        # Re-importing the same visits still hits the dedup index.
+        db2 = Database(tmp_db_path)
+        TestPruneHistory._seed(db2)
+        late = datetime(2026, 4, 20, 8, 30, 0, 250)
+        counts = db2.bulk_ingest_history(
+            [{
+                "visit_id": 99,
+                "visited_at": late,
+                "transition": "typed",
+                "url": "https://prune.example.com/0",
+                "title": None,
+                "typed_count": 1,
+                "duration_ms": 5,
+            }],
+            source_type="chrome",
+            source_name="Chrome/Default",
+        )
+        assert counts[:2] == (0, 1)
+        history_url = db2.get_history_url_by_unique_id(
+            generate_history_unique_id("https://prune.example.com/0")
+        )
+        assert history_url.last_visited == late
+        assert history_url.visit_count == 8
+
+        activity = db2.domain_activity("prune.example.com")
+        assert activity[-1]["period"] == "2026-04-20"
+        db2.rebuild_history_rollups()
+        assert db2.domain_activity("prune.example.com") == activity
+        sessions = [(s.started_at, s.visit_count) for s in db2.browsing_sessions()]
+        assert sessions[0] == (late, 1)
+        db2.rebuild_browsing_sessions()
+        assert [
+            (s.started_at, s.visit_count) for s in db2.browsing_sessions()
+        ] == sessions
+
+        result = db2.prune_history(date(2026, 4, 6), summarise=True)
+        assert result.visits_deleted == 10
+        assert db2.domain_activity("prune.example.com") == activity
+        assert db2.get_history_url_by_unique_id(
+            history_url.unique_id
+        ).first_visited == datetime(2026, 4, 7, 9, 0, 0)
+
+
+def _visit(i: int, at: datetime, from_visit: int = 0, url: str = "") -> dict:
+    return {
+        "visit_id": i,
+        "visited_at": at,
+        "from_visit": from_visit,
+        "transition": "link",
+        "url": url or f"https://graph.example.com/{i}",
+        "title": None,
+        "typed_count": 0,
+        "duration_ms": 10,
+    }
+
+
+class TestVisitGraph:
+    @staticmethod
+    def _seed(db: Database) -> dict[int, int]:
+        # 1 -> 2 -> 3 -> 4, and 2 -> 5; browser ids map to ours by time.
+        t0 = datetime(2026, 4, 20, 9, 0, 0)
+        links = {1: 0, 2: 1, 3: 2, 4: 3, 5: 2}
+        db.bulk_ingest_history(
+            [_visit(i, t0 + timedelta(minutes=i), src) for i, src in links.items()],
+            source_type="chrome",
+            source_name="Chrome/Default",
+        )
+        with db._session() as s:
+            from bookmark_memex.models import HistoryVisit
+
+            return dict(s.execute(
+                select(HistoryVisit.source_visit_id, HistoryVisit.id)
+            ).all())
+
+    def test_visit_chain_walks_referrers_oldest_first(
+        self, tmp_db_path: str
+    ) -> None:
+        db = Database(tmp_db_path)
+        ids = self._seed(db)
+
+        chain = db.visit_chain(ids[4])
+        assert [v.id for v in chain] == [ids[1], ids[2], ids[3], ids[4]]
+        assert [v.id for v in db.visit_chain(ids[4], depth=1)] == [ids[3], ids[4]]
+        assert db.visit_chain(999_999) == []
+
+    def test_descendants_follow_links_to_depth(self, tmp_db_path: str) -> None:
+        db = Database(tmp_db_path)
+        ids = self._seed(db)
+
+        assert [v.id for v in db.descendants(ids[1])] == [
+            ids[2], ids[3], ids[4], ids[5],
+        ]
+        assert [v.id for v in db.descendants(ids[1], depth=2)] == [
+            ids[2], ids[3], ids[5],
+        ]
+        assert db.descendants(ids[4]) == []
+
+    def test_from_visit_index_serves_referral_lookups(
+        self, tmp_db_path: str
+    ) -> None:
+        Database(tmp_db_path)
+        with sqlite3.connect(tmp_db_path) as conn:
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN "
+                "SELECT id FROM history_visits WHERE from_visit_id = ?",
+                (1,),
+            ).fetchall()
+        assert "ix_history_visits_from_visit" in plan[0][3]
+
+
+class TestBrowsingSessions:
+    T0 = datetime(2026, 4, 20, 9, 0, 0)
+
+    @staticmethod
+    def _sessions(path: str) -> list[tuple]:
+        with sqlite3.connect(path) as conn:
+            return conn.execute(
+                "SELECT started_at, ended_at, visit_count, url_count, "
+                "total_duration_ms FROM browsing_sessions ORDER BY started_at"
+            ).fetchall()
+
+    def test_visits_are_grouped_by_idle_gap_across_sources(
+        self, tmp_db_path: str
+    ) -> None:
+        db = Database(tmp_db_path)
+        minutes = [0, 10, 35, 120, 140, 400]
+        db.bulk_ingest_history(
+            [_visit(i, self.T0 + timedelta(minutes=m), url="https://a.example/")
+             for i, m in enumerate(minutes[::2], 1)],
+            source_type="chrome", source_name="Chrome/Default",
+        )
+        db.bulk_ingest_history(
+            [_visit(i, self.T0 + timedelta(minutes=m))
+             for i, m in enumerate(minutes[1::2], 1)],
+            source_type="firefox", source_name="Firefox/default",
+        )
+
+        sessions = db.browsing_sessions()
+        assert [(s.visit_count, s.url_count) for s in sessions] == [
+            (1, 1), (2, 2), (3, 2),
+        ]
+        first = sessions[-1]
+        assert first.started_at == self.T0
+        assert first.ended_at == self.T0 + timedelta(minutes=35)
+        assert first.total_duration_ms == 30
+
+        visits = db.session_visits(first.id)
+        assert [v.visited_at for v in visits] == [
+            self.T0 + timedelta(minutes=m) for m in (0, 10, 35)
+        ]
+        assert db.session_for_visit(visits[1].id).id == first.id
+        assert db.browsing_sessions(start=date(2026, 4, 21)) == []
+        assert db.session_visits(999_999) == []
+
+    def test_out_of_order_ingest_matches_full_rebuild(
+        self, tmp_db_path: str
+    ) -> None:
+        db = Database(tmp_db_path)
+        minutes = [0, 20, 40, 60, 80, 100, 3000, 3020, 6000]
+        # A late-arriving visit bridges two sessions, another splits
+        # nothing, and one lands days earlier.
+        for batch in ([0, 40, 80, 3000, 6000], [20, 60, 3020], [100]):
+            db.bulk_ingest_history(
+                [_visit(minutes.index(m) + 1, self.T0 + timedelta(minutes=m))
+                 for m in batch],
+                source_type="chrome", source_name="Chrome/Default",
+            )
+        url_row, _ = db.upsert_history_url("https://single.example.com/")
+        db.add_history_visit(
+            url_id=url_row.id, visited_at=self.T0 - timedelta(days=3),
+            source_type="manual", source_name="test",
+        )
+
+        incremental = self._sessions(tmp_db_path)
+        assert [row[2] for row in incremental] == [1, 6, 2, 1]
+        assert db.rebuild_browsing_sessions() == 4
+        assert self._sessions(tmp_db_path) == incremental
+
+    def test_in_order_appends_match_full_rebuild(self, tmp_db_path: str) -> None:
+        db = Database(tmp_db_path)
+        urls = [db.upsert_history_url(f"https://a.example/{i}")[0].id for i in range(3)]
+        # Revisited URLs keep url_count distinct across extensions.
+        minutes = [0, 5, 20, 45, 50, 200, 210, 229, 300]
+        for n, m in enumerate(minutes):
+            db.add_history_visit(
+                url_id=urls[n % 3], visited_at=self.T0 + timedelta(minutes=m),
+                source_type="manual", source_name="test", duration_ms=n,
+            )
+
+        incremental = self._sessions(tmp_db_path)
+        assert [(row[2], row[3]) for row in incremental] == [(5, 3), (3, 3), (1, 1)]
+        assert db.rebuild_browsing_sessions() == 3
+        assert self._sessions(tmp_db_path) == incremental
+
+    def test_batch_regroups_sessions_once_per_commit(self, tmp_db_path: str) -> None:
+        db = Database(tmp_db_path)
+        url_row, _ = db.upsert_history_url("https://a.example/")
+        # Out of order, so the batch has to regroup rather than extend.
+        minutes = [100, 0, 40, 20, 3000, 60]
+        with patch(
+            "bookmark_memex.db._add_browsing_sessions",
+            wraps=db_module._add_browsing_sessions,
+        ) as regroup:
+            with db.batch(commit_every=4):
+                for m in minutes:
+                    db.add_history_visit(
+                        url_id=url_row.id, visited_at=self.T0 + timedelta(minutes=m),
+                        source_type="manual", source_name="test",
+                    )
+        assert regroup.call_count == 2
+
+        grouped = self._sessions(tmp_db_path)
+        assert [row[2] for row in grouped] == [4, 1, 1]
+        assert db.rebuild_browsing_sessions() == 3
+        assert self._sessions(tmp_db_path) == grouped
+
+    @staticmethod
+    def _append_cost(path: str, session_visits: int) -> int:
+        """SQLite VM steps to add one visit to the end of a long session."""
+        db = Database(path)
+        t0 = TestBrowsingSessions.T0
+        db.bulk_ingest_history(
+            [_visit(i, t0 + timedelta(seconds=10 * i), url=f"https://a.example/{i % 7}")
+             for i in range(1, session_visits + 1)],
+            source_type="chrome", source_name="Chrome/Default",
+        )
+        url_row, _ = db.upsert_history_url("https://a.example/0")
+        steps = [0]
+
+        def count() -> int:
+            steps[0] += 1
+            return 0
+
+        def on_checkout(dbapi_conn, record, proxy) -> None:
+            dbapi_conn.set_progress_handler(count, 10)
+
+        event.listen(db._engine, "checkout", on_checkout)
+        try:
+            db.add_history_visit(
+                url_id=url_row.id,
+                visited_at=t0 + timedelta(seconds=10 * (session_visits + 1)),
+                source_type="manual", source_name="test",
+            )
+        finally:
+            event.remove(db._engine, "checkout", on_checkout)
+            db._engine.dispose()
+        return steps[0]
+
+    def test_appending_to_a_session_does_not_rescan_it(self, tmp_path: Path) -> None:
+        small = self._append_cost(str(tmp_path / "small.db"), 200)
+        large = self._append_cost(str(tmp_path / "large.db"), 4000)
+        assert large < 2 * small
+
+    def test_prune_regroups_sessions(self, tmp_db_path: str) -> None:
+        db = Database(tmp_db_path)
+        # One session straddling midnight, plus an older one.
+        db.bulk_ingest_history(
+            [
+                _visit(1, datetime(2026, 4, 18, 12, 0)),
+                _visit(2, datetime(2026, 4, 19, 23, 50)),
+                _visit(3, datetime(2026, 4, 20, 0, 10)),
+            ],
+            source_type="chrome", source_name="Chrome/Default",
+        )
+        db.prune_history(date(2026, 4, 20))
+
+        assert [(s.started_at, s.visit_count) for s in db.browsing_sessions()] == [
+            (datetime(2026, 4, 20, 0, 10), 1),
+        ]
+
 
 # ---------------------------------------------------------------------------
 # Fake-DB fixtures
@@ -482,7 +1327,8 @@ class TestChromeEndToEnd:
         )
         with patch.object(ChromeImporter, "find_profiles", return_value=[fake_profile]):
             r1 = import_history(db, browser="chrome")
-            r2 = import_history(db, browser="chrome")
+            # full=True re-reads everything instead of starting at the watermark.
+            r2 = import_history(db, browser="chrome", full=True)
 
         assert r1.visits_added == 2
         assert r1.visits_skipped == 0
@@ -491,6 +1337,181 @@ class TestChromeEndToEnd:
         assert r2.urls_added == 0
         assert r2.urls_updated == 1  # same URL, existed already, counted once
 
+    def test_watermark_limits_reimport_to_new_visits(
+        self, tmp_db_path: str, tmp_path: Path
+    ) -> None:
+        profile = tmp_path / "Default"
+        profile.mkdir()
+        t0 = datetime(2026, 4, 20, 9, 0, 0)
+        visits = [
+            {
+                "visit_id": 1,
+                "url": "https://w.example.com/old",
+                "visited_at": t0 - timedelta(days=1),
+                "transition": 0,
+            },
+            {
+                "visit_id": 2,
+                "url": "https://w.example.com/recent",
+                "visited_at": t0 - timedelta(minutes=30),
+                "transition": 0,
+            },
+            {
+                "visit_id": 3,
+                "url": "https://w.example.com/last",
+                "visited_at": t0,
+                "transition": 0,
+            },
+        ]
+        history = profile / "History"
+        _make_fake_chrome_history(history, visits)
+        db = Database(tmp_db_path)
+        fake_profile = BrowserProfile(
+            name="Default", path=profile, browser="Chrome", is_default=True
+        )
+        with patch.object(ChromeImporter, "find_profiles", return_value=[fake_profile]):
+            first = import_history(db, browser="chrome")
+            wm = db.get_import_watermark("chrome", "Chrome/Default")
+            assert (wm.last_visited_at, wm.last_visit_id) == (t0, 3)
+
+            # A new visit, plus one whose timestamp lags the watermark
+            # by more than the overlap window (clock skew): its id is
+            # still past the watermark, so it is picked up.
+            history.unlink()
+            _make_fake_chrome_history(history, visits + [
+                {
+                    "visit_id": 4,
+                    "url": "https://w.example.com/new",
+                    "visited_at": t0 + timedelta(minutes=5),
+                    "transition": 0,
+                },
+                {
+                    "visit_id": 5,
+                    "url": "https://w.example.com/skewed",
+                    "visited_at": t0 - timedelta(hours=3),
+                    "transition": 0,
+                },
+            ])
+            second = import_history(db, browser="chrome")
+            full = import_history(db, browser="chrome", full=True)
+
+        assert first.visits_added == 3
+        # Overlap window re-reads visits 2 and 3; visit 1 is not read.
+        assert second.visits_seen == 4
+        assert second.visits_added == 2
+        assert full.visits_seen == 5
+        assert full.visits_added == 0
+        wm = db.get_import_watermark("chrome", "Chrome/Default")
+        assert (wm.last_visited_at, wm.last_visit_id) == (t0 + timedelta(minutes=5), 5)
+
+    def test_interrupted_import_resumes_from_checkpoint(
+        self, tmp_db_path: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr("bookmark_memex.db._HISTORY_CHUNK", 2)
+        profile = tmp_path / "Default"
+        profile.mkdir()
+        t0 = datetime(2026, 4, 20, 9, 0, 0)
+        _make_fake_chrome_history(
+            profile / "History",
+            [
+                {
+                    "visit_id": i,
+                    "url": f"https://r.example.com/{i}",
+                    "visited_at": t0 + timedelta(minutes=i),
+                    "transition": 0,
+                }
+                for i in range(1, 6)
+            ],
+        )
+        db = Database(tmp_db_path)
+        fake_profile = BrowserProfile(
+            name="Default", path=profile, browser="Chrome", is_default=True
+        )
+
+        class Interrupted(Exception):
+            pass
+
+        def stop_after_first_chunk(done: int) -> None:
+            raise Interrupted
+
+        with patch.object(ChromeImporter, "find_profiles", return_value=[fake_profile]):
+            with pytest.raises(Interrupted):
+                import_history(db, browser="chrome", progress=stop_after_first_chunk)
+            checkpoint = db.get_import_checkpoint("chrome", "Chrome/Default")
+            assert checkpoint.last_visited_at == t0 + timedelta(minutes=2)
+            assert checkpoint.visits_done == 2
+
+            seen: list[int] = []
+            result = import_history(db, browser="chrome", progress=seen.append)
+
+        # Only the visit at the checkpoint timestamp is re-read.
+        assert result.visits_seen == 4
+        assert result.visits_skipped == 1
+        assert result.visits_added == 3
+        assert seen == [2, 4]
+        assert db.get_import_checkpoint("chrome", "Chrome/Default") is None
+        with sqlite3.connect(tmp_db_path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM history_visits").fetchone() == (5,)
+
+    def test_restart_ignores_checkpoint(
+        self, tmp_db_path: str, tmp_path: Path
+    ) -> None:
+        profile = tmp_path / "Default"
+        profile.mkdir()
+        _make_fake_chrome_history(
+            profile / "History",
+            [
+                {
+                    "visit_id": 1,
+                    "url": "https://r.example.com/",
+                    "visited_at": datetime(2026, 4, 20, 9, 0, 0),
+                    "transition": 0,
+                }
+            ],
+        )
+        db = Database(tmp_db_path)
+        with db._session() as s:
+            s.add(ImportCheckpoint(
+                source_type="chrome",
+                source_name="Chrome/Default",
+                last_visited_at=datetime(2030, 1, 1),
+            ))
+        fake_profile = BrowserProfile(
+            name="Default", path=profile, browser="Chrome", is_default=True
+        )
+        with patch.object(ChromeImporter, "find_profiles", return_value=[fake_profile]):
+            result = import_history(db, browser="chrome", resume=False)
+
+        assert result.visits_seen == 1
+        assert db.get_import_checkpoint("chrome", "Chrome/Default") is None
+
+    def test_reader_streams_and_closes_source(self, tmp_path: Path) -> None:
+        profile = tmp_path / "Default"
+        profile.mkdir()
+        _make_fake_chrome_history(
+            profile / "History",
+            [
+                {
+                    "visit_id": i,
+                    "url": f"https://s.example.com/{i}",
+                    "visited_at": datetime(2026, 4, 20, 9, i, 0),
+                    "transition": 0,
+                }
+                for i in range(1, 4)
+            ],
+        )
+        rows = _read_chrome_history(profile, None)
+        assert not isinstance(rows, list)
+        assert next(rows)["visit_id"] == 1
+        rows.close()
+
+        # The source connection is gone: an exclusive writer gets in.
+        conn = sqlite3.connect(profile / "History", timeout=0)
+        conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+        conn.execute("DELETE FROM visits")
+        conn.commit()
+        conn.close()
+
     def test_referrer_chain_resolved(
         self, tmp_db_path: str, tmp_path: Path
     ) -> None:
@@ -533,6 +1554,126 @@ class TestChromeEndToEnd:
         # Second visit's from_visit_id should match the first visit's id.
         assert rows[1][1] == rows[0][0]
 
+    def test_referrer_from_earlier_import_resolved(
+        self, tmp_db_path: str, tmp_path: Path
+    ) -> None:
+        """A referrer outside this run's window still resolves."""
+        profile = tmp_path / "Default"
+        profile.mkdir()
+        t0 = datetime(2026, 4, 20, 9, 0, 0)
+        first = {
+            "visit_id": 10,
+            "url": "https://search.example.com/q=memex",
+            "visited_at": t0,
+        }
+        later = {
+            "visit_id": 11,
+            "url": "https://result.example.com/a",
+            "visited_at": t0 + timedelta(days=2),
+            "from_visit": 10,
+        }
+        db = Database(tmp_db_path)
+        fake_profile = BrowserProfile(
+            name="Default", path=profile, browser="Chrome", is_default=True
+        )
+        with patch.object(ChromeImporter, "find_profiles", return_value=[fake_profile]):
+            _make_fake_chrome_history(profile / "History", [first])
+            import_history(db, browser="chrome")
+            (profile / "History").unlink()
+            _make_fake_chrome_history(profile / "History", [first, later])
+            r2 = import_history(db, browser="chrome", since=t0 + timedelta(days=1))
+
+        assert r2.visits_seen == 1
+        conn = sqlite3.connect(tmp_db_path)
+        rows = conn.execute(
+            "SELECT id, from_visit_id, source_visit_id FROM history_visits "
+            "ORDER BY visited_at"
+        ).fetchall()
+        conn.close()
+        assert [r[2] for r in rows] == [10, 11]
+        assert rows[1][1] == rows[0][0]
+
+    def test_reimport_records_source_ids_on_legacy_visits(
+        self, tmp_db_path: str, tmp_path: Path
+    ) -> None:
+        """Visits imported before source_visit_id existed pick it up."""
+        profile = tmp_path / "Default"
+        profile.mkdir()
+        t0 = datetime(2026, 4, 20, 9, 0, 0)
+        _make_fake_chrome_history(
+            profile / "History",
+            [
+                {"visit_id": 1, "url": "https://l.example.com/", "visited_at": t0},
+                {
+                    "visit_id": 2,
+                    "url": "https://l.example.com/next",
+                    "visited_at": t0 + timedelta(minutes=1),
+                    "from_visit": 1,
+                },
+            ],
+        )
+        db = Database(tmp_db_path)
+        fake_profile = BrowserProfile(
+            name="Default", path=profile, browser="Chrome", is_default=True
+        )
+        with patch.object(ChromeImporter, "find_profiles", return_value=[fake_profile]):
+            import_history(db, browser="chrome")
+            with sqlite3.connect(tmp_db_path) as conn:
+                conn.execute(
+                    "UPDATE history_visits SET source_visit_id = NULL, "
+                    "from_visit_id = NULL"
+                )
+            import_history(db, browser="chrome", full=True)
+
+        conn = sqlite3.connect(tmp_db_path)
+        ids = [r[0] for r in conn.execute(
+            "SELECT source_visit_id FROM history_visits ORDER BY visited_at"
+        )]
+        conn.close()
+        assert ids == [1, 2]
+
+    def test_media_detected_on_new_urls(
+        self, tmp_db_path: str, tmp_path: Path
+    ) -> None:
+        profile = tmp_path / "Default"
+        profile.mkdir()
+        t0 = datetime(2026, 4, 20, 9, 0, 0)
+        _make_fake_chrome_history(
+            profile / "History",
+            [
+                {"visit_id": 1, "url": "https://github.com/queelius/btk",
+                 "visited_at": t0},
+                {"visit_id": 2, "url": "https://plain.example.com/",
+                 "visited_at": t0 + timedelta(minutes=1)},
+                {"visit_id": 3, "url": "https://boom.example.com/",
+                 "visited_at": t0 + timedelta(minutes=2)},
+            ],
+        )
+        db = Database(tmp_db_path)
+        fake_profile = BrowserProfile(
+            name="Default", path=profile, browser="Chrome", is_default=True
+        )
+
+        from bookmark_memex.detectors import run_detectors
+
+        def flaky(url, content=None):
+            if "boom" in url:
+                raise RuntimeError("detector bug")
+            return run_detectors(url, content)
+
+        with (
+            patch.object(ChromeImporter, "find_profiles", return_value=[fake_profile]),
+            patch("bookmark_memex.importers.browser_history.run_detectors", flaky),
+        ):
+            import_history(db, browser="chrome")
+
+        conn = sqlite3.connect(tmp_db_path)
+        media = dict(conn.execute("SELECT url, media FROM history_urls"))
+        conn.close()
+        assert '"repo"' in media["https://github.com/queelius/btk"]
+        assert media["https://plain.example.com/"] is None
+        assert media["https://boom.example.com/"] is None
+
     def test_tracking_params_collapse_to_one_url(
         self, tmp_db_path: str, tmp_path: Path
     ) -> None:
@@ -680,6 +1821,148 @@ class TestFirefoxEndToEnd:
         conn.close()
 
 
+# ---------------------------------------------------------------------------
+# Multi-profile import
+# ---------------------------------------------------------------------------
+
+
+class TestImportHistoryAll:
+    def _profiles(self, tmp_path: Path) -> tuple[list, list]:
+        t0 = datetime(2026, 4, 20, 9, 0, 0)
+        chrome_dir = tmp_path / "Default"
+        brave_dir = tmp_path / "Brave"
+        ff_dir = tmp_path / "abc.default-release"
+        for d in (chrome_dir, brave_dir, ff_dir):
+            d.mkdir()
+        _make_fake_chrome_history(
+            chrome_dir / "History",
+            [
+                {
+                    "visit_id": i,
+                    "url": f"https://chrome.example.com/{i % 3}",
+                    "visited_at": t0 + timedelta(minutes=i),
+                    "from_visit": i - 1 if i > 1 else 0,
+                }
+                for i in range(1, 8)
+            ],
+        )
+        _make_fake_chrome_history(
+            brave_dir / "History",
+            [
+                {
+                    "visit_id": 1,
+                    "url": "https://shared.example.com/",
+                    "visited_at": t0,
+                },
+            ],
+        )
+        _make_fake_firefox_places(
+            ff_dir / "places.sqlite",
+            [
+                {
+                    "visit_id": i,
+                    "url": "https://shared.example.com/" if i == 1
+                    else f"https://ff.example.com/{i}",
+                    "visited_at": t0 + timedelta(minutes=i),
+                }
+                for i in range(1, 5)
+            ],
+        )
+        chromium = [
+            BrowserProfile(name="Default", path=chrome_dir, browser="Chrome",
+                           is_default=True),
+            BrowserProfile(name="Default", path=brave_dir, browser="Brave",
+                           is_default=True),
+        ]
+        firefox = [
+            BrowserProfile(name="abc.default-release", path=ff_dir,
+                           browser="Firefox", is_default=True),
+        ]
+        return chromium, firefox
+
+    def test_imports_every_profile(
+        self, tmp_db_path: str, tmp_path: Path, monkeypatch
+    ) -> None:
+        monkeypatch.setattr("bookmark_memex.db._HISTORY_CHUNK", 2)
+        chromium, firefox = self._profiles(tmp_path)
+        db = Database(tmp_db_path)
+        with (
+            patch.object(ChromeImporter, "find_profiles", return_value=chromium),
+            patch.object(FirefoxImporter, "find_profiles", return_value=firefox),
+        ):
+            results = import_history_all(db, workers=2)
+
+        assert list(results) == [
+            "Chrome/Default", "Brave/Default", "Firefox/abc.default-release",
+        ]
+        assert results["Chrome/Default"].visits_added == 7
+        assert results["Chrome/Default"].urls_seen == 3
+        assert results["Brave/Default"].visits_added == 1
+        assert results["Firefox/abc.default-release"].visits_added == 4
+
+        conn = sqlite3.connect(tmp_db_path)
+        assert conn.execute("SELECT COUNT(*) FROM history_visits").fetchone()[0] == 12
+        # Shared URL collapses to one row whose aggregates see both sources.
+        assert conn.execute(
+            "SELECT visit_count FROM history_urls WHERE url = ?",
+            ("https://shared.example.com/",),
+        ).fetchone()[0] == 2
+        # Referrer chains resolve across chunk boundaries.
+        assert conn.execute(
+            "SELECT COUNT(*) FROM history_visits "
+            "WHERE source_name = 'Chrome/Default' AND from_visit_id IS NOT NULL"
+        ).fetchone()[0] == 6
+        assert conn.execute("SELECT COUNT(*) FROM import_checkpoints").fetchone()[0] == 0
+        conn.close()
+        assert db.get_import_watermark("chrome", "Brave/Default") is not None
+
+    def test_browser_and_profile_filters(
+        self, tmp_db_path: str, tmp_path: Path
+    ) -> None:
+        chromium, firefox = self._profiles(tmp_path)
+        db = Database(tmp_db_path)
+        with (
+            patch.object(ChromeImporter, "find_profiles", return_value=chromium),
+            patch.object(FirefoxImporter, "find_profiles", return_value=firefox),
+        ):
+            brave = import_history_all(db, browsers=["brave"])
+            named = import_history_all(
+                db, browsers=["chrome", "firefox"], profiles=["chrome/default"],
+            )
+        assert list(brave) == ["Brave/Default"]
+        assert list(named) == ["Chrome/Default"]
+
+    def test_no_matching_profile_raises(self, tmp_db_path: str) -> None:
+        db = Database(tmp_db_path)
+        with (
+            patch.object(ChromeImporter, "find_profiles", return_value=[]),
+            patch.object(FirefoxImporter, "find_profiles", return_value=[]),
+        ):
+            with pytest.raises(ValueError, match="No matching"):
+                import_history_all(db)
+
+    def test_reader_error_propagates(
+        self, tmp_db_path: str, tmp_path: Path
+    ) -> None:
+        chromium, firefox = self._profiles(tmp_path)
+        db = Database(tmp_db_path)
+
+        def broken(*args, **kwargs):
+            raise sqlite3.DatabaseError("file is not a database")
+            yield  # pragma: no cover
+
+        with (
+            patch.object(ChromeImporter, "find_profiles", return_value=chromium),
+            patch.object(FirefoxImporter, "find_profiles", return_value=firefox),
+            patch(
+                "bookmark_memex.importers.browser_history._read_firefox_history",
+                broken,
+            ),
+        ):
+            with pytest.raises(sqlite3.DatabaseError):
+                import_history_all(db)
+
+
 # ---------------------------------------------------------------------------
 # Marginalia orphan survival (extended to history records)
 # ---------------------------------------------------------------------------
@@ -858,6 +2141,46 @@ class TestCLIImportHistory:
         assert "visits seen 1" in out
         assert "added 1" in out
 
+    def test_all_flag_prints_each_profile(
+        self, tmp_db_path: str, tmp_path: Path, capsys
+    ) -> None:
+        profile = tmp_path / "Default"
+        profile.mkdir()
+        _make_fake_chrome_history(
+            profile / "History",
+            [
+                {
+                    "visit_id": 1,
+                    "url": "https://all.example.com/",
+                    "visited_at": datetime(2026, 4, 20, 9, 0, 0),
+                }
+            ],
+        )
+        fake = [
+            BrowserProfile(
+                name="Default", path=profile, browser="Chrome", is_default=True
+            )
+        ]
+        with (
+            patch.object(ChromeImporter, "find_profiles", return_value=fake),
+            patch.object(FirefoxImporter, "find_profiles", return_value=[]),
+        ):
+            from bookmark_memex.cli import cmd_import_history
+
+            args = Namespace(
+                db=tmp_db_path,
+                browser=None,
+                profile=None,
+                since=None,
+                list_profiles=False,
+                all_profiles=True,
+            )
+            cmd_import_history(args)
+
+        out = capsys.readouterr().out
+        assert "Imported history from Chrome/Default" in out
+        assert "visits seen 1, added 1" in out
+
     def test_since_flag_invalid_value(
         self, tmp_db_path: str
     ) -> None:
@@ -880,7 +2203,10 @@ class TestCLIImportHistory:
 
 
 class TestMcpGetRecord:
-    def test_get_record_history_url(self, tmp_db_path: str) -> None:
+    @pytest.mark.parametrize("compact", [False, True])
+    def test_get_record_history_url(
+        self, tmp_db_path: str, compact: bool
+    ) -> None:
         from bookmark_memex.mcp import _create_tools
 
         db = Database(tmp_db_path)
@@ -894,14 +2220,21 @@ class TestMcpGetRecord:
             source_name="Chrome/Default",
             transition="link",
         )
+        if compact:
+            db.compact_history_timestamps()
 
         tools = _create_tools(tmp_db_path)
         result = tools["get_record"]("history-url", row.unique_id)
 
         assert result["url"] == "https://mcp.example.com/page"
         assert result["visit_count"] == 1
+        assert result["first_visited"] == "2026-04-20T09:00:00"
         assert len(result["recent_visits"]) == 1
         assert result["recent_visits"][0]["transition"] == "link"
+        assert (
+            result["recent_visits"][0]["visited_at"]
+            == "2026-04-20 09:00:00.000000"
+        )
         assert result["uri"].startswith("bookmark-memex://history-url/")
 
     def test_get_record_visit(self, tmp_db_path: str) -> None:
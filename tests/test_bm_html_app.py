@@ -207,6 +207,17 @@ def test_single_file_hash_routing_present(populated_db, tmp_path):
     assert "hashchange" in html
 
 
+def test_original_db_bytes_counts_pending_wal(populated_db, tmp_path):
+    """Under WAL recent commits sit in <db>-wal; the source size includes them."""
+    src = Path(populated_db.path)
+    wal = src.with_name(src.name + "-wal")
+    assert wal.exists() and wal.stat().st_size > 0
+    expected = src.stat().st_size + wal.stat().st_size
+
+    result = export_html_app(populated_db, tmp_path / "archive.html")
+    assert result["original_db_bytes"] == expected
+
+
 def test_single_file_reports_size_stats(populated_db, tmp_path):
     out = tmp_path / "archive.html"
     result = export_html_app(populated_db, out)
@@ -55,6 +55,12 @@ def test_get_schema_contains_create_table(tools):
     assert "CREATE TABLE" in schema
 
 
+def test_get_schema_points_at_history_rollups(tools):
+    schema = tools["get_schema"]()
+    header = schema.split("-- history_daily (", 1)[1].split("CREATE TABLE", 1)[0]
+    assert "Prefer over scanning history_visits" in header
+
+
 # ---------------------------------------------------------------------------
 # execute_sql
 # ---------------------------------------------------------------------------
@@ -294,6 +300,19 @@ def test_mutate_tag_remove(tools, db_with_data):
     assert "programming" not in tag_names
 
 
+def test_mutate_rename_and_merge_tags(tools, db_with_data):
+    db, _ = db_with_data
+    result = tools["mutate"]([
+        {"op": "rename_tag", "old": "programming", "new": "lang/python"},
+        {"op": "merge_tags", "src": ["test"], "dst": "lang/python"},
+    ])
+    assert result["succeeded"] == 2
+    assert [t.name for t in db.list_tags()] == ["lang/python"]
+    assert all(
+        [t.name for t in bm.tags] == ["lang/python"] for bm in db.list()
+    )
+
+
 # ---------------------------------------------------------------------------
 # mutate – marginalia CRUD
 # ---------------------------------------------------------------------------
@@ -412,6 +431,36 @@ def test_mutate_empty_batch(tools):
     assert result["succeeded"] == 0
 
 
+def test_concurrent_first_calls_share_one_database(db_with_data, monkeypatch):
+    import threading
+    import time
+
+    import bookmark_memex.mcp as mcp_mod
+    from bookmark_memex.mcp import _create_tools
+
+    db, db_path = db_with_data
+    uid = db.list()[0].unique_id
+    opened: list[Database] = []
+
+    class SlowDatabase(Database):
+        def __init__(self, path: str) -> None:
+            time.sleep(0.05)  # widen the first-use window
+            super().__init__(path)
+            opened.append(self)
+
+    monkeypatch.setattr(mcp_mod, "Database", SlowDatabase)
+    tools = _create_tools(db_path)
+    threads = [
+        threading.Thread(target=tools["get_record"], args=("bookmark", uid))
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(opened) == 1
+
+
 # ---------------------------------------------------------------------------
 # create_server (smoke test)
 # ---------------------------------------------------------------------------
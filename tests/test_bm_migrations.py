@@ -1,6 +1,7 @@
-"""Pre-create migrations on Database.__init__.
+"""Schema migrations on Database.__init__.
 
-We currently have exactly one migration:
+The chain lives in :mod:`bookmark_memex.migrations` and is gated on
+``schema_version``. The step with real data-preserving logic is:
 
     _apply_rename_annotations_to_marginalia: renames the legacy
     ``annotations`` table to ``marginalia`` and drops the legacy
@@ -19,6 +20,9 @@ from pathlib import Path
 
 import pytest
 
+from unittest.mock import patch
+
+from bookmark_memex import migrations
 from bookmark_memex.db import Database
 
 
@@ -54,6 +58,8 @@ def test_migration_renames_legacy_annotations_table(tmp_path):
 
     with sqlite3.connect(str(db_path)) as conn:
         conn.execute("ALTER TABLE marginalia RENAME TO annotations")
+        # Pre-rename databases predate version tracking.
+        conn.execute("DELETE FROM schema_version")
         conn.commit()
 
     # Now reopen — migration should rename it back.
@@ -88,6 +94,7 @@ def test_migration_drops_legacy_annotations_fts_shadow(tmp_path):
             " annotation_id UNINDEXED, text"
             ")"
         )
+        conn.execute("DELETE FROM schema_version")
         conn.commit()
 
     Database(str(db_path))
@@ -110,3 +117,458 @@ def test_migration_is_idempotent(tmp_path):
         assert len(notes) == 1
         assert notes[0].text == "first"
         del db
+
+
+def test_fresh_database_records_schema_version(tmp_path):
+    db_path = tmp_path / "versioned.db"
+    Database(str(db_path))
+    with sqlite3.connect(str(db_path)) as conn:
+        versions = [r[0] for r in conn.execute(
+            "SELECT version FROM schema_version ORDER BY version"
+        )]
+    assert versions == [m.version for m in migrations.MIGRATIONS]
+    assert versions[-1] == migrations.SCHEMA_VERSION
+
+
+def test_up_to_date_database_skips_migration_chain(tmp_path):
+    db_path = tmp_path / "fast.db"
+    Database(str(db_path))
+    with patch("bookmark_memex.db.run_migrations") as run:
+        db = Database(str(db_path))
+    run.assert_not_called()
+    assert db.add("https://example.com").id is not None
+
+
+def test_behind_database_runs_pending_steps_only(tmp_path):
+    db_path = tmp_path / "behind.db"
+    Database(str(db_path))
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("DELETE FROM schema_version WHERE version > 2")
+        conn.execute("DROP TRIGGER trg_history_visits_insert")
+        conn.commit()
+
+    Database(str(db_path))
+    with sqlite3.connect(str(db_path)) as conn:
+        trigger = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='trigger' "
+            "AND name='trg_history_visits_insert'"
+        ).fetchone()
+        top = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    assert trigger is not None
+    assert top[0] == migrations.SCHEMA_VERSION
+
+
+def test_content_blob_migration_backfills_inline_pages(tmp_path):
+    db_path = tmp_path / "blobs.db"
+    db = Database(str(db_path))
+    a = db.add("https://example.com/a")
+    b = db.add("https://example.com/b")
+    db._engine.dispose()
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("DELETE FROM schema_version WHERE version >= 5")
+        for bm_id in (a.id, b.id):
+            conn.execute(
+                "INSERT INTO content_cache (bookmark_id, html_content, "
+                "content_hash, content_length, compressed_size, fetched_at) "
+                "VALUES (?, X'789C', 'abc123', 10, 2, '2024-01-01 00:00:00')",
+                (bm_id,),
+            )
+        conn.commit()
+
+    Database(str(db_path))
+    with sqlite3.connect(str(db_path)) as conn:
+        blobs = conn.execute("SELECT hash, refcount FROM content_blobs").fetchall()
+        rows = conn.execute(
+            "SELECT blob_hash, html_content FROM content_cache"
+        ).fetchall()
+    assert blobs == [("abc123", 2)]
+    assert rows == [("abc123", None), ("abc123", None)]
+
+
+def test_active_index_migration_replaces_plain_archived_indexes(tmp_path):
+    db_path = tmp_path / "indexes.db"
+    db = Database(str(db_path))
+    db._engine.dispose()
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("DELETE FROM schema_version WHERE version >= 6")
+        conn.execute("DROP INDEX ix_bookmarks_active_added")
+        conn.execute("CREATE INDEX ix_bookmarks_archived_at ON bookmarks (archived_at)")
+        conn.commit()
+
+    Database(str(db_path))
+    with sqlite3.connect(str(db_path)) as conn:
+        names = {r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='index'"
+        )}
+    assert "ix_bookmarks_active_added" in names
+    assert "ix_bookmarks_archived_at" not in names
+
+
+def test_shadowed_visit_indexes_are_dropped(tmp_path):
+    db_path = tmp_path / "visits.db"
+    db = Database(str(db_path))
+    db._engine.dispose()
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("DELETE FROM schema_version WHERE version >= 7")
+        conn.execute("CREATE INDEX ix_history_visits_url_id ON history_visits (url_id)")
+        conn.commit()
+
+    Database(str(db_path))
+    with sqlite3.connect(str(db_path)) as conn:
+        names = {r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='index' "
+            "AND tbl_name='history_visits'"
+        )}
+    assert "ix_history_visits_url_id" not in names
+    assert "uq_history_visits_key" in names
+
+
+def test_source_visit_id_migration_adds_column_and_index(tmp_path):
+    db_path = tmp_path / "legacy_visits.db"
+    db = Database(str(db_path))
+    db._engine.dispose()
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("DELETE FROM schema_version WHERE version >= 10")
+        conn.execute("DROP INDEX ix_history_visits_source_visit")
+        conn.execute("ALTER TABLE history_visits DROP COLUMN source_visit_id")
+        conn.execute(
+            "CREATE INDEX ix_history_visits_source "
+            "ON history_visits (source_type, source_name)"
+        )
+        conn.commit()
+
+    Database(str(db_path))
+    with sqlite3.connect(str(db_path)) as conn:
+        cols = {r[1] for r in conn.execute("PRAGMA table_info(history_visits)")}
+        names = {r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='index' "
+            "AND tbl_name='history_visits'"
+        )}
+    assert "source_visit_id" in cols
+    assert "ix_history_visits_source_visit" in names
+    assert "ix_history_visits_source" not in names
+
+
+def test_history_rollup_migration_backfills_from_visits(tmp_path):
+    from datetime import datetime
+
+    db_path = tmp_path / "rollups.db"
+    db = Database(str(db_path))
+    url_row, _ = db.upsert_history_url("https://Example.com/a?utm_source=x")
+    for hour in (9, 10):
+        db.add_history_visit(
+            url_id=url_row.id, visited_at=datetime(2026, 4, 20, hour),
+            source_type="chrome", source_name="Chrome/Default",
+            duration_ms=100,
+        )
+    db._engine.dispose()
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("DELETE FROM schema_version WHERE version >= 11")
+        conn.execute("DROP TABLE history_url_daily")
+        conn.execute("DROP TABLE history_daily")
+        conn.commit()
+
+    Database(str(db_path))
+    with sqlite3.connect(str(db_path)) as conn:
+        daily = conn.execute("SELECT * FROM history_daily").fetchall()
+        per_url = conn.execute(
+            "SELECT day, visits, total_duration_ms FROM history_url_daily"
+        ).fetchall()
+    assert daily == [("example.com", "2026-04-20", 2, 1, 200)]
+    assert per_url == [("2026-04-20", 2, 200)]
+
+
+def test_domain_migration_backfills_and_rekeys_rollups(tmp_path):
+    from datetime import datetime
+
+    db_path = tmp_path / "domains.db"
+    db = Database(str(db_path))
+    db.add("https://www.example.com/page", title="Example")
+    url_row, _ = db.upsert_history_url("https://example.com:8080/a")
+    db.add_history_visit(
+        url_id=url_row.id, visited_at=datetime(2026, 4, 20, 9),
+        source_type="chrome", source_name="Chrome/Default",
+    )
+    db._engine.dispose()
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("DELETE FROM schema_version WHERE version >= 12")
+        for table in ("bookmarks", "history_urls"):
+            conn.execute(f"DROP INDEX ix_{table}_domain")
+            conn.execute(f"ALTER TABLE {table} DROP COLUMN domain")
+        # Rollups keyed the pre-column way, host with port.
+        conn.execute("UPDATE history_daily SET domain = 'example.com:8080'")
+        conn.commit()
+
+    Database(str(db_path))
+    with sqlite3.connect(str(db_path)) as conn:
+        domains = [
+            conn.execute(f"SELECT domain FROM {table}").fetchone()[0]
+            for table in ("bookmarks", "history_urls")
+        ]
+        rollup = conn.execute("SELECT domain FROM history_daily").fetchall()
+        names = {r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='index'"
+        )}
+    assert domains == ["example.com", "example.com"]
+    assert rollup == [("example.com",)]
+    assert {"ix_bookmarks_domain", "ix_history_urls_domain"} <= names
+
+
+def test_domain_migration_pages_through_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(migrations, "_BACKFILL_BATCH", 2)
+    db_path = tmp_path / "pages.db"
+    db = Database(str(db_path))
+    for i in range(5):
+        db.add(f"https://site{i}.example.com/")
+    db._engine.dispose()
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("DELETE FROM schema_version WHERE version >= 12")
+        conn.execute("UPDATE bookmarks SET domain = ''")
+        conn.commit()
+
+    pages: list[int] = []
+    real_batches = migrations._backfill_batches
+
+    def batches(conn, query, key="id"):
+        for rows in real_batches(conn, query, key):
+            pages.append(len(rows))
+            yield rows
+
+    monkeypatch.setattr(migrations, "_backfill_batches", batches)
+    Database(str(db_path))
+    with sqlite3.connect(str(db_path)) as conn:
+        domains = [r[0] for r in conn.execute(
+            "SELECT domain FROM bookmarks ORDER BY id"
+        )]
+    assert domains == [f"site{i}.example.com" for i in range(5)]
+    assert pages == [2, 2, 1]
+
+
+def test_compact_history_timestamps_converts_every_text_form(tmp_path):
+    from datetime import datetime
+
+    db_path = tmp_path / "compact.db"
+    db = Database(str(db_path))
+    url_row, _ = db.upsert_history_url("https://example.com/a")
+    for i in range(4):
+        db.add_history_visit(
+            url_id=url_row.id, visited_at=datetime(2026, 4, 20, 9, i),
+            source_type="chrome", source_name="Chrome/Default",
+        )
+    db._engine.dispose()
+    # Text written by other tools: no fraction, short fraction, 'T'.
+    raw = [
+        "2026-04-20 09:00:00",
+        "2026-04-20 09:01:00.5",
+        "2026-04-20T09:02:00.000123",
+        "1969-12-31 23:59:59.000001",
+    ]
+    with sqlite3.connect(str(db_path)) as conn:
+        for i, text in enumerate(raw):
+            conn.execute(
+                "UPDATE history_visits SET visited_at = ? WHERE id = ?",
+                (text, i + 1),
+            )
+        conn.commit()
+
+    assert migrations.compact_history_timestamps(db._engine) is True
+    assert migrations.history_timestamps_are_epoch(db._engine) is True
+    with sqlite3.connect(str(db_path)) as conn:
+        stored = [r[0] for r in conn.execute(
+            "SELECT visited_at FROM history_visits ORDER BY id"
+        )]
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+    assert stored == [
+        1776675600000000,
+        1776675660500000,
+        1776675720000123,
+        -999999,
+    ]
+
+
+def test_visit_graph_migration_indexes_referrers_and_groups_sessions(tmp_path):
+    from datetime import datetime, timedelta
+
+    db_path = tmp_path / "graph.db"
+    db = Database(str(db_path))
+    url_row, _ = db.upsert_history_url("https://example.com/a")
+    for minutes in (0, 10, 90):
+        db.add_history_visit(
+            url_id=url_row.id,
+            visited_at=datetime(2026, 4, 20, 9) + timedelta(minutes=minutes),
+            source_type="chrome", source_name="Chrome/Default",
+        )
+    db._engine.dispose()
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("DELETE FROM schema_version WHERE version >= 13")
+        conn.execute("DROP INDEX ix_history_visits_from_visit")
+        conn.execute("DROP TABLE browsing_sessions")
+        conn.commit()
+
+    Database(str(db_path))
+    with sqlite3.connect(str(db_path)) as conn:
+        sessions = conn.execute(
+            "SELECT visit_count FROM browsing_sessions ORDER BY started_at"
+        ).fetchall()
+        names = {r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='index'"
+        )}
+    assert sessions == [(2,), (1,)]
+    assert "ix_history_visits_from_visit" in names
+
+
+def test_visit_key_migration_replaces_random_unique_ids(tmp_path, monkeypatch):
+    from datetime import datetime
+
+    from bookmark_memex.models import generate_visit_key, visit_key_to_unique_id
+
+    # One visit per backfill page.
+    monkeypatch.setattr(migrations, "_BACKFILL_BATCH", 1)
+    db_path = tmp_path / "keys.db"
+    db = Database(str(db_path))
+    url_row, _ = db.upsert_history_url("https://example.com/a")
+    times = [datetime(2026, 4, 20, 9, minute) for minute in (0, 5)]
+    for at in times:
+        db.add_history_visit(
+            url_id=url_row.id, visited_at=at,
+            source_type="chrome", source_name="Chrome/Default",
+        )
+    db._engine.dispose()
+    # Back to the schema 13 layout: uuid4 ids and the four-column key.
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("DELETE FROM schema_version WHERE version >= 14")
+        conn.execute("DROP INDEX uq_history_visits_key")
+        conn.execute("DROP INDEX ix_history_visits_url_visited")
+        conn.execute("ALTER TABLE history_visits DROP COLUMN unique_id")
+        conn.execute("ALTER TABLE history_visits DROP COLUMN visit_key")
+        conn.execute("ALTER TABLE history_visits ADD COLUMN unique_id TEXT")
+        conn.execute(
+            "UPDATE history_visits SET unique_id = lower(hex(randomblob(16)))"
+        )
+        conn.execute(
+            "CREATE UNIQUE INDEX ix_history_visits_unique_id "
+            "ON history_visits (unique_id)"
+        )
+        conn.execute(
+            "CREATE UNIQUE INDEX uq_history_visits_dedup ON history_visits "
+            "(url_id, visited_at, source_type, source_name)"
+        )
+        conn.commit()
+
+    db = Database(str(db_path))
+    with sqlite3.connect(str(db_path)) as conn:
+        ids = [r[0] for r in conn.execute(
+            "SELECT unique_id FROM history_visits ORDER BY visited_at"
+        )]
+        names = {r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='index' "
+            "AND tbl_name='history_visits'"
+        )}
+    assert ids == [
+        visit_key_to_unique_id(generate_visit_key(
+            url_row.unique_id, at, "chrome", "Chrome/Default"
+        ))
+        for at in times
+    ]
+    assert {"uq_history_visits_key", "ix_history_visits_url_visited"} <= names
+    assert not {"uq_history_visits_dedup", "ix_history_visits_unique_id"} & names
+    _, created = db.add_history_visit(
+        url_id=url_row.id, visited_at=times[0],
+        source_type="chrome", source_name="Chrome/Default",
+    )
+    assert created is False
+    assert db.get_history_visit_by_unique_id(ids[1]).visited_at == times[1]
+
+
+def test_visit_insert_trigger_gate_migration(tmp_path):
+    from datetime import datetime
+
+    db_path = tmp_path / "gate.db"
+    Database(str(db_path))
+    # Back to the schema 14 layout: no store_settings, an ungated trigger.
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("DELETE FROM schema_version WHERE version >= 15")
+        conn.execute("DROP TABLE store_settings")
+        conn.execute("DROP TRIGGER trg_history_visits_insert")
+        conn.execute(
+            "CREATE TRIGGER trg_history_visits_insert AFTER INSERT ON history_visits "
+            "BEGIN UPDATE history_urls SET visit_count = visit_count + 1 "
+            "WHERE id = NEW.url_id; END"
+        )
+        conn.commit()
+
+    db = Database(str(db_path))
+    with sqlite3.connect(str(db_path)) as conn:
+        sql = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'trg_history_visits_insert'"
+        ).fetchone()[0]
+    assert migrations.DEFER_VISIT_AGGREGATES in sql
+    url_row, _ = db.upsert_history_url("https://example.com/a")
+    db.add_history_visit(
+        url_id=url_row.id, visited_at=datetime(2026, 4, 20, 9, 0),
+        source_type="chrome", source_name="Chrome/Default",
+    )
+    assert db.get_history_url(url_row.id).visit_count == 1
+
+
+def test_visit_delete_trigger_gate_migration(tmp_path):
+    from datetime import date, datetime
+
+    db_path = tmp_path / "gate.db"
+    db = Database(str(db_path))
+    url_row, _ = db.upsert_history_url("https://example.com/a")
+    for day in (1, 2):
+        db.add_history_visit(
+            url_id=url_row.id, visited_at=datetime(2026, 4, day, 9, 0),
+            source_type="chrome", source_name="Chrome/Default",
+        )
+    # Back to the schema 16 layout: an ungated delete trigger.
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("DELETE FROM schema_version WHERE version >= 17")
+        conn.execute("DROP TRIGGER trg_history_visits_delete")
+        conn.execute(
+            "CREATE TRIGGER trg_history_visits_delete AFTER DELETE ON history_visits "
+            "BEGIN UPDATE history_urls SET visit_count = visit_count - 1 "
+            "WHERE id = OLD.url_id; END"
+        )
+        conn.commit()
+
+    db = Database(str(db_path))
+    with sqlite3.connect(str(db_path)) as conn:
+        sql = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'trg_history_visits_delete'"
+        ).fetchone()[0]
+    assert migrations.DEFER_VISIT_AGGREGATES in sql
+    assert db.prune_history(date(2026, 4, 2)).visits_deleted == 1
+    assert db.get_history_url(url_row.id).visit_count == 1
+
+
+def test_timestamp_storage_migration_records_compacted_files(tmp_path):
+    db_path = tmp_path / "storage.db"
+    db = Database(str(db_path))
+    db.compact_history_timestamps()
+    db._engine.dispose()
+    # A file compacted before the setting existed.
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("DELETE FROM schema_version WHERE version >= 16")
+        conn.execute("DELETE FROM store_settings")
+        conn.commit()
+
+    db = Database(str(db_path))
+    assert migrations.schema_state(db._engine) == (migrations.SCHEMA_VERSION, True)
+    with sqlite3.connect(str(db_path)) as conn:
+        stored = conn.execute(
+            "SELECT value FROM store_settings WHERE key = 'history_timestamps'"
+        ).fetchone()
+    assert stored == ("epoch",)
+
+
+def test_schema_state_on_fresh_and_legacy_files(tmp_path):
+    from sqlalchemy import create_engine
+
+    db = Database(str(tmp_path / "fresh.db"))
+    assert migrations.schema_state(db._engine) == (migrations.SCHEMA_VERSION, False)
+    # No schema_version or store_settings yet.
+    assert migrations.schema_state(
+        create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    ) == (0, False)
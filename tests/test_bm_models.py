@@ -18,10 +18,15 @@ from bookmark_memex.models import (
     BookmarkSource,
     ContentCache,
     Event,
+    HistoryTimestamp,
     Marginalia,
     SchemaVersion,
     Tag,
     bookmark_tags,
+    generate_visit_key,
+    use_epoch_timestamps,
+    visit_key_from_unique_id,
+    visit_key_to_unique_id,
 )
 from bookmark_memex.uri import (
     build_annotation_uri,  # legacy alias (kept for backward-compat test)
@@ -140,6 +145,19 @@ class TestBookmarkProperties:
         session.flush()
         assert bm.domain == "github.com"
 
+    def test_domain_drops_port_and_www(self, session):
+        bm = Bookmark(
+            unique_id="a9b8c7d6e5f4a3b2",
+            url="https://WWW.Example.com:8443/x",
+            title="Ported",
+        )
+        session.add(bm)
+        session.flush()
+        assert bm.domain == "example.com"
+        assert session.execute(
+            select(Bookmark.id).where(Bookmark.domain == "example.com")
+        ).scalar_one() == bm.id
+
     def test_tag_names_property_empty(self, session):
         bm = Bookmark(
             unique_id="a4b5c6d1e2f3a4b5",
@@ -494,6 +512,89 @@ class TestContentCache:
         assert isinstance(cc.fetched_at, datetime)
 
 
+# ---------------------------------------------------------------------------
+# HistoryTimestamp
+# ---------------------------------------------------------------------------
+
+
+class TestHistoryTimestamp:
+    @pytest.mark.parametrize("epoch", [False, True])
+    def test_round_trip_in_both_storages(self, epoch):
+        from sqlalchemy import Column, Integer, MetaData, Table
+
+        eng = create_engine("sqlite:///:memory:")
+        use_epoch_timestamps(eng.dialect, epoch)
+        t = Table(
+            "ts", MetaData(),
+            Column("id", Integer, primary_key=True),
+            Column("at", HistoryTimestamp),
+        )
+        t.metadata.create_all(eng)
+        at = datetime(2026, 4, 20, 9, 30, 15, 123456)
+        with eng.begin() as conn:
+            conn.execute(t.insert(), [{"at": at}, {"at": None}])
+            stored = conn.execute(
+                text("SELECT at FROM ts ORDER BY id")
+            ).scalars().all()
+            read = conn.execute(select(t.c.at).order_by(t.c.id)).scalars().all()
+            hits = conn.execute(
+                select(t.c.id).where(t.c.at >= datetime(2026, 4, 20))
+            ).scalars().all()
+        eng.dispose()
+
+        assert stored[0] == (
+            1776677415123456 if epoch else "2026-04-20 09:30:15.123456"
+        )
+        assert read == [at, None]
+        assert hits == [1]
+
+    def test_reads_either_form(self):
+        ts = HistoryTimestamp()
+        expected = datetime(1970, 1, 1, 0, 0, 1)
+        assert ts.process_result_value(1_000_000, None) == expected
+        assert ts.process_result_value("1970-01-01 00:00:01", None) == expected
+        assert ts.process_result_value("1970-01-01T00:00:01.000000", None) == expected
+
+
+class TestVisitKey:
+    def test_unique_id_round_trips_the_signed_key(self):
+        for key in (0, 1, -1, 2**63 - 1, -(2**63)):
+            uid = visit_key_to_unique_id(key)
+            assert len(uid) == 16
+            assert visit_key_from_unique_id(uid) == key
+
+    def test_matches_sqlite_rendering(self):
+        eng = create_engine("sqlite:///:memory:")
+        with eng.connect() as conn:
+            for key in (5, -5):
+                rendered = conn.execute(
+                    text("SELECT printf('%016x', :k)"), {"k": key}
+                ).scalar()
+                assert rendered == visit_key_to_unique_id(key)
+        eng.dispose()
+
+    def test_key_depends_on_every_part(self):
+        at = datetime(2026, 4, 20, 9, 30)
+        base = generate_visit_key("00000000000000aa", at, "chrome", "Chrome/Default")
+        assert base == generate_visit_key(
+            "00000000000000aa", at.replace(tzinfo=timezone.utc),
+            "chrome", "Chrome/Default",
+        )
+        assert len({
+            base,
+            generate_visit_key("00000000000000ab", at, "chrome", "Chrome/Default"),
+            generate_visit_key(
+                "00000000000000aa", at.replace(microsecond=1),
+                "chrome", "Chrome/Default",
+            ),
+            generate_visit_key("00000000000000aa", at, "firefox", "Chrome/Default"),
+            generate_visit_key("00000000000000aa", at, "chrome", "Chrome/Other"),
+        }) == 5
+
+    @pytest.mark.parametrize("uid", ["", "abc", "A" * 16, uuid.uuid4().hex])
+    def test_rejects_other_ids(self, uid):
+        assert visit_key_from_unique_id(uid) is None
+
 # ---------------------------------------------------------------------------
 # Event and SchemaVersion
 # ---------------------------------------------------------------------------
@@ -0,0 +1,101 @@
+"""Tests for bookmark_memex.pool."""
+
+from __future__ import annotations
+
+import shutil
+import sqlite3
+import threading
+
+import pytest
+
+from bookmark_memex.db import Database
+from bookmark_memex.pool import ReadPool, close_read_pools, get_read_pool
+
+
+@pytest.fixture
+def db(tmp_db_path):
+    return Database(tmp_db_path)
+
+
+def test_connections_are_reused(db):
+    pool = get_read_pool(db.path)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+    assert get_read_pool(db.path) is pool
+
+
+def test_connections_are_read_only_and_tuned(db):
+    with get_read_pool(db.path).connection() as conn:
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] < -2000
+        assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM bookmarks")
+
+
+def test_pooled_reader_sees_later_writes(db):
+    pool = get_read_pool(db.path)
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM bookmarks").fetchone()[0] == 0
+    db.add("https://example.com")
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM bookmarks").fetchone()[0] == 1
+
+
+def test_row_factory_is_reset_on_return(db):
+    pool = get_read_pool(db.path)
+    with pool.connection() as conn:
+        conn.row_factory = sqlite3.Row
+    with pool.connection() as conn:
+        assert conn.row_factory is None
+
+
+def test_pool_is_bounded(db):
+    pool = ReadPool(db.path, size=1)
+    got = []
+
+    def worker():
+        with pool.connection() as conn:
+            got.append(conn)
+
+    with pool.connection() as held:
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join(0.1)
+        assert got == []
+    t.join(1)
+    assert got == [held]
+
+
+def test_replaced_file_gets_a_fresh_pool(db, tmp_path):
+    pool = get_read_pool(db.path)
+    other = Database(str(tmp_path / "other.db"))
+    other.add("https://example.org")
+    other._engine.dispose()
+    db._engine.dispose()
+    shutil.copy(other.path, tmp_path / "staged.db")
+    shutil.move(str(tmp_path / "staged.db"), db.path)
+
+    fresh = get_read_pool(db.path)
+    assert fresh is not pool
+    with fresh.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM bookmarks").fetchone()[0] == 1
+
+
+def test_missing_file_raises(tmp_path):
+    with pytest.raises(sqlite3.OperationalError):
+        get_read_pool(tmp_path / "nope.db")
+
+
+def test_close_read_pools_closes_idle_connections(db):
+    pool = get_read_pool(db.path)
+    with pool.connection() as conn:
+        pass
+    close_read_pools()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            pass